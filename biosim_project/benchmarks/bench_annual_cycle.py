@@ -0,0 +1,253 @@
+# -*-coding: utf-8 -*-
+
+"""
+Benchmark of the annual cycle on islands of different sizes and populations.
+
+Every phase of :meth:`biosim.island_nature.Island.annual_cycle` is timed
+separately, as well as whole years. The results are saved as JSON, and can be
+compared to a stored baseline, e.g.::
+
+    python benchmarks/bench_annual_cycle.py --output results.json
+    python benchmarks/bench_annual_cycle.py --full --years 2
+    python benchmarks/bench_annual_cycle.py --save-baseline
+
+The script exits with status 1 when a case is slower than the baseline by
+more than the tolerance, so it can be used as a check for regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import textwrap
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from biosim.island_nature import Island
+from biosim.map_generator import generate_map, generate_population
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline_annual_cycle.json')
+
+CHECK_SIM_MAP = textwrap.dedent("""\
+    OOOOOOOOOOOOOOOOOOOOO
+    OOOOOOOOSMMMMJJJJJJJO
+    OSSSSSJJJJMMJJJJJJJOO
+    OSSSSSSSSSMMJJJJJJOOO
+    OSSSSSJJJJJJJJJJJJOOO
+    OSSSSSJJJDDJJJSJJJOOO
+    OSSJJJJJDDDJJJSSSSOOO
+    OOSSSSJJJDDJJJSOOOOOO
+    OSSSJJJJJDDJJJJJJJOOO
+    OSSSSJJJJDDJJJJOOOOOO
+    OOSSSSJJJJJJJJOOOOOOO
+    OOOSSSSJJJJJJJOOOOOOO
+    OOOOOOOOOOOOOOOOOOOOO""")
+
+# islands benchmarked by default, and in addition with --full
+MAP_SIZES = ('check_sim', 50, 100)
+FULL_MAP_SIZES = MAP_SIZES + (500, 1000)
+POPULATIONS = (100, 1000, 10000)
+FULL_POPULATIONS = POPULATIONS + (100000, 1000000)
+
+# slowdowns smaller than this are timing noise, in seconds per year
+MIN_DIFFERENCE = 0.005
+
+
+def island_map(map_size):
+    """
+    Returns the geography of a benchmarked island.
+
+    :param map_size: 'check_sim' or number of rows and columns
+    :return: multiline string with the island's geography
+    """
+    if map_size == 'check_sim':
+        return CHECK_SIM_MAP
+    return generate_map(map_size, map_size, seed=1)
+
+
+def populated_island(map_size, num_animals, seed=1):
+    """
+    Makes an island with animals spread randomly over the habitable cells.
+
+    One of ten animals is a carnivore. Islands other than check_sim are
+    made by :func:`biosim.map_generator.generate_map`.
+
+    :param map_size: 'check_sim' or number of rows and columns
+    :param num_animals: total number of animals placed on the island
+    :param seed: seed for the locations of the animals
+    :return: class instance of the island
+    """
+    geogr = island_map(map_size)
+    island = Island(geogr)
+    num_carn = num_animals // 10
+    island.place_animals(generate_population(
+        geogr, num_animals - num_carn, num_carn, seed=seed))
+    return island
+
+
+def time_years(island, num_years):
+    """
+    Simulates years on the island, timing each phase of the annual cycle.
+
+    :param island: class instance of the island
+    :param num_years: number of years simulated
+    :return: dictionary with mean seconds per year for each phase and for
+             the whole year
+    """
+    phase_times = dict((phase, 0.0) for phase in island.annual_phases)
+    for _ in range(num_years):
+        for phase in island.annual_phases:
+            start = time.perf_counter()
+            getattr(island, phase)()
+            phase_times[phase] += time.perf_counter() - start
+
+    result = dict((phase, seconds / num_years)
+                  for phase, seconds in phase_times.items())
+    result['year'] = sum(phase_times.values()) / num_years
+    return result
+
+
+def run_case(map_size, num_animals, num_years, seed=1):
+    """
+    Benchmarks one island size and initial population.
+
+    :param map_size: 'check_sim' or number of rows and columns
+    :param num_animals: initial number of animals
+    :param num_years: number of years simulated
+    :param seed: seed for the placement and the simulation
+    :return: dictionary with the case and its timings
+    """
+    start = time.perf_counter()
+    island = populated_island(map_size, num_animals, seed)
+    setup_time = time.perf_counter() - start
+
+    random.seed(seed)
+    seconds = time_years(island, num_years)
+    return {'name': case_name(map_size, num_animals),
+            'map_size': map_size,
+            'num_animals': num_animals,
+            'num_years': num_years,
+            'setup': setup_time,
+            'seconds': seconds}
+
+
+def case_name(map_size, num_animals):
+    """ Returns the name identifying a case in results and baselines. """
+    return '{}/{}'.format(map_size, num_animals)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the time of whole years with the baseline.
+
+    :param results: list of case results from :func:`run_case`
+    :param baseline: dictionary with saved results
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25 %
+    :return: list of messages describing regressions
+    """
+    reference = dict((case['name'], case) for case in baseline['cases'])
+    regressions = []
+    for case in results:
+        if case['name'] not in reference:
+            continue
+        old = reference[case['name']]['seconds']['year']
+        new = case['seconds']['year']
+        if new > old * (1 + tolerance) and new - old > MIN_DIFFERENCE:
+            regressions.append(
+                '{}: {:.4f} s per year, baseline {:.4f} s ({:+.0%})'.format(
+                    case['name'], new, old, new / old - 1))
+    return regressions
+
+
+def machine_info():
+    """ Returns a description of the machine running the benchmark. """
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor()}
+
+
+def main(argv=None):
+    """
+    Runs the benchmark from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    :return: exit status, 1 if there are regressions
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the phases of the annual cycle.')
+    parser.add_argument('--full', action='store_true',
+                        help='include large islands and populations')
+    parser.add_argument('--maps', nargs='+', default=None,
+                        help="island sizes, 'check_sim' or number of rows")
+    parser.add_argument('--populations', nargs='+', type=int, default=None,
+                        help='initial numbers of animals')
+    parser.add_argument('--years', type=int, default=3,
+                        help='years simulated in each case')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None,
+                        help='file for the results as JSON')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='file with results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown from the baseline')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    if args.maps is not None:
+        map_sizes = [size if size == 'check_sim' else int(size)
+                     for size in args.maps]
+    else:
+        map_sizes = FULL_MAP_SIZES if args.full else MAP_SIZES
+    if args.populations is not None:
+        populations = args.populations
+    else:
+        populations = FULL_POPULATIONS if args.full else POPULATIONS
+
+    results = []
+    for map_size in map_sizes:
+        for num_animals in populations:
+            case = run_case(map_size, num_animals, args.years, args.seed)
+            results.append(case)
+            print('{:<20} {:>10.4f} s per year'.format(
+                case['name'], case['seconds']['year']))
+            for phase in Island.annual_phases:
+                print('    {:<26} {:>10.4f} s'.format(
+                    phase, case['seconds'][phase]))
+
+    report = {'machine': machine_info(), 'cases': results}
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline in {}'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('REGRESSIONS compared to {}:'.format(args.baseline))
+        for message in regressions:
+            print('    ' + message)
+        return 1
+
+    print('No regressions compared to {}'.format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
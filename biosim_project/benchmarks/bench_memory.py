@@ -0,0 +1,278 @@
+# -*-coding: utf-8 -*-
+
+"""
+Benchmark of the memory used by islands of different sizes and populations.
+
+Each case is measured twice. First the resident set size (RSS) of the
+process is read while the island is populated and simulated without
+tracing, giving the bytes per animal the operating system sees and the
+growth per year. Then the same island is built again with allocations
+traced by :mod:`tracemalloc`, giving the bytes of each habitable cell, of
+each animal, and the memory allocated and the peak of each phase of the
+annual cycle, see :func:`biosim.memory.phase_memory`. The results are saved
+as JSON, and can be compared to a stored baseline, e.g.::
+
+    python benchmarks/bench_memory.py --output results.json
+    python benchmarks/bench_memory.py --full --years 2
+    python benchmarks/bench_memory.py --save-baseline
+
+Only the traced bytes are compared, since the RSS depends on the history of
+the process. The script exits with status 1 when a case uses more memory
+per cell or animal than the baseline by more than the tolerance.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from bench_annual_cycle import island_map, case_name, machine_info
+from biosim.island_nature import Island, habitable_neighbours
+from biosim.map_generator import generate_population
+from biosim.memory import current_rss, phase_memory
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline_memory.json')
+
+# tracing makes the simulation several times slower, so the default cases
+# are smaller than those of bench_annual_cycle
+MAP_SIZES = ('check_sim', 50)
+FULL_MAP_SIZES = MAP_SIZES + (100, 500)
+POPULATIONS = (1000, 10000)
+FULL_POPULATIONS = POPULATIONS + (100000, 1000000)
+
+# measures compared with the baseline, and increases smaller than this are
+# noise, in bytes
+COMPARED = ('per_cell', 'per_animal', 'peak_per_animal')
+MIN_DIFFERENCE = 16
+
+
+def population(geogr, num_animals, seed):
+    """
+    Returns a population spread randomly over the habitable cells, one of
+    ten animals is a carnivore.
+    """
+    num_carn = num_animals // 10
+    return generate_population(geogr, num_animals - num_carn, num_carn,
+                               seed=seed)
+
+
+def len_population(ini_pop):
+    """ Returns the number of animals in a population dictionary. """
+    return sum(len(entry['pop']) for entry in ini_pop)
+
+
+def measure_rss(geogr, ini_pop, num_years, seed):
+    """
+    Measures the resident set size while an island is populated and
+    simulated.
+
+    :return: dictionary with the RSS before and after placing the animals
+             and after the years, and bytes per animal and growth per year
+    """
+    gc.collect()
+    start = current_rss()
+    island = Island(geogr)
+    island.place_animals(ini_pop)
+    placed = current_rss()
+
+    random.seed(seed)
+    for _ in range(num_years):
+        island.annual_cycle()
+    end = current_rss()
+    return {'start': start, 'placed': placed, 'end': end,
+            'per_animal': (placed - start) / float(len_population(ini_pop)),
+            'growth': (end - placed) / float(num_years)}
+
+
+def measure_traced(geogr, ini_pop, num_years, seed):
+    """
+    Measures the traced allocations of an island, its cells, its animals
+    and each phase of the annual cycle.
+
+    :return: dictionary with bytes of the map, per cell and per animal, and
+             of each phase
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        island = Island(geogr)
+        map_bytes = tracemalloc.get_traced_memory()[0]
+
+        locations = habitable_neighbours(island.terrain)[0]
+        for row, col in locations:
+            island.get_cell(row, col)
+        island.habitable_cells()
+        cells_bytes = tracemalloc.get_traced_memory()[0] - map_bytes
+
+        num_animals = len_population(ini_pop)
+        island.place_animals(ini_pop)
+        animals_bytes = (tracemalloc.get_traced_memory()[0] - map_bytes -
+                         cells_bytes)
+
+        random.seed(seed)
+        phases = dict((phase, {'allocated': 0.0, 'peak': 0,
+                               'peak_per_animal': 0.0, 'rss': 0.0})
+                      for phase in island.annual_phases)
+        for _ in range(num_years):
+            num_herb, num_carn = island.number_of_animals()
+            year = phase_memory(island)
+            for phase, memory in year.items():
+                result = phases[phase]
+                result['allocated'] += memory.allocated / float(num_years)
+                result['rss'] += memory.rss / float(num_years)
+                result['peak'] = max(result['peak'], memory.peak)
+                result['peak_per_animal'] = max(
+                    result['peak_per_animal'],
+                    memory.peak / float(max(num_herb + num_carn, 1)))
+    finally:
+        tracemalloc.stop()
+
+    return {'map': map_bytes,
+            'num_cells': len(locations),
+            'per_cell': cells_bytes / float(max(len(locations), 1)),
+            'per_animal': animals_bytes / float(num_animals),
+            'peak_per_animal': max(result['peak_per_animal']
+                                   for result in phases.values()),
+            'phases': phases}
+
+
+def run_case(map_size, num_animals, num_years, seed=1):
+    """
+    Benchmarks one island size and initial population.
+
+    :param map_size: 'check_sim' or number of rows and columns
+    :param num_animals: initial number of animals
+    :param num_years: number of years simulated
+    :param seed: seed for the placement and the simulation
+    :return: dictionary with the case and its measures
+    """
+    geogr = island_map(map_size)
+    ini_pop = population(geogr, num_animals, seed)
+    rss = measure_rss(geogr, ini_pop, num_years, seed)
+    traced = measure_traced(geogr, ini_pop, num_years, seed)
+    return {'name': case_name(map_size, num_animals),
+            'map_size': map_size,
+            'num_animals': num_animals,
+            'num_years': num_years,
+            'rss': rss,
+            'bytes': traced}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the traced bytes per cell and per animal with the baseline.
+
+    :param results: list of case results from :func:`run_case`
+    :param baseline: dictionary with saved results
+    :param tolerance: allowed relative increase, e.g. 0.25 for 25 %
+    :return: list of messages describing regressions
+    """
+    reference = dict((case['name'], case) for case in baseline['cases'])
+    regressions = []
+    for case in results:
+        if case['name'] not in reference:
+            continue
+        for measure in COMPARED:
+            old = reference[case['name']]['bytes'][measure]
+            new = case['bytes'][measure]
+            if new > old * (1 + tolerance) and new - old > MIN_DIFFERENCE:
+                regressions.append(
+                    '{}: {} {:.0f} bytes, baseline {:.0f} bytes '
+                    '({:+.0%})'.format(case['name'], measure, new, old,
+                                       new / old - 1))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the benchmark from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    :return: exit status, 1 if there are regressions
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the memory used per cell and animal.')
+    parser.add_argument('--full', action='store_true',
+                        help='include large islands and populations')
+    parser.add_argument('--maps', nargs='+', default=None,
+                        help="island sizes, 'check_sim' or number of rows")
+    parser.add_argument('--populations', nargs='+', type=int, default=None,
+                        help='initial numbers of animals')
+    parser.add_argument('--years', type=int, default=2,
+                        help='years simulated in each case')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None,
+                        help='file for the results as JSON')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='file with results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative increase from the baseline')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    if args.maps is not None:
+        map_sizes = [size if size == 'check_sim' else int(size)
+                     for size in args.maps]
+    else:
+        map_sizes = FULL_MAP_SIZES if args.full else MAP_SIZES
+    if args.populations is not None:
+        populations = args.populations
+    else:
+        populations = FULL_POPULATIONS if args.full else POPULATIONS
+
+    results = []
+    for map_size in map_sizes:
+        for num_animals in populations:
+            case = run_case(map_size, num_animals, args.years, args.seed)
+            results.append(case)
+            traced = case['bytes']
+            print('{:<20} {:>8.0f} B per cell {:>8.0f} B per animal '
+                  '{:>8.0f} B RSS per animal'.format(
+                      case['name'], traced['per_cell'], traced['per_animal'],
+                      case['rss']['per_animal']))
+            for phase in Island.annual_phases:
+                memory = traced['phases'][phase]
+                print('    {:<26} {:>12.0f} B allocated {:>12.0f} B peak '
+                      '{:>8.1f} B peak per animal'.format(
+                          phase, memory['allocated'], memory['peak'],
+                          memory['peak_per_animal']))
+
+    report = {'machine': machine_info(), 'cases': results}
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline in {}'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('REGRESSIONS compared to {}:'.format(args.baseline))
+        for message in regressions:
+            print('    ' + message)
+        return 1
+
+    print('No regressions compared to {}'.format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
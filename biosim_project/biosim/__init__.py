@@ -6,3 +6,6 @@
 
 __authors__ = 'Elisabeth Flatner and Marie Klever'
 __emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+# version of the model, part of the key of cached simulations
+__version__ = '0.1'
@@ -35,6 +35,22 @@ class Animal(object):
         self._age = age
         self._fitness = None
 
+    @classmethod
+    def from_checked(cls, weight, age):
+        """
+        Creates an animal without checking weight and age, for values that
+        are already checked, e.g. by :func:`biosim.population.check_columns`.
+
+        :param weight: weight of the animal, positive
+        :param age: age of the animal, non-negative integer
+        :return: class instance of the animal
+        """
+        animal = cls.__new__(cls)
+        animal._weight = weight
+        animal._age = age
+        animal._fitness = None
+        return animal
+
     @property
     def weight(self):
         """ Returns the weight of the animal. """
@@ -0,0 +1,497 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides an archipelago for the biosim project: several islands
+simulated in parallel, with animals migrating between them along sea routes.
+
+Each island runs in its own worker process with its own random state, and
+the islands only wait for each other at the exchanges, every
+``exchange_years`` years. At an exchange each animal in the port cell of a
+sea route leaves with the probability of the route, and arrives in the port
+cell of the target island before the next year.
+
+The migrants of all routes from an island are sent as one NumPy array with
+:data:`MIGRANT_DTYPE`, so an exchange is a single message from each island
+and one to each island receiving migrants. With ``parallel=False`` the
+islands run one after the other in the calling process, with the same
+results.
+"""
+
+import multiprocessing
+import random
+from collections import namedtuple
+import numpy as np
+from .island_nature import Island, LANDSCAPE_LETTERS
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+SeaRoute = namedtuple('SeaRoute', ['source', 'source_port', 'target',
+                                   'target_port', 'probability'])
+SeaRoute.__doc__ = """
+Sea route from a port cell on one island to a port cell on another. Ports
+are (row, column) counted from 1, as locations in populations. Each animal
+in the source port leaves with the probability at every exchange.
+"""
+
+_DESERT = LANDSCAPE_LETTERS.index('D')
+
+# one record for each migrant, the index of its route in the archipelago
+MIGRANT_DTYPE = np.dtype([('route', np.uint16), ('species', np.uint8),
+                          ('age', np.uint16), ('weight', np.float64)])
+
+
+class _IslandRunner(object):
+    """
+    One island of an archipelago with its own random state, so the island
+    gives the same simulation in a worker process as in the calling process.
+    """
+
+    def __init__(self, island_map, seed, routes, cell_engine=None):
+        """
+        :param island_map: specification about the island's geography
+        :param seed: random seed of the island
+        :param routes: list of :class:`SeaRoute` of the archipelago, with
+                       the ports of this island
+        :param cell_engine: cell engine of the island, see
+                            :class:`biosim.island_nature.Island`
+        """
+        self.island = Island(island_map, cell_engine)
+        self._routes = routes
+
+        state = random.getstate()
+        random.seed(seed)
+        self._state = random.getstate()
+        random.setstate(state)
+
+    def call(self, method, *args):
+        """
+        Calls a method with the random state of the island.
+
+        :param method: name of the method
+        :return: the result of the method
+        """
+        state = random.getstate()
+        random.setstate(self._state)
+        try:
+            return getattr(self, method)(*args)
+        finally:
+            self._state = random.getstate()
+            random.setstate(state)
+
+    def place_animals(self, population):
+        """ Places a population on the island. """
+        self.island.place_animals(population)
+
+    def run(self, migrants, num_years, departures):
+        """
+        Places arriving migrants, simulates the island and lets animals
+        leave.
+
+        :param migrants: array of MIGRANT_DTYPE arriving on the island
+        :param num_years: number of years to simulate
+        :param departures: indices of the routes from the island that
+                           animals leave by after the last year
+        :return: array of shape (num_years, 2) with the number of herbivores
+                 and carnivores after each year, and array of MIGRANT_DTYPE
+                 with the animals leaving
+        """
+        self.arrive(migrants)
+        counts = np.zeros((num_years, 2), dtype=np.int64)
+        for year in range(num_years):
+            self.island.annual_cycle()
+            counts[year] = self.island.number_of_animals()
+        return counts, self.depart(departures)
+
+    def arrive(self, migrants):
+        """
+        Places migrants in the target ports of their routes.
+
+        :param migrants: array of MIGRANT_DTYPE
+        """
+        if len(migrants) == 0:
+            return
+        ports = np.array([self._routes[route].target_port
+                          for route in migrants['route'].tolist()])
+        self.island.place_animal_columns(ports, migrants['species'],
+                                         migrants['age'], migrants['weight'])
+
+    def depart(self, departures):
+        """
+        Removes the animals leaving by given routes.
+
+        :param departures: indices of routes from the island
+        :return: array of MIGRANT_DTYPE
+        """
+        records = []
+        for route in departures:
+            row, col = self._routes[route].source_port
+            cell = self.island.get_cell(row - 1, col - 1)
+            probability = self._routes[route].probability
+            for code, name in enumerate(('herb', 'carn')):
+                staying = []
+                for animal in getattr(cell, name):
+                    if random.random() < probability:
+                        records.append((route, code, animal.age,
+                                        animal.weight))
+                    else:
+                        staying.append(animal)
+                setattr(cell, name, staying)
+        return np.array(records, dtype=MIGRANT_DTYPE)
+
+    def number_of_animals(self):
+        """ Returns number of herbivores and carnivores on the island. """
+        return self.island.number_of_animals()
+
+    def animal_properties(self, species):
+        """ Returns the properties of the animals, see Island. """
+        return self.island.animal_properties(species)
+
+
+def _serve(connection, runner):
+    """
+    Runs the methods of an island runner sent through a connection, until
+    None is sent.
+
+    Runs in a worker process. Exceptions are sent back to be raised in the
+    calling process.
+
+    :param connection: end of a multiprocessing.Pipe
+    :param runner: class instance of _IslandRunner
+    """
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        method, args = message
+        try:
+            result = runner.call(method, *args)
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+    connection.close()
+
+
+class _LocalWorker(object):
+    """ Runs an island in the calling process, as _ProcessWorker. """
+
+    def __init__(self, runner):
+        self._runner = runner
+        self._result = None
+
+    def send(self, method, *args):
+        """ Runs a method of the island, the result is kept for receive. """
+        self._result = self._runner.call(method, *args)
+
+    def receive(self):
+        """ Returns the result of the last method sent. """
+        return self._result
+
+    def close(self):
+        pass
+
+
+class _ProcessWorker(object):
+    """ Runs an island in a worker process. """
+
+    def __init__(self, runner, context=multiprocessing):
+        """
+        :param runner: object with a method call(method, *args)
+        :param context: multiprocessing or a context of it, giving the
+                        start method of the process
+        """
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child, runner))
+        self._process.daemon = True
+        self._process.start()
+        child.close()
+
+    def send(self, method, *args):
+        """ Starts a method of the island in the worker process. """
+        self._connection.send((method, args))
+
+    def receive(self):
+        """
+        Waits for the result of the last method sent, raising the exception
+        of the method if it failed.
+        """
+        success, result = self._connection.recv()
+        if not success:
+            raise result
+        return result
+
+    def close(self):
+        """ Stops the worker process. """
+        if self._process is None:
+            return
+        try:
+            self._connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join()
+        self._connection.close()
+        self._process = None
+
+
+class Archipelago(object):
+    """
+    This class represents several islands simulated in parallel, with
+    migration along sea routes.
+    """
+
+    def __init__(self, islands, routes=(), exchange_years=1, seed=1,
+                 parallel=True, cell_engine=None):
+        """
+        :param islands: dictionary with the map of each island by name
+        :type islands: dict
+        :param routes: sea routes between the islands
+        :type routes: list of SeaRoute
+        :param exchange_years: number of years between the exchanges of
+                               migrants
+        :type exchange_years: int
+        :param seed: random seed of the first island, the i-th island uses
+                     seed + i
+        :type seed: int
+        :param parallel: if True, each island runs in a worker process,
+                         else all islands run in the calling process
+        :type parallel: bool
+        :param cell_engine: cell engine of the islands, see
+                            :class:`biosim.island_nature.Island`
+        """
+        if len(islands) == 0:
+            raise ValueError("The archipelago needs at least one island")
+        if exchange_years < 1:
+            raise ValueError("Exchanges must be at least one year apart")
+        self.names = list(islands)
+        self.routes = [SeaRoute(*route) for route in routes]
+        self.exchange_years = exchange_years
+
+        runners = [_IslandRunner(islands[name], seed + num, self.routes,
+                                 cell_engine)
+                   for num, name in enumerate(self.names)]
+        self._check_routes({name: runner.island for name, runner in
+                            zip(self.names, runners)})
+
+        self._departures = [
+            [num for num, route in enumerate(self.routes)
+             if route.source == name] for name in self.names]
+        self._arrivals = [
+            [num for num, route in enumerate(self.routes)
+             if route.target == name] for name in self.names]
+
+        self._step = 0
+        self._migrations = []
+
+        # number of herbivores and carnivores on each island after each
+        # year, including year 0
+        self._counts = [np.array([runner.island.number_of_animals()
+                                  for runner in runners])]
+
+        self._workers = []
+        try:
+            for runner in runners:
+                if parallel:
+                    self._workers.append(_ProcessWorker(runner))
+                else:
+                    self._workers.append(_LocalWorker(runner))
+        except Exception:
+            self.close()
+            raise
+
+    def _check_routes(self, islands):
+        """
+        Checks that the routes connect ports where animals can live.
+
+        :param islands: dictionary with the Island of each name
+        """
+        if len(self.routes) > np.iinfo(MIGRANT_DTYPE['route']).max:
+            raise ValueError("Too many sea routes")
+        for route in self.routes:
+            if not 0 <= route.probability <= 1:
+                raise ValueError("Probability of {} must be between 0 and 1"
+                                 .format(route))
+            for name, port in ((route.source, route.source_port),
+                               (route.target, route.target_port)):
+                if name not in islands:
+                    raise ValueError("Unknown island {}".format(name))
+                terrain = islands[name].terrain
+                row, col = port[0] - 1, port[1] - 1
+                if not (0 <= row < terrain.shape[0] and
+                        0 <= col < terrain.shape[1] and
+                        terrain[row, col] >= _DESERT):
+                    raise ValueError("Animals can not live in port {} of {}"
+                                     .format(port, name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stops the worker processes. """
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+
+    def _island_number(self, name):
+        """ Returns the number of the island with given name. """
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise ValueError("Unknown island {}".format(name))
+
+    def _call_all(self, method, args_of_island):
+        """
+        Runs a method on all islands at the same time.
+
+        :param method: name of the method of _IslandRunner
+        :param args_of_island: list with the arguments for each island
+        :return: list with the result of each island
+        """
+        for worker, args in zip(self._workers, args_of_island):
+            worker.send(method, *args)
+
+        # all results are received, so the workers are ready for the next
+        # call even if one of them failed
+        results, error = [], None
+        for worker in self._workers:
+            try:
+                results.append(worker.receive())
+            except Exception as exception:
+                error = error or exception
+        if error is not None:
+            raise error
+        return results
+
+    def place_animals(self, name, population):
+        """
+        Places populations of animals on an island.
+
+        :param name: name of the island
+        :param population: dictionary with location and corresponding population
+        """
+        number = self._island_number(name)
+        self._workers[number].send('place_animals', population)
+        self._workers[number].receive()
+        self._counts[-1] = np.array(self._call_all(
+            'number_of_animals', [()] * len(self.names)))
+
+    def simulate(self, num_years):
+        """
+        Simulates the archipelago for given number of years.
+
+        The islands run in parallel between the exchanges, and migrants are
+        moved after every year that is a multiple of exchange_years.
+
+        :param num_years: number of years to simulate
+        """
+        if not self._workers:
+            raise ValueError("The archipelago is closed")
+
+        migrants = [np.zeros(0, dtype=MIGRANT_DTYPE)] * len(self.names)
+        final_step = self._step + num_years
+        while self._step < final_step:
+            years = min(final_step - self._step,
+                        self.exchange_years -
+                        self._step % self.exchange_years)
+            self._step += years
+            exchange = self._step % self.exchange_years == 0
+            results = self._call_all(
+                'run', [(migrants[num], years,
+                         self._departures[num] if exchange else [])
+                        for num in range(len(self.names))])
+            counts = np.stack([result[0] for result in results], axis=1)
+            departed = [result[1] for result in results]
+            migrants = self._route_migrants(departed)
+            if exchange:
+                self._migrations.append(np.bincount(
+                    np.concatenate(departed)['route'],
+                    minlength=len(self.routes)))
+                # the counts of the year include the exchange
+                counts[-1] += (self._species_counts(migrants) -
+                               self._species_counts(departed))
+            self._counts.extend(counts)
+
+        # migrants arrive before the next year, so none are at sea between
+        # calls
+        if any(len(arriving) for arriving in migrants):
+            self._call_all('arrive', [(arriving,) for arriving in migrants])
+
+    def _route_migrants(self, departed):
+        """
+        Collects the migrants arriving on each island.
+
+        :param departed: list with the array of migrants leaving each island
+        :return: list with the array of migrants arriving on each island
+        """
+        departed = np.concatenate(departed)
+        return [departed[np.isin(departed['route'], self._arrivals[num])]
+                for num in range(len(self.names))]
+
+    @staticmethod
+    def _species_counts(migrants):
+        """
+        Counts the migrants of each species.
+
+        :param migrants: list with an array of migrants for each island
+        :return: array of shape (islands, 2) with the number of herbivores
+                 and carnivores
+        """
+        return np.array([np.bincount(island['species'], minlength=2)
+                         for island in migrants])
+
+    def num_years(self):
+        """ Returns total number of years that have been simulated. """
+        return self._step
+
+    def number_of_animals(self):
+        """
+        Returns dictionary with the number of herbivores and carnivores on
+        each island.
+        """
+        return {name: tuple(counts.tolist())
+                for name, counts in zip(self.names, self._counts[-1])}
+
+    def total_num_by_species(self):
+        """ Returns total number of herbivores and carnivores on all islands. """
+        num_herb, num_carn = self._counts[-1].sum(axis=0).tolist()
+        return {'herbivores': num_herb, 'carnivores': num_carn}
+
+    def num_animals_by_year(self):
+        """
+        Returns arrays of shape (years + 1, islands) with the number of
+        herbivores and carnivores on each island after each year.
+        """
+        counts = np.array(self._counts)
+        return {'herbivores': counts[:, :, 0], 'carnivores': counts[:, :, 1]}
+
+    def migrations(self):
+        """
+        Returns array of shape (exchanges, routes) with the number of
+        animals leaving by each route at each exchange.
+        """
+        return np.array(self._migrations,
+                        dtype=np.int64).reshape(-1, len(self.routes))
+
+    def property_summary(self, species):
+        """
+        Calculates statistics for age, weight and fitness of given species
+        over all islands.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with mean, std, min and max for each property,
+                 None for each property if there are no animals
+        """
+        properties = self._call_all('animal_properties',
+                                    [(species,)] * len(self.names))
+        summary = {}
+        for name in ('age', 'weight', 'fitness'):
+            values = np.concatenate([island[name] for island in properties])
+            if len(values) == 0:
+                summary[name] = None
+            else:
+                summary[name] = {'mean': values.mean(), 'std': values.std(),
+                                 'min': values.min(), 'max': values.max()}
+        return summary
@@ -0,0 +1,180 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides branches of a simulation for the biosim project:
+several independent continuations of the same simulated years, e.g. to
+compare what happens with and without carnivores added after year 100.
+
+The branches are made by :meth:`biosim.simulation.BioSim.fork`. Each branch
+runs in a worker process forked from the calling process, so it starts with
+a copy-on-write copy of the island and the years simulated so far are
+neither simulated again nor copied until a branch changes them. With
+``parallel=False`` the branches are deep copies run one after the other in
+the calling process, with the same results.
+
+Branches are simulated by functions sent to them, called with the
+simulation of the branch as first argument. In worker processes the
+functions, their arguments and their results must be picklable, so they
+must be defined at module level. The simulation of a branch has no graphics
+or image files, so simulate must be called with ``vis_steps=None``::
+
+    def scenario(sim, population):
+        sim.add_population(population)
+        sim.simulate(50, vis_steps=None)
+        return sim.total_num_by_species()
+
+    with sim.fork(2, seeds=[1, 2]) as branches:
+        results = branches.map(scenario, [[], ini_carns])
+"""
+
+import multiprocessing
+import random
+from .archipelago import _LocalWorker, _ProcessWorker
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class _BranchRunner(object):
+    """
+    The simulation of a branch with its own random state, so the branch
+    gives the same results in a worker process as in the calling process.
+    """
+
+    def __init__(self, sim, seed=None):
+        """
+        :param sim: class instance of BioSim of the branch
+        :param seed: random seed of the branch, None continues the random
+                     state of the calling process
+        """
+        self.sim = sim
+
+        state = random.getstate()
+        if seed is not None:
+            random.seed(seed)
+        self._state = random.getstate()
+        random.setstate(state)
+
+    def call(self, function, *args):
+        """
+        Calls a function of the simulation with the random state of the
+        branch.
+
+        :param function: function called as function(sim, \\*args)
+        :return: the result of the function
+        """
+        state = random.getstate()
+        random.setstate(self._state)
+        try:
+            return function(self.sim, *args)
+        finally:
+            self._state = random.getstate()
+            random.setstate(state)
+
+
+class Branches(object):
+    """
+    This class represents independent continuations of a simulation, run in
+    parallel.
+    """
+
+    def __init__(self, sim, num_branches, seeds=None, parallel=True):
+        """
+        :param sim: class instance of BioSim to continue, which is not
+                    changed by the branches
+        :param num_branches: number of branches
+        :type num_branches: int
+        :param seeds: list with the random seed of each branch; if None all
+                      branches continue the random state of the simulation,
+                      and differ only by the functions sent to them
+        :type seeds: list
+        :param parallel: if True each branch runs in a forked worker
+                         process, else in the calling process
+        :type parallel: bool
+        """
+        if seeds is None:
+            seeds = [None] * num_branches
+        elif len(seeds) != num_branches:
+            raise ValueError("There must be one seed for each branch")
+
+        if parallel:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise ValueError("Processes can not be forked on this "
+                                 "platform, use parallel=False")
+            context = multiprocessing.get_context('fork')
+            self._workers = [
+                _ProcessWorker(_BranchRunner(sim._branch(copy_state=False),
+                                             seed), context)
+                for seed in seeds]
+        else:
+            self._workers = [
+                _LocalWorker(_BranchRunner(sim._branch(copy_state=True),
+                                           seed))
+                for seed in seeds]
+
+    def __len__(self):
+        return len(self._workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stops the worker processes, the branches can not be used again. """
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+
+    def _call_all(self, function, args_of_branch):
+        """
+        Runs a function on all branches at the same time.
+
+        :param function: function called as function(sim, \\*args)
+        :param args_of_branch: list with the arguments for each branch
+        :return: list with the result of each branch
+        """
+        if not self._workers:
+            raise ValueError("The branches are closed")
+
+        for worker, args in zip(self._workers, args_of_branch):
+            worker.send(function, *args)
+
+        # all results are received, so the branches are ready for the next
+        # call even if one of them failed
+        results, error = [], None
+        for worker in self._workers:
+            try:
+                results.append(worker.receive())
+            except Exception as exception:
+                error = error or exception
+        if error is not None:
+            raise error
+        return results
+
+    def run(self, function, *args):
+        """
+        Calls the same function in every branch. The branches keep their
+        state between calls.
+
+        :param function: function called as function(sim, \\*args) with the
+                         simulation of the branch
+        :return: list with the result of each branch
+        """
+        return self._call_all(function, [args] * len(self._workers))
+
+    def map(self, function, values):
+        """
+        Calls a function in every branch with a value for each branch, e.g.
+        the population added in each scenario.
+
+        :param function: function called as function(sim, value) with the
+                         simulation of the branch
+        :param values: list with one value for each branch
+        :return: list with the result of each branch
+        """
+        values = list(values)
+        if len(values) != len(self._workers):
+            raise ValueError("There must be one value for each branch")
+        return self._call_all(function, [(value,) for value in values])
@@ -0,0 +1,219 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a cache of simulation results on disk for the biosim
+project.
+
+A simulation without graphics is given by its inputs: the map, the initial
+population, the seed, the number of years, the engine and the parameters of
+all animals and landscapes. :func:`run_cached` hashes a canonical form of
+the inputs together with the package version, and returns the recorded
+:class:`biosim.trajectory.Trajectory` from the cache if the same inputs were
+simulated before. Otherwise it simulates, and stores the trajectory.
+
+Each result is an NPZ file named by its key. Files are written to a
+temporary name and renamed, so other processes never read a partial
+result. A hit marks the file as recently used, and when the files together
+are larger than the limit of the cache the least recently used ones are
+removed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy as np
+from . import __version__
+from .simulation import BioSim
+from .trajectory import Trajectory
+from .verification import PARAMETER_CLASSES
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'biosim')
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def _plain(value):
+    """ Converts NumPy values to Python values for JSON. """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Can not hash {!r}".format(value))
+
+
+def canonical_inputs(island_map, ini_pop, seed, num_years,
+                     engine='individual', engine_options=None, params=None,
+                     version=__version__):
+    """
+    Returns the inputs of a simulation as a canonical JSON string.
+
+    :param params: parameters of all classes by class name, default is the
+                   current parameters
+    :param version: version of the package
+    """
+    if params is None:
+        params = {name: cls.params for name, cls in PARAMETER_CLASSES.items()}
+    inputs = {'island_map': '\n'.join(island_map.split()),
+              'ini_pop': ini_pop, 'seed': seed, 'num_years': num_years,
+              'engine': engine, 'engine_options': engine_options or {},
+              'params': params, 'version': version}
+    return json.dumps(inputs, sort_keys=True, separators=(',', ':'),
+                      default=_plain)
+
+
+def input_key(*args, **kwargs):
+    """
+    Returns the SHA-256 hash of the canonical inputs of a simulation, see
+    :func:`canonical_inputs`.
+    """
+    text = canonical_inputs(*args, **kwargs)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    This class represents trajectories stored in a directory by key, with a
+    limit on their total size.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param directory: directory of the files, created if missing
+        :type directory: str
+        :param max_bytes: largest total size of the files
+        :type max_bytes: int
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _filename(self, key):
+        """ Returns the name of the file of a key. """
+        return os.path.join(self.directory, key + '.npz')
+
+    def _entries(self):
+        """
+        Returns list of (time of last use, size, filename) of the results.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            filename = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def size(self):
+        """ Returns the total size of the results in bytes. """
+        return sum(size for _, size, _ in self._entries())
+
+    def __len__(self):
+        return len(self._entries())
+
+    def get(self, key):
+        """
+        Returns the trajectory of a key and marks it as recently used.
+
+        :param key: key of the inputs, see :func:`input_key`
+        :return: class instance of Trajectory, None if not stored
+        """
+        filename = self._filename(key)
+        try:
+            trajectory = Trajectory.load(filename)
+            os.utime(filename, None)
+        except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+            # missing, removed by another process, or not a result
+            self.misses += 1
+            return None
+        self.hits += 1
+        return trajectory
+
+    def put(self, key, trajectory):
+        """
+        Stores the trajectory of a key, removing the least recently used
+        results if the cache grows too large.
+
+        :param key: key of the inputs, see :func:`input_key`
+        :param trajectory: class instance of Trajectory
+        """
+        handle, temporary = tempfile.mkstemp(dir=self.directory,
+                                             suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                trajectory.save(f)
+            os.replace(temporary, self._filename(key))
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+
+    def evict(self):
+        """ Removes least recently used results until the cache fits. """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """ Removes all results. """
+        for _, _, filename in self._entries():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+
+def run_cached(island_map, ini_pop, seed, num_years, cache=None,
+               engine='individual', engine_options=None):
+    """
+    Simulates an island without graphics, or returns the trajectory of the
+    same simulation from the cache.
+
+    The current parameters of all animals and landscapes are part of the
+    inputs. A simulation that stops early because all animals died is
+    stored as it is.
+
+    :param island_map: specification about the island's geography
+    :param ini_pop: initial animal population
+    :param seed: random generator seed
+    :param num_years: number of years to simulate
+    :param cache: class instance of ResultCache, the default directory if
+                  None
+    :param engine: engine of BioSim, 'individual' or 'meanfield'
+    :param engine_options: keyword arguments for the island of the engine
+    :return: class instance of Trajectory with the number of animals in
+             each cell for every year, including year 0
+    """
+    if cache is None:
+        cache = ResultCache()
+    key = input_key(island_map, ini_pop, seed, num_years, engine,
+                    engine_options)
+    trajectory = cache.get(key)
+    if trajectory is not None:
+        return trajectory
+
+    sim = BioSim(island_map, ini_pop, seed, record=True, engine=engine,
+                 engine_options=engine_options)
+    for _ in sim.iter_years(num_years):
+        pass
+    cache.put(key, sim.trajectory)
+    return sim.trajectory
@@ -0,0 +1,454 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides calibration of the parameters of animals and
+landscapes against target population curves for the biosim project.
+
+A parameter space is a dictionary with names like ``'Herbivore.gamma'`` and
+ranges ``(low, high)``. The targets are the number of herbivores and
+carnivores after each simulated year, with NaN for years without data. The
+loss of a set of parameters is the mean squared difference between
+log(1 + n) of the targets and of the number of animals averaged over
+replicates with different seeds.
+
+:class:`Calibrator` searches the space with an adaptive sampling
+distribution, as in the cross-entropy method. In each generation, candidates
+are drawn around the mean of the distribution and compared by successive
+halving: all candidates are simulated with a few replicates, the better
+part is simulated with more replicates, and so on until one candidate is
+left. The candidates that survived the first round move the distribution.
+The best candidate so far takes part in every generation, so its loss is
+compared with the same replicates as the new candidates.
+
+The simulations run in a pool of worker processes, and are stored in an
+:class:`EvaluationCache`. With a file, a calibration that is restarted finds
+the simulations it already ran, e.g.::
+
+    python -m biosim.calibration targets.csv --param Herbivore.gamma 0.05 0.5
+        --param Carnivore.F 20 80 --cache calibration.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+from collections import namedtuple
+import numpy as np
+from .island_nature import Island
+from .map_generator import generate_population
+from .verification import MAPS, PARAMETER_CLASSES, parameters
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+SPECIES = ('herbivores', 'carnivores')
+
+CalibrationResult = namedtuple('CalibrationResult',
+                               ['params', 'loss', 'replicates', 'history'])
+CalibrationResult.__doc__ = """
+Result of a calibration: the best parameters found as a dictionary by
+class name, e.g. {'Herbivore': {'gamma': 0.3}}, their loss over the given
+number of replicates, and a list with a dictionary for each evaluation of a
+candidate, with the generation, the round of successive halving, the
+parameters, the replicates and the loss.
+"""
+
+
+def class_params(values):
+    """
+    Converts parameters by full name to dictionaries by class name.
+
+    :param values: dictionary with names like 'Herbivore.gamma' as keys
+    :return: dictionary with class names as keys and dictionaries of
+             parameters as values, as taken by
+             :func:`biosim.verification.parameters`
+    """
+    params = {}
+    for name, value in values.items():
+        try:
+            cls_name, param = name.split('.')
+        except ValueError:
+            raise ValueError("Parameter name must be Class.parameter: {}"
+                             .format(name))
+        if (cls_name not in PARAMETER_CLASSES or
+                param not in PARAMETER_CLASSES[cls_name].params):
+            raise ValueError("Unknown parameter {}".format(name))
+        params.setdefault(cls_name, {})[param] = value
+    return params
+
+
+def all_params(params):
+    """
+    Returns the current parameters of all classes, updated with given
+    parameters.
+
+    :param params: dictionary with class names as keys
+    """
+    return {name: dict(cls.params, **params.get(name, {}))
+            for name, cls in PARAMETER_CLASSES.items()}
+
+
+def simulate_counts(island_map, ini_pop, num_years, params, seed):
+    """
+    Simulates an island without graphics.
+
+    :param island_map: specification about the island's geography
+    :param ini_pop: initial population
+    :param num_years: number of years to simulate
+    :param params: dictionary with parameters by class name
+    :param seed: random seed
+    :return: array of shape (num_years, 2) with the number of herbivores
+             and carnivores after each year
+    """
+    state = random.getstate()
+    counts = np.zeros((num_years, 2))
+    try:
+        with parameters(params):
+            random.seed(seed)
+            island = Island(island_map)
+            island.place_animals(ini_pop)
+            for year in range(num_years):
+                island.annual_cycle()
+                counts[year] = island.number_of_animals()
+    finally:
+        random.setstate(state)
+    return counts
+
+
+def _simulate_task(task):
+    """ Runs simulate_counts in a worker process, returning a list. """
+    return simulate_counts(*task).tolist()
+
+
+def population_loss(counts, targets):
+    """
+    Compares simulated numbers of animals with the targets.
+
+    :param counts: array of shape (years, 2), or (replicates, years, 2)
+                   which is averaged over the replicates
+    :param targets: array of shape (years, 2), NaN for years without data
+    :return: mean squared difference of log(1 + n) over the targets
+    """
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim == 3:
+        counts = counts.mean(axis=0)
+    observed = ~np.isnan(targets)
+    return float(np.mean((np.log1p(counts[observed]) -
+                          np.log1p(targets[observed])) ** 2))
+
+
+class EvaluationCache(object):
+    """
+    This class represents simulations stored by a hash of their inputs,
+    in memory and optionally in a file with one JSON object on each line.
+    """
+
+    def __init__(self, filename=None):
+        """
+        :param filename: file to read and append simulations to; the
+                         simulations are only kept in memory if None
+        :type filename: str
+        """
+        self.filename = filename
+        self._results = {}
+        self._line_started = False
+        if filename is not None and os.path.exists(filename):
+            with open(filename) as f:
+                line = ''
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a line cut off when a calibration was stopped
+                        continue
+                    self._results[record['key']] = np.array(record['counts'])
+                self._line_started = not line.endswith('\n')
+
+    def __len__(self):
+        return len(self._results)
+
+    @staticmethod
+    def key(island_map, ini_pop, num_years, params, seed):
+        """
+        Returns a hash of the inputs of a simulation.
+
+        :param params: dictionary with the parameters of all classes
+        """
+        text = json.dumps([island_map, ini_pop, num_years, params, seed],
+                          sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Returns the stored counts for a key, None if not stored. """
+        return self._results.get(key)
+
+    def put(self, key, counts):
+        """ Stores the counts of a simulation. """
+        self._results[key] = np.asarray(counts)
+        if self.filename is not None:
+            with open(self.filename, 'a') as f:
+                if self._line_started:
+                    f.write('\n')
+                    self._line_started = False
+                f.write(json.dumps({'key': key,
+                                    'counts': np.asarray(counts).tolist()})
+                        + '\n')
+
+
+class Calibrator(object):
+    """
+    This class represents a calibration of parameters against target
+    population curves.
+    """
+
+    def __init__(self, island_map, ini_pop, targets, space, cache=None,
+                 workers=None, seed=1):
+        """
+        :param island_map: specification about the island's geography
+        :type island_map: multiline str
+        :param ini_pop: initial animal population
+        :type ini_pop: list of dictionaries
+        :param targets: number of herbivores and carnivores after each year,
+                        NaN for years without data; a species that is not
+                        given is not compared
+        :type targets: dict with keys 'herbivores' and 'carnivores'
+        :param space: range (low, high) of each parameter calibrated, by
+                      full name, e.g. 'Herbivore.gamma'
+        :type space: dict
+        :param cache: cache of simulations, in memory if None
+        :type cache: EvaluationCache
+        :param workers: number of worker processes, default is the number of
+                        cores; simulations run in the calling process if 1
+        :type workers: int
+        :param seed: seed of the first replicate, replicate r uses seed + r,
+                     and seed for drawing candidates
+        :type seed: int
+        """
+        lengths = set(len(targets[species]) for species in targets)
+        if not targets or len(lengths) != 1 or 0 in lengths:
+            raise ValueError("Targets must be non-empty and of equal length")
+        if set(targets) - set(SPECIES):
+            raise ValueError("Targets must be given for herbivores or "
+                             "carnivores")
+        self.num_years = lengths.pop()
+        self.targets = np.full((self.num_years, len(SPECIES)), np.nan)
+        for num, species in enumerate(SPECIES):
+            if species in targets:
+                self.targets[:, num] = targets[species]
+
+        if not space:
+            raise ValueError("The parameter space is empty")
+        for end in (0, 1):
+            with parameters(class_params({name: bounds[end] for name, bounds
+                                          in space.items()})):
+                pass
+        self.names = sorted(space)
+        self._low = np.array([space[name][0] for name in self.names],
+                             dtype=float)
+        self._high = np.array([space[name][1] for name in self.names],
+                              dtype=float)
+        if not (self._low < self._high).all():
+            raise ValueError("Each range must have low < high")
+
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.cache = EvaluationCache() if cache is None else cache
+        self.workers = workers
+        self.seed = seed
+        self._pool = None
+
+    def candidate_params(self, point):
+        """
+        Returns the parameters by class name of a point in the unit cube of
+        the parameter space.
+        """
+        values = self._low + np.asarray(point) * (self._high - self._low)
+        return class_params(dict(zip(self.names, values.tolist())))
+
+    def _run(self, tasks):
+        """ Runs simulations, in the worker processes if there is a pool. """
+        if self._pool is None:
+            return [_simulate_task(task) for task in tasks]
+        return self._pool.map(_simulate_task, tasks)
+
+    def evaluate(self, points, num_replicates):
+        """
+        Calculates the loss of candidates, simulating the replicates that
+        are not in the cache.
+
+        :param points: array of shape (candidates, parameters) in the unit
+                       cube
+        :param num_replicates: number of replicates of each candidate
+        :return: array with the loss of each candidate
+        """
+        keys, tasks, missing = [], [], []
+        for point in points:
+            params = all_params(self.candidate_params(point))
+            keys.append([])
+            for replicate in range(num_replicates):
+                task = (self.island_map, self.ini_pop, self.num_years,
+                        params, self.seed + replicate)
+                key = self.cache.key(*task)
+                keys[-1].append(key)
+                if self.cache.get(key) is None and key not in missing:
+                    tasks.append(task)
+                    missing.append(key)
+
+        for key, counts in zip(missing, self._run(tasks)):
+            self.cache.put(key, counts)
+
+        return np.array([population_loss([self.cache.get(key)
+                                          for key in candidate],
+                                         self.targets)
+                         for candidate in keys])
+
+    def run(self, generations=10, num_candidates=16, min_replicates=2,
+            eta=2, smoothing=0.7, min_spread=0.02):
+        """
+        Searches the parameter space.
+
+        :param generations: number of generations of candidates
+        :param num_candidates: number of new candidates in each generation
+        :param min_replicates: replicates in the first round of successive
+                               halving
+        :param eta: the best 1 / eta candidates of a round go on to the next
+                    round, with eta times as many replicates
+        :param smoothing: share of the new mean and spread of the survivors
+                          of the first round in the sampling distribution
+        :param min_spread: smallest standard deviation of the sampling
+                           distribution, in the unit cube
+        :return: :class:`CalibrationResult`
+        """
+        if eta < 2 or num_candidates < 1 or min_replicates < 1:
+            raise ValueError("Invalid settings of the calibration")
+        rng = np.random.RandomState(self.seed)
+        mean = np.full(len(self.names), 0.5)
+        spread = np.full(len(self.names), 0.3)
+        best, best_loss, best_replicates = None, None, None
+        history = []
+
+        if self.workers != 1:
+            self._pool = multiprocessing.Pool(self.workers)
+        try:
+            for generation in range(generations):
+                points = np.clip(rng.normal(
+                    mean, spread, (num_candidates, len(self.names))), 0, 1)
+                if best is not None:
+                    points = np.vstack((best, points))
+
+                num_replicates = min_replicates
+                survivors = np.arange(len(points))
+                halving = 0
+                while True:
+                    losses = self.evaluate(points[survivors], num_replicates)
+                    for point, loss in zip(points[survivors], losses):
+                        history.append({
+                            'generation': generation, 'round': halving,
+                            'params': self.candidate_params(point),
+                            'replicates': num_replicates, 'loss': loss})
+                    order = np.argsort(losses, kind='stable')
+                    if len(survivors) == 1:
+                        break
+                    survivors = survivors[order[:int(math.ceil(
+                        len(survivors) / float(eta)))]]
+                    if halving == 0:
+                        elite = points[survivors]
+                        mean = (smoothing * elite.mean(axis=0) +
+                                (1 - smoothing) * mean)
+                        spread = np.maximum(
+                            smoothing * elite.std(axis=0) +
+                            (1 - smoothing) * spread, min_spread)
+                    num_replicates *= eta
+                    halving += 1
+
+                best = points[survivors[0]]
+                best_loss, best_replicates = losses[0], num_replicates
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+        return CalibrationResult(self.candidate_params(best), best_loss,
+                                 best_replicates, history)
+
+
+def load_targets(filename):
+    """
+    Loads targets from a CSV file with a header line and the columns year,
+    herbivores and carnivores, where empty values are years without data.
+
+    :param filename: name of the file
+    :return: dictionary with an array for each species, the first element
+             is year 1
+    """
+    data = np.genfromtxt(filename, delimiter=',', names=True, ndmin=1,
+                         missing_values='', filling_values=np.nan)
+    names = data.dtype.names or ()
+    if 'year' not in names:
+        raise ValueError("Missing column year in {}".format(filename))
+    years = data['year'].astype(np.int64)
+    if (years < 1).any():
+        raise ValueError("Years must be counted from 1")
+
+    targets = {}
+    for species in SPECIES:
+        if species in names:
+            targets[species] = np.full(years.max(), np.nan)
+            targets[species][years - 1] = data[species]
+    return targets
+
+
+def main(argv=None):
+    """
+    Calibrates parameters from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description='Calibrate parameters against target population curves.')
+    parser.add_argument('targets', help='CSV file with the columns year, '
+                                        'herbivores and carnivores')
+    parser.add_argument('--param', nargs=3, action='append', required=True,
+                        metavar=('NAME', 'LOW', 'HIGH'),
+                        help='range of a parameter, e.g. Herbivore.gamma '
+                             '0.05 0.5')
+    parser.add_argument('--map', help='file with the island map, a small '
+                                      'mixed map if not given')
+    parser.add_argument('--herbivores', type=int, default=60)
+    parser.add_argument('--carnivores', type=int, default=10)
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--candidates', type=int, default=16)
+    parser.add_argument('--replicates', type=int, default=2,
+                        help='replicates in the first round')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache', help='file storing the simulations')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.map is None:
+        island_map = MAPS['mixed']
+    else:
+        with open(args.map) as f:
+            island_map = f.read()
+    ini_pop = generate_population(island_map, args.herbivores,
+                                  args.carnivores, seed=args.seed)
+    space = {name: (float(low), float(high)) for name, low, high in args.param}
+
+    calibrator = Calibrator(island_map, ini_pop, load_targets(args.targets),
+                            space, EvaluationCache(args.cache), args.workers,
+                            args.seed)
+    result = calibrator.run(args.generations, args.candidates,
+                            args.replicates)
+    print("loss {:.4f} over {} replicates".format(result.loss,
+                                                  result.replicates))
+    for cls_name, params in sorted(result.params.items()):
+        for param, value in sorted(params.items()):
+            print("{}.{} = {:.6g}".format(cls_name, param, value))
+
+
+if __name__ == '__main__':
+    main()
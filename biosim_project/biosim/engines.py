@@ -0,0 +1,557 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides engines running the phases of the annual cycle in the
+cells of an island for the biosim project.
+
+:class:`ObjectEngine` calls the methods of the cells, which loop over the
+animals. :class:`ArrayEngine` computes the fitness and the probabilities of
+all animals of a cell at once with NumPy, which pays off in cells with many
+animals. :class:`AdaptiveEngine` chooses between them for each cell at the
+start of each year, by the number of animals in the cell.
+
+The array path draws the same random numbers in the same order as the
+object path and makes the same decisions, so both give the same simulation
+for a seed. NumPy may round exp differently from math in the last digit,
+which only matters if a random number falls exactly between the two
+values. The engine is chosen when the island is created, e.g.::
+
+    island = Island(island_map, cell_engine='auto')
+
+The threshold of the adaptive engine is measured on the current machine
+with::
+
+    python -m biosim.engines --output engine.json
+
+and used with ``AdaptiveEngine.from_calibration('engine.json')``.
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import time
+import numpy as np
+from .animals import Herbivore, Carnivore
+from .landscape import Landscape, Jungle
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+# cells with at least this many animals use the array path, unless a
+# calibrated threshold is given
+DEFAULT_THRESHOLD = 40
+
+_CALIBRATION_SIZES = (2, 5, 10, 20, 40, 80, 160, 320, 640)
+
+
+def _fitness(animals, params):
+    """
+    Calculates the fitness of animals with the operations of
+    :func:`biosim.fitness_workers._fitness`, so the values are the same.
+
+    :param animals: list of class instances of animals of one species
+    :param params: parameters of the species
+    :return: array of fitness values
+    """
+    num = len(animals)
+    # the attributes are read directly, the properties would cost more
+    # than the calculation
+    ages = np.fromiter((animal._age for animal in animals), float, num)
+    weights = np.fromiter((animal._weight for animal in animals), float, num)
+    return _fitness_of_columns(ages, weights, params)
+
+
+def _fitness_of_columns(ages, weights, params):
+    """
+    Calculates the fitness of animals given as columns, see :func:`_fitness`.
+
+    :param ages: array of ages
+    :param weights: array of weights
+    :param params: parameters of the species
+    :return: array of fitness values
+    """
+    with np.errstate(over='ignore'):
+        q_age = 1. / (1 + np.exp(params['phi_age'] *
+                                 (ages - params['a_half'])))
+        q_weight = 1. / (1 + np.exp(-params['phi_weight'] *
+                                    (weights - params['w_half'])))
+    return q_age * q_weight
+
+
+def _draws(num):
+    """ Returns num random numbers, drawn as the object path draws them. """
+    rnd = random.random
+    return np.array([rnd() for _ in range(num)])
+
+
+class ObjectEngine(object):
+    """
+    This class represents the engine calling the methods of the cells.
+    """
+
+    name = 'object'
+
+    def start_year(self, cells):
+        """
+        Prepares a year in the cells.
+
+        :param cells: list of class instances of the habitable cells
+        """
+        pass
+
+    def herb_eating(self, cell):
+        cell.herb_eating()
+
+    def carn_eating(self, cell):
+        cell.carn_eating()
+
+    def animal_birth(self, cell):
+        cell.animal_birth()
+
+    def herb_migration(self, cell, neighbours):
+        cell.herb_migration(neighbours)
+
+    def carn_migration(self, cell, neighbours):
+        cell.carn_migration(neighbours)
+
+    def animal_aging(self, cell):
+        cell.animal_aging()
+
+    def animal_weight_change(self, cell):
+        cell.animal_weight_change()
+
+    def animal_death(self, cell):
+        cell.animal_death()
+
+
+class ArrayEngine(ObjectEngine):
+    """
+    This class represents the engine computing fitness and probabilities of
+    the animals of a cell as arrays.
+
+    Aging uses the method of the cells.
+    """
+
+    name = 'array'
+
+    @staticmethod
+    def _sort(animals, params, descending):
+        """
+        Sorts animals by fitness like list.sort, keeping the order of animals
+        with the same fitness.
+
+        :return: sorted list
+        """
+        fitness = _fitness(animals, params)
+        order = np.argsort(-fitness if descending else fitness, kind='stable')
+        return [animals[num] for num in order.tolist()]
+
+    def herb_eating(self, cell):
+        """ Herbivores eat in order of fitness, as Landscape.herb_eating. """
+        if len(cell.herb) < 2:
+            cell.herb_eating()
+            return
+
+        cell.herb = self._sort(cell.herb, Herbivore.params, True)
+        if len(cell.carn) > 1:
+            cell.carn = self._sort(cell.carn, Carnivore.params, True)
+
+        food = Herbivore.params['F']
+        beta = Herbivore.params['beta']
+        for herb in cell.herb:
+            if cell.available_food <= 0:
+                break
+            eaten = food if food <= cell.available_food else \
+                cell.available_food
+            herb.weight += beta * eaten
+            cell.available_food -= eaten
+
+    def carn_eating(self, cell):
+        """
+        Carnivores hunt in order of fitness, as Landscape.carn_eating.
+
+        The fitness and weight of the herbivores are looked up once, and the
+        list of survivors is only rebuilt up to where a carnivore stopped.
+        """
+        cell.fitness_sorting(herb_descending=False)
+        herbs = cell.herb
+        herb_fitness = [herb.fitness for herb in herbs]
+        herb_weights = [herb.weight for herb in herbs]
+        food = Carnivore.params['F']
+        beta = Carnivore.params['beta']
+        delta_phi_max = Carnivore.params['DeltaPhiMax']
+        rnd = random.random
+
+        # indices of the surviving herbivores, in order of fitness
+        alive = list(range(len(herbs)))
+        for carn in cell.carn:
+            if not alive or carn.fitness < herb_fitness[alive[0]]:
+                break
+
+            eaten = 0
+            killed = set()
+            stop = len(alive)
+            for pos, num in enumerate(alive):
+                # as Carnivore.eating, the fitness changes when it eats
+                fitness = carn.fitness
+                if fitness <= herb_fitness[num] or eaten == food:
+                    stop = pos
+                    break
+                diff = fitness - herb_fitness[num]
+                if (0 < diff < delta_phi_max and
+                        rnd() >= diff / delta_phi_max):
+                    continue
+
+                if eaten + herb_weights[num] > food:
+                    carn.weight += (food - eaten) * beta
+                    eaten = food
+                else:
+                    carn.weight += herb_weights[num] * beta
+                    eaten += herb_weights[num]
+                killed.add(num)
+
+            if killed:
+                alive = [num for num in alive[:stop]
+                         if num not in killed] + alive[stop:]
+
+        if len(alive) < len(herbs):
+            cell.herb = [herbs[num] for num in alive]
+
+        if cell.events is not None:
+            cell.events.killed(cell, len(herbs) - len(alive))
+
+    @staticmethod
+    def _newborns(animals, cls):
+        """
+        Returns the animals born, as Landscape.newborns.
+
+        :param animals: list of class instances of the animals procreating
+        :param cls: class of the animals
+        :return: list of class instances of newborn animals
+        """
+        params = cls.params
+        num = len(animals)
+        if num < 2:
+            return Landscape.newborns(animals)
+
+        # fitness is only needed for the animals heavy enough to give birth
+        weights = np.fromiter((animal._weight for animal in animals), float,
+                              num)
+        heavy = np.flatnonzero(weights >= params['zeta'] * (
+            params['w_birth'] + params['sigma_birth']))
+        prob = np.zeros(num)
+        if len(heavy):
+            prob[heavy] = params['gamma'] * _fitness(
+                [animals[index] for index in heavy.tolist()], params) * \
+                (num - 1)
+            prob[prob > 1] = 1
+
+        newborns = []
+        rnd = random.random
+        for animal, prob_birth in zip(animals, prob.tolist()):
+            if rnd() < prob_birth:
+                w_newborn = random.gauss(params['w_birth'],
+                                         params['sigma_birth'])
+                if 0 < w_newborn < animal.weight:
+                    w_mother_after = animal.weight - params['xi'] * w_newborn
+                    if w_mother_after > 0:
+                        animal.weight = w_mother_after
+                        newborns.append(cls(w_newborn))
+        return newborns
+
+    def animal_birth(self, cell):
+        """ Animals procreate, as Landscape.animal_birth. """
+        new_herb = self._newborns(cell.herb, Herbivore)
+        new_carn = self._newborns(cell.carn, Carnivore)
+        cell.herb += new_herb
+        cell.carn += new_carn
+
+        if cell.events is not None:
+            cell.events.born(cell, new_herb, new_carn)
+
+    @staticmethod
+    def _migrate(cell, animals, params, neighbours, species, add_immigrant):
+        """
+        Moves animals to neighbour cells, as Landscape.herb_migration.
+
+        The fodder and the number of animals in the neighbours are looked up
+        once, and the numbers are counted up as immigrants arrive, instead
+        of being recomputed for each animal moving.
+
+        :param add_immigrant: name of the method of the neighbours adding an
+                              immigrant, e.g. 'add_herb_immigrant'
+        :return: list of the remaining animals
+        """
+        prob = params['mu'] * _fitness(animals, params)
+        habitable = [neighbour.animals_can_live_here()
+                     for neighbour in neighbours]
+        fodder = [neighbour.get_available_fodder(species) if live else 0
+                  for neighbour, live in zip(neighbours, habitable)]
+        num_animals = [neighbour.total_num_animals(species) if live else 0
+                       for neighbour, live in zip(neighbours, habitable)]
+
+        remaining = []
+        rnd = random.random
+        for animal, prob_migration in zip(animals, prob.tolist()):
+            if rnd() < prob_migration:
+                # as Landscape.prob_move
+                exp_ek = [math.exp(params['lambda'] *
+                                   (fodder_j / ((num_j + 1) * params['F'])))
+                          if live else 0
+                          for fodder_j, num_j, live in zip(fodder,
+                                                           num_animals,
+                                                           habitable)]
+                if sum(exp_ek) == 0:
+                    remaining.append(animal)
+                else:
+                    pos = cell.animal_moves_to(
+                        [exp_ekj / sum(exp_ek) for exp_ekj in exp_ek])
+                    getattr(neighbours[pos], add_immigrant)(animal)
+                    num_animals[pos] += 1
+            else:
+                remaining.append(animal)
+        return remaining
+
+    def herb_migration(self, cell, neighbours):
+        remaining = self._migrate(cell, cell.herb, Herbivore.params,
+                                  neighbours, 'herbivore',
+                                  'add_herb_immigrant')
+        if cell.events is not None:
+            cell.events.migrated(cell, len(cell.herb) - len(remaining), 0)
+        cell.herb = remaining
+
+    def carn_migration(self, cell, neighbours):
+        remaining = self._migrate(cell, cell.carn, Carnivore.params,
+                                  neighbours, 'carnivore',
+                                  'add_carn_immigrant')
+        if cell.events is not None:
+            cell.events.migrated(cell, 0, len(cell.carn) - len(remaining))
+        cell.carn = remaining
+
+    def animal_weight_change(self, cell):
+        """ All animals lose weight, as Landscape.animal_weight_change. """
+        for animals, params in ((cell.herb, Herbivore.params),
+                                (cell.carn, Carnivore.params)):
+            weights = np.fromiter((animal._weight for animal in animals),
+                                  float, len(animals))
+            weights -= params['eta'] * weights
+            for animal, weight in zip(animals, weights.tolist()):
+                animal.weight = weight
+
+    def animal_death(self, cell):
+        """
+        Animals die with probability omega * (1 - fitness), as
+        Landscape.animal_death.
+        """
+        num_herb, num_carn = len(cell.herb), len(cell.carn)
+        for name, params in (('herb', Herbivore.params),
+                             ('carn', Carnivore.params)):
+            animals = getattr(cell, name)
+            prob = params['omega'] * (1 - _fitness(animals, params))
+            survives = (_draws(len(animals)) >= prob).tolist()
+            setattr(cell, name, [animal for animal, alive in
+                                 zip(animals, survives) if alive])
+
+        if cell.events is not None:
+            cell.events.died(cell, num_herb - len(cell.herb),
+                             num_carn - len(cell.carn))
+
+
+class AdaptiveEngine(ObjectEngine):
+    """
+    This class represents the engine choosing the object or the array path
+    for each cell at the start of each year.
+    """
+
+    name = 'auto'
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        """
+        :param threshold: cells with at least this many animals at the start
+                          of the year use the array path
+        :type threshold: int
+        """
+        self.threshold = threshold
+        self.object_engine = ObjectEngine()
+        self.array_engine = ArrayEngine()
+        self._choices = {}
+
+    @classmethod
+    def from_calibration(cls, filename):
+        """
+        Creates the engine with the threshold saved by :func:`main`.
+
+        :param filename: name of the JSON file
+        :return: class instance of the engine
+        """
+        with open(filename) as f:
+            return cls(json.load(f)['threshold'])
+
+    def start_year(self, cells):
+        self._choices = {}
+        for cell in cells:
+            if len(cell.herb) + len(cell.carn) >= self.threshold:
+                self._choices[id(cell)] = self.array_engine
+
+    def _engine(self, cell):
+        """ Returns the engine chosen for the cell this year. """
+        return self._choices.get(id(cell), self.object_engine)
+
+    def herb_eating(self, cell):
+        self._engine(cell).herb_eating(cell)
+
+    def carn_eating(self, cell):
+        self._engine(cell).carn_eating(cell)
+
+    def animal_birth(self, cell):
+        self._engine(cell).animal_birth(cell)
+
+    def herb_migration(self, cell, neighbours):
+        self._engine(cell).herb_migration(cell, neighbours)
+
+    def carn_migration(self, cell, neighbours):
+        self._engine(cell).carn_migration(cell, neighbours)
+
+    def animal_aging(self, cell):
+        self._engine(cell).animal_aging(cell)
+
+    def animal_weight_change(self, cell):
+        self._engine(cell).animal_weight_change(cell)
+
+    def animal_death(self, cell):
+        self._engine(cell).animal_death(cell)
+
+
+_ENGINES = {'object': ObjectEngine, 'array': ArrayEngine,
+            'auto': AdaptiveEngine}
+
+
+def make_engine(engine):
+    """
+    Returns the engine for a name or an engine.
+
+    :param engine: 'object', 'array', 'auto', a class instance of an engine,
+                   or None for the object engine
+    :return: class instance of the engine
+    """
+    if engine is None:
+        return ObjectEngine()
+    if isinstance(engine, ObjectEngine):
+        return engine
+    if engine in _ENGINES:
+        return _ENGINES[engine]()
+    raise ValueError("Unknown cell engine: {}".format(engine))
+
+
+def _calibration_cell(num_animals, rng):
+    """
+    Creates a jungle cell with herbivores and a tenth as many carnivores,
+    and four jungle neighbours.
+    """
+    cell = Jungle((1, 1))
+    cell.herb = [Herbivore(rng.uniform(5, 50), rng.randint(0, 20))
+                 for _ in range(num_animals)]
+    cell.carn = [Carnivore(rng.uniform(5, 50), rng.randint(0, 20))
+                 for _ in range(max(num_animals // 10, 1))]
+    return cell, [Jungle(loc) for loc in cell.neighbour_locations()]
+
+
+def _time_year(engine, cell, neighbours, repeats):
+    """
+    Times the phases of a year in one cell, on copies of the cell.
+
+    :return: shortest time in seconds
+    """
+    best = None
+    for num in range(repeats):
+        cells = copy.deepcopy((cell, neighbours))
+        random.seed(num)
+        start = time.perf_counter()
+        cell_copy, neighbours_copy = cells
+        cell_copy.food_growth()
+        engine.herb_eating(cell_copy)
+        engine.carn_eating(cell_copy)
+        engine.animal_birth(cell_copy)
+        engine.herb_migration(cell_copy, neighbours_copy)
+        engine.carn_migration(cell_copy, neighbours_copy)
+        engine.animal_aging(cell_copy)
+        engine.animal_weight_change(cell_copy)
+        engine.animal_death(cell_copy)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def calibrate(sizes=_CALIBRATION_SIZES, repeats=5, seed=1):
+    """
+    Measures the number of animals in a cell where the array path becomes
+    faster than the object path.
+
+    :param sizes: numbers of herbivores in the cells timed
+    :param repeats: the shortest of this many timings is used
+    :param seed: seed for the animals in the cells
+    :return: threshold, and list of (size, object seconds, array seconds)
+    """
+    rng = random.Random(seed)
+    state = random.getstate()
+    timings = []
+    try:
+        for size in sizes:
+            cell, neighbours = _calibration_cell(size, rng)
+            num_animals = len(cell.herb) + len(cell.carn)
+            timings.append((num_animals,
+                            _time_year(ObjectEngine(), cell, neighbours,
+                                       repeats),
+                            _time_year(ArrayEngine(), cell, neighbours,
+                                       repeats)))
+    finally:
+        random.setstate(state)
+
+    # the smallest size from which the array path is faster for all larger
+    # sizes
+    threshold = None
+    for num_animals, object_time, array_time in reversed(timings):
+        if array_time >= object_time:
+            break
+        threshold = num_animals
+    if threshold is None:
+        threshold = timings[-1][0] + 1
+    return threshold, timings
+
+
+def main(argv=None):
+    """
+    Calibrates the adaptive engine from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description='Measure the cell size where the array path of the '
+                    'cell engines becomes faster.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=list(_CALIBRATION_SIZES),
+                        help='numbers of herbivores in the cells timed')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the threshold, read by '
+                             'AdaptiveEngine.from_calibration')
+    args = parser.parse_args(argv)
+
+    threshold, timings = calibrate(args.sizes, args.repeats)
+    print('Animals   object (ms)   array (ms)')
+    for num_animals, object_time, array_time in timings:
+        print('{:>7} {:>13.3f} {:>12.3f}'.format(
+            num_animals, 1000 * object_time, 1000 * array_time))
+    print('threshold: {}'.format(threshold))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'threshold': threshold,
+                       'timings': [list(timing) for timing in timings]},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
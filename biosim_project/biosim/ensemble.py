@@ -0,0 +1,753 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a batched ensemble for the biosim project, simulating
+many independent replicates of the same island in one set of arrays.
+
+The animals of each species in all replicates are stored as arrays of age,
+weight and group, where the group is the replicate and the habitable cell of
+the animal, ``replicate * num_cells + cell``. The arrays are kept sorted by
+group, and the fodder is an array of shape (replicates, cells). Each phase
+of the annual cycle is then a few NumPy operations for all replicates, and
+the cost of a year grows with the total number of animals, not with the
+number of replicates times the overhead of a simulation.
+
+Each replicate draws its random numbers from its own
+:class:`numpy.random.RandomState`, so a replicate gives the same simulation
+whatever other replicates it is run with. The random numbers are not the
+same as in :class:`biosim.island_nature.Island`, so the ensemble follows
+the same model in distribution. The differences in the order of events are:
+
+* a carnivore meets the herbivores of its cell in order of fitness as in
+  Landscape.carn_eating, but the trials until its next kill are drawn at
+  once;
+* the number of animals in the neighbours during migration is counted
+  before the animals of a species move, not while the cells are moved one
+  by one in random order.
+
+With ``compact=True`` the ages are stored as uint16 and the weights as
+float32, which takes 14 instead of 24 bytes for each animal with its group,
+and the fitness is computed in float32. Values that need more precision are
+promoted: the fodder, the sums of weights in cells, the weights of newborns
+and mothers before they are stored, and the probabilities compared with the
+random numbers are double precision. Both stores draw the same random
+numbers, so :func:`compare_precision` runs replicates with the same seeds
+in both and reports the difference, e.g.::
+
+    python -m biosim.ensemble --compare-precision --years 50
+
+:class:`EnsembleSim` has the queries of :class:`biosim.simulation.BioSim`
+with a result for each replicate. The speed against separate simulations
+can be measured from the command line::
+
+    python -m biosim.ensemble --replicates 64 --years 20
+"""
+
+import argparse
+import math
+import random
+import time
+import textwrap
+import numpy as np
+from .animals import Herbivore, Carnivore
+from .landscape import Jungle, Savannah
+from .island_nature import Island, LANDSCAPE_LETTERS, habitable_neighbours
+from .population import check_columns
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_DESERT = LANDSCAPE_LETTERS.index('D')
+_JUNGLE = LANDSCAPE_LETTERS.index('J')
+_SAVANNAH = LANDSCAPE_LETTERS.index('S')
+
+_SPECIES_CLASSES = (Herbivore, Carnivore)
+_SPECIES_NAMES = {'herbivores': 0, 'Herbivore': 0, 'herbivore': 0,
+                  'carnivores': 1, 'Carnivore': 1, 'carnivore': 1}
+
+# dtypes of the age and weight of the animals, by compact
+_DTYPES = {False: (np.float64, np.float64), True: (np.uint16, np.float32)}
+
+_DEFAULT_MAP = textwrap.dedent("""\
+    OOOOOOO
+    OJJSJJO
+    OJSJDJO
+    OJJJSSO
+    OOOOOOO""")
+
+
+def _fitness(params, age, weight):
+    """
+    Calculates the fitness of animals as Animal.fitness, in the precision
+    of the weights.
+
+    :param params: parameters of the species
+    :param age: array of ages
+    :param weight: array of weights
+    :return: array of fitness
+    """
+    age = np.asarray(age, dtype=weight.dtype)
+    with np.errstate(over='ignore'):
+        q_age = 1. / (1 + np.exp(params['phi_age'] *
+                                 (age - params['a_half'])))
+        q_weight = 1. / (1 + np.exp(-params['phi_weight'] *
+                                    (weight - params['w_half'])))
+    return q_age * q_weight
+
+
+class _Animals(object):
+    """
+    Animals of one species in all replicates, sorted by group.
+    """
+
+    def __init__(self, compact=False):
+        age_dtype, weight_dtype = _DTYPES[compact]
+        self.group = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=age_dtype)
+        self.weight = np.zeros(0, dtype=weight_dtype)
+
+    def __len__(self):
+        return len(self.group)
+
+    def select(self, index):
+        """
+        Keeps the animals given by an index or boolean array, in that order.
+        """
+        self.group = self.group[index]
+        self.age = self.age[index]
+        self.weight = self.weight[index]
+
+    def add(self, group, age, weight):
+        """
+        Adds animals, keeping all animals sorted by group. Ages and weights
+        are converted to the dtypes of the store.
+        """
+        self.group = np.concatenate((self.group, group))
+        self.age = np.concatenate(
+            (self.age, np.asarray(age).astype(self.age.dtype)))
+        self.weight = np.concatenate(
+            (self.weight, np.asarray(weight).astype(self.weight.dtype)))
+        self.sort()
+
+    @property
+    def nbytes(self):
+        """ Returns the number of bytes of the arrays. """
+        return self.group.nbytes + self.age.nbytes + self.weight.nbytes
+
+    def sort(self):
+        """ Sorts the animals by group, keeping the order within groups. """
+        self.select(np.argsort(self.group, kind='stable'))
+
+
+class EnsembleIsland(object):
+    """
+    This class represents independent replicates of an island, with the
+    animals of all replicates in the same arrays.
+    """
+
+    annual_phases = Island.annual_phases
+
+    def __init__(self, geogr, seeds, compact=False):
+        """
+        :param geogr: string with specifications about the islands geography
+        :param seeds: random seed of each replicate
+        :type seeds: list of int
+        :param compact: if True ages are stored as uint16 and weights and
+                        fitness as float32
+        :type compact: bool
+        """
+        self.seeds = list(seeds)
+        if len(self.seeds) == 0:
+            raise ValueError("The ensemble needs at least one replicate")
+        self._rngs = [np.random.RandomState(seed) for seed in self.seeds]
+
+        self.geogr = geogr.split()
+        self.terrain = Island.parse_geography(self.geogr)
+        self.locations, self._neighbours = habitable_neighbours(self.terrain)
+
+        codes = self.terrain[tuple(self.locations.T)]
+        self._jungle = codes == _JUNGLE
+        self._savannah = codes == _SAVANNAH
+        self.fodder = np.zeros((len(self.seeds), len(self.locations)))
+        self.fodder[:, self._jungle] = Jungle.params['fmax']
+        self.fodder[:, self._savannah] = Savannah.params['fmax']
+
+        self.compact = compact
+        self.animals = [_Animals(compact), _Animals(compact)]
+
+    @property
+    def num_replicates(self):
+        """ Returns the number of replicates. """
+        return len(self.seeds)
+
+    def _species_index(self, species):
+        """ Returns 0 for herbivores and 1 for carnivores. """
+        try:
+            return _SPECIES_NAMES[species]
+        except KeyError:
+            raise ValueError("Given species does not exist")
+
+    def _fitness(self, species):
+        """ Returns the fitness of the animals of given species index. """
+        animals = self.animals[species]
+        return _fitness(_SPECIES_CLASSES[species].params, animals.age,
+                        animals.weight)
+
+    def bytes_per_animal(self):
+        """ Returns the number of bytes stored for each animal. """
+        return sum(np.dtype(dtype).itemsize
+                   for dtype in _DTYPES[self.compact]) + \
+            np.dtype(np.int64).itemsize
+
+    def _draw(self, group, method, *args):
+        """
+        Draws one random number for each group, from the generator of its
+        replicate.
+
+        :param group: sorted array of groups
+        :param method: name of the method of RandomState
+        :return: array of random numbers
+        """
+        counts = np.bincount(group // len(self.locations),
+                             minlength=self.num_replicates)
+        return np.concatenate(
+            [getattr(rng, method)(*(args + (num,)))
+             for rng, num in zip(self._rngs, counts)])
+
+    def place_animals(self, population):
+        """
+        Places populations of animals in the same locations in every
+        replicate.
+
+        :param population: dictionary with location and corresponding population
+        """
+        loc, species, age, weight = [], [], [], []
+        for pop in population:
+            for animal in pop['pop']:
+                loc.append(pop['loc'])
+                species.append(animal['species'])
+                age.append(animal['age'])
+                weight.append(animal['weight'])
+        if loc:
+            self.place_animal_columns(loc, species, age, weight)
+
+    def place_animal_columns(self, loc, species, age, weight):
+        """
+        Places a population given as columns in every replicate.
+
+        :param loc: array of shape (n, 2) with locations counted from 1
+        :param species: species codes or names
+        :param age: ages
+        :param weight: weights
+        """
+        rows, cols, codes, ages, weights = check_columns(
+            loc, species, age, weight, self.terrain >= _DESERT)
+        cells = np.zeros(self.terrain.shape, dtype=np.int64)
+        cells[tuple(self.locations.T)] = np.arange(len(self.locations))
+        cells = cells[rows, cols]
+        first = np.arange(self.num_replicates)[:, None] * len(self.locations)
+
+        for code, animals in enumerate(self.animals):
+            chosen = codes == code
+            animals.add((first + cells[chosen]).ravel(),
+                        np.tile(ages[chosen], self.num_replicates),
+                        np.tile(weights[chosen], self.num_replicates))
+
+    def food_growth_in_all_cells(self):
+        """ Allows food to grow in all the cells of all replicates. """
+        self.fodder[:, self._jungle] = Jungle.params['fmax']
+        self.fodder[:, self._savannah] += Savannah.params['alpha'] * (
+            Savannah.params['fmax'] - self.fodder[:, self._savannah])
+
+    def all_herb_eating(self):
+        """
+        Herbivores eat in order of fitness. The herbivore of rank r in its
+        cell finds the fodder left by the r fitter ones.
+        """
+        herbs = self.animals[0]
+        if len(herbs) == 0:
+            return
+        herbs.select(np.lexsort((-self._fitness(0), herbs.group)))
+        rank = np.arange(len(herbs)) - np.searchsorted(herbs.group,
+                                                       herbs.group)
+        fodder = self.fodder.reshape(-1)
+        food = Herbivore.params['F']
+        eaten = np.clip(fodder[herbs.group] - rank * food, 0, food)
+        herbs.weight += Herbivore.params['beta'] * eaten
+        fodder -= np.bincount(herbs.group, eaten, minlength=len(fodder))
+
+    def all_carn_eating(self):
+        """
+        Carnivores hunt in order of fitness, the weakest herbivores first.
+
+        The carnivores of the same rank in all cells hunt together. For each
+        carnivore, one trial is drawn for each herbivore it has not met, and
+        it kills the first herbivore whose trial succeeds, or stops at the
+        first herbivore at least as fit as itself. Its fitness is then
+        updated, and the trials after the kill are drawn again.
+        """
+        herbs, carns = self.animals
+        if len(herbs) == 0 or len(carns) == 0:
+            return
+        params = Carnivore.params
+        herbs.select(np.lexsort((self._fitness(0), herbs.group)))
+        herb_fitness = self._fitness(0)
+        carns.select(np.lexsort((-self._fitness(1), carns.group)))
+        carn_fitness = self._fitness(1)
+        rank = np.arange(len(carns)) - np.searchsorted(carns.group,
+                                                       carns.group)
+
+        alive = np.ones(len(herbs), dtype=bool)
+        hunter_of_group = np.full(self.fodder.size, -1, dtype=np.int64)
+        for hunt in range(rank.max() + 1):
+            hunters = np.flatnonzero(rank == hunt)
+            hunter_of_group[carns.group[hunters]] = np.arange(len(hunters))
+            herb_hunter = hunter_of_group[herbs.group]
+            hunter_of_group[carns.group[hunters]] = -1
+
+            fitness = carn_fitness[hunters]
+            eaten = np.zeros(len(hunters))
+            first_prey = np.zeros(len(hunters), dtype=np.int64)
+            active = np.full(len(hunters), params['F'] > 0)
+            prey = np.flatnonzero(herb_hunter >= 0)
+            while len(prey) > 0:
+                hunter = herb_hunter[prey]
+                meets = (alive[prey] & active[hunter] &
+                         (prey >= first_prey[hunter]))
+                prey, hunter = prey[meets], hunter[meets]
+                if len(prey) == 0:
+                    break
+
+                diff = fitness[hunter] - herb_fitness[prey]
+                kill = (self._draw(herbs.group[prey], 'random_sample') <
+                        diff / params['DeltaPhiMax'])
+                event = np.flatnonzero(kill | (diff <= 0))
+                _, first = np.unique(hunter[event], return_index=True)
+                event = event[first][kill[event[first]]]
+
+                # carnivores without a kill have met all herbivores, or one
+                # as fit as themselves
+                active[:] = False
+                killers, victims = hunter[event], prey[event]
+                alive[victims] = False
+                gain = np.minimum(herbs.weight[victims],
+                                  params['F'] - eaten[killers])
+                eaten[killers] += gain
+                index = hunters[killers]
+                carns.weight[index] += params['beta'] * gain
+                fitness[killers] = _fitness(params, carns.age[index],
+                                            carns.weight[index])
+                first_prey[killers] = victims + 1
+                active[killers] = eaten[killers] < params['F']
+
+            carn_fitness[hunters] = fitness
+        herbs.select(alive)
+
+    def animals_give_birth(self):
+        """ All animals of all replicates get the opportunity to give birth. """
+        for species, animals in enumerate(self.animals):
+            if len(animals) == 0:
+                continue
+            params = _SPECIES_CLASSES[species].params
+            num = np.bincount(animals.group)[animals.group]
+            prob = np.minimum(params['gamma'] * self._fitness(species) *
+                              (num - 1), 1)
+            prob[animals.weight < params['zeta'] * (
+                params['w_birth'] + params['sigma_birth'])] = 0
+
+            mothers = np.flatnonzero(
+                self._draw(animals.group, 'random_sample') < prob)
+            w_newborn = self._draw(animals.group[mothers], 'normal',
+                                   params['w_birth'], params['sigma_birth'])
+            w_mother = animals.weight[mothers]
+            w_after = w_mother - params['xi'] * w_newborn
+            born = (0 < w_newborn) & (w_newborn < w_mother) & (0 < w_after)
+
+            animals.weight[mothers[born]] = w_after[born]
+            animals.add(animals.group[mothers[born]],
+                        np.zeros(born.sum()), w_newborn[born])
+
+    def animals_migrate(self):
+        """ All animals of all replicates get an opportunity to migrate. """
+        num_cells = len(self.locations)
+        habitable = self._neighbours >= 0
+        neighbours = np.where(habitable, self._neighbours, 0)
+        herbs = self.animals[0]
+
+        for species, animals in enumerate(self.animals):
+            if len(animals) == 0:
+                continue
+            params = _SPECIES_CLASSES[species].params
+            if species == 0:
+                fodder = self.fodder
+            else:
+                fodder = np.bincount(herbs.group, herbs.weight,
+                                     minlength=self.fodder.size).reshape(
+                    self.fodder.shape)
+            num = np.bincount(animals.group, minlength=self.fodder.size)\
+                .reshape(self.fodder.shape)
+
+            movers = np.flatnonzero(
+                self._draw(animals.group, 'random_sample') <
+                params['mu'] * self._fitness(species))
+            replicate, cell = np.divmod(animals.group[movers], num_cells)
+
+            # propensities relative to the largest one of each cell, which
+            # gives the same probabilities without overflow
+            abundance = params['lambda'] * (
+                fodder[replicate[:, None], neighbours[cell]] /
+                ((num[replicate[:, None], neighbours[cell]] + 1) *
+                 params['F']))
+            abundance[~habitable[cell]] = -np.inf
+            largest = abundance.max(axis=1, initial=-np.inf)
+            can_move = np.isfinite(largest)
+            propensity = np.exp(abundance[can_move] -
+                                largest[can_move, None])
+            cumulative = np.cumsum(propensity, axis=1)
+            cumulative /= cumulative[:, -1:]
+
+            rnd = self._draw(animals.group[movers[can_move]],
+                             'random_sample')
+            direction = np.minimum((cumulative <= rnd[:, None]).sum(axis=1),
+                                   3)
+            target = self._neighbours[cell[can_move], direction]
+            moves = target >= 0
+            animals.group[movers[can_move][moves]] = (
+                replicate[can_move][moves] * num_cells + target[moves])
+            animals.sort()
+
+    def all_animals_aging(self):
+        """ All animals of all replicates get one year older. """
+        for animals in self.animals:
+            animals.age += 1
+
+    def all_animals_lose_weight(self):
+        """ All animals of all replicates lose weight. """
+        for species, animals in enumerate(self.animals):
+            animals.weight -= (_SPECIES_CLASSES[species].params['eta'] *
+                               animals.weight)
+
+    def animals_die(self):
+        """ Controls if any of the animals of all replicates die. """
+        for species, animals in enumerate(self.animals):
+            if len(animals) == 0:
+                continue
+            prob = _SPECIES_CLASSES[species].params['omega'] * (
+                1 - self._fitness(species))
+            animals.select(
+                self._draw(animals.group, 'random_sample') >= prob)
+
+    def annual_cycle(self):
+        """ Simulates one year in all replicates. """
+        for phase in self.annual_phases:
+            getattr(self, phase)()
+
+    def number_of_animals(self):
+        """
+        Counts herbivores and carnivores in each replicate.
+
+        :return: arrays with the number of herbivores and carnivores in each
+                 replicate
+        """
+        num_cells = len(self.locations)
+        return tuple(np.bincount(animals.group // num_cells,
+                                 minlength=self.num_replicates)
+                     for animals in self.animals)
+
+    def _num_in_cells(self, species):
+        """ Returns array with number of animals in each replicate and cell. """
+        counts = np.bincount(self.animals[species].group,
+                             minlength=self.fodder.size)
+        grid = np.zeros((self.num_replicates,) + self.terrain.shape)
+        grid[:, self.locations[:, 0], self.locations[:, 1]] = \
+            counts.reshape(self.fodder.shape)
+        return grid
+
+    def num_herb_in_cells(self):
+        """ Returns array of shape (replicates, rows, columns). """
+        return self._num_in_cells(0)
+
+    def num_carn_in_cells(self):
+        """ Returns array of shape (replicates, rows, columns). """
+        return self._num_in_cells(1)
+
+    def animal_properties(self, species):
+        """
+        Collects age, weight and fitness of all animals of given species.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with arrays of age, weight, fitness and the
+                 replicate of each animal
+        """
+        index = self._species_index(species)
+        animals = self.animals[index]
+        return {'age': animals.age.astype(float),
+                'weight': animals.weight.astype(float),
+                'fitness': self._fitness(index).astype(float),
+                'replicate': animals.group // len(self.locations)}
+
+
+class EnsembleSim(object):
+    """
+    Simulates replicates of an island together, with the queries of
+    :class:`biosim.simulation.BioSim` giving a result for each replicate.
+    """
+
+    def __init__(self, island_map, ini_pop, seed, num_replicates,
+                 compact=False):
+        """
+        :param island_map: specification about the island's geography
+        :type island_map: multiline str
+        :param ini_pop: initial animal population in every replicate
+        :type ini_pop: dictionary
+        :param seed: random seed of the first replicate, replicate r uses
+                     seed + r
+        :type seed: int
+        :param num_replicates: number of replicates
+        :type num_replicates: int
+        :param compact: if True the animals are stored in reduced precision,
+                        see :class:`EnsembleIsland`
+        :type compact: bool
+        """
+        self._island = EnsembleIsland(
+            island_map, [seed + replicate
+                         for replicate in range(num_replicates)], compact)
+        self._island.place_animals(ini_pop)
+        self._step = 0
+
+        # number of animals in each replicate after each year, including
+        # year 0
+        self._num_herb = []
+        self._num_carn = []
+        self._update_num_animals()
+
+    def _update_num_animals(self):
+        """ Records the number of animals in each replicate. """
+        num_herb, num_carn = self._island.number_of_animals()
+        self._num_herb.append(num_herb)
+        self._num_carn.append(num_carn)
+
+    def simulate(self, num_years):
+        """
+        Simulates the replicates for given number of years.
+
+        :param num_years: number of years to simulate
+        """
+        for _ in range(num_years):
+            self._island.annual_cycle()
+            self._step += 1
+            self._update_num_animals()
+
+    def add_population(self, population):
+        """
+        Places new animals in correct location in every replicate.
+
+        :param population: Dictionary with new animals
+        """
+        self._island.place_animals(population)
+
+    @property
+    def island(self):
+        """ Returns the :class:`EnsembleIsland` of the replicates. """
+        return self._island
+
+    def num_years(self):
+        """ Returns total number of years that have been simulated. """
+        return self._step
+
+    def total_num_animals(self):
+        """ Returns array with total number of animals in each replicate. """
+        return self._num_herb[-1] + self._num_carn[-1]
+
+    def total_num_by_species(self):
+        """
+        Returns arrays with the number of herbivores and carnivores in each
+        replicate.
+        """
+        return {'herbivores': self._num_herb[-1],
+                'carnivores': self._num_carn[-1]}
+
+    def num_animals_per_cell(self):
+        """
+        Returns arrays of shape (replicates, rows, columns) with the number
+        of animals per cell in each replicate.
+        """
+        return {'herbivores': self._island.num_herb_in_cells(),
+                'carnivores': self._island.num_carn_in_cells()}
+
+    def num_animals_by_year(self):
+        """
+        Returns arrays of shape (years + 1, replicates) with the number of
+        herbivores and carnivores in each replicate after each year.
+        """
+        return {'herbivores': np.array(self._num_herb),
+                'carnivores': np.array(self._num_carn)}
+
+
+def time_ensemble(island_map, ini_pop, num_years, num_replicates, seed=1,
+                  sequential=True, compact=False):
+    """
+    Times the ensemble against separate simulations of each replicate.
+
+    :param sequential: if False, only the ensemble is timed
+    :param compact: if True the ensemble stores the animals in reduced
+                    precision
+    :return: dictionary with the wall time of the ensemble and of the
+             separate simulations, None if not timed, and the mean number of
+             herbivores and carnivores at the last year of both
+    """
+    from .simulation import BioSim
+
+    start = time.perf_counter()
+    ensemble = EnsembleSim(island_map, ini_pop, seed, num_replicates,
+                           compact)
+    ensemble.simulate(num_years)
+    result = {'ensemble': time.perf_counter() - start, 'sequential': None,
+              'ensemble_mean': (ensemble.total_num_by_species()['herbivores']
+                                .mean(),
+                                ensemble.total_num_by_species()['carnivores']
+                                .mean()),
+              'sequential_mean': None}
+
+    if sequential:
+        state = random.getstate()
+        start = time.perf_counter()
+        counts = []
+        for replicate in range(num_replicates):
+            sim = BioSim(island_map, ini_pop, seed + replicate)
+            for _ in sim.iter_years(num_years):
+                pass
+            counts.append(sim.total_num_by_species())
+        result['sequential'] = time.perf_counter() - start
+        result['sequential_mean'] = (
+            np.mean([count['herbivores'] for count in counts]),
+            np.mean([count['carnivores'] for count in counts]))
+        random.setstate(state)
+    return result
+
+
+def compare_precision(island_map, ini_pop, num_years, num_replicates=20,
+                      seed=1):
+    """
+    Simulates replicates with the animals stored in double and in reduced
+    precision, with the same seeds.
+
+    :param island_map: multiline string with the island's geography
+    :param ini_pop: initial population in every replicate
+    :param num_years: number of years simulated
+    :param num_replicates: number of replicates of each precision
+    :param seed: random seed of the first replicate
+    :return: dictionary with arrays 'double_herb', 'double_carn',
+             'compact_herb' and 'compact_carn' of shape (num_years + 1,
+             num_replicates), and the bytes per animal of each store as
+             'double_bytes' and 'compact_bytes'
+    """
+    result = {}
+    for name, compact in (('double', False), ('compact', True)):
+        ensemble = EnsembleSim(island_map, ini_pop, seed, num_replicates,
+                               compact)
+        ensemble.simulate(num_years)
+        counts = ensemble.num_animals_by_year()
+        result[name + '_herb'] = counts['herbivores']
+        result[name + '_carn'] = counts['carnivores']
+        result[name + '_bytes'] = ensemble.island.bytes_per_animal()
+    return result
+
+
+def format_precision(result, step=1):
+    """
+    Describes the counts of both precisions in a table.
+
+    The replicates of both precisions draw the same random numbers, so they
+    are compared in pairs: diff is the mean of the compact count minus the
+    double count, and z is diff in standard errors of that mean.
+
+    :param result: dictionary from :func:`compare_precision`
+    :param step: years between the lines of the table
+    :return: multiline string
+    """
+    replicates = result['double_herb'].shape[1]
+    lines = ['{} bytes per animal in double precision, {} in compact '
+             'storage'.format(result['double_bytes'],
+                              result['compact_bytes']),
+             '{:>5}  {:>9} {:>9} {:>7} {:>6}  {:>9} {:>9} {:>7} {:>6}'.format(
+                 'Year', 'herb dbl', 'compact', 'diff', 'z', 'carn dbl',
+                 'compact', 'diff', 'z')]
+    for year in range(0, len(result['double_herb']), step):
+        columns = []
+        for species in ('herb', 'carn'):
+            double = result['double_' + species][year]
+            compact = result['compact_' + species][year]
+            diff = compact - double
+            error = diff.std() / math.sqrt(max(replicates, 1))
+            z = diff.mean() / error if error > 0 else 0.
+            columns.append('{:>9.1f} {:>9.1f} {:>7.1f} {:>6.1f}'.format(
+                double.mean(), compact.mean(), diff.mean(), z))
+        lines.append('{:>5}  {}  {}'.format(year, *columns))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Times an ensemble against separate simulations from the command line.
+
+    :param argv: list of arguments, sys.argv[1:] if None
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulates replicates of an island together and "
+                    "separately, and reports the times.")
+    parser.add_argument('--map', help="file with the island map, a small "
+                                      "map if not given")
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--replicates', type=int, default=64)
+    parser.add_argument('--herbivores', type=int, default=50)
+    parser.add_argument('--carnivores', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-sequential', action='store_true',
+                        help="only time the ensemble")
+    parser.add_argument('--compact', action='store_true',
+                        help="store the animals of the ensemble in reduced "
+                             "precision")
+    parser.add_argument('--compare-precision', action='store_true',
+                        help="compare the counts with the animals stored in "
+                             "double and reduced precision instead of "
+                             "timing")
+    parser.add_argument('--step', type=int, default=5,
+                        help="years between the lines of the comparison")
+    args = parser.parse_args(argv)
+
+    if args.map is None:
+        island_map = _DEFAULT_MAP
+    else:
+        with open(args.map) as f:
+            island_map = f.read()
+
+    island = Island(island_map)
+    row, col = np.argwhere(island.terrain >= _DESERT)[0]
+    ini_pop = [{'loc': (row + 1, col + 1),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(args.herbivores)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(args.carnivores)]}]
+
+    if args.compare_precision:
+        result = compare_precision(island_map, ini_pop, args.years,
+                                   args.replicates, args.seed)
+        print(format_precision(result, args.step))
+        return
+
+    result = time_ensemble(island_map, ini_pop, args.years, args.replicates,
+                           args.seed, not args.no_sequential, args.compact)
+    print("{} replicates, {} years".format(args.replicates, args.years))
+    print("ensemble:   {:8.2f} s, mean {:.1f} herbivores, {:.1f} carnivores"
+          .format(result['ensemble'], *result['ensemble_mean']))
+    if result['sequential'] is not None:
+        print("sequential: {:8.2f} s, mean {:.1f} herbivores, {:.1f} "
+              "carnivores".format(result['sequential'],
+                                  *result['sequential_mean']))
+        print("speedup:    {:8.1f}x".format(result['sequential'] /
+                                           result['ensemble']))
+
+
+if __name__ == '__main__':
+    main()
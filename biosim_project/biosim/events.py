@@ -0,0 +1,303 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides counts of the demographic events in each cell and life
+histories of sampled animals for the biosim project.
+
+Event recording is opt-in, see :meth:`biosim.island_nature.Island.
+enable_events`. The cells then report births, deaths, kills and migrations
+to a :class:`CellEvents` as a by-product of the phases, with one call for
+each cell and phase, so the cost does not grow with the number of animals.
+The counts of each year are kept as an array with a grid for each event in
+:data:`EVENTS`.
+
+Optionally, :class:`LifeHistories` tracks a fixed number of animals, a
+uniform reservoir sample of the animals on the island when recording starts
+and all animals born or placed later. The age, weight, fitness and location
+of the tracked animals alive are written every year as records of
+:data:`HISTORY_DTYPE`, to a binary file or kept in memory. Since an animal
+migrates at most once a year, a tracked animal is found in its last cell or
+one of the neighbours, and the cost each year depends on the number of
+tracked animals and the size of their cells only.
+"""
+
+import math
+import random
+import numpy as np
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+EVENTS = ('herb_births', 'carn_births', 'herb_deaths', 'carn_deaths',
+          'kills', 'herb_migrations', 'carn_migrations')
+_HERB_BIRTHS, _CARN_BIRTHS, _HERB_DEATHS, _CARN_DEATHS, _KILLS, \
+    _HERB_MIGRATIONS, _CARN_MIGRATIONS = range(len(EVENTS))
+
+# one record for each tracked animal alive at the end of each year; species
+# is the index into biosim.population.SPECIES
+HISTORY_DTYPE = np.dtype([('id', np.uint32), ('year', np.uint32),
+                          ('species', np.uint8), ('age', np.uint16),
+                          ('weight', np.float32), ('fitness', np.float32),
+                          ('row', np.uint16), ('col', np.uint16)])
+
+_SPECIES_LISTS = ('herb', 'carn')
+
+
+def load_histories(filename):
+    """
+    Loads life histories written by :class:`LifeHistories`.
+
+    :param filename: name of the file
+    :return: array of :data:`HISTORY_DTYPE`
+    """
+    return np.fromfile(filename, dtype=HISTORY_DTYPE)
+
+
+class LifeHistories(object):
+    """
+    This class represents a reservoir sample of animals whose age, weight,
+    fitness and location are recorded every year.
+    """
+
+    def __init__(self, num_tracked, filename=None, seed=None):
+        """
+        :param num_tracked: number of animals in the sample
+        :type num_tracked: int
+        :param filename: name of the binary file the records are written
+                         to; the records are kept in memory if None
+        :type filename: str
+        :param seed: seed of the random numbers choosing the sample, which
+                     are not drawn from the random numbers of the simulation
+        :type seed: int
+        """
+        if num_tracked < 1:
+            raise ValueError("At least one animal must be tracked")
+        self.num_tracked = num_tracked
+        self.filename = filename
+        self._rng = random.Random(seed)
+
+        # entries [id, species, animal, (row, col)] of the sample; animal is
+        # None when it has died, until another animal takes its place
+        self._tracked = []
+        self._num_offered = 0
+        self._num_ids = 0
+
+        # position in the stream of offered animals of the next animal
+        # taking a place in the full sample, by Li's algorithm L
+        self._weight = None
+        self._next = None
+
+        self._records = []
+        self._file = None if filename is None else open(filename, 'wb')
+
+    def _uniform(self):
+        """ Returns a random number in the open interval (0, 1). """
+        number = self._rng.random()
+        while number == 0:
+            number = self._rng.random()
+        return number
+
+    def _skip_to(self, last):
+        """
+        Sets the position of the next animal sampled after the position of
+        the last animal offered or sampled.
+        """
+        self._next = last + 1 + int(math.floor(
+            math.log(self._uniform()) / math.log(1 - self._weight)))
+
+    def _entry(self, animal, species, loc):
+        """ Returns a new entry of the sample with the next id. """
+        self._num_ids += 1
+        return [self._num_ids - 1, species, animal, loc]
+
+    def offer(self, animals, species, loc):
+        """
+        Offers animals entering the island to the sample.
+
+        Only the animals taking a place in the sample cost more than a
+        constant time for all of them.
+
+        :param animals: list of class instances of the animals
+        :param species: species index, 0 for herbivores and 1 for carnivores
+        :param loc: (row, column) of the cell of the animals, from 0
+        """
+        start = self._num_offered
+        self._num_offered += len(animals)
+
+        pos = 0
+        while len(self._tracked) < self.num_tracked and pos < len(animals):
+            self._tracked.append(self._entry(animals[pos], species, loc))
+            pos += 1
+            if len(self._tracked) == self.num_tracked:
+                self._weight = math.exp(math.log(self._uniform()) /
+                                        self.num_tracked)
+                self._skip_to(start + pos - 1)
+
+        while self._next is not None and self._next < self._num_offered:
+            place = self._rng.randrange(self.num_tracked)
+            self._tracked[place] = self._entry(animals[self._next - start],
+                                               species, loc)
+            self._weight *= math.exp(math.log(self._uniform()) /
+                                     self.num_tracked)
+            self._skip_to(self._next)
+
+    def record(self, year, island):
+        """
+        Records the tracked animals alive at the end of a year.
+
+        :param year: number of the year
+        :param island: class instance of the island
+        """
+        rows = []
+        for entry in self._tracked:
+            num, species, animal, loc = entry
+            if animal is None:
+                continue
+            loc = self._find(island, animal, _SPECIES_LISTS[species], loc)
+            if loc is None:
+                entry[2] = None
+                continue
+            entry[3] = loc
+            rows.append((num, year, species, animal.age, animal.weight,
+                         animal.fitness, loc[0], loc[1]))
+
+        records = np.array(rows, dtype=HISTORY_DTYPE)
+        if self._file is not None:
+            records.tofile(self._file)
+        else:
+            self._records.append(records)
+
+    @staticmethod
+    def _find(island, animal, name, loc):
+        """
+        Finds the cell of an animal, which is the cell it was in a year ago
+        or one of its neighbours.
+
+        :return: (row, column) of the cell, None if the animal has died
+        """
+        cell = island.get_cell(*loc)
+        if animal in getattr(cell, name):
+            return loc
+        for neighbour in cell.neighbour_locations():
+            if animal in getattr(island.get_cell(*neighbour), name):
+                return neighbour
+        return None
+
+    def records(self):
+        """ Returns all records so far as an array of HISTORY_DTYPE. """
+        if self._file is not None:
+            self._file.flush()
+            return load_histories(self.filename)
+        if not self._records:
+            return np.zeros(0, dtype=HISTORY_DTYPE)
+        return np.concatenate(self._records)
+
+    def close(self):
+        """ Closes the file of the records. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CellEvents(object):
+    """
+    This class represents the number of births, deaths, kills and
+    migrations in each cell in each year while events are recorded.
+    """
+
+    def __init__(self, shape, first_year=1, histories=None):
+        """
+        :param shape: (rows, columns) of the map
+        :param first_year: number of the first year recorded
+        :param histories: class instance of LifeHistories, or None
+        """
+        self.shape = tuple(shape)
+        self.histories = histories
+        self.years = []
+        self._counts = []
+        self._next_year = first_year
+        self._current = np.zeros((len(EVENTS),) + self.shape, dtype=np.int32)
+
+    def born(self, cell, herbs, carns):
+        """
+        Counts animals born in a cell and offers them to the life histories.
+
+        :param cell: class instance of the cell
+        :param herbs: list of newborn herbivores
+        :param carns: list of newborn carnivores
+        """
+        row, col = cell.loc
+        self._current[_HERB_BIRTHS, row, col] += len(herbs)
+        self._current[_CARN_BIRTHS, row, col] += len(carns)
+        self.placed(cell, herbs, carns)
+
+    def placed(self, cell, herbs, carns):
+        """
+        Offers animals placed in a cell to the life histories, without
+        counting them as births.
+        """
+        if self.histories is not None:
+            if herbs:
+                self.histories.offer(herbs, 0, cell.loc)
+            if carns:
+                self.histories.offer(carns, 1, cell.loc)
+
+    def died(self, cell, num_herb, num_carn):
+        """ Counts animals dying in a cell, not including kills. """
+        row, col = cell.loc
+        self._current[_HERB_DEATHS, row, col] += num_herb
+        self._current[_CARN_DEATHS, row, col] += num_carn
+
+    def killed(self, cell, num_herb):
+        """ Counts herbivores killed by carnivores in a cell. """
+        self._current[_KILLS, cell.loc[0], cell.loc[1]] += num_herb
+
+    def migrated(self, cell, num_herb, num_carn):
+        """ Counts animals leaving a cell for a neighbour. """
+        row, col = cell.loc
+        self._current[_HERB_MIGRATIONS, row, col] += num_herb
+        self._current[_CARN_MIGRATIONS, row, col] += num_carn
+
+    def end_year(self, island):
+        """
+        Keeps the counts of the year just simulated, and records the life
+        histories.
+
+        :param island: class instance of the island
+        """
+        self.years.append(self._next_year)
+        self._counts.append(self._current.copy())
+        self._current[...] = 0
+        if self.histories is not None:
+            self.histories.record(self._next_year, island)
+        self._next_year += 1
+
+    def counts(self, event=None):
+        """
+        Returns the counts of each year.
+
+        :param event: name of an event in EVENTS, all events if None
+        :return: int array of shape (years, rows, columns) for an event, or
+                 (years, events, rows, columns) for all events
+        """
+        counts = np.array(self._counts, dtype=np.int32).reshape(
+            (len(self._counts), len(EVENTS)) + self.shape)
+        if event is None:
+            return counts
+        if event not in EVENTS:
+            raise ValueError("Unknown event {}".format(event))
+        return counts[:, EVENTS.index(event)]
+
+    def totals(self):
+        """
+        Returns the number of each event on the island in each year.
+
+        :return: dictionary with an array of totals for each event
+        """
+        totals = self.counts().sum(axis=(2, 3))
+        return {event: totals[:, num] for num, event in enumerate(EVENTS)}
+
+    def close(self):
+        """ Closes the file of the life histories. """
+        if self.histories is not None:
+            self.histories.close()
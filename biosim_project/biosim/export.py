@@ -0,0 +1,206 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a class exporting graphics files for the biosim project
+in parallel.
+
+Instead of rendering and encoding the graphics in the simulation loop, the
+simulation records a snapshot with the distribution maps of each saved step.
+Snapshots are collected in chunks of consecutive frames, and each chunk is
+rendered and encoded by one of the worker processes while the simulation
+continues. Chunks are sent to the workers in turn, and each worker keeps the
+totals for the line graph, so a chunk only carries the totals of the years
+its worker has not seen.
+"""
+
+import multiprocessing
+import matplotlib.image
+import numpy as np
+from .visualization import Visualization
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+# figures created by a worker process, reused for later chunks, with the
+# number of years shown in their line graph
+_worker_figures = {}
+
+# total number of herbivores and carnivores for each year, received by a
+# worker process
+_worker_num_animals = ([], [])
+
+
+def _render_chunk(island_map, limits, final_step, first_year, num_herb,
+                  num_carn, frames):
+    """
+    Renders and saves a chunk of consecutive frames.
+
+    Runs in a worker process, with a figure that is never shown. The figure
+    is kept for later chunks with the same layout.
+
+    :param island_map: specification about the island's geography
+    :param limits: dictionary with color code limits and ymax
+    :param final_step: last step the line graph has to show
+    :param first_year: index of the first year of num_herb and num_carn,
+                       the number of years sent to the worker before
+    :param num_herb: total number of herbivores for each year from
+                     first_year up to the last frame in the chunk
+    :param num_carn: total number of carnivores for each year from
+                     first_year up to the last frame in the chunk
+    :param frames: list of (filename, step, num_herb_cell, num_carn_cell)
+    :return: number of frames saved
+    """
+    herb, carn = _worker_num_animals
+    del herb[first_year:], carn[first_year:]
+    herb.extend(num_herb)
+    carn.extend(num_carn)
+
+    key = (island_map, final_step, tuple(sorted(limits.items())))
+    if key not in _worker_figures:
+        _worker_figures.clear()
+        vis = Visualization(island_map, blit=True, offscreen=True)
+        vis.setup(final_step, **limits)
+        _worker_figures[key] = [vis, 0]
+    vis, num_shown = _worker_figures[key]
+
+    for filename, step, num_herb_cell, num_carn_cell in frames:
+        # the line graph shows the years simulated before the frame
+        if step < num_shown:
+            vis.set_num_animals(herb[:step], carn[:step])
+        else:
+            vis.extend_num_animals(num_shown, herb[num_shown:step],
+                                   carn[num_shown:step])
+        num_shown = step
+        vis.update(step + 1, num_herb_cell, num_carn_cell)
+
+        if filename.endswith('.png'):
+            # encodes the rendered buffer, without rendering the figure again
+            matplotlib.image.imsave(filename, vis.frame_rgba())
+        else:
+            vis.save(filename)
+
+    _worker_figures[key][1] = num_shown
+    return len(frames)
+
+
+class ImageExporter(object):
+    """
+    This class represents worker processes saving graphics files.
+
+    Frames are sent to the workers in chunks, in turn. The totals for the
+    line graph are sent with the chunks, each year once to each worker.
+    """
+
+    def __init__(self, island_map, processes=None, chunk_size=25):
+        """
+        :param island_map: specification about the island's geography
+        :type island_map: multiline str
+        :param processes: number of worker processes, default is the number
+                          of cores
+        :type processes: int
+        :param chunk_size: number of frames rendered by a worker at a time
+        :type chunk_size: int
+        """
+        self._island_map = island_map
+        self._processes = processes
+        self._chunk_size = chunk_size
+
+        # pools with one process each, so chunks can be sent to a given
+        # worker
+        self._pools = []
+        self._next_worker = 0
+        # number of years of totals sent to each worker
+        self._num_sent = []
+
+        self._results = []
+        self._frames = []
+        self._limits = None
+        self._final_step = None
+
+        # total number of animals for each year simulated
+        self._num_herb = []
+        self._num_carn = []
+
+    def start(self, final_step, **limits):
+        """
+        Starts the worker processes for a call to simulate.
+
+        :param final_step: last step the line graph has to show
+        :param limits: color code limits and ymax, as for Visualization.setup
+        """
+        self._final_step = final_step
+        self._limits = limits
+        if not self._pools:
+            processes = self._processes or multiprocessing.cpu_count()
+            self._pools = [multiprocessing.Pool(1) for _ in range(processes)]
+            self._num_sent = [0] * processes
+            self._next_worker = 0
+
+    def add_num_animals(self, num_herb, num_carn):
+        """
+        Records total number of animals for the next year.
+
+        :param num_herb: total number of herbivores on the island
+        :param num_carn: total number of carnivores on the island
+        """
+        self._num_herb.append(num_herb)
+        self._num_carn.append(num_carn)
+
+    def add_frame(self, filename, step, num_herb_cell, num_carn_cell):
+        """
+        Records a snapshot to be saved as a graphics file.
+
+        :param filename: name of the graphics file
+        :param step: number of years simulated before the snapshot
+        :param num_herb_cell: total number of herbivores in each cell
+        :param num_carn_cell: total number of carnivores in each cell
+        """
+        self._frames.append((filename, step, num_herb_cell, num_carn_cell))
+        if len(self._frames) >= self._chunk_size:
+            self._send_chunk()
+
+    def _send_chunk(self):
+        """
+        Sends the recorded frames to the next worker process, with the
+        totals of the years the worker has not received.
+        """
+        if not self._frames:
+            return
+
+        worker = self._next_worker
+        self._next_worker = (worker + 1) % len(self._pools)
+        first_year = self._num_sent[worker]
+        last_step = max(self._frames[-1][1], first_year)
+        self._results.append(self._pools[worker].apply_async(
+            _render_chunk,
+            (self._island_map, self._limits, self._final_step, first_year,
+             np.array(self._num_herb[first_year:last_step]),
+             np.array(self._num_carn[first_year:last_step]),
+             self._frames)))
+        self._num_sent[worker] = last_step
+        self._frames = []
+
+    def finish(self):
+        """
+        Waits until all recorded frames are saved.
+
+        :return: number of frames saved since the last call
+        """
+        self._send_chunk()
+        num_saved = sum(result.get() for result in self._results)
+        self._results = []
+        return num_saved
+
+    def close(self):
+        """ Saves remaining frames and stops the worker processes. """
+        if not self._pools:
+            return
+
+        try:
+            self.finish()
+        finally:
+            for pool in self._pools:
+                pool.close()
+            for pool in self._pools:
+                pool.join()
+            self._pools = []
@@ -0,0 +1,293 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides fodder parameters for each cell of the island for the
+biosim project.
+
+By default all cells of a landscape type share the parameters of its class,
+e.g. ``Jungle.params['fmax']``. :class:`FodderGrids` holds arrays with the
+parameters ``fmax`` and ``alpha`` for each cell of the map, which may be
+replaced in given years, and lets the fodder of all cells grow in one
+vectorized update. NaN in an array means that the cell uses the parameter
+of its landscape class, and values in cells without fodder are not used.
+
+Arrays can be given as NumPy arrays or loaded from files with
+:func:`load_grid`: NPY files, or raster text files, either ESRI ASCII grids
+with a header or plain rows of numbers.
+"""
+
+import numpy as np
+from .landscape import Jungle, Savannah
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+GRID_PARAMETERS = ('fmax', 'alpha')
+
+# keys of the header of ESRI ASCII grid files
+_HEADER_KEYS = ('ncols', 'nrows', 'xllcorner', 'yllcorner', 'xllcenter',
+                'yllcenter', 'cellsize', 'nodata_value')
+
+
+def load_grid(filename):
+    """
+    Loads an array with a value for each cell of the map.
+
+    Files ending with .npy are NumPy arrays. Other files are text, with one
+    line for each row of the map, optionally after an ESRI ASCII grid header
+    giving e.g. ``ncols``, ``nrows`` and ``NODATA_value``. Cells with the
+    NODATA value are NaN.
+
+    :param filename: name of the file
+    :return: float array of shape (rows, columns)
+    """
+    if filename.endswith('.npy'):
+        return np.load(filename).astype(float)
+
+    with open(filename) as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+
+    header = {}
+    for line in lines:
+        words = line.split()
+        if len(words) != 2 or words[0].lower() not in _HEADER_KEYS:
+            break
+        header[words[0].lower()] = float(words[1])
+    values = np.loadtxt(lines[len(header):], dtype=float, ndmin=2)
+
+    if (values.shape[0] != header.get('nrows', values.shape[0]) or
+            values.shape[1] != header.get('ncols', values.shape[1])):
+        raise ValueError("Grid {} does not have the size in its header"
+                         .format(filename))
+    if 'nodata_value' in header:
+        values[values == header['nodata_value']] = np.nan
+    return values
+
+
+class FodderGrids(object):
+    """
+    This class represents the fodder parameters of each cell of a map, and
+    the years in which they change.
+
+    The jungle and savannah cells are found once, and an array is only used
+    for a parameter when it is given, with its NaN replaced when it is set.
+    Otherwise the parameter of the landscape class is used directly.
+    """
+
+    # parameters used by each landscape with fodder
+    _LANDSCAPE_PARAMETERS = (('fmax', Jungle), ('fmax', Savannah),
+                             ('alpha', Savannah))
+
+    def __init__(self, jungle, savannah):
+        """
+        :param jungle: bool array of the shape of the map, True for jungle
+        :param savannah: bool array of the shape of the map, True for
+                         savannah
+        """
+        self.shape = jungle.shape
+        self._jungle = jungle
+        self._savannah = savannah
+
+        # flat index into the map of the cells of each landscape with fodder
+        self._landscape_cells = {Jungle: np.flatnonzero(jungle),
+                                 Savannah: np.flatnonzero(savannah)}
+
+        # current arrays by parameter, and the arrays of later years as a
+        # list of (first year, parameters) in the order they are given
+        self._grids = {}
+        self._schedule = []
+
+        # values of a parameter in the cells of a landscape by (parameter,
+        # landscape class), with the index of the cells using the class
+        # parameter, for the parameters given as arrays
+        self._resolved = {}
+
+        # class parameters last used, and True if the parameters changed
+        # since the fodder was set to fmax by initial_fodder
+        self._class_values = dict(
+            ((name, cls), float(cls.params[name]))
+            for name, cls in self._LANDSCAPE_PARAMETERS)
+        self._changed = False
+
+        # the last index into the map given, and the cells of each landscape
+        # it selects
+        self._index = Ellipsis
+        self._index_cells = None
+
+    def check(self, params):
+        """
+        Checks arrays of parameters, loading arrays given as file names.
+
+        :param params: dictionary with array or file name by parameter
+        :return: dictionary with float array by parameter
+        """
+        grids = {}
+        for name, values in params.items():
+            if name not in GRID_PARAMETERS:
+                raise ValueError("Parameter {} can not be given for each "
+                                 "cell".format(name))
+            if isinstance(values, str):
+                values = load_grid(values)
+            values = np.array(values, dtype=float)
+            if values.shape != self.shape:
+                raise ValueError("Array of {} must have the shape {} of the "
+                                 "map".format(name, self.shape))
+            given = values[~np.isnan(values)]
+            if (given < 0).any() or (name == 'alpha' and (given > 1).any()):
+                raise ValueError("Invalid value for {}".format(name))
+            grids[name] = values
+        return grids
+
+    def set(self, params, first_year=None):
+        """
+        Sets arrays of parameters, now or from a later year.
+
+        :param params: dictionary with array or file name by parameter
+        :param first_year: first year the arrays are used, now if None
+        """
+        grids = self.check(params)
+        if first_year is None:
+            self._use(grids)
+        else:
+            self._schedule.append((first_year, grids))
+
+    def start_year(self, year):
+        """
+        Uses the arrays given for the years up to this year.
+
+        :param year: number of the year starting
+        """
+        due = [grids for first_year, grids in self._schedule
+               if first_year <= year]
+        if due:
+            self._schedule = [(first_year, grids)
+                              for first_year, grids in self._schedule
+                              if first_year > year]
+            for grids in due:
+                self._use(grids)
+
+    def _use(self, grids):
+        """
+        Makes arrays the current parameters, keeping their values in the
+        cells of each landscape with NaN replaced by the class parameter.
+
+        :param grids: dictionary with float array by parameter
+        """
+        self._update_class_values()
+        self._grids.update(grids)
+        for name, cls in self._LANDSCAPE_PARAMETERS:
+            if name in grids:
+                values = grids[name].ravel()[self._landscape_cells[cls]]
+                nan = np.flatnonzero(np.isnan(values))
+                values[nan] = self._class_values[name, cls]
+                self._resolved[name, cls] = (values, nan)
+        self._changed = True
+
+    def _update_class_values(self):
+        """
+        Uses the current parameters of the landscape classes for the cells
+        without a value in the arrays.
+        """
+        for name, cls in self._LANDSCAPE_PARAMETERS:
+            value = float(cls.params[name])
+            if value != self._class_values[name, cls]:
+                self._class_values[name, cls] = value
+                if (name, cls) in self._resolved:
+                    values, nan = self._resolved[name, cls]
+                    values[nan] = value
+                self._changed = True
+
+    def _values(self, name, cls, positions):
+        """
+        Returns the current values of a parameter in cells of a landscape.
+
+        :param name: 'fmax' or 'alpha'
+        :param cls: Jungle or Savannah
+        :param positions: index into the cells of the landscape
+        :return: float array with a value for each cell, or the class
+                 parameter if no array is given
+        """
+        if (name, cls) not in self._resolved:
+            return self._class_values[name, cls]
+        values = self._resolved[name, cls][0]
+        return values if positions is Ellipsis else values[positions]
+
+    def _cells(self, cls, index, cells=None):
+        """
+        Finds the cells of a landscape in the fodder array.
+
+        :param cls: Jungle or Savannah
+        :param index: index of the cells of the fodder array into an array
+                      of the shape of the map
+        :param cells: flat index into the map of the only cells wanted, used
+                      with index Ellipsis; all cells if None
+        :return: flat index of the cells into the fodder array, and index of
+                 the cells into the cells of the landscape
+        """
+        landscape = self._landscape_cells[cls]
+        if cells is not None:
+            positions = np.searchsorted(landscape, cells)
+            found = positions < len(landscape)
+            found[found] = landscape[positions[found]] == cells[found]
+            return cells[found], positions[found]
+        if index is Ellipsis:
+            return landscape, Ellipsis
+
+        if index is not self._index:
+            flat = np.ravel_multi_index(index, self.shape)
+            masks = {Jungle: self._jungle, Savannah: self._savannah}
+            self._index_cells = {}
+            for landscape_cls, mask in masks.items():
+                places = np.flatnonzero(mask.ravel()[flat])
+                self._index_cells[landscape_cls] = (
+                    places, np.searchsorted(
+                        self._landscape_cells[landscape_cls], flat[places]))
+            self._index = index
+        return self._index_cells[cls]
+
+    def initial_fodder(self, index=Ellipsis):
+        """
+        Returns the fodder of the cells before the first year, which is fmax
+        in jungle and savannah and zero in other cells.
+
+        :param index: index of the cells into an array of the shape of the
+                      map, all cells by default
+        :return: float array with the fodder of each cell
+        """
+        self._update_class_values()
+        fodder = np.zeros(self._jungle[index].shape)
+        for cls in (Jungle, Savannah):
+            places, positions = self._cells(cls, index)
+            np.put(fodder, places, self._values('fmax', cls, positions))
+        self._changed = False
+        return fodder
+
+    def grow(self, fodder, index=Ellipsis, cells=None):
+        """
+        Lets the fodder grow in the cells: jungle is filled up to fmax, and
+        savannah grows by alpha times what is missing up to fmax.
+
+        Cells that have not been eaten from since :meth:`initial_fodder` are
+        still at fmax, so if the parameters have not changed since then, only
+        the cells given by cells need to grow.
+
+        :param fodder: contiguous float array with the fodder of the cells,
+                       changed in place
+        :param index: index of the cells into an array of the shape of the
+                      map, all cells by default
+        :param cells: flat index into the map of the cells that may have
+                      been eaten from, used with index Ellipsis; all cells
+                      grow if None
+        """
+        self._update_class_values()
+        if self._changed:
+            cells = None
+
+        places, positions = self._cells(Jungle, index, cells)
+        np.put(fodder, places, self._values('fmax', Jungle, positions))
+
+        places, positions = self._cells(Savannah, index, cells)
+        savannah = fodder.take(places)
+        savannah += (self._values('alpha', Savannah, positions) *
+                     (self._values('fmax', Savannah, positions) - savannah))
+        np.put(fodder, places, savannah)
@@ -0,0 +1,139 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a class recording the wall time and the demographic
+events of each phase of the annual cycle for the biosim project.
+
+Instrumentation is opt-in, see :meth:`biosim.island_nature.Island.
+enable_instrumentation`. When it is disabled, the annual cycle only checks
+once a year whether it should be recorded.
+"""
+
+import time
+from collections import namedtuple
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+YearStats = namedtuple('YearStats',
+                       ['year', 'phase_times', 'animals_processed', 'births',
+                        'deaths', 'kills', 'migrations'])
+YearStats.__doc__ = """
+Record of one simulated year.
+
+phase_times and animals_processed are dictionaries with the phase names of
+:attr:`biosim.island_nature.Island.annual_phases` as keys, holding the wall
+time in seconds and the number of animals on the island when the phase
+started. births, deaths and migrations are dictionaries with 'herbivores'
+and 'carnivores' as keys. kills is the number of herbivores killed by
+carnivores. deaths does not include kills.
+"""
+
+
+def run_phase(island, phase, phase_hook=None):
+    """
+    Runs a phase of the annual cycle on the island.
+
+    :param island: class instance of the island
+    :param phase: name of the phase, see
+                  :attr:`biosim.island_nature.Island.annual_phases`
+    :param phase_hook: function called as phase_hook(phase, method), which
+                       has to call method() to run the phase; the phase is
+                       run directly if None
+    """
+    method = getattr(island, phase)
+    if phase_hook is None:
+        method()
+    else:
+        phase_hook(phase, method)
+
+
+class Instrumentation(object):
+    """
+    This class represents the records of the years simulated while
+    instrumentation is enabled.
+    """
+
+    def __init__(self, first_year=1):
+        """
+        :param first_year: number of the first year recorded
+        :type first_year: int
+        """
+        self.records = []
+        self._next_year = first_year
+        self._migrations = None
+
+    def run_year(self, island, phase_hook=None):
+        """
+        Simulates one year on the island, timing and counting each phase.
+
+        The animals are counted between the phases, so the counting is not
+        included in the times.
+
+        :param island: class instance of the island
+        :param phase_hook: function running each phase, see
+                           :func:`run_phase`
+        :return: record of the year
+        """
+        phase_times = {}
+        processed = {}
+        counts = {}
+        self._migrations = {'herbivores': 0, 'carnivores': 0}
+
+        num_herb, num_carn = island.number_of_animals()
+        for phase in island.annual_phases:
+            processed[phase] = num_herb + num_carn
+            start = time.perf_counter()
+            run_phase(island, phase, phase_hook)
+            phase_times[phase] = time.perf_counter() - start
+
+            before = num_herb, num_carn
+            num_herb, num_carn = island.number_of_animals()
+            counts[phase] = (before[0] - num_herb, before[1] - num_carn)
+
+        births = counts['animals_give_birth']
+        deaths = counts['animals_die']
+        record = YearStats(
+            year=self._next_year, phase_times=phase_times,
+            animals_processed=processed,
+            births={'herbivores': -births[0], 'carnivores': -births[1]},
+            deaths={'herbivores': deaths[0], 'carnivores': deaths[1]},
+            kills=counts['all_carn_eating'][0],
+            migrations=self._migrations)
+
+        self._migrations = None
+        self._next_year += 1
+        self.records.append(record)
+        return record
+
+    def count_migrations(self, num_herb, num_carn):
+        """
+        Adds animals that moved to another cell in the current year.
+
+        :param num_herb: number of herbivores that moved
+        :param num_carn: number of carnivores that moved
+        """
+        if self._migrations is not None:
+            self._migrations['herbivores'] += num_herb
+            self._migrations['carnivores'] += num_carn
+
+    def phase_totals(self):
+        """
+        Returns total wall time of each phase over all recorded years.
+
+        :return: dictionary with seconds for each phase
+        """
+        totals = {}
+        for record in self.records:
+            for phase, seconds in record.phase_times.items():
+                totals[phase] = totals.get(phase, 0) + seconds
+        return totals
+
+    def as_dicts(self):
+        """ Returns the records as dictionaries, e.g. for saving as JSON. """
+        return [record._asdict() for record in self.records]
+
+    def clear(self):
+        """ Removes all records, the next year keeps its number. """
+        self.records = []
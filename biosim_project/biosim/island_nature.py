@@ -4,68 +4,226 @@
 This module provides a class implementing the island for the biosim project.
 """
 
+from collections import namedtuple
+from .animals import Herbivore, Carnivore
 from .landscape import Jungle, Savannah, Desert, Mountain, Ocean
+from .instrumentation import Instrumentation, run_phase
+from .events import CellEvents, LifeHistories
+# noinspection PyProtectedMember
+from .engines import make_engine, _fitness_of_columns
+from .population import check_columns, add_columns_to_cells, load_population
+from .fodder import FodderGrids
 import random
 import numpy as np
 
 __authors__ = 'Elisabeth Flatner and Marie Klever'
 __emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
 
+# landscape letters in the map, the index is the code in Island.terrain
+LANDSCAPE_LETTERS = 'OMDSJ'
+_CELL_TYPES = (Ocean, Mountain, Desert, Savannah, Jungle)
+_OCEAN = LANDSCAPE_LETTERS.index('O')
+_MOUNTAIN = LANDSCAPE_LETTERS.index('M')
+_DESERT = LANDSCAPE_LETTERS.index('D')
+_SAVANNAH = LANDSCAPE_LETTERS.index('S')
+_JUNGLE = LANDSCAPE_LETTERS.index('J')
+
+# code for each ASCII character, _NO_CODE for characters that are not
+# landscape letters
+_NO_CODE = 255
+_LETTER_CODES = np.full(256, _NO_CODE, dtype=np.uint8)
+for _code, _letter in enumerate(LANDSCAPE_LETTERS):
+    _LETTER_CODES[ord(_letter)] = _code
+
+CellStatistics = namedtuple('CellStatistics',
+                            ['count', 'age', 'weight', 'fitness'])
+CellStatistics.__doc__ = """
+Arrays of the shape of the map for one species, returned by
+:meth:`Island.cell_statistics`: the number of animals in each cell, and
+their mean age, weight and fitness, NaN in cells without animals.
+"""
+
+# row and column offsets of the neighbours, in the order of
+# Landscape.neighbour_locations
+NEIGHBOUR_OFFSETS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+def habitable_neighbours(terrain):
+    """
+    Numbers the habitable cells of a map and finds their neighbours.
+
+    :param terrain: array of landscape codes, see Island.parse_geography
+    :return: array of shape (n, 2) with the row and column of each habitable
+             cell, row by row, and array of shape (n, 4) with the number of
+             each neighbour, -1 if animals can not live there
+    """
+    habitable = terrain >= _DESERT
+    locations = np.argwhere(habitable)
+    index = np.full(terrain.shape, -1, dtype=np.int64)
+    index[habitable] = np.arange(len(locations))
+
+    # the map is surrounded by ocean, so all neighbours are on the map
+    neighbours = np.stack(
+        [index[locations[:, 0] + d_row, locations[:, 1] + d_col]
+         for d_row, d_col in NEIGHBOUR_OFFSETS], axis=1).reshape(-1, 4)
+    return locations, neighbours
+
 
 class Island(object):
     """
     This class represents the island with all cells.
     """
 
-    def __init__(self, geogr):
+    # methods called by annual_cycle, in order
+    annual_phases = ('food_growth_in_all_cells', 'all_herb_eating',
+                     'all_carn_eating', 'animals_give_birth',
+                     'animals_migrate', 'all_animals_aging',
+                     'all_animals_lose_weight', 'animals_die')
+
+    def __init__(self, geogr, cell_engine=None, fodder_params=None,
+                 fodder_schedule=None):
         """
 
         :param geogr: string with specifications about the islands geography
+        :param cell_engine: engine running the phases in each cell, 'object',
+                            'array', 'auto' or a class instance from
+                            :mod:`biosim.engines`; default is 'object'
+        :param fodder_params: dictionary with an array or file name for
+                              'fmax' and 'alpha', giving the parameter for
+                              each cell, see :mod:`biosim.fodder`
+        :param fodder_schedule: dictionary with fodder_params by the first
+                                year they are used
         """
 
         self.geogr = geogr.split()
+        self.cell_engine = make_engine(cell_engine)
+
+        # records of each year, None when instrumentation is disabled
+        self.instrumentation = None
+
+        # events in each cell of each year, None unless recorded
+        self.events = None
+
+        self.terrain = self.parse_geography(self.geogr)
+
+        # number of years simulated
+        self.year = 0
+
+        # fodder of the cells given by _fodder_cells, an index into arrays
+        # of the shape of the map; cells share the items, see get_cell
+        self.fodder_grids = FodderGrids(self.terrain == _JUNGLE,
+                                        self.terrain == _SAVANNAH)
+        for first_year, params in sorted((fodder_schedule or {}).items()):
+            self.fodder_grids.set(params, first_year)
+        self._fodder_cells = Ellipsis
+        self.fodder = np.zeros(self.terrain.shape)
+        self.set_fodder_params(fodder_params or {})
+
+        # cells where animals can not live are shared by all their locations
+        self._ocean = Ocean()
+        self._mountain = Mountain()
 
-        isl_width = max([len(stri) for stri in self.geogr])
-        for row_str in self.geogr:
+        # habitable cells are created when first used, see get_cell
+        self._cells = {}
+        self._cells_in_order = []
+        self._cell_numbers = np.zeros(0, dtype=np.int64)
+
+        self.island_map = _CellGrid(self)
+
+    @staticmethod
+    def parse_geography(geogr):
+        """
+        Converts the rows of the map to an array of landscape codes, checking
+        that the island is a rectangle surrounded by ocean.
+
+        :param geogr: list of strings, one for each row of the map
+        :return: uint8 array with an index into :data:`LANDSCAPE_LETTERS`
+                 for each cell
+        """
+        if len(geogr) == 0:
+            raise ValueError("Island map is empty, there is no island")
+
+        isl_width = len(geogr[0])
+        for row_str in geogr:
             if len(row_str) != isl_width:
                 raise ValueError("Island has to be a rectangle")
 
-        for letter in self.geogr[0]:
-            if letter != 'O':
-                raise ValueError("Island must be surrounded by ocean")
+        try:
+            letters = np.frombuffer(''.join(geogr).encode('ascii'),
+                                    dtype=np.uint8)
+        except UnicodeEncodeError:
+            raise ValueError("Landscape type does not exist on the island")
+        terrain = _LETTER_CODES[letters].reshape(len(geogr), isl_width)
 
-        for letter in self.geogr[-1]:
-            if letter != 'O':
-                raise ValueError("Island must be surrounded by ocean")
+        if (terrain == _NO_CODE).any():
+            raise ValueError("Landscape type does not exist on the island")
 
-        for row_letter in self.geogr[1:-1]:
-            if row_letter[0] != 'O' or row_letter[-1] != 'O':
-                raise ValueError("Island must be surrounded by ocean")
+        if ((terrain[0] != _OCEAN).any() or (terrain[-1] != _OCEAN).any() or
+                (terrain[:, 0] != _OCEAN).any() or
+                (terrain[:, -1] != _OCEAN).any()):
+            raise ValueError("Island must be surrounded by ocean")
 
-        self.island_map = []
+        return terrain
 
-        if len(self.geogr) == 0:
-            raise ValueError("Island map is empty, there is no island")
+    def get_cell(self, row, col):
+        """
+        Returns the cell in a location, creating it if it is not used before.
 
-        for row_num in range(len(self.geogr)):
-            row = []
-            for col_num in range(len(self.geogr[0])):
-                letter = self.geogr[row_num][col_num]
-                if letter == 'J':
-                    row.append(Jungle((row_num, col_num)))
-                elif letter == 'S':
-                    row.append(Savannah((row_num, col_num)))
-                elif letter == 'D':
-                    row.append(Desert((row_num, col_num)))
-                elif letter == 'M':
-                    row.append(Mountain((row_num, col_num)))
-                elif letter == 'O':
-                    row.append(Ocean((row_num, col_num)))
-                else:
-                    raise ValueError(
-                        "Landscape type does not exist on the island")
+        Locations with ocean or mountain share one cell of each type.
+        Habitable cells are only created when animals arrive, or fodder is
+        needed, since a cell that is never used keeps its initial state.
+
+        :param row: row of the cell, not negative
+        :param col: column of the cell, not negative
+        :return: class instance of the cell
+        """
+        cell = self._cells.get((row, col))
+        if cell is not None:
+            return cell
+
+        code = self.terrain[row, col]
+        if code == _OCEAN:
+            return self._ocean
+        if code == _MOUNTAIN:
+            return self._mountain
+
+        cell = _CELL_TYPES[code]((row, col))
+        cell.store_fodder_in(self.fodder, (row, col))
+        cell.events = self.events
+        self._cells[row, col] = cell
+        self._cells_in_order = None
+        return cell
+
+    def habitable_cells(self):
+        """
+        Returns the habitable cells created so far, row by row.
+
+        Cells that are not created have no animals, and have the fodder they
+        started with.
+
+        :return: list of class instances of the cells
+        """
+        if self._cells_in_order is None:
+            locations = sorted(self._cells)
+            self._cells_in_order = [self._cells[loc] for loc in locations]
+            self._cell_numbers = np.ravel_multi_index(
+                np.array(locations, dtype=np.int64).reshape(-1, 2).T,
+                self.terrain.shape)
+        return self._cells_in_order
+
+    def _animals_in_cells(self, name):
+        """
+        Returns array with number of animals of a species in each cell.
 
-            self.island_map.append(row)
+        :param name: 'herb' or 'carn', the attribute of the cells
+        """
+        cells = self.habitable_cells()
+        immigrants = name + '_immigrants'
+        counts = np.fromiter((len(getattr(cell, name)) +
+                              len(getattr(cell, immigrants))
+                              for cell in cells), float, len(cells))
+        return np.bincount(self._cell_numbers, counts,
+                           self.terrain.size).reshape(self.terrain.shape)
 
     def place_animals(self, population):
         """
@@ -74,6 +232,7 @@ class Island(object):
         :param population: dictionary with location and corresponding population
         """
 
+        before = self._numbers_before_placing()
         for pop in population:
             row, col = (pop['loc'][0] - 1), (pop['loc'][1] - 1)
 
@@ -82,64 +241,149 @@ class Island(object):
                 raise ValueError("Position ({}, {}) does not exist on map".
                                  format(row, col))
 
-            if self.island_map[row][col].animals_can_live_here():
-                self.island_map[row][col].add_population(pop['pop'])
+            cell = self.island_map[row][col]
+            if cell.animals_can_live_here():
+                cell.add_population(pop['pop'])
             else:
                 raise ValueError("Animals can not live in position ({}, {})"
                                  .format(row, col))
+        self._offer_placed(before)
+
+    def place_animal_columns(self, loc, species, age, weight):
+        """
+        Places a population given as columns, e.g. NumPy arrays.
+
+        All animals are checked before any is placed, and animals of the
+        same cell and species are added together.
+
+        :param loc: array of shape (n, 2) with locations counted from 1, as
+                    in place_animals
+        :param species: species codes, see :data:`biosim.population.SPECIES`,
+                        or names
+        :param age: ages
+        :param weight: weights
+        """
+        columns = check_columns(loc, species, age, weight,
+                                self.terrain >= _DESERT)
+        before = self._numbers_before_placing()
+        add_columns_to_cells(self.get_cell, *columns)
+        self._offer_placed(before)
+
+    def _numbers_before_placing(self):
+        """
+        Returns the number of herbivores and carnivores in each cell by
+        location if life histories are recorded, else None.
+        """
+        if self.events is None or self.events.histories is None:
+            return None
+        return {cell.loc: (len(cell.herb), len(cell.carn))
+                for cell in self.habitable_cells()}
+
+    def _offer_placed(self, before):
+        """
+        Offers the animals placed to the life histories.
+
+        :param before: numbers returned by _numbers_before_placing
+        """
+        if before is None:
+            return
+        for cell in self.habitable_cells():
+            num_herb, num_carn = before.get(cell.loc, (0, 0))
+            self.events.placed(cell, cell.herb[num_herb:],
+                               cell.carn[num_carn:])
+
+    def place_animals_from_file(self, filename):
+        """
+        Places a population from a NPZ or CSV file with columns, see
+        :func:`biosim.population.load_population`.
+
+        :param filename: name of the file
+        """
+        columns = load_population(filename)
+        self.place_animal_columns(columns['loc'], columns['species'],
+                                  columns['age'], columns['weight'])
+
+    def set_fodder_params(self, params, first_year=None):
+        """
+        Sets fmax and alpha for each cell, see :mod:`biosim.fodder`.
+
+        Before the first year, the fodder of each cell is set to its fmax.
+
+        :param params: dictionary with an array of the shape of the map or a
+                       file name for 'fmax' and 'alpha'; NaN uses the
+                       parameter of the landscape class
+        :param first_year: first year the parameters are used, the next year
+                           simulated if None
+        """
+        self.fodder_grids.set(params, first_year)
+        if first_year is None and self.year == 0:
+            self.fodder[...] = self.fodder_grids.initial_fodder(
+                self._fodder_cells)
 
     def food_growth_in_all_cells(self):
-        """ Allows food to grow in all the cells on the island. """
-        for row in self.island_map:
-            for cell in row:
-                cell.food_growth()
+        """
+        Allows food to grow in all the cells on the island, in one update of
+        the fodder array.
+
+        Cells that are not created still have their initial fodder, so only
+        the created cells grow unless the fodder parameters have changed.
+        """
+        self.habitable_cells()
+        self.fodder_grids.grow(self.fodder, self._fodder_cells,
+                               self._cell_numbers)
 
     def all_herb_eating(self):
         """ All herbivores on the island eats. """
-        for row in self.island_map:
-            for cell in row:
-                cell.herb_eating()
+        for cell in self.habitable_cells():
+            self.cell_engine.herb_eating(cell)
 
     def all_carn_eating(self):
         """ All carnivores on the island eats. """
-        for row in self.island_map:
-            for cell in row:
-                cell.carn_eating()
+        for cell in self.habitable_cells():
+            self.cell_engine.carn_eating(cell)
 
     def animals_give_birth(self):
         """ All animals on the island get the opportunity to give birth. """
-        for row in self.island_map:
-            for cell in row:
-                cell.animal_birth()
+        for cell in self.habitable_cells():
+            self.cell_engine.animal_birth(cell)
 
     def randomize_cell_structure(self):
         """
-        Randomizes the order of the cells on the island. Does not include
-        coordinates of the outer edges of the island.
+        Randomizes the order of the habitable cells created so far. Cells
+        that are not created have no animals to move.
 
         :return: randomized list of class instances to the island cells
         """
-
-        locations = [(row, col) for row in range(1, len(self.geogr) - 1)
-                     for col in range(1, len(self.geogr[0]) - 1)]
-        random.shuffle(locations)
-
-        return [(self.island_map[loc[0]][loc[1]]) for loc in locations]
+        cells = list(self.habitable_cells())
+        random.shuffle(cells)
+        return cells
 
     def animals_migrate(self):
         """All animals on the island get an opportunity to migrate. """
         rnd_island = self.randomize_cell_structure()
 
+        # immigrants may arrive in cells created during migration; cells
+        # are only created when an animal moves in, see _UncreatedCell
         for cell in rnd_island:
-            neighbours = self.get_neighbours(cell.neighbour_locations())
-            cell.herb_migration(neighbours)
-        for cell in rnd_island:
+            if cell.herb:
+                self.cell_engine.herb_migration(
+                    cell, self._migration_neighbours(cell))
+        if self.instrumentation is not None:
+            self.instrumentation.count_migrations(
+                sum(len(cell.herb_immigrants)
+                    for cell in self.habitable_cells()), 0)
+        for cell in self.habitable_cells():
             cell.add_immigrants_to_pop()
 
         for cell in rnd_island:
-            neighbours = self.get_neighbours(cell.neighbour_locations())
-            cell.carn_migration(neighbours)
-        for cell in rnd_island:
+            if cell.carn:
+                self.cell_engine.carn_migration(
+                    cell, self._migration_neighbours(cell))
+        if self.instrumentation is not None:
+            self.instrumentation.count_migrations(
+                0, sum(len(cell.carn_immigrants)
+                       for cell in self.habitable_cells()))
+        for cell in self.habitable_cells():
             cell.add_immigrants_to_pop()
 
     def get_neighbours(self, loc_neighbours):
@@ -150,37 +394,132 @@ class Island(object):
                                cells
         :return: list of class instances to all neighbour cells
         """
-        return [self.island_map[neighbour[0]][neighbour[1]]
-                for neighbour in loc_neighbours]
+        return [self.get_cell(*neighbour) for neighbour in loc_neighbours]
+
+    def _migration_neighbours(self, cell):
+        """
+        Finds the neighbours animals of a cell can move to, without creating
+        habitable cells that are not used yet.
+
+        :param cell: class instance of the cell
+        :return: list of class instances of the created neighbour cells, and
+                 of :class:`_UncreatedCell` for the others
+        """
+        neighbours = []
+        for loc in cell.neighbour_locations():
+            neighbour = self._cells.get(loc)
+            if neighbour is None:
+                if self.terrain[loc] >= _DESERT:
+                    neighbour = _UncreatedCell(self, loc)
+                else:
+                    neighbour = self.get_cell(*loc)
+            neighbours.append(neighbour)
+        return neighbours
 
     def all_animals_aging(self):
         """ All animals on the island get one year older. """
-        for row in self.island_map:
-            for cell in row:
-                cell.animal_aging()
+        for cell in self.habitable_cells():
+            self.cell_engine.animal_aging(cell)
 
     def all_animals_lose_weight(self):
         """ All animals on the island loses weight. """
-        for row in self.island_map:
-            for cell in row:
-                cell.animal_weight_change()
+        for cell in self.habitable_cells():
+            self.cell_engine.animal_weight_change(cell)
 
     def animals_die(self):
         """ Controls if any of the animals on the island dies. """
-        for row in self.island_map:
-            for cell in row:
-                cell.animal_death()
-
-    def annual_cycle(self):
-        """Simulates one year on the island. """
-        self.food_growth_in_all_cells()
-        self.all_herb_eating()
-        self.all_carn_eating()
-        self.animals_give_birth()
-        self.animals_migrate()
-        self.all_animals_aging()
-        self.all_animals_lose_weight()
-        self.animals_die()
+        for cell in self.habitable_cells():
+            self.cell_engine.animal_death(cell)
+
+    def start_year(self):
+        """ Lets the cell engine choose how to run the cells this year. """
+        self.cell_engine.start_year(self.habitable_cells())
+
+    def annual_cycle(self, phase_hook=None):
+        """
+        Simulates one year on the island.
+
+        :param phase_hook: function called as phase_hook(phase, method) for
+                           each phase of annual_phases, which has to call
+                           method() to run the phase, e.g. to measure it;
+                           the phases are run directly if None
+        """
+        self.year += 1
+        self.fodder_grids.start_year(self.year)
+        self.start_year()
+        if self.instrumentation is not None:
+            self.instrumentation.run_year(self, phase_hook)
+        else:
+            for phase in self.annual_phases:
+                run_phase(self, phase, phase_hook)
+
+        if self.events is not None:
+            self.events.end_year(self)
+
+    def enable_instrumentation(self, first_year=None):
+        """
+        Records wall time and events of each phase in the following years.
+
+        If instrumentation is already enabled, the existing records are kept.
+
+        :param first_year: number of the first year recorded, the next year
+                           simulated if None
+        :return: class instance of the instrumentation
+        """
+        if self.instrumentation is None:
+            if first_year is None:
+                first_year = self.year + 1
+            self.instrumentation = Instrumentation(first_year)
+        return self.instrumentation
+
+    def enable_events(self, num_tracked=0, history_file=None, seed=None):
+        """
+        Counts births, deaths, kills and migrations in each cell in the
+        following years, and optionally records life histories of a sample
+        of the animals, see :mod:`biosim.events`.
+
+        :param num_tracked: number of animals tracked, no life histories
+                            if 0
+        :param history_file: name of the binary file of the life histories,
+                             kept in memory if None
+        :param seed: seed of the sampling of tracked animals
+        :return: class instance of :class:`biosim.events.CellEvents`
+        """
+        if self.events is not None:
+            raise ValueError("Events are already recorded")
+        histories = None
+        if num_tracked > 0:
+            histories = LifeHistories(num_tracked, history_file, seed)
+        self.events = CellEvents(self.terrain.shape, self.year + 1,
+                                 histories)
+        for cell in self.habitable_cells():
+            cell.events = self.events
+            self.events.placed(cell, cell.herb, cell.carn)
+        return self.events
+
+    def disable_events(self):
+        """
+        Stops counting events and closes the file of the life histories.
+
+        :return: class instance of :class:`biosim.events.CellEvents` with
+                 the counts, None if events were not recorded
+        """
+        events, self.events = self.events, None
+        if events is not None:
+            for cell in self.habitable_cells():
+                cell.events = None
+            events.close()
+        return events
+
+    def disable_instrumentation(self):
+        """
+        Stops recording the following years.
+
+        :return: class instance of the instrumentation with the records,
+                 None if it was not enabled
+        """
+        instrumentation, self.instrumentation = self.instrumentation, None
+        return instrumentation
 
     def number_of_animals(self):
         """
@@ -191,28 +530,217 @@ class Island(object):
         num_herbs = 0
         num_carns = 0
 
-        for row in self.island_map:
-            for cell in row:
-                num_herbs += cell.total_num_animals(species='herbivore')
-                num_carns += cell.total_num_animals(species='carnivore')
+        for cell in self.habitable_cells():
+            num_herbs += cell.total_num_animals(species='herbivore')
+            num_carns += cell.total_num_animals(species='carnivore')
         return num_herbs, num_carns
 
     def num_herb_in_cells(self):
         """Returns array with number of herbivores in each cell. """
-        herbivores = np.zeros((len(self.geogr), len(self.geogr[0])))
-
-        for row in range(len(self.island_map)):
-            for cell in range(len(self.island_map[row])):
-                herbivores[row, cell] = (
-                    self.island_map[row][cell].total_num_animals('herbivore'))
-        return herbivores
+        return self._animals_in_cells('herb')
 
     def num_carn_in_cells(self):
         """Returns array with number of carnivores in each cell. """
-        carnivores = np.zeros((len(self.geogr), len(self.geogr[0])))
+        return self._animals_in_cells('carn')
+
+    def cell_statistics(self):
+        """
+        Calculates the number of animals in each cell and their mean age,
+        weight and fitness.
+
+        The ages and weights of all animals of a species are read in one
+        pass into arrays, and the sums for each cell are computed with
+        bincount over the cell numbers of the animals.
+
+        :return: dictionary with :class:`CellStatistics` for 'herbivores'
+                 and 'carnivores'
+        """
+        cells = self.habitable_cells()
+        statistics = {}
+        for species, name, cls in (('herbivores', 'herb', Herbivore),
+                                   ('carnivores', 'carn', Carnivore)):
+            groups = [getattr(cell, name) for cell in cells]
+            counts = np.fromiter(map(len, groups), np.int64, len(groups))
+            num = counts.sum()
+            # the attributes are read directly, the properties would cost
+            # more than the sums
+            ages = np.fromiter((animal._age for animals in groups
+                                for animal in animals), float, num)
+            weights = np.fromiter((animal._weight for animals in groups
+                                   for animal in animals), float, num)
+            fitness = _fitness_of_columns(ages, weights, cls.params)
+
+            numbers = np.repeat(self._cell_numbers, counts)
+            count = np.bincount(numbers, minlength=self.terrain.size)
+            with np.errstate(invalid='ignore'):
+                means = [np.bincount(numbers, values, self.terrain.size) /
+                         count for values in (ages, weights, fitness)]
+            statistics[species] = CellStatistics(
+                *[grid.reshape(self.terrain.shape)
+                  for grid in [count] + means])
+        return statistics
+
+    def animal_properties(self, species):
+        """
+        Collects age, weight and fitness of all animals of given species.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with arrays of age, weight and fitness
+        """
+        if species in ('herbivores', 'Herbivore', 'herbivore'):
+            animals = [animal for cell in self.habitable_cells()
+                       for animal in cell.herb]
+        elif species in ('carnivores', 'Carnivore', 'carnivore'):
+            animals = [animal for cell in self.habitable_cells()
+                       for animal in cell.carn]
+        else:
+            raise ValueError("Given species does not exist")
+
+        return {'age': np.array([animal.age for animal in animals],
+                                dtype=float),
+                'weight': np.array([animal.weight for animal in animals]),
+                'fitness': np.array([animal.fitness for animal in animals])}
+
+    def animal_columns(self):
+        """
+        Collects all animals on the island as a population in columns, see
+        :mod:`biosim.population`, which can be placed again with
+        place_animal_columns.
+
+        :return: tuple of arrays loc, counted from 1, species codes, age
+                 and weight
+        """
+        loc, species, age, weight = [], [], [], []
+        for cell in self.habitable_cells():
+            herbs = cell.herb + cell.herb_immigrants
+            carns = cell.carn + cell.carn_immigrants
+            for code, animals in enumerate((herbs, carns)):
+                loc.extend([(cell.loc[0] + 1, cell.loc[1] + 1)] *
+                           len(animals))
+                species.extend([code] * len(animals))
+                age.extend(animal.age for animal in animals)
+                weight.extend(animal.weight for animal in animals)
+        return (np.array(loc, dtype=np.int64).reshape(-1, 2),
+                np.array(species, dtype=np.int64),
+                np.array(age, dtype=np.int64), np.array(weight, dtype=float))
+
+    def property_summary(self, species):
+        """
+        Calculates statistics for age, weight and fitness of given species.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with mean, std, min and max for each property,
+                 None for each property if there are no animals
+        """
+        summary = {}
+        for name, values in self.animal_properties(species).items():
+            if len(values) == 0:
+                summary[name] = None
+            else:
+                summary[name] = {'mean': values.mean(), 'std': values.std(),
+                                 'min': values.min(), 'max': values.max()}
+        return summary
+
+
+class _UncreatedCell(object):
+    """
+    A habitable neighbour cell during migration which is not created yet.
+
+    It has no animals and the fodder it started with, read from the fodder
+    array of the island, and the cell is created when the first animal
+    moves in. After that the cell answers for it.
+    """
+
+    def __init__(self, island, loc):
+        """
+        :param island: class instance of the island
+        :param loc: (row, column) of the cell
+        """
+        self._island = island
+        self.loc = loc
+
+    def _cell(self):
+        """ Returns the cell if it is created, else None. """
+        return self._island._cells.get(self.loc)
+
+    @staticmethod
+    def animals_can_live_here():
+        """ Returns True because only habitable cells are not created. """
+        return True
+
+    def get_available_fodder(self, species):
+        """ Returns relevant available fodder in the cell. """
+        cell = self._cell()
+        if cell is not None:
+            return cell.get_available_fodder(species)
+        if species == 'Herbivore' or species == 'herbivore':
+            return self._island.fodder[self.loc]
+        elif species == 'Carnivore' or species == 'carnivore':
+            return 0
+        else:
+            raise ValueError("Given species does not exist")
+
+    def total_num_animals(self, species=None):
+        """ Returns number of given species. """
+        cell = self._cell()
+        if cell is not None:
+            return cell.total_num_animals(species)
+        if species not in ('Herbivore', 'herbivore', 'Carnivore',
+                           'carnivore'):
+            raise ValueError("Given species does not exist")
+        return 0
+
+    def add_herb_immigrant(self, herb_immigrant):
+        """ Creates the cell if needed and adds the immigrant to it. """
+        self._island.get_cell(*self.loc).add_herb_immigrant(herb_immigrant)
+
+    def add_carn_immigrant(self, carn_immigrant):
+        """ Creates the cell if needed and adds the immigrant to it. """
+        self._island.get_cell(*self.loc).add_carn_immigrant(carn_immigrant)
+
+
+class _CellGrid(object):
+    """
+    Rows of cells of an island, indexed like a list of lists of cells.
+
+    Cells are looked up with :meth:`Island.get_cell`, so iterating over the
+    whole grid creates all habitable cells.
+    """
+
+    def __init__(self, island):
+        """
+        :param island: class instance of the island
+        """
+        self._island = island
+
+    def __len__(self):
+        return self._island.terrain.shape[0]
+
+    def __getitem__(self, row):
+        return _CellRow(self._island, range(len(self))[row])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield _CellRow(self._island, row)
+
+
+class _CellRow(object):
+    """ One row of cells of an island, indexed like a list of cells. """
+
+    def __init__(self, island, row):
+        """
+        :param island: class instance of the island
+        :param row: number of the row
+        """
+        self._island = island
+        self._row = row
+
+    def __len__(self):
+        return self._island.terrain.shape[1]
+
+    def __getitem__(self, col):
+        return self._island.get_cell(self._row, range(len(self))[col])
 
-        for row in range(len(self.island_map)):
-            for cell in range(len(self.island_map[row])):
-                carnivores[row, cell] = (
-                    self.island_map[row][cell].total_num_animals('carnivore'))
-        return carnivores
+    def __iter__(self):
+        for col in range(len(self)):
+            yield self._island.get_cell(self._row, col)
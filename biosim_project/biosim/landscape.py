@@ -29,7 +29,36 @@ class Landscape(object):
         self.carn = []
         self.herb_immigrants = []
         self.carn_immigrants = []
-        self.available_food = 0
+
+        # the available fodder is item _fodder_index of _fodder, see
+        # store_fodder_in
+        self._fodder = [0]
+        self._fodder_index = 0
+
+        # class instance of biosim.events.CellEvents counting the events in
+        # the cell, None unless events are recorded
+        self.events = None
+
+    @property
+    def available_food(self):
+        """ Returns the fodder available in the cell. """
+        return self._fodder[self._fodder_index]
+
+    @available_food.setter
+    def available_food(self, value):
+        self._fodder[self._fodder_index] = value
+
+    def store_fodder_in(self, fodder, index):
+        """
+        Keeps the available fodder of the cell in an item of an array, e.g.
+        the fodder array of the island. The item is the fodder of the cell
+        from now on.
+
+        :param fodder: array with the fodder of many cells
+        :param index: index of the item of the cell
+        """
+        self._fodder = fodder
+        self._fodder_index = index
 
     @classmethod
     def set_parameters(cls, new_params):
@@ -96,6 +125,7 @@ class Landscape(object):
         Carnivores eats in the order of their fitness.
         """
         self.fitness_sorting(herb_descending=False)
+        num_herb = len(self.herb)
         for carn in self.carn:
             if not self.herb:
                 break
@@ -104,6 +134,9 @@ class Landscape(object):
 
             self.herb = carn.eating(self.herb)
 
+        if self.events is not None:
+            self.events.killed(self, num_herb - len(self.herb))
+
     @staticmethod
     def newborns(animals_procreating):
         """
@@ -126,8 +159,13 @@ class Landscape(object):
 
         Adds newborn animals to population.
         """
-        self.herb += self.newborns(self.herb)
-        self.carn += self.newborns(self.carn)
+        new_herb = self.newborns(self.herb)
+        new_carn = self.newborns(self.carn)
+        self.herb += new_herb
+        self.carn += new_carn
+
+        if self.events is not None:
+            self.events.born(self, new_herb, new_carn)
 
     def neighbour_locations(self):
         """
@@ -167,6 +205,8 @@ class Landscape(object):
             else:
                 remaining_herb.append(herb)
 
+        if self.events is not None:
+            self.events.migrated(self, len(self.herb) - len(remaining_herb), 0)
         self.herb = remaining_herb
 
     def carn_migration(self, neighbours):
@@ -190,6 +230,8 @@ class Landscape(object):
             else:
                 remaining_carn.append(carn)
 
+        if self.events is not None:
+            self.events.migrated(self, 0, len(self.carn) - len(remaining_carn))
         self.carn = remaining_carn
 
     @staticmethod
@@ -319,9 +361,14 @@ class Landscape(object):
 
         Population is updated with only surviving animals.
         """
+        num_herb, num_carn = len(self.herb), len(self.carn)
         self.herb = [herb for herb in self.herb if not herb.death()]
         self.carn = [carn for carn in self.carn if not carn.death()]
 
+        if self.events is not None:
+            self.events.died(self, num_herb - len(self.herb),
+                             num_carn - len(self.carn))
+
     def add_population(self, pop):
         """
         Creates class instances for animals and adds them to existing
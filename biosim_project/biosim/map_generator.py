@@ -0,0 +1,219 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides functions generating island maps and initial
+populations of any size for the biosim project, e.g. for scaling tests.
+
+The maps are valid input to :class:`biosim.island_nature.Island`: a rectangle
+surrounded by ocean. The same arguments and seed always give the same map.
+"""
+
+import numpy as np
+from .island_nature import Island, LANDSCAPE_LETTERS
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_DEFAULT_PROPORTIONS = {'J': 0.5, 'S': 0.35, 'D': 0.15}
+
+
+def _value_noise(rows, cols, scale, rng):
+    """
+    Makes smooth noise by interpolating a coarse grid of random values.
+
+    :param rows: number of rows
+    :param cols: number of columns
+    :param scale: distance in cells between the random values
+    :param rng: numpy random generator
+    :return: array of shape (rows, cols) with values in [0, 1]
+    """
+    scale = max(float(scale), 1.0)
+    coarse = rng.random_sample((int(rows / scale) + 2, int(cols / scale) + 2))
+
+    y = np.arange(rows) / scale
+    x = np.arange(cols) / scale
+    y0 = y.astype(int)
+    x0 = x.astype(int)
+    # smoothstep weights hide the grid of the coarse values
+    wy = (y - y0) ** 2 * (3 - 2 * (y - y0))
+    wx = (x - x0) ** 2 * (3 - 2 * (x - x0))
+
+    # interpolates along the rows of the coarse grid first, which is cheap,
+    # and then between the interpolated rows
+    rows_x = coarse[:, x0] * (1 - wx) + coarse[:, x0 + 1] * wx
+    noise = rows_x[y0]
+    noise *= (1 - wy)[:, None]
+    noise += rows_x[y0 + 1] * wy[:, None]
+    return noise
+
+
+def _fractal_noise(rows, cols, scale, octaves, rng):
+    """
+    Adds value noise of decreasing scale and amplitude.
+
+    :return: array of shape (rows, cols) with values in [0, 1]
+    """
+    noise = np.zeros((rows, cols))
+    amplitude = 1.0
+    total = 0.0
+    for _ in range(octaves):
+        noise += amplitude * _value_noise(rows, cols, scale, rng)
+        total += amplitude
+        amplitude /= 2
+        scale /= 2
+    return noise / total
+
+
+def _ridges(rows, cols, num_ridges, width, rng):
+    """
+    Marks cells close to randomly placed straight ridges.
+
+    :param num_ridges: number of ridges
+    :param width: width of the ridges in cells
+    :return: boolean array of shape (rows, cols)
+    """
+    mask = np.zeros((rows, cols), dtype=bool)
+    for _ in range(num_ridges):
+        start = rng.random_sample(2) * (rows, cols)
+        angle = rng.random_sample() * np.pi
+        length = rng.uniform(0.2, 0.5) * min(rows, cols)
+        direction = np.array([np.sin(angle), np.cos(angle)])
+        end = start + length * direction
+
+        # only the cells in the bounding box of the ridge are checked
+        row_min, col_min = np.maximum(
+            np.floor(np.minimum(start, end) - width), 0).astype(int)
+        row_max, col_max = np.minimum(
+            np.ceil(np.maximum(start, end) + width) + 1,
+            (rows, cols)).astype(int)
+        y, x = np.mgrid[row_min:row_max, col_min:col_max]
+
+        # distance from each cell to the segment
+        t = np.clip((y - start[0]) * direction[0] +
+                    (x - start[1]) * direction[1], 0, length)
+        dist = np.hypot(y - start[0] - t * direction[0],
+                        x - start[1] - t * direction[1])
+        mask[row_min:row_max, col_min:col_max] |= dist <= width / 2.0
+    return mask
+
+
+def generate_map(rows, cols, proportions=None, land_fraction=0.6,
+                 roughness=0.5, num_ridges=2, ridge_width=None, seed=None):
+    """
+    Generates an island map surrounded by ocean.
+
+    The land is a blob in the middle of the map, with a coastline made
+    irregular by noise. Mountains are placed along straight ridges, and the
+    rest of the land is divided between the landscape types in patches.
+
+    :param rows: number of rows, at least 3
+    :param cols: number of columns, at least 3
+    :param proportions: dictionary with the share of the non-mountain land
+                        for each of 'J', 'S' and 'D'
+    :param land_fraction: share of the cells inside the ocean border that
+                          are land
+    :param roughness: 0 gives an elliptic island, larger values give more
+                      irregular coastlines, bays and small islands
+    :param num_ridges: number of mountain ridges
+    :param ridge_width: width of the ridges in cells, default depends on the
+                        size of the map
+    :param seed: seed for the random generator
+    :return: multiline string with the island's geography
+    """
+    if rows < 3 or cols < 3:
+        raise ValueError("Island map must have at least 3 rows and columns")
+    if not 0 <= land_fraction <= 1:
+        raise ValueError("Invalid value for land_fraction")
+    if roughness < 0:
+        raise ValueError("Invalid value for roughness")
+
+    if proportions is None:
+        proportions = _DEFAULT_PROPORTIONS
+    for letter, share in proportions.items():
+        if letter not in 'JSD':
+            raise ValueError("Landscape {} can not be given a proportion"
+                             .format(letter))
+        if share < 0:
+            raise ValueError("Invalid proportion for {}".format(letter))
+    total = float(sum(proportions.values()))
+    if total <= 0:
+        raise ValueError("Proportions must not all be zero")
+
+    rng = np.random.RandomState(seed)
+    size = min(rows, cols)
+
+    # height decreases from the middle, the coastline is where the height
+    # falls below a threshold chosen to give the requested land fraction
+    y = np.linspace(-1, 1, rows)[:, None]
+    x = np.linspace(-1, 1, cols)[None, :]
+    height = 1 - np.sqrt(x ** 2 + y ** 2) / np.sqrt(2)
+    height = height + roughness * (
+        _fractal_noise(rows, cols, size / 4.0, 4, rng) - 0.5)
+
+    inner = height[1:-1, 1:-1]
+    land = np.zeros((rows, cols), dtype=bool)
+    if land_fraction > 0:
+        threshold = np.percentile(inner, 100 * (1 - land_fraction))
+        land[1:-1, 1:-1] = inner >= threshold
+
+    codes = np.zeros((rows, cols), dtype=np.uint8)
+
+    # land types in patches: the noise values are split at quantiles
+    # matching the proportions
+    patches = _fractal_noise(rows, cols, max(size / 10.0, 2), 3, rng)
+    land_values = patches[land]
+    lower = 0.0
+    for letter in 'JSD':
+        share = proportions.get(letter, 0) / total
+        if share == 0:
+            continue
+        upper = lower + share
+        low, high = np.percentile(land_values, [100 * lower, 100 * upper])
+        in_patch = land & (patches >= low) & (patches <= high)
+        codes[in_patch] = LANDSCAPE_LETTERS.index(letter)
+        lower = upper
+
+    if ridge_width is None:
+        ridge_width = max(1.0, size / 50.0)
+    mountains = land & _ridges(rows, cols, num_ridges, ridge_width, rng)
+    codes[mountains] = LANDSCAPE_LETTERS.index('M')
+
+    letters = np.frombuffer(LANDSCAPE_LETTERS.encode('ascii'),
+                            dtype=np.uint8)[codes]
+    newlines = np.full((rows, 1), ord('\n'), dtype=np.uint8)
+    return np.hstack((letters, newlines)).tobytes().decode('ascii')[:-1]
+
+
+def generate_population(island_map, num_herbivores, num_carnivores=0,
+                        age=5, weight=20, seed=None):
+    """
+    Generates an initial population spread randomly over habitable cells.
+
+    :param island_map: multiline string with the island's geography
+    :param num_herbivores: number of herbivores
+    :param num_carnivores: number of carnivores
+    :param age: age of all animals
+    :param weight: weight of all animals
+    :param seed: seed for the random generator
+    :return: list of dictionaries with location and population, as taken
+             by :meth:`biosim.simulation.BioSim.add_population`
+    """
+    terrain = Island.parse_geography(island_map.split())
+    habitable = np.argwhere(terrain >= LANDSCAPE_LETTERS.index('D'))
+    if len(habitable) == 0 and num_herbivores + num_carnivores > 0:
+        raise ValueError("Animals can not live anywhere on the island")
+
+    rng = np.random.RandomState(seed)
+    population = {}
+    for species, num in (('Herbivore', num_herbivores),
+                         ('Carnivore', num_carnivores)):
+        cells, counts = np.unique(rng.randint(len(habitable), size=num),
+                                  return_counts=True)
+        for cell, count in zip(cells, counts):
+            loc = (int(habitable[cell][0]) + 1, int(habitable[cell][1]) + 1)
+            population.setdefault(loc, []).extend(
+                {'species': species, 'age': age, 'weight': weight}
+                for _ in range(count))
+
+    return [{'loc': loc, 'pop': pop}
+            for loc, pop in sorted(population.items())]
@@ -0,0 +1,746 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a mean-field island for the biosim project, simulating
+expected numbers of animals instead of individual animals.
+
+The animals of each species in each habitable cell are a histogram over
+integer age and binned weight. The rules of the annual cycle are applied to
+the bins as expected values: a bin where each animal dies with probability
+p keeps (1 - p) of its count, a bin where animals gain weight is moved to
+the bins around the new weight, and so on. The cost of a year therefore
+depends on the number of cells and bins, not on the number of animals.
+
+The approximations are:
+
+* all animals of a bin have the age and the weight of its centre, the
+  oldest age bin holds all older animals and the heaviest weight bin all
+  heavier animals;
+* carnivores and herbivores are grouped in classes of similar fitness; the
+  carnivores of a class hunt together and share what they kill equally,
+  and the herbivores of a class are killed in the same proportion;
+* the fitness of an animal does not change while it eats;
+* an animal giving birth in a cell with an expected number N of its
+  species meets N - 1 other animals, the probability of birth being
+  computed from the expected number instead of averaged over the numbers
+  the cell may have;
+* the neighbours' abundance of fodder during migration is computed once,
+  before the animals of a species move;
+* a species dies out when the expected number on the island falls below
+  ``extinction_count``.
+
+:class:`MeanFieldIsland` has the query methods of
+:class:`biosim.island_nature.Island`, and is used by
+``BioSim(..., engine='meanfield')``. :func:`compare_with_individual` runs
+both engines on the same island, e.g. from the command line::
+
+    python -m biosim.meanfield --years 50 --replicates 20
+"""
+
+import argparse
+import math
+import random
+import textwrap
+import numpy as np
+from .animals import Herbivore, Carnivore
+from .island_nature import (Island, CellStatistics, LANDSCAPE_LETTERS,
+                            NEIGHBOUR_OFFSETS, habitable_neighbours)
+from .population import SPECIES, check_columns, load_population
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_DEFAULT_MAP = textwrap.dedent("""\
+    OOOOOOOOOOOOOOOOOOOOO
+    OOOOOOOOSMMMMJJJJJJJO
+    OSSSSSJJJJMMJJJJJJJOO
+    OSSSSSSSSSMMJJJJJJOOO
+    OSSSSSJJJJJJJJJJJJOOO
+    OSSSSSJJJDDJJJSJJJOOO
+    OSSJJJJJDDDJJJSSSSOOO
+    OOSSSSJJJDDJJJSOOOOOO
+    OSSSJJJJJDDJJJJJJJOOO
+    OSSSSJJJJDDJJJJOOOOOO
+    OOSSSSJJJJJJJJOOOOOOO
+    OOOSSSSJJJJJJJOOOOOOO
+    OOOOOOOOOOOOOOOOOOOOO""")
+
+_HABITABLE = LANDSCAPE_LETTERS.index('D')
+
+# bins with smaller expected counts are emptied at the end of each year
+_MIN_COUNT = 1e-9
+
+_SPECIES_CLASSES = (Herbivore, Carnivore)
+_SPECIES_NAMES = {'herbivores': 0, 'Herbivore': 0, 'herbivore': 0,
+                  'carnivores': 1, 'Carnivore': 1, 'carnivore': 1}
+
+
+def _fitness_grid(params, ages, weights):
+    """
+    Calculates the fitness of each bin.
+
+    :param params: dictionary with the parameters of the species
+    :param ages: ages of the bins
+    :param weights: weights of the bin centres
+    :return: array of shape (len(ages), len(weights))
+    """
+    with np.errstate(over='ignore'):
+        q_age = 1. / (1 + np.exp(params['phi_age'] *
+                                 (ages - params['a_half'])))
+        q_weight = 1. / (1 + np.exp(-params['phi_weight'] *
+                                    (weights - params['w_half'])))
+    return q_age[:, None] * q_weight[None, :]
+
+
+class MeanFieldIsland(Island):
+    """
+    This class represents the island with histograms of the animals in each
+    habitable cell.
+
+    There are no cell objects; :meth:`get_cell`, :meth:`habitable_cells`
+    and the other methods of :class:`biosim.island_nature.Island` using
+    cells, or individual animals, raise ValueError.
+    """
+
+    def __init__(self, geogr, max_age=60, weight_step=2.5, max_weight=150.0,
+                 fitness_classes=100, extinction_count=0.5, fodder_params=None,
+                 fodder_schedule=None):
+        """
+        :param geogr: string with specifications about the islands geography
+        :param max_age: age of the oldest age bin, which holds all animals of
+                        that age or older
+        :type max_age: int
+        :param weight_step: width of the weight bins
+        :type weight_step: float
+        :param max_weight: weights above this are counted in the heaviest bin
+        :type max_weight: float
+        :param fitness_classes: number of classes of fitness in which
+                                carnivores and herbivores hunt and are hunted
+                                together
+        :type fitness_classes: int
+        :param extinction_count: a species dies out when the expected number
+                                 on the island is below this
+        :type extinction_count: float
+        :param fodder_params: fmax and alpha for each cell, see
+                              :class:`biosim.island_nature.Island`
+        :param fodder_schedule: fodder_params by the first year they are used
+        """
+        super(MeanFieldIsland, self).__init__(
+            geogr, fodder_params=fodder_params,
+            fodder_schedule=fodder_schedule)
+        if max_age < 1 or weight_step <= 0 or max_weight < 2 * weight_step:
+            raise ValueError("Invalid size of the bins")
+
+        self.ages = np.arange(max_age + 1, dtype=float)
+        self.weight_step = float(weight_step)
+        self.weights = (np.arange(int(math.ceil(max_weight / weight_step))) +
+                        0.5) * self.weight_step
+        self.fitness_classes = fitness_classes
+        self.extinction_count = extinction_count
+
+        # index of each neighbour of each habitable cell, -1 if animals can
+        # not live there
+        self.locations, self._neighbours = habitable_neighbours(self.terrain)
+
+        self._fodder_cells = tuple(self.locations.T)
+        self.fodder = self.fodder_grids.initial_fodder(self._fodder_cells)
+
+        # expected number of animals of each species in each cell, age bin
+        # and weight bin
+        shape = (len(self.locations), len(self.ages), len(self.weights))
+        self.counts = [np.zeros(shape), np.zeros(shape)]
+
+    @staticmethod
+    def _no_cells(*args, **kwargs):
+        """ Raises ValueError, the island has no cell objects. """
+        raise ValueError("The mean-field island has no cells")
+
+    def get_cell(self, row, col):
+        self._no_cells()
+
+    def habitable_cells(self):
+        self._no_cells()
+
+    def randomize_cell_structure(self):
+        self._no_cells()
+
+    def get_neighbours(self, loc_neighbours):
+        self._no_cells()
+
+    def enable_events(self, num_tracked=0, history_file=None, seed=None):
+        """
+        Raises ValueError, events are counted by the cells. Use
+        :meth:`enable_instrumentation` for the numbers of each year.
+        """
+        self._no_cells()
+
+    def animal_columns(self):
+        """
+        Raises ValueError, the animals are histograms, see
+        :meth:`distribution`.
+        """
+        raise ValueError("The mean-field island has no individual animals")
+
+    def start_year(self):
+        pass
+
+    def food_growth_in_all_cells(self):
+        """ Lets the fodder grow in every habitable cell. """
+        self.fodder_grids.grow(self.fodder, self._fodder_cells)
+
+    def _species_index(self, species):
+        """ Returns 0 for herbivores and 1 for carnivores. """
+        try:
+            return _SPECIES_NAMES[species]
+        except KeyError:
+            raise ValueError("Given species does not exist")
+
+    def _fitness(self, species):
+        """ Returns the fitness of each bin for given species index. """
+        return _fitness_grid(_SPECIES_CLASSES[species].params, self.ages,
+                             self.weights)
+
+    def _weight_positions(self, new_weights):
+        """
+        Finds the two bins around each weight.
+
+        :param new_weights: array of weights
+        :return: arrays with the lower bin and the share of the count going
+                 to the bin above it
+        """
+        num_bins = len(self.weights)
+        pos = np.clip(new_weights / self.weight_step - 0.5, 0, num_bins - 1)
+        low = np.minimum(np.floor(pos).astype(np.int64), num_bins - 2)
+        return low, pos - low
+
+    def _rebin(self, counts, new_weights):
+        """
+        Moves the count of each weight bin to a new weight, split between the
+        bins on each side so the mean weight is kept.
+
+        :param counts: array with weight bins along the last axis
+        :param new_weights: new weight for each count, broadcast to counts
+        :return: array of the same shape as counts
+        """
+        num_bins = len(self.weights)
+        low, frac = self._weight_positions(
+            np.broadcast_to(new_weights, counts.shape))
+        first = (np.arange(counts.size) // num_bins) * num_bins
+        index = (first + low.ravel())
+        moved = np.bincount(index, (counts * (1 - frac)).ravel(),
+                            minlength=counts.size)
+        moved += np.bincount(index + 1, (counts * frac).ravel(),
+                             minlength=counts.size)
+        return moved.reshape(counts.shape)
+
+    def _shift_matrix(self, new_weights):
+        """
+        Returns the matrix moving each weight bin to a new weight, applied
+        as counts.dot(matrix).
+        """
+        return self._rebin(np.eye(len(self.weights)), new_weights)
+
+    def place_animals(self, population):
+        """
+        Places populations of animals in the correct location on the island.
+
+        :param population: dictionary with location and corresponding population
+        """
+        loc, species, age, weight = [], [], [], []
+        for pop in population:
+            for animal in pop['pop']:
+                loc.append(pop['loc'])
+                species.append(animal['species'])
+                age.append(animal['age'])
+                weight.append(animal['weight'])
+        if loc:
+            self.place_animal_columns(loc, species, age, weight)
+
+    def place_animal_columns(self, loc, species, age, weight):
+        """
+        Places a population given as columns in the histograms.
+
+        :param loc: array of shape (n, 2) with locations counted from 1
+        :param species: species codes or names
+        :param age: ages
+        :param weight: weights
+        """
+        rows, cols, codes, ages, weights = check_columns(
+            loc, species, age, weight, self.terrain >= _HABITABLE)
+        cells = np.zeros(self.terrain.shape, dtype=np.int64)
+        cells[tuple(self.locations.T)] = np.arange(len(self.locations))
+        cells = cells[rows, cols]
+        ages = np.minimum(ages, len(self.ages) - 1)
+
+        for code in range(len(SPECIES)):
+            chosen = codes == code
+            animals = np.zeros_like(self.counts[code])
+            low, frac = self._weight_positions(weights[chosen])
+            for target, share in ((low, 1 - frac), (low + 1, frac)):
+                np.add.at(animals, (cells[chosen], ages[chosen], target),
+                          share)
+            self.counts[code] += animals
+
+    def place_animals_from_file(self, filename):
+        """
+        Places a population from a NPZ or CSV file with columns, see
+        :func:`biosim.population.load_population`.
+
+        :param filename: name of the file
+        """
+        columns = load_population(filename)
+        self.place_animal_columns(columns['loc'], columns['species'],
+                                  columns['age'], columns['weight'])
+
+    def all_herb_eating(self):
+        """
+        Herbivores eat in order of fitness, each eating F or what is left.
+        """
+        params = Herbivore.params
+        herb = self.counts[0]
+        flat = herb.reshape(len(herb), -1)
+        order = np.argsort(-self._fitness(0).ravel(), kind='stable')
+
+        in_order = flat[:, order]
+        before = np.cumsum(in_order, axis=1) - in_order
+        fed = np.empty_like(flat)
+        fed[:, order] = np.clip(self.fodder[:, None] / params['F'] - before,
+                                0, in_order)
+        self.fodder = np.maximum(self.fodder - fed.sum(axis=1) * params['F'],
+                                 0)
+
+        fed = fed.reshape(herb.shape)
+        gain = self._shift_matrix(self.weights + params['beta'] * params['F'])
+        self.counts[0] = herb - fed + fed.dot(gain)
+
+    def _fitness_classes(self, counts, fitness):
+        """
+        Adds the bins of each cell to classes of similar fitness.
+
+        :param counts: array of shape (cells, bins)
+        :param fitness: fitness of each bin
+        :return: class of each bin, and arrays of shape (cells, classes) with
+                 the count, mean fitness and mean weight of each class
+        """
+        num_classes = self.fitness_classes
+        classes = np.minimum((fitness * num_classes).astype(np.int64),
+                             num_classes - 1)
+        weights = np.tile(self.weights, len(self.ages))
+
+        index = (np.arange(len(counts))[:, None] * num_classes +
+                 classes[None, :]).ravel()
+        size = len(counts) * num_classes
+        total = np.bincount(index, counts.ravel(), size)
+        mean_fitness = np.bincount(index, (counts * fitness).ravel(), size)
+        mean_weight = np.bincount(index, (counts * weights).ravel(), size)
+        used = total > 0
+        mean_fitness[used] /= total[used]
+        mean_weight[used] /= total[used]
+        shape = (len(counts), num_classes)
+        return (classes, total.reshape(shape), mean_fitness.reshape(shape),
+                mean_weight.reshape(shape))
+
+    def all_carn_eating(self):
+        """
+        Carnivores hunt in order of fitness, trying the herbivores in order
+        of increasing fitness until they have eaten F.
+
+        Carnivores and herbivores of similar fitness are handled together,
+        in classes of fitness, in all cells at once.
+        """
+        params = Carnivore.params
+        herb = self.counts[0].reshape(len(self.locations), -1)
+        carn = self.counts[1].reshape(len(self.locations), -1)
+        herb_classes, prey, prey_fitness, prey_weight = \
+            self._fitness_classes(herb, self._fitness(0).ravel())
+        carn_classes, hunters, hunter_fitness, _ = \
+            self._fitness_classes(carn, self._fitness(1).ravel())
+
+        alive = prey.copy()
+        eaten = np.zeros_like(hunters)
+        for num in reversed(range(self.fitness_classes)):
+            cells = np.flatnonzero(hunters[:, num] > 0)
+            if len(cells) == 0:
+                continue
+
+            # herbivores with lower fitness than the carnivores, in order of
+            # increasing fitness
+            diff = hunter_fitness[cells, num, None] - prey_fitness[cells]
+            prob_kill = np.where(diff > 0,
+                                 np.minimum(diff / params['DeltaPhiMax'], 1),
+                                 0)
+            food = alive[cells] * prob_kill * prey_weight[cells]
+            before = np.cumsum(food, axis=1) - food
+            hunger = hunters[cells, num, None] * params['F']
+
+            # the carnivores are full within one class of herbivores, which
+            # is killed in part
+            share = np.clip(np.divide(hunger - before, food,
+                                      out=np.zeros_like(food),
+                                      where=food > 0), 0, 1)
+            alive[cells] -= alive[cells] * prob_kill * share
+            eaten[cells, num] = (food * share).sum(axis=1)
+
+        survival = np.divide(alive, prey, out=np.ones_like(prey),
+                             where=prey > 0)
+        self.counts[0] = (herb * np.maximum(survival[:, herb_classes], 0)
+                          ).reshape(self.counts[0].shape)
+
+        gain = params['beta'] * np.divide(eaten, hunters,
+                                          out=np.zeros_like(eaten),
+                                          where=hunters > 0)
+        num_weights = len(self.weights)
+        self.counts[1] = self._rebin(
+            carn.reshape(-1, num_weights),
+            self.weights + gain[:, carn_classes].reshape(-1, num_weights)
+        ).reshape(self.counts[1].shape)
+
+    def animals_give_birth(self):
+        """
+        Animals heavy enough give birth with probability gamma * fitness *
+        (N - 1), see the module documentation, and newborns are added to the
+        youngest age bin.
+
+        As for the individual animals, a newborn is not born if its weight
+        is not above zero, not below the weight of the mother, or if the
+        mother would lose more than her weight, so the newborns of each
+        weight bin of mothers follow the normal distribution cut at zero
+        and at that limit. The mothers lose xi times the mean weight of
+        their newborns.
+        """
+        edges = np.arange(len(self.weights) + 1) * self.weight_step
+        edges[-1] = np.inf
+        for species, cls in enumerate(_SPECIES_CLASSES):
+            params = cls.params
+            mean, std = params['w_birth'], params['sigma_birth']
+            counts = self.counts[species]
+            others = np.maximum(counts.sum(axis=(1, 2)) - 1, 0)
+            heavy = self.weights >= params['zeta'] * (mean + std)
+            prob = (params['gamma'] * self._fitness(species) * heavy)[None] * \
+                others[:, None, None]
+            attempts = counts * np.minimum(prob, 1)
+
+            # newborn weights of each weight bin of mothers, between zero
+            # and the largest weight giving birth
+            limit = self.weights * min(1., 1. / params['xi'])
+            cdf = np.array([[_normal_cdf(edge, mean, std)
+                             for edge in np.clip(edges, 0, top)]
+                            for top in limit])
+            newborns = np.diff(cdf, axis=1)
+            born = newborns.sum(axis=1)
+            newborn_mean = np.array([_truncated_normal_mean(mean, std, top)
+                                     for top in limit])
+
+            births = attempts * born
+            mothers = self._shift_matrix(self.weights -
+                                         params['xi'] * newborn_mean)
+            counts = counts - births + births.dot(mothers)
+            counts[:, 0, :] += attempts.sum(axis=1).dot(newborns)
+            self.counts[species] = counts
+
+    def _migrate(self, species, fodder):
+        """
+        Moves animals of a species to the neighbouring cells.
+
+        :param species: 0 for herbivores, 1 for carnivores
+        :param fodder: fodder in each cell for the species
+        :return: expected number of animals moving
+        """
+        params = _SPECIES_CLASSES[species].params
+        counts = self.counts[species]
+        num_animals = counts.sum(axis=(1, 2))
+
+        abundance = fodder / ((num_animals + 1) * params['F'])
+        exists = self._neighbours >= 0
+        propensity = np.where(exists, np.exp(
+            params['lambda'] * abundance[self._neighbours]), 0)
+        total = propensity.sum(axis=1)
+        prob_move = np.divide(propensity, total[:, None],
+                              out=np.zeros_like(propensity),
+                              where=total[:, None] > 0)
+
+        movers = counts * np.minimum(params['mu'] * self._fitness(species),
+                                     1)[None]
+        moved = counts - movers * (total > 0)[:, None, None]
+        for direction in range(len(NEIGHBOUR_OFFSETS)):
+            source = np.flatnonzero(exists[:, direction])
+            target = self._neighbours[source, direction]
+            # each cell is the neighbour in a direction of at most one cell
+            moved[target] += (movers[source] *
+                              prob_move[source, direction, None, None])
+        self.counts[species] = moved
+        return float((movers * (total > 0)[:, None, None]).sum())
+
+    def animals_migrate(self):
+        """ Herbivores migrate first, then carnivores. """
+        num_herb = self._migrate(0, self.fodder)
+        herb_weight = self.counts[0].sum(axis=1).dot(self.weights)
+        num_carn = self._migrate(1, herb_weight)
+        if self.instrumentation is not None:
+            self.instrumentation.count_migrations(num_herb, num_carn)
+
+    def all_animals_aging(self):
+        """ All animals get one year older. """
+        for species, counts in enumerate(self.counts):
+            older = np.zeros_like(counts)
+            older[:, 1:] = counts[:, :-1]
+            older[:, -1] += counts[:, -1]
+            self.counts[species] = older
+
+    def all_animals_lose_weight(self):
+        """ All animals lose a share eta of their weight. """
+        for species, cls in enumerate(_SPECIES_CLASSES):
+            self.counts[species] = self.counts[species].dot(
+                self._shift_matrix(self.weights * (1 - cls.params['eta'])))
+
+    def animals_die(self):
+        """
+        Animals die with probability omega * (1 - fitness). Tiny counts are
+        removed, and species with less than extinction_count animals die
+        out.
+        """
+        for species, cls in enumerate(_SPECIES_CLASSES):
+            survive = 1 - cls.params['omega'] * (1 - self._fitness(species))
+            counts = self.counts[species] * survive[None]
+            counts[counts < _MIN_COUNT] = 0
+            if counts.sum() < self.extinction_count:
+                counts[:] = 0
+            self.counts[species] = counts
+
+    def number_of_animals(self):
+        """
+        Counts number of herbivores and carnivores on the island.
+
+        :return: expected number of herbivores and carnivores on the island
+        """
+        return float(self.counts[0].sum()), float(self.counts[1].sum())
+
+    def _counts_in_cells(self, species):
+        """ Returns array with expected number of animals in each cell. """
+        counts = np.zeros(self.terrain.shape)
+        counts[tuple(self.locations.T)] = self.counts[species].sum(
+            axis=(1, 2))
+        return counts
+
+    def num_herb_in_cells(self):
+        """Returns array with number of herbivores in each cell. """
+        return self._counts_in_cells(0)
+
+    def num_carn_in_cells(self):
+        """Returns array with number of carnivores in each cell. """
+        return self._counts_in_cells(1)
+
+    def cell_statistics(self):
+        """
+        Calculates the expected number of animals in each cell and their
+        mean age, weight and fitness, weighting each bin by its count.
+
+        :return: dictionary with
+                 :class:`biosim.island_nature.CellStatistics` for
+                 'herbivores' and 'carnivores'
+        """
+        statistics = {}
+        for code, species in enumerate(('herbivores', 'carnivores')):
+            counts = self.counts[code]
+            count = counts.sum(axis=(1, 2))
+            with np.errstate(invalid='ignore'):
+                means = [counts.sum(axis=2).dot(self.ages) / count,
+                         counts.sum(axis=1).dot(self.weights) / count,
+                         (counts * self._fitness(code)).sum(axis=(1, 2)) /
+                         count]
+            grids = [np.zeros(self.terrain.shape)]
+            grids[0][tuple(self.locations.T)] = count
+            for values in means:
+                grids.append(np.full(self.terrain.shape, np.nan))
+                grids[-1][tuple(self.locations.T)] = values
+            statistics[species] = CellStatistics(*grids)
+        return statistics
+
+    def distribution(self, species):
+        """
+        Returns the histogram of a species over the whole island.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: array of shape (len(ages), len(weights)) with the expected
+                 number of animals in each bin
+        """
+        return self.counts[self._species_index(species)].sum(axis=0)
+
+    def animal_properties(self, species):
+        """
+        Collects age, weight and fitness of each bin of given species.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with arrays of age, weight and fitness of the
+                 bins with animals, and their expected number as 'count'
+        """
+        code = self._species_index(species)
+        counts = self.distribution(species)
+        used = counts > 0
+        ages, weights = np.meshgrid(self.ages, self.weights, indexing='ij')
+        return {'age': ages[used], 'weight': weights[used],
+                'fitness': self._fitness(code)[used], 'count': counts[used]}
+
+    def property_summary(self, species):
+        """
+        Calculates statistics for age, weight and fitness of given species,
+        weighting each bin by its count.
+
+        :param species: 'herbivores' or 'carnivores'
+        :return: dictionary with mean, std, min and max for each property,
+                 None for each property if there are no animals
+        """
+        properties = self.animal_properties(species)
+        counts = properties.pop('count')
+        summary = {}
+        for name, values in properties.items():
+            if len(values) == 0:
+                summary[name] = None
+                continue
+            mean = np.average(values, weights=counts)
+            summary[name] = {
+                'mean': mean,
+                'std': np.sqrt(np.average((values - mean) ** 2,
+                                          weights=counts)),
+                'min': values.min(), 'max': values.max()}
+        return summary
+
+
+def _normal_cdf(x, mean, std):
+    """ Returns the normal cumulative distribution function at x. """
+    if std == 0:
+        return float(x >= mean)
+    return 0.5 * (1 + math.erf((x - mean) / (std * math.sqrt(2))))
+
+
+def _truncated_normal_mean(mean, std, upper):
+    """
+    Returns the mean of the normal distribution cut to values between zero
+    and upper, zero if no values are between them.
+    """
+    if std == 0:
+        return float(mean) if 0 < mean < upper else 0.
+    probability = _normal_cdf(upper, mean, std) - _normal_cdf(0, mean, std)
+    if probability <= 0:
+        return 0.
+    density = [math.exp(-0.5 * ((x - mean) / std) ** 2) /
+               (std * math.sqrt(2 * math.pi)) for x in (0., upper)]
+    return mean + std ** 2 * (density[0] - density[1]) / probability
+
+
+def compare_with_individual(island_map, ini_pop, num_years, num_replicates=10,
+                            seed=1, **options):
+    """
+    Simulates an island with the individual-based and the mean-field engine.
+
+    The individual-based engine is run num_replicates times with different
+    seeds, the mean-field engine once.
+
+    :param island_map: multiline string with the island's geography
+    :param ini_pop: initial population, as taken by place_animals
+    :param num_years: number of years simulated
+    :param num_replicates: number of runs of the individual-based engine
+    :param seed: seed of the first run, the following runs use seed + 1 and
+                 so on
+    :param options: keyword arguments for :class:`MeanFieldIsland`
+    :return: dictionary with arrays 'individual_herb' and 'individual_carn'
+             of shape (num_replicates, num_years + 1), and 'meanfield_herb'
+             and 'meanfield_carn' of length num_years + 1
+    """
+    result = {'individual_herb': np.zeros((num_replicates, num_years + 1)),
+              'individual_carn': np.zeros((num_replicates, num_years + 1)),
+              'meanfield_herb': np.zeros(num_years + 1),
+              'meanfield_carn': np.zeros(num_years + 1)}
+
+    for replicate in range(num_replicates):
+        random.seed(seed + replicate)
+        island = Island(island_map)
+        island.place_animals(ini_pop)
+        for year in range(num_years + 1):
+            if year > 0:
+                island.annual_cycle()
+            (result['individual_herb'][replicate, year],
+             result['individual_carn'][replicate, year]) = \
+                island.number_of_animals()
+
+    island = MeanFieldIsland(island_map, **options)
+    island.place_animals(ini_pop)
+    for year in range(num_years + 1):
+        if year > 0:
+            island.annual_cycle()
+        (result['meanfield_herb'][year],
+         result['meanfield_carn'][year]) = island.number_of_animals()
+
+    return result
+
+
+def format_comparison(result, step=1):
+    """
+    Describes the counts of both engines in a table.
+
+    The z column is the distance of the mean-field count from the mean of
+    the individual-based runs, in standard errors of that mean.
+
+    :param result: dictionary from :func:`compare_with_individual`
+    :param step: years between the lines of the table
+    :return: multiline string
+    """
+    replicates = len(result['individual_herb'])
+    lines = ['{:>5}  {:>21} {:>9} {:>6}  {:>21} {:>9} {:>6}'.format(
+        'Year', 'herbivores (mean+-sd)', 'mean-fld', 'z',
+        'carnivores (mean+-sd)', 'mean-fld', 'z')]
+    for year in range(0, len(result['meanfield_herb']), step):
+        columns = []
+        for species in ('herb', 'carn'):
+            counts = result['individual_' + species][:, year]
+            meanfield = result['meanfield_' + species][year]
+            error = counts.std() / math.sqrt(max(replicates, 1))
+            z = (meanfield - counts.mean()) / error if error > 0 else 0.
+            columns.append('{:>10.1f} +- {:>7.1f} {:>9.1f} {:>6.1f}'.format(
+                counts.mean(), counts.std(), meanfield, z))
+        lines.append('{:>5}  {}  {}'.format(year, *columns))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Compares the engines from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    from .map_generator import generate_population
+
+    parser = argparse.ArgumentParser(
+        description='Compare the mean-field engine with the individual-based '
+                    'engine.')
+    parser.add_argument('--map', default=None,
+                        help='file with the island map (default: the '
+                             'check_sim island)')
+    parser.add_argument('--herbivores', type=int, default=150)
+    parser.add_argument('--carnivores', type=int, default=0)
+    parser.add_argument('--years', type=int, default=50)
+    parser.add_argument('--replicates', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--step', type=int, default=5,
+                        help='years between the lines of the table')
+    parser.add_argument('--weight-step', type=float, default=2.5)
+    parser.add_argument('--max-age', type=int, default=60)
+    args = parser.parse_args(argv)
+
+    if args.map is not None:
+        with open(args.map) as f:
+            island_map = f.read()
+    else:
+        island_map = _DEFAULT_MAP
+
+    ini_pop = generate_population(island_map, args.herbivores,
+                                  args.carnivores, seed=args.seed)
+    result = compare_with_individual(island_map, ini_pop, args.years,
+                                     args.replicates, args.seed,
+                                     max_age=args.max_age,
+                                     weight_step=args.weight_step)
+    print(format_comparison(result, args.step))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides measurements of the memory used by a simulation, and a
+guard stopping a simulation before it uses more memory than a budget, for
+the biosim project.
+
+Two measures are used: the resident set size (RSS) of the process, which is
+what the operating system kills a process for, and the allocations traced by
+:mod:`tracemalloc`, which can be assigned to each phase of the annual cycle
+but slow the simulation down several times. The benchmark
+``benchmarks/bench_memory.py`` uses both per animal and per cell.
+
+:class:`MemoryGuard` is cheap enough to be used in every run, e.g.::
+
+    sim.set_memory_budget(8 * 2 ** 30, dump_file='state.npz')
+    sim.simulate(5000, vis_steps=None)
+
+After each year it reads the RSS, estimates the growth per year from the
+last years, and if the RSS projected for the next year is above the budget,
+the state of the island is saved with :func:`dump_state` and
+:class:`MemoryBudgetExceeded` is raised before the year is simulated.
+"""
+
+import os
+import sys
+import tracemalloc
+from collections import namedtuple
+import numpy as np
+from .meanfield import MeanFieldIsland
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+MemoryRecord = namedtuple('MemoryRecord',
+                          ['year', 'rss', 'num_animals', 'growth',
+                           'projected'])
+MemoryRecord.__doc__ = """
+Memory used after a simulated year.
+
+rss is the resident set size of the process in bytes and num_animals the
+number of animals on the island. growth is the estimated growth of the RSS
+per year in bytes, from the last years, never negative, and projected is the
+RSS expected after the next year.
+"""
+
+PhaseMemory = namedtuple('PhaseMemory', ['allocated', 'peak', 'rss'])
+PhaseMemory.__doc__ = """
+Memory used by a phase of the annual cycle.
+
+allocated is the change of the memory traced by tracemalloc over the phase,
+negative if memory was freed, and peak the highest traced memory during the
+phase above the memory traced when it started, in bytes. rss is the change
+of the resident set size of the process, which is coarser since the
+allocators keep freed memory.
+"""
+
+
+def current_rss():
+    """
+    Returns the resident set size of the process.
+
+    It is read from /proc where available, else the peak resident set size
+    from :mod:`resource` is used, which never decreases.
+
+    :return: number of bytes
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def phase_memory(island):
+    """
+    Simulates one year on the island, measuring the memory used by each
+    phase of the annual cycle.
+
+    Allocations are traced by tracemalloc, which is started for the year if
+    it is not already tracing. The year is simulated by
+    :meth:`biosim.island_nature.Island.annual_cycle`, so instrumentation
+    and events are recorded as in any other year.
+
+    :param island: class instance of the island
+    :return: dictionary with :class:`PhaseMemory` for the phase names of
+             :attr:`biosim.island_nature.Island.annual_phases`
+    """
+    phases = {}
+
+    def measure(phase, method):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        rss = current_rss()
+        method()
+        traced, peak = tracemalloc.get_traced_memory()
+        phases[phase] = PhaseMemory(traced - before, peak - before,
+                                    current_rss() - rss)
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        island.annual_cycle(measure)
+        return phases
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def dump_state(filename, island, record=None):
+    """
+    Saves the state of the island to an NPZ file.
+
+    The number of herbivores and carnivores in each cell is saved as
+    ``num_herb`` and ``num_carn``. For an island simulating each animal the
+    animals are saved as the columns ``loc``, ``species``, ``age`` and
+    ``weight``, so the file can be loaded with
+    :func:`biosim.population.load_population`. For the mean-field island the
+    histograms are saved as ``herb_counts`` and ``carn_counts``. The fields
+    of the record are saved as well.
+
+    :param filename: name of the file, ending with .npz
+    :param island: class instance of the island
+    :param record: :class:`MemoryRecord` saved with the state, or None
+    """
+    arrays = {'year': island.year, 'num_herb': island.num_herb_in_cells(),
+              'num_carn': island.num_carn_in_cells()}
+    if isinstance(island, MeanFieldIsland):
+        arrays.update(herb_counts=island.counts[0],
+                      carn_counts=island.counts[1])
+    else:
+        loc, species, age, weight = island.animal_columns()
+        arrays.update(loc=loc, species=species, age=age, weight=weight)
+    if record is not None:
+        arrays.update(('memory_' + name, value)
+                      for name, value in record._asdict().items())
+    np.savez_compressed(filename, **arrays)
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """
+    Raised when a simulation would use more memory than its budget.
+    """
+
+    def __init__(self, record, budget, dump_file=None):
+        """
+        :param record: :class:`MemoryRecord` of the last year simulated
+        :param budget: budget in bytes
+        :param dump_file: name of the file with the state of the island,
+                          None if it was not saved
+        """
+        message = ("Memory projected for year {} is {:.1f} MB, above the "
+                   "budget of {:.1f} MB (now {:.1f} MB, growing {:.1f} MB "
+                   "per year)".format(record.year + 1,
+                                      record.projected / 2 ** 20,
+                                      budget / 2 ** 20, record.rss / 2 ** 20,
+                                      record.growth / 2 ** 20))
+        if dump_file is not None:
+            message += "; state saved to {}".format(dump_file)
+        super(MemoryBudgetExceeded, self).__init__(message)
+        self.record = record
+        self.budget = budget
+        self.dump_file = dump_file
+
+
+class MemoryGuard(object):
+    """
+    This class represents a budget for the resident set size of a
+    simulation, and the memory used in each year checked.
+    """
+
+    def __init__(self, budget, dump_file=None, window=5):
+        """
+        :param budget: largest resident set size allowed, in bytes
+        :type budget: int
+        :param dump_file: name of the NPZ file the state of the island is
+                          saved to before stopping, nothing is saved if None
+        :type dump_file: str
+        :param window: number of years the growth is estimated from
+        :type window: int
+        """
+        if budget <= 0:
+            raise ValueError("The memory budget must be positive")
+        if window < 2:
+            raise ValueError("The growth needs a window of at least 2 years")
+        self.budget = budget
+        self.dump_file = dump_file
+        self.window = window
+        self.records = []
+
+    def check(self, year, num_animals):
+        """
+        Records the memory used after a year, and projects the next year.
+
+        :param year: number of the year simulated
+        :param num_animals: number of animals on the island
+        :return: :class:`MemoryRecord` of the year
+        """
+        rss = current_rss()
+        recent = self.records[1 - self.window:]
+        years = np.array([record.year for record in recent] + [year], float)
+        sizes = np.array([record.rss for record in recent] + [rss], float)
+        growth = 0.0
+        if len(years) > 1:
+            growth = max(np.polyfit(years, sizes, 1)[0], 0.0)
+        record = MemoryRecord(year, rss, num_animals, growth, rss + growth)
+        self.records.append(record)
+        return record
+
+    def exceeded(self, record):
+        """ Returns True if the next year is projected above the budget. """
+        return record.projected > self.budget
+
+    def projected(self, num_years):
+        """
+        Returns the resident set size projected after more years at the
+        current growth.
+
+        :param num_years: number of years after the last year checked
+        :return: number of bytes, None if no year is checked
+        """
+        if not self.records:
+            return None
+        last = self.records[-1]
+        return last.rss + last.growth * num_years
+
+    def years_left(self):
+        """
+        Returns the number of years until the budget is projected to be
+        exceeded, None if the memory is not growing.
+        """
+        if not self.records or self.records[-1].growth <= 0:
+            return None
+        last = self.records[-1]
+        return max(int((self.budget - last.rss) // last.growth), 0)
+
+    def abort(self, island, record):
+        """
+        Saves the state of the island, if a file is given, and raises
+        :class:`MemoryBudgetExceeded`.
+
+        :param island: class instance of the island
+        :param record: :class:`MemoryRecord` of the last year simulated
+        """
+        if self.dump_file is not None:
+            dump_state(self.dump_file, island, record)
+        raise MemoryBudgetExceeded(record, self.budget, self.dump_file)
@@ -0,0 +1,189 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a class streaming frames to a movie for the biosim
+project.
+
+Frames are piped as raw pixel buffers to an ``ffmpeg`` process which stays
+open during the simulation, so no intermediate image files are written.
+
+.. note::
+   This module requires the program ``ffmpeg`` available from
+   `<http://ffmpeg.org>`.
+"""
+
+import os
+import subprocess
+import numpy as np
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class MovieWriter(object):
+    """
+    This class represents a movie file that frames are streamed into.
+
+    The ffmpeg process is started when the first frame arrives, since the
+    frame size is needed to interpret the raw pixel stream.
+    """
+
+    def __init__(self, filename, fps=25, ffmpeg_binary='ffmpeg'):
+        """
+        :param filename: name of the movie file, including format suffix
+        :type filename: str
+        :param fps: frames per second in the movie
+        :type fps: int
+        :param ffmpeg_binary: command required to invoke ffmpeg
+        :type ffmpeg_binary: str
+        """
+        self.filename = filename
+        self._fps = fps
+        self._ffmpeg_binary = ffmpeg_binary
+        self._proc = None
+        self._frame_shape = None
+        self.num_frames = 0
+
+    def _start(self, height, width):
+        """
+        Starts ffmpeg reading raw RGBA frames of given size from its stdin.
+
+        :param height: height of the frames in pixels
+        :param width: width of the frames in pixels
+        """
+        # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
+        # section "Compatibility". The padding makes the frame size even, as
+        # required by yuv420p.
+        cmd = [self._ffmpeg_binary,
+               '-loglevel', 'error',
+               '-f', 'rawvideo',
+               '-pix_fmt', 'rgba',
+               '-s', '{}x{}'.format(width, height),
+               '-framerate', str(self._fps),
+               '-i', '-',
+               '-y',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        if self.filename.endswith('.mp4'):
+            cmd += ['-profile:v', 'baseline',
+                    '-level', '3.0',
+                    '-pix_fmt', 'yuv420p']
+        cmd.append(self.filename)
+
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write_frame(self, frame):
+        """
+        Writes one frame to the movie.
+
+        :param frame: RGBA pixel buffer with shape (height, width, 4)
+        :type frame: numpy.ndarray of uint8
+        """
+        if frame.shape[2] != 4:
+            raise ValueError("Frame must have four color channels (RGBA)")
+
+        if self._proc is None:
+            self._frame_shape = frame.shape
+            self._start(frame.shape[0], frame.shape[1])
+        elif frame.shape != self._frame_shape:
+            raise ValueError("All frames in a movie must have the same size")
+
+        # writes the buffer itself, without making a bytes copy of the frame
+        self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Finishes the movie and waits for ffmpeg to complete the file.
+
+        Raises RuntimeError if ffmpeg fails.
+        """
+        if self._proc is None:
+            return
+
+        self._proc.stdin.close()
+        returncode = self._proc.wait()
+        self._proc = None
+        if returncode != 0:
+            raise RuntimeError("ffmpeg failed with exit status {}"
+                               .format(returncode))
+
+
+def concat_movies(segments, filename, ffmpeg_binary='ffmpeg'):
+    """
+    Joins movie segments into one movie without re-encoding.
+
+    All segments must be encoded with the same codec and frame size.
+
+    :param segments: list of names of the movie files to join, in order
+    :param filename: name of the joined movie file
+    :param ffmpeg_binary: command required to invoke ffmpeg
+    """
+    # paths in the list file are relative to the list file itself
+    list_file = filename + '.segments.txt'
+    with open(list_file, 'w') as f:
+        for segment in segments:
+            f.write("file '{}'\n".format(
+                os.path.abspath(segment).replace("'", "'\\''")))
+
+    try:
+        subprocess.check_call([ffmpeg_binary, '-loglevel', 'error',
+                               '-f', 'concat', '-safe', '0',
+                               '-i', list_file,
+                               '-c', 'copy', '-y', filename])
+    finally:
+        os.remove(list_file)
+
+
+def encode_segments(img_pattern, num_images, filename, num_segments,
+                    ffmpeg_binary='ffmpeg'):
+    """
+    Encodes numbered images to a movie, with segments encoded concurrently.
+
+    The images are split into consecutive segments that are encoded by
+    separate ffmpeg processes at the same time. The segments are then joined
+    without re-encoding.
+
+    Raises subprocess.CalledProcessError if ffmpeg fails.
+
+    :param img_pattern: ffmpeg pattern for the image file names, e.g.
+                        'dv_%05d.png'
+    :param num_images: number of images, numbered from zero
+    :param filename: name of the movie file, including format suffix
+    :param num_segments: number of segments encoded concurrently
+    :param ffmpeg_binary: command required to invoke ffmpeg
+    """
+    root, ext = os.path.splitext(filename)
+    bounds = np.linspace(0, num_images, num_segments + 1).astype(int)
+
+    segments = []
+    processes = []
+    for num, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if start == stop:
+            continue
+
+        segment = '{}_segment{:03d}{}'.format(root, num, ext)
+        cmd = [ffmpeg_binary, '-loglevel', 'error',
+               '-start_number', str(start),
+               '-i', img_pattern,
+               '-frames:v', str(stop - start),
+               '-y']
+        if ext == '.mp4':
+            cmd += ['-profile:v', 'baseline',
+                    '-level', '3.0',
+                    '-pix_fmt', 'yuv420p']
+        cmd.append(segment)
+
+        segments.append(segment)
+        processes.append((subprocess.Popen(cmd), cmd))
+
+    try:
+        for proc, cmd in processes:
+            if proc.wait() != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd)
+        concat_movies(segments, filename, ffmpeg_binary=ffmpeg_binary)
+    finally:
+        for proc, _ in processes:
+            proc.wait()
+        for segment in segments:
+            if os.path.exists(segment):
+                os.remove(segment)
@@ -0,0 +1,215 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides functions handling populations stored as columns for
+the biosim project.
+
+A population in columns is four arrays of the same length: the location of
+each animal as (row, column) counted from 1, as in the ``'loc'`` of
+populations given as dictionaries, the species code, the age and the weight.
+Species codes are indices into :data:`SPECIES`.
+
+Populations in columns can be saved to and loaded from NPZ files with the
+arrays ``loc``, ``species``, ``age`` and ``weight``, or CSV files with a
+header line and the columns ``row``, ``col``, ``species``, ``age`` and
+``weight``. In CSV files the species can be given by name or code.
+"""
+
+import gc
+import numpy as np
+from .animals import Herbivore, Carnivore
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+SPECIES = ('Herbivore', 'Carnivore')
+_SPECIES_CLASSES = (Herbivore, Carnivore)
+_CSV_COLUMNS = ('row', 'col', 'species', 'age', 'weight')
+
+
+def species_codes(species):
+    """
+    Converts species names or codes to an array of codes.
+
+    :param species: sequence of codes, or names as in the population
+                    dictionaries, e.g. 'Herbivore' or 'herbivore'
+    :return: int array of codes
+    """
+    species = np.asarray(species)
+    if species.size == 0:
+        # an empty list is float, but has no invalid species
+        return np.zeros(species.shape, dtype=np.int64)
+    if species.dtype.kind in 'iu':
+        codes = species.astype(np.int64)
+    elif species.dtype.kind in 'US':
+        names, inverse = np.unique(species.astype(str), return_inverse=True)
+        lookup = []
+        for name in names:
+            if name.capitalize() not in SPECIES:
+                raise ValueError("invalid species {}".format(name))
+            lookup.append(SPECIES.index(name.capitalize()))
+        codes = np.array(lookup, dtype=np.int64)[inverse.reshape(-1)]
+    else:
+        raise ValueError("Species must be given by name or code")
+
+    if ((codes < 0) | (codes >= len(SPECIES))).any():
+        raise ValueError("invalid species code")
+    return codes
+
+
+def check_columns(loc, species, age, weight, habitable):
+    """
+    Checks a population in columns for an island.
+
+    All animals are checked at once, and the first invalid animal is
+    reported.
+
+    :param loc: array of shape (n, 2) with locations counted from 1,
+                integers
+    :param species: species names or codes
+    :param age: ages, non-negative integers
+    :param weight: weights, positive and finite
+    :param habitable: boolean array, True for each cell of the island where
+                      animals can live
+    :return: tuple of arrays (rows, cols, codes, ages, weights) with rows and
+             columns counted from 0
+    """
+    loc = np.asarray(loc)
+    if loc.size == 0:
+        loc = loc.reshape(0, 2)
+    if loc.ndim != 2 or loc.shape[1] != 2:
+        raise ValueError("Locations must have shape (n, 2)")
+    codes = species_codes(species).reshape(-1)
+    age = np.asarray(age, dtype=float).reshape(-1)
+    weight = np.asarray(weight, dtype=float).reshape(-1)
+    if not len(loc) == len(codes) == len(age) == len(weight):
+        raise ValueError("Columns must have the same length")
+
+    if loc.dtype.kind not in 'iu':
+        if loc.dtype.kind != 'f':
+            raise ValueError("Locations must be integers")
+        whole = np.isfinite(loc) & (loc == np.round(loc))
+        if not whole.all():
+            num = np.flatnonzero(~whole.all(axis=1))[0]
+            raise ValueError("Position ({}, {}) is not a cell of the map"
+                             .format(*loc[num]))
+
+    rows = loc[:, 0].astype(np.int64) - 1
+    cols = loc[:, 1].astype(np.int64) - 1
+    outside = ((rows < 0) | (rows >= habitable.shape[0]) |
+               (cols < 0) | (cols >= habitable.shape[1]))
+    if outside.any():
+        num = np.flatnonzero(outside)[0]
+        raise ValueError("Position ({}, {}) does not exist on map"
+                         .format(rows[num], cols[num]))
+
+    uninhabitable = ~habitable[rows, cols]
+    if uninhabitable.any():
+        num = np.flatnonzero(uninhabitable)[0]
+        raise ValueError("Animals can not live in position ({}, {})"
+                         .format(rows[num], cols[num]))
+
+    if not ((weight > 0) & np.isfinite(weight)).all():
+        raise ValueError("Weight has to be positive and above 0")
+    if not ((age >= 0) & np.isfinite(age) & (age == np.round(age))).all():
+        raise ValueError("Age has to be a positive integer")
+
+    return rows, cols, codes, age.astype(np.int64), weight
+
+
+def add_columns_to_cells(get_cell, rows, cols, codes, ages, weights):
+    """
+    Creates animals from checked columns and adds them to their cells.
+
+    Animals of the same cell and species are added together, in the order
+    they are given.
+
+    :param get_cell: function returning the cell for a row and column
+    :param rows: rows counted from 0
+    :param cols: columns counted from 0
+    :param codes: species codes
+    :param ages: ages
+    :param weights: weights
+    """
+    if len(rows) == 0:
+        return
+
+    order = np.lexsort((codes, cols, rows))
+    keys = np.stack((rows[order], cols[order], codes[order]), axis=1)
+    starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+    bounds = np.concatenate(([0], starts, [len(order)]))
+
+    ages = ages[order].tolist()
+    weights = weights[order].tolist()
+
+    # the garbage collector would otherwise scan the growing populations
+    # many times while the animals are created
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            row, col, code = keys[start].tolist()
+            cell = get_cell(row, col)
+            if code == SPECIES.index('Carnivore'):
+                animals = cell.carn
+            else:
+                animals = cell.herb
+            create = _SPECIES_CLASSES[code].from_checked
+            animals.extend(create(weight, age) for weight, age in
+                           zip(weights[start:stop], ages[start:stop]))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def load_population(filename):
+    """
+    Loads a population in columns from an NPZ or CSV file.
+
+    :param filename: name of the file, ending with .npz or .csv
+    :return: dictionary with the arrays 'loc', 'species', 'age' and 'weight'
+    """
+    if filename.endswith('.npz'):
+        with np.load(filename) as data:
+            return {'loc': data['loc'], 'species': data['species'],
+                    'age': data['age'], 'weight': data['weight']}
+
+    if filename.endswith('.csv'):
+        data = np.genfromtxt(filename, delimiter=',', names=True, dtype=None,
+                             encoding='utf-8', autostrip=True, ndmin=1)
+        missing = set(_CSV_COLUMNS) - set(data.dtype.names or ())
+        if missing:
+            raise ValueError("Missing columns in {}: {}".format(
+                filename, ', '.join(sorted(missing))))
+        return {'loc': np.stack((data['row'], data['col']), axis=1),
+                'species': data['species'], 'age': data['age'],
+                'weight': data['weight']}
+
+    raise ValueError("Unknown population file format: " + filename)
+
+
+def save_population(filename, loc, species, age, weight):
+    """
+    Saves a population in columns to an NPZ or CSV file.
+
+    :param filename: name of the file, ending with .npz or .csv
+    :param loc: array of shape (n, 2) with locations counted from 1
+    :param species: species names or codes
+    :param age: ages
+    :param weight: weights
+    """
+    loc = np.asarray(loc, dtype=np.int64).reshape(-1, 2)
+    codes = species_codes(species)
+    if filename.endswith('.npz'):
+        np.savez_compressed(filename, loc=loc, species=codes,
+                            age=np.asarray(age), weight=np.asarray(weight))
+    elif filename.endswith('.csv'):
+        with open(filename, 'w') as f:
+            f.write(','.join(_CSV_COLUMNS) + '\n')
+            for (row, col), code, animal_age, animal_weight in zip(
+                    loc.tolist(), codes.tolist(), np.asarray(age).tolist(),
+                    np.asarray(weight).tolist()):
+                f.write('{},{},{},{},{}\n'.format(row, col, SPECIES[code],
+                                                  animal_age, animal_weight))
+    else:
+        raise ValueError("Unknown population file format: " + filename)
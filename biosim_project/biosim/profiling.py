@@ -0,0 +1,313 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a statistical profiler for simulations in the biosim
+project.
+
+Instead of tracing every function call, like cProfile does, a thread looks
+at the stack of the simulation at fixed intervals. The per-animal methods
+therefore run at full speed, and the time spent in a function is estimated
+by the number of samples where it is on the stack.
+
+Samples are attributed to the phase of the annual cycle and to the type of
+cell being processed, which are inserted as extra frames in the stacks. The
+stacks are written in the collapsed format read by ``flamegraph.pl`` and
+speedscope, e.g.::
+
+    from biosim.profiling import SamplingProfiler
+
+    with SamplingProfiler() as profiler:
+        sim.simulate(100, vis_steps=None)
+    profiler.write_collapsed('sim.folded')
+    print(profiler.format_summary())
+
+or from the command line::
+
+    python -m biosim.profiling --years 50 --herbivores 2000 --output sim
+"""
+
+import argparse
+import os
+import sys
+import textwrap
+import threading
+import time
+from .island_nature import Island
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_DEFAULT_MAP = textwrap.dedent("""\
+    OOOOOOOOOOOOOOOOOOOOO
+    OOOOOOOOSMMMMJJJJJJJO
+    OSSSSSJJJJMMJJJJJJJOO
+    OSSSSSSSSSMMJJJJJJOOO
+    OSSSSSJJJJJJJJJJJJOOO
+    OSSSSSJJJDDJJJSJJJOOO
+    OSSJJJJJDDDJJJSSSSOOO
+    OOSSSSJJJDDJJJSOOOOOO
+    OSSSJJJJJDDJJJJJJJOOO
+    OSSSSJJJJDDJJJJOOOOOO
+    OOSSSSJJJJJJJJOOOOOOO
+    OOOSSSSJJJJJJJOOOOOOO
+    OOOOOOOOOOOOOOOOOOOOO""")
+
+_LANDSCAPE_FILE = os.path.join('biosim', 'landscape.py')
+
+
+class SamplingProfiler(object):
+    """
+    This class represents a profiler sampling the stack of one thread.
+
+    The profiler samples the thread that starts it, unless another thread
+    is given.
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        """
+        :param interval: seconds between samples
+        :type interval: float
+        :param thread_id: identifier of the sampled thread, default is the
+                          thread calling :meth:`start`
+        :type thread_id: int
+        """
+        self.interval = interval
+        self._thread_id = thread_id
+        self._sampler = None
+        self._running = threading.Event()
+        self._switch_interval = None
+
+        self.stacks = {}
+        self.phase_samples = {}
+        self.cell_samples = {}
+        self.num_samples = 0
+        self.duration = 0.0
+        self._start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """ Starts sampling in a background thread. """
+        if self._sampler is not None:
+            raise RuntimeError("Profiler is already running")
+
+        if self._thread_id is None:
+            self._thread_id = threading.current_thread().ident
+        self._running.set()
+
+        # the sampler needs the interpreter lock as often as it samples
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+
+        self._sampler = threading.Thread(target=self._sample_loop,
+                                         name='biosim-profiler')
+        self._sampler.daemon = True
+        self._start_time = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self):
+        """ Stops sampling and waits for the background thread. """
+        if self._sampler is None:
+            return
+
+        self._running.clear()
+        self._sampler.join()
+        self._sampler = None
+        sys.setswitchinterval(self._switch_interval)
+        self.duration += time.perf_counter() - self._start_time
+
+    def _sample_loop(self):
+        """ Takes samples until the profiler is stopped. """
+        while self._running.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._add_sample(frame)
+            del frame
+            time.sleep(self.interval)
+
+    def _add_sample(self, frame):
+        """
+        Adds the stack of a frame to the samples.
+
+        :param frame: innermost frame of the sampled thread
+        """
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+
+        stack = []
+        phase = None
+        cell = None
+        for frame in frames:
+            code = frame.f_code
+            if phase is None and code.co_name in Island.annual_phases:
+                phase = code.co_name
+                stack.append('[phase {}]'.format(phase))
+            elif cell is None and code.co_filename.endswith(_LANDSCAPE_FILE):
+                cell = frame.f_locals.get('self')
+                if getattr(cell, 'loc', None) is not None:
+                    stack.append('[cell {}]'.format(type(cell).__name__))
+            stack.append(_frame_label(frame))
+
+        stack = tuple(stack)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.num_samples += 1
+
+        if phase is not None:
+            self.phase_samples[phase] = self.phase_samples.get(phase, 0) + 1
+        if getattr(cell, 'loc', None) is not None:
+            key = tuple(cell.loc)
+            self.cell_samples[key] = self.cell_samples.get(key, 0) + 1
+
+    def top_functions(self, num=20):
+        """
+        Returns the functions with most self time.
+
+        Self time of a function is the samples where it is the innermost
+        frame, total time the samples where it is anywhere on the stack.
+
+        :param num: number of functions returned
+        :return: list of (function, self samples, total samples), sorted by
+                 self samples
+        """
+        self_samples = {}
+        total_samples = {}
+        for stack, count in self.stacks.items():
+            functions = [label for label in stack if not label.startswith('[')]
+            if not functions:
+                continue
+            self_samples[functions[-1]] = (
+                self_samples.get(functions[-1], 0) + count)
+            for function in set(functions):
+                total_samples[function] = (
+                    total_samples.get(function, 0) + count)
+
+        ranked = sorted(self_samples.items(), key=lambda item: -item[1])
+        return [(function, count, total_samples[function])
+                for function, count in ranked[:num]]
+
+    def format_summary(self, num=20):
+        """
+        Describes the samples of each phase and the top functions.
+
+        :param num: number of functions described
+        :return: multiline string
+        """
+        total = float(max(self.num_samples, 1))
+        lines = ['{} samples in {:.2f} s'.format(self.num_samples,
+                                                 self.duration),
+                 '', 'Phase                           samples       %']
+        for phase in Island.annual_phases:
+            count = self.phase_samples.get(phase, 0)
+            lines.append('{:<30} {:>8} {:>7.1f}'.format(phase, count,
+                                                        100 * count / total))
+
+        lines.extend(['', 'Self     Total     %self  Function'])
+        for function, self_count, total_count in self.top_functions(num):
+            lines.append('{:>8} {:>8} {:>7.1f}  {}'.format(
+                self_count, total_count, 100 * self_count / total, function))
+        return '\n'.join(lines)
+
+    def write_collapsed(self, filename):
+        """
+        Writes the stacks in collapsed format, one line for each stack.
+
+        :param filename: name of the file
+        """
+        with open(filename, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('{} {}\n'.format(';'.join(stack), count))
+
+    def write_summary(self, filename, num=20):
+        """
+        Writes the summary from :meth:`format_summary` and the cells with
+        most samples.
+
+        :param filename: name of the file
+        :param num: number of functions and cells described
+        """
+        cells = sorted(self.cell_samples.items(), key=lambda item: -item[1])
+        with open(filename, 'w') as f:
+            f.write(self.format_summary(num))
+            f.write('\n\nCell          samples\n')
+            for loc, count in cells[:num]:
+                f.write('{:<12} {:>8}\n'.format(str(loc), count))
+
+
+def _frame_label(frame):
+    """ Returns the label of a frame in the collapsed stacks. """
+    code = frame.f_code
+    return '{} ({}:{})'.format(code.co_name,
+                               os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+
+
+def profile_simulation(sim, num_years, interval=0.001):
+    """
+    Simulates years without graphics while sampling the stack.
+
+    :param sim: class instance of the simulation
+    :param num_years: number of years simulated
+    :param interval: seconds between samples
+    :return: class instance of the profiler with the samples
+    """
+    profiler = SamplingProfiler(interval)
+    with profiler:
+        for _ in sim.iter_years(num_years):
+            pass
+    return profiler
+
+
+def main(argv=None):
+    """
+    Profiles a simulation from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    from .simulation import BioSim
+    from .map_generator import generate_population
+
+    parser = argparse.ArgumentParser(
+        description='Profile a BioSim simulation by sampling the stack.')
+    parser.add_argument('--map', default=None,
+                        help='file with the island map (default: the '
+                             'check_sim island)')
+    parser.add_argument('--herbivores', type=int, default=1000)
+    parser.add_argument('--carnivores', type=int, default=100)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--interval', type=float, default=0.001,
+                        help='seconds between samples')
+    parser.add_argument('--top', type=int, default=20,
+                        help='number of functions in the summary')
+    parser.add_argument('--output', default='biosim_profile',
+                        help='beginning of name for the .folded and .txt '
+                             'files')
+    args = parser.parse_args(argv)
+
+    if args.map is not None:
+        with open(args.map) as f:
+            island_map = f.read()
+    else:
+        island_map = _DEFAULT_MAP
+
+    sim = BioSim(island_map,
+                 generate_population(island_map, args.herbivores,
+                                     args.carnivores, seed=args.seed),
+                 args.seed)
+    profiler = profile_simulation(sim, args.years, args.interval)
+
+    profiler.write_collapsed(args.output + '.folded')
+    profiler.write_summary(args.output + '.txt', args.top)
+    print(profiler.format_summary(args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides functions drawing the graphics of a recorded simulation
+for the biosim project.
+
+The figures have the same layout as the live graphics of
+:class:`biosim.simulation.BioSim`, but are drawn from a
+:class:`biosim.trajectory.Trajectory`, so color limits and ymax can be changed
+without simulating again.
+
+The module can be run as a script, e.g.::
+
+    python -m biosim.render trajectory.npz --movie sim.mp4 --ymax 15000
+    python -m biosim.render trajectory.npz --year 100 --image year100.png
+    python -m biosim.render trajectory.npz --img-dir images --workers 4
+"""
+
+import argparse
+import os
+from .visualization import Visualization
+from .trajectory import Trajectory
+from .movie import MovieWriter
+from .export import ImageExporter
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+def _frame_steps(trajectory, vis_steps):
+    """ Returns the years drawn, from year 0 to the last year. """
+    return range(0, trajectory.num_years() + 1, vis_steps)
+
+
+def render_year(trajectory, year, filename, color_min_herb=0,
+                color_max_herb=180, color_min_carn=0, color_max_carn=180,
+                ymax=None):
+    """
+    Saves the figure for one year of the trajectory.
+
+    :param trajectory: class instance of the recorded trajectory
+    :param year: year to draw, 0 is the state before the first year
+    :param filename: name of the graphics file
+    :param color_min_herb: color code minimum for herbivore
+    :param color_max_herb: color code maximum for herbivore
+    :param color_min_carn: color code minimum for carnivore
+    :param color_max_carn: color code maximum for carnivore
+    :param ymax: maxvalue for ylimit, adjusted automatically if None
+    """
+    if not 0 <= year <= trajectory.num_years():
+        raise ValueError("Year {} is not in the trajectory".format(year))
+
+    totals = trajectory.total_num_by_species(year)
+    num_herb_cells, num_carn_cells = trajectory.num_animals_in_year(year)
+    vis = Visualization(trajectory.island_map, offscreen=True)
+    vis.setup(trajectory.num_years(), color_min_herb=color_min_herb,
+              color_max_herb=color_max_herb, color_min_carn=color_min_carn,
+              color_max_carn=color_max_carn, ymax=ymax)
+    vis.set_num_animals(totals['herbivores'][1:], totals['carnivores'][1:])
+    vis.update(year + 1, num_herb_cells, num_carn_cells, draw=False)
+    vis.save(filename)
+
+
+def render_movie(trajectory, filename, vis_steps=1, fps=25,
+                 ffmpeg_binary='ffmpeg', color_min_herb=0,
+                 color_max_herb=180, color_min_carn=0, color_max_carn=180,
+                 ymax=None):
+    """
+    Makes a movie of the trajectory, streaming frames directly to ffmpeg.
+
+    :param trajectory: class instance of the recorded trajectory
+    :param filename: name of the movie file, including format suffix
+    :param vis_steps: interval between years drawn in the movie
+    :param fps: frames per second in the movie
+    :param ffmpeg_binary: command required to invoke ffmpeg
+    :param color_min_herb: color code minimum for herbivore
+    :param color_max_herb: color code maximum for herbivore
+    :param color_min_carn: color code minimum for carnivore
+    :param color_max_carn: color code maximum for carnivore
+    :param ymax: maxvalue for ylimit, adjusted automatically if None
+    :return: number of frames in the movie
+    """
+    totals = trajectory.total_num_by_species()
+    herb_cells = trajectory.num_herb_cells()
+    carn_cells = trajectory.num_carn_cells()
+
+    vis = Visualization(trajectory.island_map, blit=True, offscreen=True)
+    vis.setup(trajectory.num_years(), color_min_herb=color_min_herb,
+              color_max_herb=color_max_herb, color_min_carn=color_min_carn,
+              color_max_carn=color_max_carn, ymax=ymax)
+
+    writer = MovieWriter(filename, fps=fps, ffmpeg_binary=ffmpeg_binary)
+    try:
+        last_year = 0
+        for year in _frame_steps(trajectory, vis_steps):
+            for step in range(last_year, year):
+                vis.update_num_animals(step, totals['herbivores'][step + 1],
+                                       totals['carnivores'][step + 1])
+            last_year = year
+
+            vis.update(year + 1, herb_cells[year], carn_cells[year])
+            writer.write_frame(vis.frame_rgba())
+    finally:
+        writer.close()
+
+    return writer.num_frames
+
+
+def render_images(trajectory, img_base, img_fmt='png', img_steps=1,
+                  processes=None, color_min_herb=0, color_max_herb=180,
+                  color_min_carn=0, color_max_carn=180, ymax=None):
+    """
+    Saves numbered graphics files of the trajectory, using worker processes.
+
+    The files are named as the files saved by BioSim, so
+    :func:`biosim.movie.encode_segments` can make a movie of them.
+
+    :param trajectory: class instance of the recorded trajectory
+    :param img_base: directory and beginning of name for image files
+    :param img_fmt: image file format suffix
+    :param img_steps: interval between years saved to files
+    :param processes: number of worker processes, default is number of cores
+    :param color_min_herb: color code minimum for herbivore
+    :param color_max_herb: color code maximum for herbivore
+    :param color_min_carn: color code minimum for carnivore
+    :param color_max_carn: color code maximum for carnivore
+    :param ymax: maxvalue for ylimit, adjusted automatically if None
+    :return: number of images saved
+    """
+    totals = trajectory.total_num_by_species()
+    herb_cells = trajectory.num_herb_cells()
+    carn_cells = trajectory.num_carn_cells()
+
+    exporter = ImageExporter(trajectory.island_map, processes=processes)
+    exporter.start(trajectory.num_years(), color_min_herb=color_min_herb,
+                   color_max_herb=color_max_herb,
+                   color_min_carn=color_min_carn,
+                   color_max_carn=color_max_carn, ymax=ymax)
+    for num_herb, num_carn in zip(totals['herbivores'][1:],
+                                  totals['carnivores'][1:]):
+        exporter.add_num_animals(num_herb, num_carn)
+
+    num_images = 0
+    try:
+        for num_images, year in enumerate(_frame_steps(trajectory,
+                                                       img_steps), 1):
+            exporter.add_frame('{base}_{num:05d}.{type}'.format(
+                base=img_base, num=num_images - 1, type=img_fmt),
+                year, herb_cells[year], carn_cells[year])
+    finally:
+        exporter.close()
+
+    return num_images
+
+
+def main(argv=None):
+    """
+    Draws a recorded trajectory from the command line.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description='Draw graphics of a recorded BioSim trajectory.')
+    parser.add_argument('trajectory', help='trajectory file (.npz)')
+
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--movie', help='movie file, e.g. sim.mp4')
+    output.add_argument('--image', help='graphics file for one year')
+    output.add_argument('--img-dir', help='directory for numbered images')
+
+    parser.add_argument('--year', type=int, default=None,
+                        help='year drawn with --image (default: last year)')
+    parser.add_argument('--img-name', default='dv',
+                        help='beginning of name for numbered images')
+    parser.add_argument('--img-fmt', default='png',
+                        help='format of numbered images')
+    parser.add_argument('--steps', type=int, default=1,
+                        help='interval between years drawn')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes saving numbered images')
+    parser.add_argument('--fps', type=int, default=25,
+                        help='frames per second in the movie')
+    parser.add_argument('--ffmpeg', default='ffmpeg',
+                        help='command required to invoke ffmpeg')
+    parser.add_argument('--color-min-herb', type=float, default=0)
+    parser.add_argument('--color-max-herb', type=float, default=180)
+    parser.add_argument('--color-min-carn', type=float, default=0)
+    parser.add_argument('--color-max-carn', type=float, default=180)
+    parser.add_argument('--ymax', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    trajectory = Trajectory.load(args.trajectory)
+    limits = dict(color_min_herb=args.color_min_herb,
+                  color_max_herb=args.color_max_herb,
+                  color_min_carn=args.color_min_carn,
+                  color_max_carn=args.color_max_carn, ymax=args.ymax)
+
+    if args.movie is not None:
+        render_movie(trajectory, args.movie, vis_steps=args.steps,
+                     fps=args.fps, ffmpeg_binary=args.ffmpeg, **limits)
+    elif args.image is not None:
+        year = trajectory.num_years() if args.year is None else args.year
+        render_year(trajectory, year, args.image, **limits)
+    else:
+        render_images(trajectory, os.path.join(args.img_dir, args.img_name),
+                      img_fmt=args.img_fmt, img_steps=args.steps,
+                      processes=args.workers, **limits)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,19 @@ This script is based on the simulation script in the RandVis project example
 given in lecture 15, INF200, 13.01.16 by Hans Ekkehard Plesser at NMBU
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
+import copy
 import subprocess
 import os
+from collections import namedtuple
 from .island_nature import Island
+from .meanfield import MeanFieldIsland
+from .visualization import Visualization
+from .movie import MovieWriter, concat_movies, encode_segments
+from .export import ImageExporter
+from .trajectory import Trajectory
+from .stopping import StopReport
+from .branching import Branches
+from .memory import MemoryGuard
 import random
 
 __authors__ = 'Elisabeth Flatner and Marie Klever'
@@ -67,12 +75,28 @@ _DEFAULT_GRAPHICS_NAME = 'dv'
 _DEFAULT_MOVIE_FORMAT = 'mp4'   # alternatives: mp4, gif
 
 
+YearSnapshot = namedtuple('YearSnapshot',
+                          ['year', 'num_herb', 'num_carn', 'num_herb_cells',
+                           'num_carn_cells', 'summary'])
+YearSnapshot.__doc__ = """
+State of the island after a simulated year, yielded by
+:meth:`BioSim.iter_years`.
+
+The count grids are the arrays computed for the year, not copies. summary
+is None unless requested, else a dictionary with statistics for the age,
+weight and fitness of each species.
+"""
+
+
 class BioSim(object):
     """Provides user interface for simulation, including visualization."""
 
     def __init__(self, island_map, ini_pop, seed,
                  img_dir=None, img_name=_DEFAULT_GRAPHICS_NAME,
-                 img_fmt='png'):
+                 img_fmt='png', blit=False, stream_movie=False,
+                 movie_fmt=_DEFAULT_MOVIE_FORMAT, img_workers=None,
+                 record=False, instrument=False, engine='individual',
+                 engine_options=None):
         """
         :param island_map: specification about the island's geography
         :type island_map: multiline str
@@ -86,13 +110,48 @@ class BioSim(object):
         :type img_name: str
         :param img_fmt: image file format suffix, default 'png'
         :type img_fmt: str
+        :param blit: if True, live graphics only redraw changed artists
+        :type blit: bool
+        :param stream_movie: if True, frames are piped directly to ffmpeg
+                             instead of being saved as image files
+        :type stream_movie: bool
+        :param movie_fmt: movie file format suffix when streaming
+        :type movie_fmt: str
+        :param img_workers: number of worker processes rendering and saving
+                            image files; images are saved by the simulation
+                            itself if None
+        :type img_workers: int
+        :param record: if True, the number of animals in each cell is
+                       recorded every year, see :attr:`trajectory`
+        :type record: bool
+        :param instrument: if True, wall time and events of each phase of
+                           the annual cycle are recorded every year, see
+                           :attr:`year_stats`
+        :type instrument: bool
+        :param engine: 'individual' simulates each animal, 'meanfield'
+                       simulates the expected number of animals in bins of
+                       age and weight, see :mod:`biosim.meanfield`
+        :type engine: str
+        :param engine_options: keyword arguments for the island of the
+                               engine, e.g. the bin sizes of
+                               :class:`biosim.meanfield.MeanFieldIsland`
+        :type engine_options: dict
         """
 
         random.seed(seed)
 
+        if engine_options is None:
+            engine_options = {}
         self._island_map = island_map
-        self._island = Island(self._island_map)
+        if engine == 'individual':
+            self._island = Island(self._island_map, **engine_options)
+        elif engine == 'meanfield':
+            self._island = MeanFieldIsland(self._island_map, **engine_options)
+        else:
+            raise ValueError("Unknown engine: {}".format(engine))
         self._island.place_animals(ini_pop)
+        if instrument:
+            self._island.enable_instrumentation()
 
         if img_dir is not None:
             self._img_base = os.path.join(img_dir, img_name)
@@ -100,20 +159,46 @@ class BioSim(object):
             self._img_base = None
         self._img_fmt = img_fmt
 
+        # streamed movie segments, one for each call to simulate
+        self._stream_movie = stream_movie
+        self._movie_fmt = movie_fmt
+        self._movie_writer = None
+        self._movie_segments = []
+        # True if the movie holds the segments joined at an earlier call
+        self._movie_joined = False
+
+        # worker processes saving image files
+        self._img_workers = img_workers
+        self._exporter = None
+
         self._step = 0
         self._final_step = None
         self._img_ctr = 0
 
+        # total number of animals after each simulated year
+        self._num_herb = []
+        self._num_carn = []
+
+        # criteria for the current call to simulate or iter_years, and why
+        # the last call stopped early
+        self._stop_criteria = []
+        self._stop_report = None
+
+        # budget for the memory of the process, checked after each year
+        self._memory_guard = None
+
+        # number of animals in each cell for the current year, computed once
+        self._cell_counts = None
+
+        # number of animals in each cell after each year, including year 0
+        self._trajectory = None
+        if record:
+            self._trajectory = Trajectory(self._island_map)
+            self._record_year()
+
         # the following will be initialized by _setup_graphics
-        self._fig = None
-        self._map_ax = None
-        self._img_axis = None
-        self._pop_ax = None
-        self._herb_line = None
-        self._carn_line = None
-        self._herb_map_ax = None
-        self._carn_map_ax = None
-        self._count_year = None
+        self._blit = blit
+        self._vis = None
 
         # limits for color code in population maps
         self._color_min_herb = None
@@ -121,20 +206,20 @@ class BioSim(object):
         self._color_min_carn = None
         self._color_max_carn = None
 
-        # maximum and default limit for ordinate in line graph
+        # maximum limit for ordinate in line graph
         self._ymax = None
-        self._ylim = 200
 
     def simulate(self, num_steps, vis_steps=1, img_steps=None,
                  color_min_herb=0, color_max_herb=180, color_min_carn=0,
-                 color_max_carn=180, ymax=None):
+                 color_max_carn=180, ymax=None, stop=None):
         """
         Run simulation while visualizing the result.
 
         :param num_steps: number of simulation steps to execute
-        :param vis_steps: interval between visualization updates
+        :param vis_steps: interval between visualization updates; no live
+                          graphics if None
         :param img_steps: interval between visualizations saved to files
-                          (default: vis_steps)
+                          (default: vis_steps); no files if None
         :param color_min_herb: color code minimum for herbivore
                                 (default: 0)
         :param color_max_herb: color code maximum for herbivore
@@ -144,8 +229,13 @@ class BioSim(object):
         :param color_max_carn: color code maximum for carnivore
                                 (default: 180)
         :param ymax: maxvalue for ylimit
+        :param stop: criterion or list of criteria from
+                     :mod:`biosim.stopping`; the simulation stops after the
+                     first year a criterion is met, see :attr:`stop_report`
 
-        .. note:: Image files will be numbered consecutively.
+        .. note:: Image files will be numbered consecutively. When streaming
+                  a movie, the movie img_base + movie_fmt is complete when
+                  simulate returns.
         """
 
         if img_steps is None:
@@ -162,25 +252,134 @@ class BioSim(object):
         self._color_min_carn = color_min_carn
         self._color_max_carn = color_max_carn
 
+        if self._img_base is None:
+            img_steps = None
+
         self._final_step = self._step + num_steps
-        self._setup_graphics()
+        self._set_stop_criteria(stop)
+        if vis_steps is not None or img_steps is not None:
+            self._setup_graphics()
+            self._open_movie_writer()
+            self._start_exporter()
+
+        try:
+            num_animals = self.total_num_animals()
+            while (self._step < self._final_step and
+                   self._stop_report is None and 0 < num_animals):
+
+                updated = False
+                if vis_steps is not None and self._step % vis_steps == 0:
+                    self._update_graphics()
+                    updated = True
+
+                if img_steps is not None and self._step % img_steps == 0:
+                    self._save_graphics(updated)
+
+                num_animals = self._advance()
+
+                if num_animals <= 0:
+                    print('There are no animals left on the island ')
+                    self._stop_report = StopReport(self._step,
+                                                   'all animals extinct')
+        finally:
+            self._close_movie_writer()
+            self._close_exporter()
+
+    def iter_years(self, num_years, summary=False, stop=None):
+        """
+        Simulates one year at a time, yielding the state after each year.
+
+        No graphics are drawn. The simulation stops early if there are no
+        animals left on the island. Breaking out of the loop leaves the
+        simulation at the last year yielded, and it can be continued by
+        simulate or iter_years.
+
+        :param num_years: maximum number of years to simulate
+        :param summary: if True, statistics for age, weight and fitness of
+                        each species are included in each snapshot
+        :param stop: criterion or list of criteria from
+                     :mod:`biosim.stopping`; the last snapshot is the year
+                     a criterion is met, see :attr:`stop_report`
+        :return: generator of :class:`YearSnapshot`
+        """
+        final_step = self._step + num_years
+        self._set_stop_criteria(stop)
+
+        num_animals = self.total_num_animals()
+        while (self._step < final_step and self._stop_report is None and
+               0 < num_animals):
+            num_animals = self._advance()
+            if num_animals <= 0:
+                self._stop_report = StopReport(self._step,
+                                               'all animals extinct')
+            num_herb_cells, num_carn_cells = self._num_animals_in_cells()
+
+            yield YearSnapshot(self._step, self._num_herb[-1],
+                               self._num_carn[-1], num_herb_cells,
+                               num_carn_cells,
+                               self._summary() if summary else None)
+
+    def _advance(self):
+        """
+        Simulates one year and records the number of animals.
+
+        The animals are counted once, for the records, the stopping criteria
+        and the memory budget.
 
-        while self._step < self._final_step and 0 < self.total_num_animals():
+        :return: total number of animals on the island after the year
+        """
+        self._island.annual_cycle()
+        self._cell_counts = None
+        num_animals = self._update_num_animals()
+        self._step += 1
+        self._check_stop_criteria()
+        self._check_memory(num_animals)
+        return num_animals
+
+    def _set_stop_criteria(self, stop):
+        """
+        Sets the stopping criteria for a call to simulate or iter_years.
 
-            if self._step % vis_steps == 0:
-                self._update_graphics()
+        :param stop: criterion, list of criteria or None
+        """
+        if stop is None:
+            stop = []
+        elif not isinstance(stop, (list, tuple)):
+            stop = [stop]
+        self._stop_criteria = list(stop)
+        self._stop_report = None
+
+    def _check_stop_criteria(self):
+        """ Records a stop report if a criterion is met. """
+        for criterion in self._stop_criteria:
+            reason = criterion.check(self._num_herb, self._num_carn)
+            if reason is not None:
+                self._stop_report = StopReport(self._step, reason)
+                return
+
+    def _check_memory(self, num_animals):
+        """
+        Stops the simulation if the next year is projected to use more
+        memory than the budget.
 
-            if self._step % img_steps == 0:
-                self._save_graphics()
+        :param num_animals: total number of animals on the island
+        """
+        if self._memory_guard is None:
+            return
+        record = self._memory_guard.check(self._step, num_animals)
+        if self._memory_guard.exceeded(record):
+            self._memory_guard.abort(self._island, record)
 
-            self._island.annual_cycle()
-            self._update_num_animals()
-            self._step += 1
+    def _summary(self):
+        """
+        Calculates statistics for age, weight and fitness of each species.
 
-            if self.total_num_animals() <= 0:
-                print('There are no animals left on the island ')
+        :return: dictionary with mean, std, min and max for each property
+        """
+        return {species: self._island.property_summary(species)
+                for species in ('herbivores', 'carnivores')}
 
-    def make_movie(self, movie_fmt=_DEFAULT_MOVIE_FORMAT):
+    def make_movie(self, movie_fmt=_DEFAULT_MOVIE_FORMAT, segments=None):
         """
         Creates MPEG4 movie from visualization images saved.
 
@@ -188,12 +387,33 @@ class BioSim(object):
             Requires ffmpeg
 
         The movie is stored as img_base + movie_fmt
+
+        If segments is given, the images are split into that many segments
+        which are encoded concurrently and joined without re-encoding.
+
+        If frames are streamed, the movie is already made by simulate and
+        nothing is done.
         """
 
         if self._img_base is None:
             raise RuntimeError("No filename defined.")
 
-        if movie_fmt == 'mp4':
+        if self._stream_movie:
+            if movie_fmt != self._movie_fmt:
+                raise ValueError("Streamed movie has format {}"
+                                 .format(self._movie_fmt))
+            return
+
+        if movie_fmt == 'mp4' and segments is not None:
+            try:
+                encode_segments('{}_%05d.{}'.format(self._img_base,
+                                                    self._img_fmt),
+                                self._img_ctr,
+                                '{}.{}'.format(self._img_base, movie_fmt),
+                                segments, ffmpeg_binary=_FFMPEG_BINARY)
+            except subprocess.CalledProcessError as err:
+                print("ERROR: ffmpeg failed:", err)
+        elif movie_fmt == 'mp4':
             # noinspection PyPep8
             try:
                 # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
@@ -223,196 +443,153 @@ class BioSim(object):
 
     def _setup_graphics(self):
         """Creates subplots."""
+        if self._vis is None:
+            self._vis = Visualization(self._island_map, blit=self._blit)
 
-        # create new figure window
-        if self._fig is None:
-            self._fig = plt.figure(figsize=(12, 8))
-
-        rgb_value = {'O': (0.0, 0.0, 1.0),  # blue
-                     'M': (0.5, 0.5, 0.5),  # grey
-                     'J': (0.0, 0.6, 0.0),  # dark green
-                     'S': (0.5, 1.0, 0.5),  # light green
-                     'D': (1.0, 1.0, 0.5)}  # light yellow
-
-        kart_rgb = [[rgb_value[column] for column in row]
-                    for row in self._island_map.split()]
-
-        # Add upper left subplot showing a map with the geography of the island.
-        if self._map_ax is None:
-            self._map_ax = self._fig.add_axes([0.05, 0.525, 0.35, 0.45],
-                                              title='Island map')
-            self._map_ax.imshow(kart_rgb, interpolation='nearest')
-            self._img_axis = self._fig.add_axes([0.41, 0.59, 0.1, 0.35])
-            self._img_axis.axis('off')
-
-            for ix, name in enumerate(('Ocean', 'Mountain', 'Jungle',
-                                       'Savannah', 'Desert')):
-                self._img_axis.add_patch(plt.Rectangle
-                                         ((0., ix * 0.2), 0.3, 0.1,
-                                          edgecolor='none',
-                                          facecolor=rgb_value[name[0]]))
-                self._img_axis.text(0.35, ix * 0.2, name,
-                                    transform=self._img_axis.transAxes)
-
-        # Add upper right subplot for line graph of number of animals on the
-        # island.
-        if self._pop_ax is None:
-            self._pop_ax = self._fig.add_axes([0.6, 0.58, 0.35, 0.35],
-                                              title='Number of animals on the '
-                                                    'island',
-                                              xlabel='year',
-                                              ylabel='number of animals')
-
-        # needs updating on subsequent calls to simulate()
-        self._pop_ax.set_xlim(0, self._final_step + 1)
-
-        if self._herb_line is None:
-            self._herb_line = self._pop_ax.plot(
-                np.arange(0, self._final_step), np.nan * np.ones(
-                    self._final_step), 'b-')[0]
-
-            self._carn_line = self._pop_ax.plot(
-                np.arange(0, self._final_step), np.nan * np.ones(
-                    self._final_step), 'r-')[0]
-        else:
-            xdata, ydata_herb = self._herb_line.get_data()
-            ydata_carn = self._carn_line.get_ydata()
-            xnew = np.arange(xdata[-1] + 1, self._final_step)
-
-            if len(xnew) > 0:
-                ynew = np.nan * np.ones_like(xnew)
-                self._herb_line.set_data(np.hstack((xdata, xnew)),
-                                         np.hstack((ydata_herb, ynew)))
-                self._carn_line.set_data(np.hstack((xdata, xnew)),
-                                         np.hstack((ydata_carn, ynew)))
-
-        # Add lower left subplot for map illustrating the distribution of
-        # herbivores on the island.
-        if self._herb_map_ax is None:
-            self._herb_map_ax = self._fig.add_axes([0.05, 0.025, 0.4, 0.45],
-                                                   title='Distribution of '
-                                                         'herbivores')
-            self._herb_img_axis = None
-
-        # Add lower right subplot for map illustrating the distribution of
-        # carnivores on the island.
-        if self._carn_map_ax is None:
-            self._carn_map_ax = self._fig.add_axes([0.57, 0.025, 0.4, 0.45],
-                                                   title='Distribution of '
-                                                         'carnivores')
-            self._carn_img_axis = None
-
-        if self._count_year is None:
-            self._count_year = self._fig.add_axes([0.36, 0.35, 0.2, 0.2])
-            self._count_year.axis('off')
-
-        # Add lower center subplot for counter of number of years that are
-        # simulated
-            self._template = 'Year: {:5}'
-            self._txt = self._count_year.text(0.5, 0.5, self._template.
-                                              format(0),
-                                              horizontalalignment='left',
-                                              verticalalignment='bottom',
-                                              transform=self._count_year.
-                                              transAxes, fontsize='large',
-                                              weight='bold')
-
-    def _update_distribution_maps(self, num_herb_cell, num_carn_cell):
-        """
-        Update the 2D-view of the system.
-
-        Updates subplots showing the distribution of herbivores and carnivores
-        on the island.
-        :param num_herb_cell: total number of herbivores in each cell
-        :param num_carn_cell: total number of carnivores in each cell
-        """
-
-        if self._herb_img_axis is not None:
-            self._herb_img_axis.set_data(num_herb_cell)
-            self._carn_img_axis.set_data(num_carn_cell)
-        else:
-            self._herb_img_axis = self._herb_map_ax.imshow(
-                num_herb_cell, interpolation='nearest',
-                vmin=self._color_min_herb, vmax=self._color_max_herb)
-
-            plt.colorbar(self._herb_img_axis, ax=self._herb_map_ax,
-                         orientation='horizontal')
+        self._vis.setup(self._final_step,
+                        color_min_herb=self._color_min_herb,
+                        color_max_herb=self._color_max_herb,
+                        color_min_carn=self._color_min_carn,
+                        color_max_carn=self._color_max_carn,
+                        ymax=self._ymax)
 
-            self._carn_img_axis = self._carn_map_ax.imshow(
-                num_carn_cell, interpolation='nearest',
-                vmin=self._color_min_carn, vmax=self._color_max_carn)
-
-            plt.colorbar(self._carn_img_axis, ax=self._carn_map_ax,
-                         orientation='horizontal')
+        # years simulated without graphics are shown in the line graph
+        if self._step > 0:
+            self._vis.set_num_animals(self._num_herb, self._num_carn)
 
     def _update_num_animals(self):
-        """ Updates total number of animals for each year in the simulation. """
+        """
+        Updates total number of animals for each year in the simulation.
 
+        :return: total number of animals on the island
+        """
         num_herb, num_carn = self._island.number_of_animals()
+        self._num_herb.append(num_herb)
+        self._num_carn.append(num_carn)
+
+        if self._vis is not None:
+            self._vis.update_num_animals(self._step, num_herb, num_carn)
+        if self._exporter is not None:
+            self._exporter.add_num_animals(num_herb, num_carn)
+        if self._trajectory is not None:
+            self._record_year()
+        return num_herb + num_carn
 
-        ydata_herb = self._herb_line.get_ydata()
-        ydata_herb[self._step] = num_herb
-
-        ydata_carn = self._carn_line.get_ydata()
-        ydata_carn[self._step] = num_carn
-
-    def _update_pop_graph(self):
+    def _num_animals_in_cells(self):
         """
-        Updates line graph showing the total number of different animal species
-        on the island.
+        Returns number of herbivores and carnivores in each cell, computed
+        once for each state of the island.
         """
+        if self._cell_counts is None:
+            self._cell_counts = (self._island.num_herb_in_cells(),
+                                 self._island.num_carn_in_cells())
+        return self._cell_counts
 
-        self._pop_ax.legend(('Herbivores', 'Carnivores'), loc='upper left',
-                            fontsize='small')
+    def _record_year(self):
+        """ Records number of animals in each cell in the trajectory. """
+        self._trajectory.record(*self._num_animals_in_cells())
 
-        ydata_herb = self._herb_line.get_ydata()
-        self._herb_line.set_ydata(ydata_herb)
-
-        ydata_carn = self._carn_line.get_ydata()
-        self._carn_line.set_ydata(ydata_carn)
+    def _update_graphics(self):
+        """Updates graphics with current data."""
+        self._vis.update(self._step + 1, *self._num_animals_in_cells())
 
-        # updates ordinate simultaneously if ymax is not given
-        # else ylim is set to given ymax
-        if self._ymax is None and self._step % 2 == 0:
-            max_herb = max(ydata_herb)
-            max_carn = max(ydata_carn)
+    def _open_movie_writer(self):
+        """Starts a new movie segment if frames are streamed."""
+        if self._img_base is None or not self._stream_movie:
+            return
 
-            if max_herb > max_carn:
-                if max_herb > self._ylim:
-                    self._ylim = 1.2 * max_herb
-            else:
-                if max_carn > self._ylim:
-                    self._ylim = 1.2 * max_carn
+        self._movie_writer = MovieWriter(
+            '{base}_part{num:03d}.{type}'.format(
+                base=self._img_base, num=len(self._movie_segments),
+                type=self._movie_fmt),
+            ffmpeg_binary=_FFMPEG_BINARY)
 
-            self._pop_ax.set_ylim(0, self._ylim)
+    def _close_movie_writer(self):
+        """
+        Finishes the current movie segment and joins all segments into the
+        movie img_base + movie_fmt.
 
-        else:
-            self._pop_ax.set_ylim(0, self._ymax)
+        The segment files are removed when they are joined, and the movie
+        is the first segment joined after the next call to simulate. If
+        joining fails, the segment files are kept.
+        """
+        if self._movie_writer is None:
+            return
 
-    def _update_counter(self):
-        """ Updates counter with number of years that are simulated. """
-        self._txt.set_text(self._template.format(self._step+1))
+        writer, self._movie_writer = self._movie_writer, None
+        writer.close()
+        if writer.num_frames > 0:
+            self._movie_segments.append(writer.filename)
+        if not self._movie_segments:
+            return
 
-    def _update_graphics(self):
-        """Updates graphics with current data."""
+        movie = '{}.{}'.format(self._img_base, self._movie_fmt)
+        segments = list(self._movie_segments)
+        if self._movie_joined:
+            joined = '{}_joined.{}'.format(self._img_base, self._movie_fmt)
+            os.rename(movie, joined)
+            segments.insert(0, joined)
+            self._movie_segments = segments
+            self._movie_joined = False
+
+        concat_movies(segments, movie, ffmpeg_binary=_FFMPEG_BINARY)
+        for segment in segments:
+            os.remove(segment)
+        self._movie_segments = []
+        self._movie_joined = True
+
+    def _start_exporter(self):
+        """Starts worker processes if images are saved in parallel."""
+        if (self._img_base is None or self._stream_movie or
+                self._img_workers is None):
+            return
 
-        self._update_distribution_maps(self._island.num_herb_in_cells(),
-                                       self._island.num_carn_in_cells())
-        self._update_pop_graph()
+        if self._exporter is None:
+            self._exporter = ImageExporter(self._island_map,
+                                           processes=self._img_workers)
+            # the exporter needs the totals of all years already simulated
+            for num_herb, num_carn in zip(self._num_herb, self._num_carn):
+                self._exporter.add_num_animals(num_herb, num_carn)
+
+        self._exporter.start(self._final_step,
+                             color_min_herb=self._color_min_herb,
+                             color_max_herb=self._color_max_herb,
+                             color_min_carn=self._color_min_carn,
+                             color_max_carn=self._color_max_carn,
+                             ymax=self._ymax)
+
+    def _close_exporter(self):
+        """Waits until all image files are saved."""
+        if self._exporter is not None:
+            self._exporter.close()
+
+    def _save_graphics(self, updated=True):
+        """
+        Saves graphics to file if file name given.
 
-        self._update_counter()
+        :param updated: False if the graphics have not been updated with the
+                        current data
+        """
 
-        plt.pause(1e-6)
+        if self._img_base is None:
+            return
 
-    def _save_graphics(self):
-        """Saves graphics to file if file name given."""
+        if not updated and self._exporter is None:
+            self._vis.update(self._step + 1, *self._num_animals_in_cells(),
+                             draw=False)
 
-        if self._img_base is None:
+        if self._movie_writer is not None:
+            self._movie_writer.write_frame(self._vis.frame_rgba())
             return
 
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self._img_base,
-                                                     num=self._img_ctr,
-                                                     type=self._img_fmt))
+        filename = '{base}_{num:05d}.{type}'.format(base=self._img_base,
+                                                    num=self._img_ctr,
+                                                    type=self._img_fmt)
+        if self._exporter is not None:
+            self._exporter.add_frame(filename, self._step,
+                                     *self._num_animals_in_cells())
+        else:
+            self._vis.save(filename)
         self._img_ctr += 1
 
     def add_population(self, population):
@@ -422,11 +599,140 @@ class BioSim(object):
         :param population: Dictionary with new animals
         """
         self._island.place_animals(population)
+        self._cell_counts = None
+
+    def add_population_columns(self, loc, species, age, weight):
+        """
+        Places new animals given as columns, see
+        :meth:`biosim.island_nature.Island.place_animal_columns`.
+
+        :param loc: array of shape (n, 2) with locations counted from 1
+        :param species: species codes or names
+        :param age: ages
+        :param weight: weights
+        """
+        self._island.place_animal_columns(loc, species, age, weight)
+        self._cell_counts = None
+
+    def add_population_from_file(self, filename):
+        """
+        Places new animals from a NPZ or CSV file, see
+        :func:`biosim.population.load_population`.
+
+        :param filename: name of the file
+        """
+        self._island.place_animals_from_file(filename)
+        self._cell_counts = None
+
+    def fork(self, num_branches, seeds=None, parallel=True):
+        """
+        Creates independent continuations of the simulation from the
+        current year, see :mod:`biosim.branching`.
+
+        The years simulated so far are shared by the branches. Each branch
+        is a simulation without graphics, running in a process forked from
+        this one unless parallel is False. The simulation itself is not
+        changed by the branches.
+
+        :param num_branches: number of branches
+        :param seeds: list with the random seed of each branch; if None all
+                      branches continue the random state of the simulation
+        :param parallel: if True each branch runs in a worker process
+        :return: class instance of :class:`biosim.branching.Branches`
+        """
+        return Branches(self, num_branches, seeds, parallel)
+
+    def _branch(self, copy_state):
+        """
+        Returns a copy of the simulation without graphics and image files.
+
+        :param copy_state: if True the island and the recorded years are
+                           copied, else they are shared with the simulation,
+                           as in a forked process
+        """
+        branch = copy.copy(self)
+        if copy_state:
+            branch._island = copy.deepcopy(self._island)
+            branch._trajectory = copy.deepcopy(self._trajectory)
+            branch._num_herb = list(self._num_herb)
+            branch._num_carn = list(self._num_carn)
+        branch._img_base = None
+        branch._stream_movie = False
+        branch._movie_writer = None
+        branch._movie_segments = []
+        branch._movie_joined = False
+        branch._exporter = None
+        branch._vis = None
+        branch._memory_guard = None
+        return branch
 
     def num_years(self):
         """ Returns total number of years that have been simulated. """
         return self._step
 
+    @property
+    def stop_report(self):
+        """
+        Returns :class:`biosim.stopping.StopReport` with year and reason if
+        the last call to simulate or iter_years stopped early, else None.
+        """
+        return self._stop_report
+
+    @property
+    def trajectory(self):
+        """
+        Returns the recorded trajectory, None if BioSim is created without
+        record=True.
+        """
+        return self._trajectory
+
+    @property
+    def year_stats(self):
+        """
+        Returns list of :class:`biosim.instrumentation.YearStats` for each
+        year simulated while instrumentation is enabled.
+        """
+        if self._island.instrumentation is None:
+            return []
+        return self._island.instrumentation.records
+
+    def enable_events(self, num_tracked=0, history_file=None, seed=None):
+        """
+        Counts births, deaths, kills and migrations in each cell in the
+        following years, and optionally records life histories of a sample
+        of the animals, see :meth:`biosim.island_nature.Island.enable_events`.
+
+        :param num_tracked: number of animals tracked, no life histories
+                            if 0
+        :param history_file: name of the binary file of the life histories,
+                             kept in memory if None
+        :param seed: seed of the sampling of tracked animals
+        :return: class instance of :class:`biosim.events.CellEvents`
+        """
+        return self._island.enable_events(num_tracked, history_file, seed)
+
+    def set_memory_budget(self, budget, dump_file=None, window=5):
+        """
+        Stops the following years before the resident set size of the
+        process is projected to exceed a budget, see :mod:`biosim.memory`.
+
+        The state of the island is saved to dump_file, and
+        :class:`biosim.memory.MemoryBudgetExceeded` is raised from simulate
+        or iter_years, leaving the simulation at the last year simulated.
+
+        :param budget: largest resident set size allowed in bytes, no
+                       budget if None
+        :param dump_file: name of the NPZ file for the state of the island
+        :param window: number of years the growth per year is estimated from
+        :return: class instance of :class:`biosim.memory.MemoryGuard` with
+                 the memory of each year, None if there is no budget
+        """
+        if budget is None:
+            self._memory_guard = None
+        else:
+            self._memory_guard = MemoryGuard(budget, dump_file, window)
+        return self._memory_guard
+
     def total_num_animals(self):
         """ Returns total number of animals on the island. """
         num_herb, num_carn = self._island.number_of_animals()
@@ -439,6 +745,16 @@ class BioSim(object):
 
     def num_animals_per_cell(self):
         """ Returns number of animals per cell in map. """
-        herbivores = self._island.num_herb_in_cells()
-        carnivores = self._island.num_carn_in_cells()
+        herbivores, carnivores = self._num_animals_in_cells()
         return {'herbivores': herbivores, 'carnivores': carnivores}
+
+    def cell_statistics(self):
+        """
+        Returns the number of animals in each cell and their mean age,
+        weight and fitness, see
+        :meth:`biosim.island_nature.Island.cell_statistics`.
+
+        :return: dictionary with :class:`biosim.island_nature.CellStatistics`
+                 for 'herbivores' and 'carnivores'
+        """
+        return self._island.cell_statistics()
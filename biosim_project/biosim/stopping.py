@@ -0,0 +1,222 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides criteria stopping a simulation early for the biosim
+project.
+
+A criterion looks at the total number of herbivores and carnivores after
+each simulated year, and returns a description of why the simulation should
+stop, or None to continue. Criteria are given to
+:meth:`biosim.simulation.BioSim.simulate` or
+:meth:`biosim.simulation.BioSim.iter_years`, e.g.::
+
+    sim.simulate(5000, vis_steps=None,
+                 stop=[Extinction('carnivores'), Periodicity(window=300)])
+    print(sim.stop_report)
+"""
+
+from collections import namedtuple
+import numpy as np
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_SERIES = ('herbivores', 'carnivores', 'total')
+
+StopReport = namedtuple('StopReport', ['year', 'reason'])
+StopReport.__doc__ = """
+Year a simulation stopped early, and a description of the reason.
+"""
+
+
+def _series(num_herb, num_carn, species):
+    """
+    Returns the counts of given species for each year.
+
+    :param num_herb: total number of herbivores for each year
+    :param num_carn: total number of carnivores for each year
+    :param species: 'herbivores', 'carnivores' or 'total'
+    :return: array of counts
+    """
+    if species == 'herbivores':
+        return np.asarray(num_herb, dtype=float)
+    if species == 'carnivores':
+        return np.asarray(num_carn, dtype=float)
+    return np.asarray(num_herb, dtype=float) + np.asarray(num_carn,
+                                                          dtype=float)
+
+
+def _check_species(species):
+    """ Raises ValueError for unknown series names. """
+    for name in species:
+        if name not in _SERIES:
+            raise ValueError("Given species does not exist")
+
+
+class StoppingCriterion(object):
+    """
+    This class represents a criterion stopping a simulation.
+    """
+
+    def check(self, num_herb, num_carn):
+        """
+        Checks whether the simulation should stop after the last year.
+
+        :param num_herb: total number of herbivores for each year simulated
+        :param num_carn: total number of carnivores for each year simulated
+        :return: description of the reason to stop, None to continue
+        """
+        raise NotImplementedError
+
+
+class Extinction(StoppingCriterion):
+    """
+    Stops when a species has died out.
+    """
+
+    def __init__(self, species='any'):
+        """
+        :param species: 'herbivores' or 'carnivores' for that species,
+                        'any' when one of them dies out and 'all' when both
+                        have died out
+        :type species: str
+        """
+        if species not in ('herbivores', 'carnivores', 'any', 'all'):
+            raise ValueError("Given species does not exist")
+        self.species = species
+
+    def check(self, num_herb, num_carn):
+        if not len(num_herb):
+            return None
+
+        extinct = [name for name, counts in (('herbivores', num_herb),
+                                             ('carnivores', num_carn))
+                   if counts[-1] == 0]
+        if self.species == 'all':
+            stop = len(extinct) == 2
+        elif self.species == 'any':
+            stop = len(extinct) > 0
+        else:
+            stop = self.species in extinct
+
+        if stop:
+            return '{} extinct'.format(' and '.join(extinct))
+        return None
+
+
+class Convergence(StoppingCriterion):
+    """
+    Stops when the statistics of the counts no longer change.
+
+    The mean and standard deviation of the last window of years are compared
+    with the window before. Both have to change less than rtol times the
+    earlier mean, for each of the species.
+    """
+
+    def __init__(self, window=50, rtol=0.02,
+                 species=('herbivores', 'carnivores')):
+        """
+        :param window: number of years in each window
+        :type window: int
+        :param rtol: largest relative change counted as converged
+        :type rtol: float
+        :param species: series checked, of 'herbivores', 'carnivores' and
+                        'total'
+        """
+        if window < 2:
+            raise ValueError("Window must be at least 2 years")
+        _check_species(species)
+        self.window = window
+        self.rtol = rtol
+        self.species = tuple(species)
+
+    def check(self, num_herb, num_carn):
+        if len(num_herb) < 2 * self.window:
+            return None
+
+        for species in self.species:
+            counts = _series(num_herb[-2 * self.window:],
+                             num_carn[-2 * self.window:], species)
+            before, last = counts[:self.window], counts[self.window:]
+            scale = self.rtol * max(before.mean(), 1.0)
+            if (abs(last.mean() - before.mean()) > scale or
+                    abs(last.std() - before.std()) > scale):
+                return None
+
+        return 'counts converged over {} years'.format(self.window)
+
+
+class Periodicity(StoppingCriterion):
+    """
+    Stops when the counts repeat with a period.
+
+    The autocorrelation of the last window of years is calculated for each
+    period. The shortest period with a local maximum of the autocorrelation
+    above the threshold is reported, for each of the species.
+    """
+
+    def __init__(self, window=200, threshold=0.9, min_period=2,
+                 max_period=None, species=('herbivores',)):
+        """
+        :param window: number of years analysed
+        :type window: int
+        :param threshold: smallest autocorrelation counted as periodic
+        :type threshold: float
+        :param min_period: shortest period detected
+        :type min_period: int
+        :param max_period: longest period detected, default is a third of
+                           the window, so at least three periods are seen
+        :type max_period: int
+        :param species: series checked, of 'herbivores', 'carnivores' and
+                        'total'
+        """
+        if max_period is None:
+            max_period = window // 3
+        if not 1 <= min_period <= max_period < window:
+            raise ValueError("Invalid periods for the window")
+        _check_species(species)
+        self.window = window
+        self.threshold = threshold
+        self.min_period = min_period
+        self.max_period = max_period
+        self.species = tuple(species)
+
+    def period(self, counts):
+        """
+        Finds the period of a series of counts.
+
+        :param counts: counts for each year in the window
+        :return: period in years, None if the counts are not periodic
+        """
+        counts = counts - counts.mean()
+        if not counts.any():
+            return None
+
+        correlation = np.zeros(self.max_period + 2)
+        for lag in range(max(self.min_period - 1, 1), self.max_period + 2):
+            early, late = counts[:-lag], counts[lag:]
+            norm = np.sqrt((early ** 2).sum() * (late ** 2).sum())
+            if norm > 0:
+                correlation[lag] = (early * late).sum() / norm
+
+        for lag in range(self.min_period, self.max_period + 1):
+            if (correlation[lag] >= self.threshold and
+                    correlation[lag] >= correlation[lag - 1] and
+                    correlation[lag] >= correlation[lag + 1]):
+                return lag
+        return None
+
+    def check(self, num_herb, num_carn):
+        if len(num_herb) < self.window:
+            return None
+
+        periods = []
+        for species in self.species:
+            period = self.period(_series(num_herb[-self.window:],
+                                         num_carn[-self.window:], species))
+            if period is None:
+                return None
+            periods.append(period)
+
+        return 'counts periodic with period {} years'.format(
+            ', '.join(str(period) for period in periods))
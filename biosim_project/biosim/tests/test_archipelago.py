@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the islands of the archipelago file.
+"""
+
+import nose.tools as nt
+import numpy as np
+from ..archipelago import Archipelago, SeaRoute, MIGRANT_DTYPE
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLANDS = {'west': "OOOOO\nOJJSO\nOJJJO\nOOOOO",
+           'east': "OOOOOO\nOSSJJO\nOJJJJO\nOOOOOO"}
+
+POPULATION = [{'loc': (2, 2),
+               'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                       for _ in range(40)] +
+                      [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                       for _ in range(5)]}]
+
+
+class TestArchipelago(object):
+    """
+    Tests for simulation and migration in an archipelago.
+    """
+
+    def setup(self):
+        self.routes = [SeaRoute('west', (3, 4), 'east', (2, 2), 0.3),
+                       SeaRoute('east', (3, 5), 'west', (2, 3), 0.5)]
+
+    def simulate(self, parallel, num_years=7, exchange_years=3):
+        """
+        Returns the archipelago after simulating some years, and the
+        summary of the herbivores.
+        """
+        with Archipelago(ISLANDS, self.routes, exchange_years,
+                         parallel=parallel) as archipelago:
+            archipelago.place_animals('west', POPULATION)
+            archipelago.simulate(num_years)
+            summary = archipelago.property_summary('herbivores')
+        return archipelago, summary
+
+    def test_parallel_as_serial(self):
+        """Testing that worker processes give the same simulation. """
+        serial, serial_summary = self.simulate(parallel=False)
+        parallel, parallel_summary = self.simulate(parallel=True)
+        for species in ('herbivores', 'carnivores'):
+            nt.assert_true((serial.num_animals_by_year()[species] ==
+                            parallel.num_animals_by_year()[species]).all(),
+                           "Processes give another simulation")
+        nt.assert_true((serial.migrations() == parallel.migrations()).all())
+        nt.assert_equal(serial_summary, parallel_summary)
+
+    def test_exchanges(self):
+        """Testing that migrants move at each exchange only. """
+        self.routes = [SeaRoute('west', (2, 2), 'east', (2, 2), 1.0)]
+        archipelago, _ = self.simulate(parallel=False)
+        migrations = archipelago.migrations()
+        nt.assert_equal((2, 1), migrations.shape,
+                        "Exchanges are not every third year")
+        nt.assert_greater(migrations[0, 0], 0, "No animals migrate")
+
+        herbivores = archipelago.num_animals_by_year()['herbivores']
+        carnivores = archipelago.num_animals_by_year()['carnivores']
+        nt.assert_equal((8, 2), herbivores.shape)
+        nt.assert_true((herbivores[:3, 1] == 0).all())
+        nt.assert_equal(migrations[0, 0], herbivores[3, 1] + carnivores[3, 1],
+                        "Migrants do not arrive before the next year")
+
+        total = archipelago.total_num_by_species()
+        nt.assert_equal(total['herbivores'], herbivores[-1].sum())
+        nt.assert_equal(total['herbivores'],
+                        sum(num_herb for num_herb, _ in
+                            archipelago.number_of_animals().values()))
+
+    def test_invalid_archipelago(self):
+        """Testing that routes and populations are checked. """
+        nt.assert_raises(ValueError, Archipelago, ISLANDS,
+                         [SeaRoute('west', (3, 4), 'north', (2, 2), 0.3)],
+                         parallel=False)
+        nt.assert_raises(ValueError, Archipelago, ISLANDS,
+                         [SeaRoute('west', (1, 1), 'east', (2, 2), 0.3)],
+                         parallel=False)
+        nt.assert_raises(ValueError, Archipelago, ISLANDS,
+                         [SeaRoute('west', (3, 4), 'east', (2, 2), 1.5)],
+                         parallel=False)
+
+        with Archipelago(ISLANDS, self.routes) as archipelago:
+            nt.assert_raises(ValueError, archipelago.place_animals, 'east',
+                             [{'loc': (1, 1), 'pop': POPULATION[0]['pop']}])
+            archipelago.place_animals('east', POPULATION)
+            nt.assert_equal((40, 5), archipelago.number_of_animals()['east'],
+                            "Worker is not usable after an error")
+        nt.assert_raises(ValueError, archipelago.simulate, 1)
+
+
+def test_migrant_dtype():
+    """Testing that a migrant is a compact record. """
+    nt.assert_equal(13, MIGRANT_DTYPE.itemsize)
+    migrants = np.array([(1, 0, 5, 20.5)], dtype=MIGRANT_DTYPE)
+    nt.assert_equal(20.5, migrants['weight'][0])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the branches of a simulation in branching file.
+"""
+
+import nose.tools as nt
+from ..simulation import BioSim
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = "OOOOO\nOJJSO\nOJJJO\nOOOOO"
+HERBIVORES = [{'loc': (2, 2),
+               'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                       for _ in range(30)]}]
+CARNIVORES = [{'loc': (2, 2),
+               'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                       for _ in range(5)]}]
+
+
+def continue_sim(sim, num_years):
+    """ Simulates a branch, returning years and number of animals. """
+    sim.simulate(num_years, vis_steps=None)
+    return sim.num_years(), sim.total_num_by_species()
+
+
+def add_and_continue(sim, population):
+    """ Adds animals to a branch and simulates it. """
+    sim.add_population(population)
+    return continue_sim(sim, 5)
+
+
+def fail(sim):
+    """ Raises an exception in a branch. """
+    raise KeyError('branch')
+
+
+class TestBranches(object):
+    """
+    Tests for forking a simulation into branches.
+    """
+
+    def setup(self):
+        self.sim = BioSim(ISLAND_MAP, HERBIVORES, 1, record=True)
+        self.sim.simulate(10, vis_steps=None)
+        self.num_animals = self.sim.total_num_by_species()
+
+    def test_parallel_as_serial(self):
+        """Testing that forked branches give the same results. """
+        with self.sim.fork(3, seeds=[4, 5, 6]) as branches:
+            parallel = branches.map(add_and_continue,
+                                    [[], CARNIVORES, CARNIVORES])
+        with self.sim.fork(3, seeds=[4, 5, 6], parallel=False) as branches:
+            serial = branches.map(add_and_continue,
+                                  [[], CARNIVORES, CARNIVORES])
+        nt.assert_equal(serial, parallel, "Processes give other branches")
+        nt.assert_equal(15, parallel[0][0])
+        nt.assert_equal(0, parallel[0][1]['carnivores'])
+        nt.assert_not_equal(parallel[1], parallel[2],
+                            "Seeds do not give independent branches")
+
+    def test_shared_prefix(self):
+        """Testing that branches continue the simulation unchanged. """
+        for parallel in (True, False):
+            with self.sim.fork(2, parallel=parallel) as branches:
+                results = branches.run(continue_sim, 5)
+                nt.assert_equal(results[0], results[1])
+                nt.assert_equal(20, branches.run(continue_sim, 5)[0][0],
+                                "Branches do not keep their state")
+        nt.assert_equal(10, self.sim.num_years())
+        nt.assert_equal(self.num_animals, self.sim.total_num_by_species())
+        nt.assert_equal(11, len(self.sim.trajectory.num_herb_cells()))
+
+        self.sim.simulate(5, vis_steps=None)
+        nt.assert_equal(results[0], (15, self.sim.total_num_by_species()),
+                        "Branches do not continue the random state")
+
+    def test_errors(self):
+        """Testing that errors in branches are raised. """
+        nt.assert_raises(ValueError, self.sim.fork, 2, seeds=[1])
+        with self.sim.fork(2) as branches:
+            nt.assert_raises(KeyError, branches.run, fail)
+            nt.assert_raises(ValueError, branches.map, continue_sim, [1])
+            nt.assert_equal(2, len(branches.run(continue_sim, 1)),
+                            "Branches are not usable after an error")
+        nt.assert_raises(ValueError, branches.run, continue_sim, 1)
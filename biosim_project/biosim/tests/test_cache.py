@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the cache of simulation results in cache file.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import nose.tools as nt
+from ..cache import ResultCache, input_key, run_cached
+from ..simulation import BioSim
+from ..animals import Herbivore
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = "OOOOO\nOJJSO\nOOOOO"
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                    for _ in range(20)]}]
+
+
+class TestResultCache(object):
+    """
+    Tests for keys, hits and eviction of cached simulations.
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.herb_params = Herbivore.params.copy()
+
+    def teardown(self):
+        Herbivore.params = self.herb_params
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        """Testing that the key changes with every input. """
+        key = input_key(ISLAND_MAP, INI_POP, 1, 5)
+        nt.assert_equal(key, input_key("  OOOOO\n  OJJSO\n  OOOOO\n",
+                                       INI_POP, 1, 5))
+        nt.assert_not_equal(key, input_key(ISLAND_MAP, INI_POP, 2, 5))
+        nt.assert_not_equal(key, input_key(ISLAND_MAP, INI_POP, 1, 5,
+                                           version='0.0'))
+        Herbivore.set_parameters({'gamma': 0.5})
+        nt.assert_not_equal(key, input_key(ISLAND_MAP, INI_POP, 1, 5),
+                            "Parameters are not part of the key")
+
+    def test_hit(self):
+        """Testing that a second run returns the stored simulation. """
+        cache = ResultCache(self.directory)
+        first = run_cached(ISLAND_MAP, INI_POP, 3, 4, cache)
+        nt.assert_equal((0, 1), (cache.hits, cache.misses))
+        second = run_cached(ISLAND_MAP, INI_POP, 3, 4, cache)
+        nt.assert_equal((1, 1), (cache.hits, cache.misses))
+
+        sim = BioSim(ISLAND_MAP, INI_POP, 3)
+        sim.simulate(4)
+        nt.assert_equal(4, second.num_years())
+        nt.assert_true((first.num_herb_cells() ==
+                        second.num_herb_cells()).all())
+        totals = second.total_num_by_species()
+        nt.assert_equal(sim.total_num_by_species(),
+                        {species: totals[species][-1] for species in totals})
+
+    def test_corrupt(self):
+        """Testing that an unreadable file is simulated again. """
+        cache = ResultCache(self.directory)
+        key = input_key(ISLAND_MAP, INI_POP, 3, 2)
+        with open(os.path.join(self.directory, key + '.npz'), 'w') as f:
+            f.write('cut off')
+        nt.assert_equal(2, run_cached(ISLAND_MAP, INI_POP, 3, 2,
+                                      cache).num_years())
+        nt.assert_equal(1, cache.misses)
+        nt.assert_is_not_none(cache.get(key))
+
+    def test_eviction(self):
+        """Testing that the least recently used results are removed. """
+        cache = ResultCache(self.directory)
+        run_cached(ISLAND_MAP, INI_POP, 1, 2, cache)
+        run_cached(ISLAND_MAP, INI_POP, 2, 2, cache)
+        largest = max(os.path.getsize(os.path.join(self.directory, name))
+                      for name in os.listdir(self.directory))
+        cache.max_bytes = 2 * largest
+        past = time.time() - 10
+        for name in os.listdir(self.directory):
+            os.utime(os.path.join(self.directory, name), (past, past))
+        nt.assert_is_not_none(cache.get(input_key(ISLAND_MAP, INI_POP, 1, 2)))
+
+        run_cached(ISLAND_MAP, INI_POP, 3, 2, cache)
+        nt.assert_equal(2, len(cache))
+        nt.assert_less_equal(cache.size(), cache.max_bytes)
+        nt.assert_is_not_none(cache.get(input_key(ISLAND_MAP, INI_POP, 1, 2)),
+                              "A recently used result is removed")
+        nt.assert_is_none(cache.get(input_key(ISLAND_MAP, INI_POP, 2, 2)))
+        cache.clear()
+        nt.assert_equal(0, len(cache))
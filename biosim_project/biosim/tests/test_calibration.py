@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the calibration of parameters in calibration file.
+"""
+
+import os
+import shutil
+import tempfile
+import nose.tools as nt
+import numpy as np
+from ..calibration import (Calibrator, EvaluationCache, class_params,
+                           population_loss, simulate_counts, load_targets)
+from ..animals import Herbivore
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = "OOOOO\nOJJSO\nOOOOO"
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                    for _ in range(20)]}]
+
+
+def test_class_params():
+    """Testing that parameters are grouped by class. """
+    nt.assert_equal({'Herbivore': {'gamma': 0.3, 'F': 5},
+                     'Jungle': {'fmax': 500}},
+                    class_params({'Herbivore.gamma': 0.3, 'Herbivore.F': 5,
+                                  'Jungle.fmax': 500}))
+    nt.assert_raises(ValueError, class_params, {'gamma': 0.3})
+    nt.assert_raises(ValueError, class_params, {'Dragon.gamma': 0.3})
+    nt.assert_raises(ValueError, class_params, {'Herbivore.wings': 2})
+
+
+def test_population_loss():
+    """Testing that the loss compares replicate means with the targets. """
+    targets = np.array([[10, np.nan], [20, 5]])
+    nt.assert_equal(0, population_loss([[10, 0], [20, 5]], targets))
+    replicates = [[[5, 0], [20, 4]], [[15, 0], [20, 6]]]
+    nt.assert_equal(0, population_loss(replicates, targets),
+                    "Replicates are not averaged")
+    nt.assert_almost_equal((np.log(12) - np.log(11)) ** 2 / 3,
+                           population_loss([[11, 0], [20, 5]], targets))
+
+
+def test_simulate_counts():
+    """Testing that simulations are repeatable and restore parameters. """
+    gamma = Herbivore.params['gamma']
+    first = simulate_counts(ISLAND_MAP, INI_POP, 4,
+                            {'Herbivore': {'gamma': 0.5}}, 3)
+    nt.assert_equal(gamma, Herbivore.params['gamma'])
+    nt.assert_equal((4, 2), first.shape)
+    nt.assert_true((first == simulate_counts(
+        ISLAND_MAP, INI_POP, 4, {'Herbivore': {'gamma': 0.5}}, 3)).all())
+
+
+class TestCalibrator(object):
+    """
+    Tests for the search and the cache of simulations.
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'cache.jsonl')
+        counts = simulate_counts(ISLAND_MAP, INI_POP, 5,
+                                 {'Herbivore': {'gamma': 0.3}}, 1)
+        self.targets = {'herbivores': counts[:, 0]}
+        self.space = {'Herbivore.gamma': (0.05, 0.6)}
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def calibrator(self):
+        """ Returns a calibrator running in this process. """
+        return Calibrator(ISLAND_MAP, INI_POP, self.targets, self.space,
+                          EvaluationCache(self.filename), workers=1)
+
+    def test_cache(self):
+        """Testing that a restarted calibration does not simulate again. """
+        losses = self.calibrator().evaluate(np.array([[0.2], [0.8]]), 2)
+        nt.assert_equal(4, len(EvaluationCache(self.filename)))
+
+        with open(self.filename, 'a') as f:
+            f.write('{"key": "cut off')
+        restarted = self.calibrator()
+        restarted._run = lambda tasks: nt.assert_equal([], tasks) or []
+        nt.assert_true((losses == restarted.evaluate(
+            np.array([[0.2], [0.8]]), 2)).all())
+
+        self.calibrator().evaluate(np.array([[0.5]]), 2)
+        nt.assert_equal(6, len(EvaluationCache(self.filename)),
+                        "Simulation is lost after a line cut off")
+
+    def test_empty_cache_file(self):
+        """Testing that simulations are added to an empty cache file. """
+        open(self.filename, 'w').close()
+        cache = EvaluationCache(self.filename)
+        nt.assert_equal(0, len(cache))
+        cache.put('key', [[1, 2]])
+        nt.assert_equal([[1, 2]],
+                        EvaluationCache(self.filename).get('key').tolist())
+
+    def test_run(self):
+        """Testing that successive halving adds replicates each round. """
+        calibrator = self.calibrator()
+        result = calibrator.run(generations=2, num_candidates=4,
+                                min_replicates=1)
+        nt.assert_equal(8, result.replicates)
+        nt.assert_equal(4 + 2 + 1 + 5 + 3 + 2 + 1, len(result.history),
+                        "The best candidate does not take part again")
+        nt.assert_equal([1, 2, 4, 8], sorted(set(
+            record['replicates'] for record in result.history)))
+        gamma = result.params['Herbivore']['gamma']
+        nt.assert_true(0.05 <= gamma <= 0.6)
+        nt.assert_almost_equal(result.loss, min(
+            record['loss'] for record in result.history
+            if record['replicates'] == 8))
+
+    def test_invalid(self):
+        """Testing that targets and ranges are checked. """
+        nt.assert_raises(ValueError, Calibrator, ISLAND_MAP, INI_POP,
+                         {'herbivores': [1, 2], 'carnivores': [1]},
+                         self.space)
+        nt.assert_raises(ValueError, Calibrator, ISLAND_MAP, INI_POP,
+                         self.targets, {'Herbivore.gamma': (0.5, 2)})
+        nt.assert_raises(ValueError, Calibrator, ISLAND_MAP, INI_POP,
+                         self.targets, {'Herbivore.gamma': (0.5, 0.1)})
+
+    def test_load_targets(self):
+        """Testing that missing values are years without data. """
+        filename = os.path.join(self.directory, 'targets.csv')
+        with open(filename, 'w') as f:
+            f.write('year,herbivores,carnivores\n1,50,\n3,80,4\n')
+        targets = load_targets(filename)
+        nt.assert_equal(3, len(targets['herbivores']))
+        nt.assert_equal(80, targets['herbivores'][2])
+        nt.assert_true(np.isnan(targets['herbivores'][1]))
+        nt.assert_true(np.isnan(targets['carnivores'][0]))
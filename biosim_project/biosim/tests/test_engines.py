@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the cell engines in engines file.
+"""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import nose.tools as nt
+from ..engines import (ObjectEngine, ArrayEngine, AdaptiveEngine,
+                       make_engine, calibrate)
+from ..island_nature import Island
+from ..landscape import Jungle
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+def simulate_state(cell_engine, num_years=8):
+    """
+    Simulates an island and returns the ages and weights of the animals in
+    each cell after each year.
+    """
+    random.seed(12)
+    island = Island("OOOOO\nOJJSO\nOJDJO\nOOOOO", cell_engine=cell_engine)
+    island.place_animals([
+        {'loc': (2, 2),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(60)] +
+                [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                 for _ in range(8)]},
+        {'loc': (3, 4),
+         'pop': [{'species': 'Herbivore', 'age': 3, 'weight': 15}
+                 for _ in range(5)]}])
+
+    states = []
+    for _ in range(num_years):
+        island.annual_cycle()
+        states.append([(cell.loc,
+                        [(herb.age, herb.weight) for herb in cell.herb],
+                        [(carn.age, carn.weight) for carn in cell.carn])
+                       for cell in island.habitable_cells()])
+    return states
+
+
+def test_engines_give_same_simulation():
+    """Testing that the array path draws and decides as the object path. """
+    reference = simulate_state('object')
+    nt.assert_equal(reference, simulate_state('array'),
+                    "Array engine differs from object engine")
+    nt.assert_equal(reference, simulate_state(AdaptiveEngine(threshold=20)),
+                    "Adaptive engine differs from object engine")
+
+
+def test_adaptive_engine_chooses_by_size():
+    """Testing that large cells use the array path. """
+    small = Jungle((1, 1))
+    small.add_population([{'species': 'Herbivore', 'age': 5,
+                           'weight': 20}] * 3)
+    large = Jungle((1, 2))
+    large.add_population([{'species': 'Carnivore', 'age': 5,
+                           'weight': 20}] * 30)
+
+    engine = AdaptiveEngine(threshold=10)
+    engine.start_year([small, large])
+    nt.assert_is(engine.object_engine, engine._engine(small))
+    nt.assert_is(engine.array_engine, engine._engine(large))
+    nt.assert_is(engine.object_engine, engine._engine(Jungle((2, 2))),
+                 "Cells created during the year use the object path")
+
+
+def test_make_engine():
+    """Testing that engines are made from names. """
+    nt.assert_is_instance(make_engine(None), ObjectEngine)
+    nt.assert_is_instance(make_engine('array'), ArrayEngine)
+    engine = AdaptiveEngine()
+    nt.assert_is(engine, make_engine(engine))
+    nt.assert_raises(ValueError, make_engine, 'gpu')
+    nt.assert_is_instance(Island("OOO\nOJO\nOOO", 'auto').cell_engine,
+                          AdaptiveEngine)
+
+
+class TestCalibration(object):
+    """
+    Tests for calibration of the adaptive engine.
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_calibrate(self):
+        """Testing that calibration times each size with both engines. """
+        state = random.getstate()
+        threshold, timings = calibrate(sizes=(2, 30), repeats=1)
+        nt.assert_equal(state, random.getstate(),
+                        "Calibration changes the random state")
+        nt.assert_equal([3, 33], [timing[0] for timing in timings])
+        nt.assert_in(threshold, (3, 33, 34))
+
+    def test_from_calibration(self):
+        """Testing that the threshold is read from the calibration file. """
+        filename = os.path.join(self.directory, 'engine.json')
+        with open(filename, 'w') as f:
+            json.dump({'threshold': 17}, f)
+        nt.assert_equal(17, AdaptiveEngine.from_calibration(filename)
+                        .threshold)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the batched ensemble in ensemble file.
+"""
+
+import random
+import nose.tools as nt
+import numpy as np
+from ..ensemble import (EnsembleIsland, EnsembleSim, compare_precision,
+                        format_precision)
+from ..verification import run_ensemble, ks_two_sample, MAPS
+from ..animals import Herbivore, Carnivore
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestEnsembleIsland(object):
+    """
+    Tests for the phases of the annual cycle in all replicates.
+    """
+
+    def setup(self):
+        """ Creates two replicates of a jungle cell next to a savannah. """
+        self.island = EnsembleIsland("OOOO\nOJSO\nOOOO", [1, 2])
+        self.herbs = [{'loc': (2, 2),
+                       'pop': [{'species': 'Herbivore', 'age': 5,
+                                'weight': 20.0} for _ in range(10)]}]
+        self.copy_params_herb = Herbivore.params.copy()
+        self.copy_params_carn = Carnivore.params.copy()
+
+    def teardown(self):
+        """ Restores the parameters of the animals. """
+        Herbivore.params = self.copy_params_herb
+        Carnivore.params = self.copy_params_carn
+
+    def test_place_animals(self):
+        """Testing that animals are placed in every replicate. """
+        self.island.place_animals(self.herbs)
+        num_herb, num_carn = self.island.number_of_animals()
+        nt.assert_list_equal([10, 10], list(num_herb))
+        nt.assert_list_equal([0, 0], list(num_carn))
+        nt.assert_equal((2, 3, 4), self.island.num_herb_in_cells().shape)
+        nt.assert_equal(10, self.island.num_herb_in_cells()[1, 1, 1])
+        nt.assert_raises(ValueError, self.island.place_animals,
+                         [{'loc': (1, 1), 'pop': self.herbs[0]['pop']}])
+        nt.assert_raises(ValueError, EnsembleIsland, "OOO\nOJO\nOOO", [])
+
+    def test_herb_eating(self):
+        """Testing that the fittest herbivores eat first. """
+        self.island.place_animals([{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': age, 'weight': 20.0}
+            for age in (30, 1, 10)]}])
+        self.island.fodder[:, 0] = 25
+        self.island.all_herb_eating()
+        beta = Herbivore.params['beta']
+        properties = self.island.animal_properties('herbivores')
+        gain = dict(zip(properties['age'][:3], properties['weight'][:3] - 20))
+        nt.assert_almost_equal(10 * beta, gain[1])
+        nt.assert_almost_equal(10 * beta, gain[10])
+        nt.assert_almost_equal(5 * beta, gain[30],
+                               msg="Least fit herbivore gets the rest")
+        nt.assert_list_equal([0, 0], list(self.island.fodder[:, 0]))
+
+    def test_carn_eating(self):
+        """Testing that carnivores kill until they have eaten F. """
+        Carnivore.set_parameters({'DeltaPhiMax': 0.01})
+        self.island.place_animals(self.herbs + [{'loc': (2, 2), 'pop': [
+            {'species': 'Carnivore', 'age': 5, 'weight': 40.0}]}])
+        self.island.all_carn_eating()
+        nt.assert_list_equal([7, 7],
+                             list(self.island.number_of_animals()[0]))
+        nt.assert_almost_equal(
+            40 + Carnivore.params['beta'] * Carnivore.params['F'],
+            self.island.animal_properties('carnivores')['weight'][0])
+
+        weak = EnsembleIsland("OOO\nOJO\nOOO", [1])
+        weak.place_animals(self.herbs + [{'loc': (2, 2), 'pop': [
+            {'species': 'Carnivore', 'age': 90, 'weight': 1.0}]}])
+        weak.all_carn_eating()
+        nt.assert_equal(10, weak.number_of_animals()[0][0],
+                        "Carnivore kills fitter herbivores")
+
+    def test_birth(self):
+        """Testing that newborns are added with age zero. """
+        self.island.place_animals([{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': 5, 'weight': 50.0}] * 10}])
+        self.island.animals_give_birth()
+        properties = self.island.animal_properties('herbivores')
+        newborns = properties['age'] == 0
+        nt.assert_greater(newborns.sum(), 0, "No animals are born")
+        nt.assert_equal(len(properties['age']),
+                        self.island.number_of_animals()[0].sum())
+        nt.assert_true((properties['weight'][~newborns] <= 50).all(),
+                       "Mothers do not lose weight")
+
+    def test_migration(self):
+        """Testing that migration moves animals without losing any. """
+        self.island.place_animals(self.herbs)
+        self.island.animals_migrate()
+        herbivores = self.island.num_herb_in_cells()
+        nt.assert_greater(herbivores[:, 1, 2].sum(), 0,
+                          "No herbivores migrate")
+        nt.assert_list_equal([10, 10], list(herbivores.sum(axis=(1, 2))))
+
+    def test_aging_weight_loss_and_death(self):
+        """Testing aging, weight loss and death of all replicates. """
+        self.island.place_animals(self.herbs)
+        self.island.all_animals_aging()
+        self.island.all_animals_lose_weight()
+        properties = self.island.animal_properties('herbivores')
+        nt.assert_true((properties['age'] == 6).all())
+        nt.assert_true(np.allclose(
+            20 * (1 - Herbivore.params['eta']), properties['weight']))
+
+        Herbivore.set_parameters({'omega': 0})
+        self.island.animals_die()
+        nt.assert_list_equal([10, 10],
+                             list(self.island.number_of_animals()[0]))
+
+    def test_replicates_are_independent(self):
+        """Testing that a replicate does not depend on the others. """
+        pop = self.herbs + [{'loc': (2, 2), 'pop': [
+            {'species': 'Carnivore', 'age': 5, 'weight': 20.0}] * 3}]
+        together = EnsembleIsland("OOOOO\nOJJSO\nOOOOO", [3, 4, 5])
+        alone = EnsembleIsland("OOOOO\nOJJSO\nOOOOO", [4])
+        for island in (together, alone):
+            island.place_animals(pop)
+            for _ in range(5):
+                island.annual_cycle()
+
+        nt.assert_true((together.num_herb_in_cells()[1] ==
+                        alone.num_herb_in_cells()[0]).all())
+        properties = together.animal_properties('herbivores')
+        nt.assert_true(np.allclose(
+            np.sort(properties['weight'][properties['replicate'] == 1]),
+            np.sort(alone.animal_properties('herbivores')['weight'])))
+
+
+def test_ensemble_sim():
+    """Testing that queries give a result for each replicate. """
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(10)]}]
+    sim = EnsembleSim("OOOO\nOJSO\nOOOO", ini_pop, 1, 4)
+    sim.simulate(3)
+    nt.assert_equal(3, sim.num_years())
+    nt.assert_equal((4,), sim.total_num_animals().shape)
+    nt.assert_equal((4, 4), sim.num_animals_by_year()['herbivores'].shape)
+    nt.assert_equal((4, 3, 4), sim.num_animals_per_cell()['carnivores'].shape)
+    nt.assert_true((sim.total_num_by_species()['herbivores'] ==
+                    sim.num_animals_per_cell()['herbivores'].sum(
+                        axis=(1, 2))).all())
+
+
+def test_same_model_as_island():
+    """Testing that the ensemble gives the distribution of the island. """
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+    state = random.getstate()
+    reference = run_ensemble('object', MAPS['jungle'], ini_pop, 6,
+                             range(1, 41))
+    random.setstate(state)
+    sim = EnsembleSim(MAPS['jungle'], ini_pop, 1, 40)
+    sim.simulate(6)
+
+    for species in ('herbivores', 'carnivores'):
+        _, p_value = ks_two_sample(reference[species],
+                                   sim.total_num_by_species()[species])
+        nt.assert_greater(p_value, 0.001,
+                          "Ensemble differs for {}".format(species))
+
+
+def test_compact_store():
+    """Testing that the compact store keeps its dtypes through a year. """
+    island = EnsembleIsland("OOOOO\nOJJSO\nOOOOO", [1, 2], compact=True)
+    island.place_animals([{'loc': (2, 2),
+                           'pop': [{'species': 'Herbivore', 'age': 5,
+                                    'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5,
+                                    'weight': 30} for _ in range(4)]}])
+    for _ in range(3):
+        island.annual_cycle()
+    for animals in island.animals:
+        nt.assert_equal(np.uint16, animals.age.dtype)
+        nt.assert_equal(np.float32, animals.weight.dtype)
+        nt.assert_equal(14 * len(animals), animals.nbytes)
+    nt.assert_equal(14, island.bytes_per_animal())
+    nt.assert_equal(24, EnsembleIsland("OOO\nOJO\nOOO", [1])
+                    .bytes_per_animal())
+    properties = island.animal_properties('herbivores')
+    nt.assert_equal(float, properties['weight'].dtype)
+
+
+def test_compare_precision():
+    """
+    Testing that storing the animals in reduced precision gives the same
+    distribution of counts.
+    """
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+    result = compare_precision(MAPS['jungle'], ini_pop, 6, 40)
+    nt.assert_equal((7, 40), result['compact_herb'].shape)
+    for species in ('herb', 'carn'):
+        nt.assert_true((result['double_' + species][0] ==
+                        result['compact_' + species][0]).all())
+        _, p_value = ks_two_sample(result['double_' + species][-1],
+                                   result['compact_' + species][-1])
+        nt.assert_greater(p_value, 0.001,
+                          "Compact store differs for {}".format(species))
+    nt.assert_equal(9, len(format_precision(result).splitlines()))
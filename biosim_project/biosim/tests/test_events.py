@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the event counts and life histories in events file.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import nose.tools as nt
+import numpy as np
+from ..events import LifeHistories, EVENTS, load_histories
+from ..island_nature import Island
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = """OOOOOOO
+                OJJSJJO
+                OJDJSJO
+                OOOOOOO"""
+POPULATION = [{'loc': (2, 2),
+               'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                       for _ in range(100)] +
+                      [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                       for _ in range(20)]}]
+
+
+def test_reservoir_uniform():
+    """Testing that every animal offered is tracked with equal chance. """
+    tracked = np.zeros(400)
+    for seed in range(1000):
+        histories = LifeHistories(10, seed=seed)
+        animals = list(range(400))
+        for start, stop in ((0, 3), (3, 150), (150, 151), (151, 400)):
+            histories.offer(animals[start:stop], 0, (1, 1))
+        nt.assert_equal(10, len(histories._tracked))
+        for _, _, animal, _ in histories._tracked:
+            tracked[animal] += 1
+    quarters = tracked.reshape(4, 100).sum(axis=1)
+    nt.assert_true((np.abs(quarters - 2500) < 150).all(),
+                   "Sample is not uniform: {}".format(quarters))
+
+
+class TestCellEvents(object):
+    """
+    Tests for recording events and life histories on an island.
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def simulate(num_years, cell_engine=None, **options):
+        """ Returns the island after some years, and its events. """
+        random.seed(12)
+        island = Island(ISLAND_MAP, cell_engine)
+        island.place_animals(POPULATION)
+        events = island.enable_events(**options) if options else None
+        for _ in range(num_years):
+            island.annual_cycle()
+        return island, events
+
+    def test_counts(self):
+        """Testing that the events explain the change in population. """
+        island, events = self.simulate(5, num_tracked=0)
+        stats = island.enable_instrumentation()
+        island.disable_events()
+        events = island.enable_events()
+        island.annual_cycle()
+        nt.assert_list_equal([6], events.years)
+        totals = events.totals()
+        record = stats.records[0]
+        nt.assert_equal(record.births['herbivores'], totals['herb_births'][0])
+        nt.assert_equal(record.deaths['carnivores'], totals['carn_deaths'][0])
+        nt.assert_equal(record.kills, totals['kills'][0])
+        nt.assert_equal(record.migrations['herbivores'],
+                        totals['herb_migrations'][0])
+        nt.assert_equal((1, len(EVENTS), 4, 7), events.counts().shape)
+        nt.assert_equal(0, events.counts('herb_births')[0, 2, 2],
+                        "Births counted in the desert")
+
+        _, other = self.simulate(6, cell_engine='array', num_tracked=0)
+        _, same = self.simulate(6, num_tracked=0)
+        nt.assert_true((same.counts() == other.counts()).all(),
+                       "Engines count other events")
+
+    def test_simulation_unchanged(self):
+        """Testing that recording does not change the simulation. """
+        island, _ = self.simulate(6)
+        tracked, _ = self.simulate(6, num_tracked=20, seed=3)
+        nt.assert_true((island.num_herb_in_cells() ==
+                        tracked.num_herb_in_cells()).all())
+        nt.assert_true((island.num_carn_in_cells() ==
+                        tracked.num_carn_in_cells()).all())
+
+    def test_life_histories(self):
+        """Testing that tracked animals are recorded where they live. """
+        filename = os.path.join(self.directory, 'histories.bin')
+        island, events = self.simulate(6, num_tracked=20,
+                                       history_file=filename, seed=3)
+        island.disable_events()
+        records = load_histories(filename)
+        nt.assert_equal(23, records.itemsize)
+        nt.assert_true(0 < (records['year'] == 1).sum() <= 20,
+                       "Animals alive are not recorded")
+
+        last = records[records['year'] == 6]
+        animals = {0: [], 1: []}
+        for cell in island.habitable_cells():
+            animals[0] += [(cell.loc, herb.age) for herb in cell.herb]
+            animals[1] += [(cell.loc, carn.age) for carn in cell.carn]
+        for record in last:
+            nt.assert_in(((record['row'], record['col']), record['age']),
+                         animals[record['species']])
+
+        for num in np.unique(records['id']):
+            ages = records['age'][records['id'] == num]
+            nt.assert_true((np.diff(ages) == 1).all(),
+                           "Life history is not followed")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for ImageExporter class in export file.
+"""
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+import matplotlib.image
+from ..export import ImageExporter
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestImageExporter(object):
+    """Collects tests that save images to a temporary directory. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.map_one = """OOOOO
+                          OJSMO
+                          ODJJO
+                          OOOOO"""
+        self.cells = np.zeros((4, 5))
+
+    def teardown(self):
+        """ Executed after each test in class to clean up."""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_all_frames_saved(self):
+        """
+        Testing that all recorded frames are saved when the exporter is
+        closed, also when they are split into several chunks.
+        """
+        exporter = ImageExporter(self.map_one, processes=2, chunk_size=2)
+        exporter.start(5)
+
+        filenames = []
+        for step in range(5):
+            filenames.append(os.path.join(self.tmp_dir,
+                                          'dv_{:05d}.png'.format(step)))
+            exporter.add_frame(filenames[-1], step, self.cells, self.cells)
+            exporter.add_num_animals(10 * step, step)
+        exporter.close()
+
+        for filename in filenames:
+            nt.assert_true(os.path.exists(filename),
+                           "Image {} is not saved".format(filename))
+
+    def test_image_size(self):
+        """Testing that saved images have the size of the figure. """
+        exporter = ImageExporter(self.map_one, processes=1)
+        exporter.start(1)
+        filename = os.path.join(self.tmp_dir, 'dv_00000.png')
+        exporter.add_frame(filename, 0, self.cells, self.cells)
+        exporter.close()
+
+        nt.assert_equal((800, 1200, 4),
+                        matplotlib.image.imread(filename).shape,
+                        "Saved image has wrong size")
+
+    def test_finish_counts_frames(self):
+        """Testing that finish returns number of frames saved. """
+        exporter = ImageExporter(self.map_one, processes=1, chunk_size=2)
+        exporter.start(3)
+        for step in range(3):
+            exporter.add_frame(os.path.join(self.tmp_dir,
+                                            'dv_{:05d}.png'.format(step)),
+                               step, self.cells, self.cells)
+            exporter.add_num_animals(5, 5)
+
+        nt.assert_equal(3, exporter.finish(), "Wrong number of frames saved")
+        exporter.close()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the fodder parameters of each cell in fodder file.
+"""
+
+import os
+import shutil
+import tempfile
+import tracemalloc
+import nose.tools as nt
+import numpy as np
+from ..fodder import load_grid
+from ..island_nature import Island
+from ..meanfield import MeanFieldIsland
+from ..simulation import BioSim
+from ..landscape import Jungle, Savannah
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = "OOOOO\nOJSDO\nOJSSO\nOOOOO"
+NAN = np.nan
+
+
+class TestFodderGrids(object):
+    """
+    Tests for fodder growing with parameters for each cell.
+    """
+
+    def setup(self):
+        self.jungle_params = Jungle.params.copy()
+        self.savannah_params = Savannah.params.copy()
+        self.directory = tempfile.mkdtemp()
+        self.fmax = np.array([[NAN, NAN, NAN, NAN, NAN],
+                              [NAN, 100, 50, NAN, NAN],
+                              [NAN, NAN, 10, NAN, NAN],
+                              [NAN, NAN, NAN, NAN, NAN]])
+
+    def teardown(self):
+        Jungle.params = self.jungle_params
+        Savannah.params = self.savannah_params
+        shutil.rmtree(self.directory)
+
+    def test_growth(self):
+        """Testing that each cell grows with its own parameters. """
+        alpha = np.full((4, 5), 0.5)
+        island = Island(ISLAND_MAP, fodder_params={'fmax': self.fmax,
+                                                   'alpha': alpha})
+        nt.assert_equal(100, island.get_cell(1, 1).available_food,
+                        "Cells do not start with their fmax")
+        nt.assert_equal(Jungle.params['fmax'], island.fodder[2, 1],
+                        "NaN does not use the parameter of the landscape")
+        nt.assert_equal(0, island.fodder[1, 3])
+
+        island.get_cell(1, 2).available_food = 0
+        island.get_cell(2, 3).available_food = 0
+        island.food_growth_in_all_cells()
+        nt.assert_equal(25, island.get_cell(1, 2).available_food)
+        nt.assert_equal(Savannah.params['fmax'] / 2, island.fodder[2, 3])
+
+        Jungle.set_parameters({'fmax': 400})
+        island.food_growth_in_all_cells()
+        nt.assert_equal(400, island.fodder[2, 1],
+                        "Changed landscape parameters are not used")
+
+    def test_schedule(self):
+        """Testing that parameters change in the years given. """
+        island = Island(ISLAND_MAP, fodder_schedule={
+            3: {'fmax': self.fmax}, 2: {'fmax': np.full((4, 5), 20.0)}})
+        nt.assert_equal(Jungle.params['fmax'], island.fodder[1, 1])
+        for fmax in (Jungle.params['fmax'], 20, 100, 100):
+            island.annual_cycle()
+            nt.assert_equal(fmax, island.fodder[1, 1])
+
+        island.set_fodder_params({'fmax': np.full((4, 5), 5.0)})
+        nt.assert_equal(100, island.fodder[1, 1],
+                        "Fodder is reset after the first year")
+        island.annual_cycle()
+        nt.assert_equal(5, island.fodder[1, 1])
+
+    def test_large_empty_map(self):
+        """
+        Testing that a year on a large map without animals does not allocate
+        arrays of the size of the map, with or without arrays given.
+        """
+        size = 400
+        rows = (['O' * size] +
+                ['O' + ('JS' * size)[:size - 2] + 'O'] * (size - 2) +
+                ['O' * size])
+        fmax = np.full((size, size), NAN)
+        fmax[1:-1, 1] = 500
+        for params in ({}, {'fmax': fmax}):
+            island = Island('\n'.join(rows), fodder_params=params)
+            fodder = island.fodder.copy()
+            tracemalloc.start()
+            try:
+                island.annual_cycle()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            nt.assert_less(peak, island.fodder.nbytes / 100,
+                           "Arrays of the size of the map are allocated")
+            nt.assert_true(np.array_equal(fodder, island.fodder),
+                           "Fodder of cells not eaten from is changed")
+
+    def test_invalid(self):
+        """Testing that parameters are checked. """
+        nt.assert_raises(ValueError, Island, ISLAND_MAP,
+                         fodder_params={'fmax': np.zeros((3, 5))})
+        nt.assert_raises(ValueError, Island, ISLAND_MAP,
+                         fodder_params={'alpha': np.full((4, 5), 1.5)})
+        nt.assert_raises(ValueError, Island, ISLAND_MAP,
+                         fodder_params={'F': np.zeros((4, 5))})
+
+    def test_load_grid(self):
+        """Testing that rasters are loaded with missing values as NaN. """
+        filename = os.path.join(self.directory, 'fmax.asc')
+        with open(filename, 'w') as f:
+            f.write('ncols 5\nnrows 4\nxllcorner 0\nyllcorner 0\n'
+                    'cellsize 1\nNODATA_value -9999\n')
+            for row in np.nan_to_num(self.fmax, nan=-9999):
+                f.write(' '.join(str(value) for value in row) + '\n')
+        grid = load_grid(filename)
+        nt.assert_true(np.array_equal(self.fmax, grid, equal_nan=True))
+
+        np.save(os.path.join(self.directory, 'fmax.npy'), self.fmax)
+        island = Island(ISLAND_MAP, fodder_params={
+            'fmax': os.path.join(self.directory, 'fmax.npy')})
+        nt.assert_equal(10, island.fodder[2, 2])
+
+        with open(filename, 'w') as f:
+            f.write('ncols 4\nnrows 1\n1 2 3\n')
+        nt.assert_raises(ValueError, load_grid, filename)
+
+    def test_engines(self):
+        """Testing that the mean-field island uses the parameters. """
+        island = MeanFieldIsland(ISLAND_MAP, fodder_params={'fmax': self.fmax})
+        nt.assert_equal([100, 50, 0, Jungle.params['fmax'], 10,
+                         Savannah.params['fmax']], list(island.fodder))
+
+        sim = BioSim(ISLAND_MAP, [], 1,
+                     engine_options={'fodder_params': {'fmax': self.fmax}})
+        nt.assert_equal(50, sim._island.fodder[1, 2])
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for Instrumentation class in instrumentation file.
+"""
+
+import nose.tools as nt
+import random
+from ..island_nature import Island
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestInstrumentation(object):
+    """Collects tests that use the same populated island. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        random.seed(12)
+        self.island = Island("""OOOOOOO
+                                OJJSJJO
+                                OJDJSJO
+                                OOOOOOO""")
+        self.island.place_animals(
+            [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                      for _ in range(100)] +
+                     [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                      for _ in range(20)]}])
+
+    def test_disabled_by_default(self):
+        """Testing that no records are made unless enabled. """
+        self.island.annual_cycle()
+        nt.assert_is_none(self.island.instrumentation,
+                          "Instrumentation is enabled by default")
+
+    def test_records_every_phase(self):
+        """Testing that every phase is timed and counted each year. """
+        stats = self.island.enable_instrumentation()
+        for _ in range(3):
+            self.island.annual_cycle()
+
+        nt.assert_list_equal([1, 2, 3],
+                             [record.year for record in stats.records],
+                             "Years are not numbered")
+        for record in stats.records:
+            nt.assert_set_equal(set(Island.annual_phases),
+                                set(record.phase_times),
+                                "Phase is not timed")
+            nt.assert_true(all(seconds >= 0 for seconds in
+                               record.phase_times.values()),
+                           "Negative phase time")
+        nt.assert_equal(120, stats.records[0].animals_processed[
+            'food_growth_in_all_cells'], "Wrong number of animals processed")
+
+    def test_events_balance_population(self):
+        """
+        Testing that births, deaths and kills explain the change in
+        population.
+        """
+        stats = self.island.enable_instrumentation()
+        for _ in range(5):
+            num_herb, num_carn = self.island.number_of_animals()
+            self.island.annual_cycle()
+            record = stats.records[-1]
+
+            nt.assert_equal(num_herb + record.births['herbivores'] -
+                            record.deaths['herbivores'] - record.kills,
+                            self.island.number_of_animals()[0],
+                            "Herbivore events do not add up")
+            nt.assert_equal(num_carn + record.births['carnivores'] -
+                            record.deaths['carnivores'],
+                            self.island.number_of_animals()[1],
+                            "Carnivore events do not add up")
+
+    def test_migrations_counted(self):
+        """Testing that animals leaving the crowded cell are counted. """
+        stats = self.island.enable_instrumentation()
+        self.island.annual_cycle()
+        nt.assert_greater(stats.records[0].migrations['herbivores'], 0,
+                          "Migrations are not counted")
+
+    def test_first_year(self):
+        """Testing that records start at the next year simulated. """
+        self.island.annual_cycle()
+        self.island.annual_cycle()
+        stats = self.island.enable_instrumentation()
+        self.island.annual_cycle()
+        nt.assert_equal(3, stats.records[0].year,
+                        "Record is not numbered by the year simulated")
+
+    def test_disable(self):
+        """Testing that records are kept, but no new years are recorded. """
+        self.island.enable_instrumentation()
+        self.island.annual_cycle()
+        stats = self.island.disable_instrumentation()
+        self.island.annual_cycle()
+
+        nt.assert_equal(1, len(stats.records), "Year recorded when disabled")
+        nt.assert_equal(1, len(stats.as_dicts()), "Records are not converted")
+        nt.assert_set_equal(set(Island.annual_phases),
+                            set(stats.phase_totals()),
+                            "Phase totals are missing")
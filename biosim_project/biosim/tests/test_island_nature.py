@@ -4,6 +4,7 @@
 Tests for island class.
 """
 
+import random
 import plmock
 import nose.tools as nt
 import numpy as np
@@ -61,6 +62,49 @@ def test_island_map():
                                   "Cell is not initialized correctly")
 
 
+def test_terrain():
+    """Testing that the map is parsed to an array of landscape codes. """
+    isl = Island("""OOOO
+                    ODJO
+                    OMSO
+                    OOOO""")
+    nt.assert_list_equal([[0, 0, 0, 0], [0, 2, 4, 0], [0, 1, 3, 0],
+                          [0, 0, 0, 0]], isl.terrain.tolist(),
+                         "Wrong landscape codes")
+    nt.assert_raises(ValueError, Island, u"""OOO
+                                             O\u00e6O
+                                             OOO""")
+
+
+def test_cells_created_when_used():
+    """
+    Testing that habitable cells are created when used, and that ocean and
+    mountain cells are shared.
+    """
+    isl = Island("""OOOOO
+                    OJSMO
+                    OMJJO
+                    OOOOO""")
+    nt.assert_list_equal([], isl.habitable_cells(), "Cells created at start")
+    nt.assert_is(isl.island_map[0][0], isl.island_map[3][4],
+                 "Ocean cells are not shared")
+    nt.assert_is(isl.island_map[1][3], isl.island_map[2][1],
+                 "Mountain cells are not shared")
+
+    cell = isl.island_map[2][3]
+    nt.assert_is(cell, isl.get_cell(2, 3), "Cell is created twice")
+    nt.assert_tuple_equal((2, 3), cell.loc, "Cell has wrong location")
+    nt.assert_is(isl.island_map[-1][-1], isl.island_map[3][4],
+                 "Negative index is not supported")
+    nt.assert_list_equal([cell], isl.habitable_cells(),
+                         "Only the used cell should be created")
+
+    isl.island_map[1][1]
+    nt.assert_list_equal([(1, 1), (2, 3)],
+                         [c.loc for c in isl.habitable_cells()],
+                         "Cells are not in row order")
+
+
 def test_location_does_not_exist():
     """
     Testing that ValueError is raised when location does not exist on map.
@@ -105,9 +149,6 @@ class TestAnnualProcesses(object):
     # noinspection PyAttributeOutsideInit
     def setup(self):
         """ Executed before each test in class to prepare for test. """
-        self.copy_food_growth_landscape = Landscape.food_growth
-        self.copy_food_growth_jungle = Jungle.food_growth
-        self.copy_food_growth_savannah = Savannah.food_growth
         self.copy_herb_eating = Landscape.herb_eating
         self.copy_carn_eating = Landscape.carn_eating
         self.copy_animal_birth = Landscape.animal_birth
@@ -122,13 +163,22 @@ class TestAnnualProcesses(object):
                       OJSMO
                       ODJOO
                       OOOOO"""
-        self.num_calls = 20
+        self.num_calls = 4
+
+    def island_with_all_cells(self):
+        """
+        Creates the island and all its habitable cells, which are otherwise
+        created when first used.
+
+        :return: class instance of the island
+        """
+        island = Island(self.map)
+        for row in island.island_map:
+            list(row)
+        return island
 
     def teardown(self):
         """ Executed after each test in class to clean up."""
-        Landscape.food_growth = self.copy_food_growth_landscape
-        Jungle.food_growth = self.copy_food_growth_jungle
-        Savannah.food_growth = self.copy_food_growth_savannah
         Landscape.herb_eating = self.copy_herb_eating
         Landscape.carn_eating = self.copy_carn_eating
         Landscape.animal_birth = self.copy_animal_birth
@@ -139,53 +189,24 @@ class TestAnnualProcesses(object):
         Landscape.animal_weight_change = self.copy_animal_lose_weight
         Landscape.animal_death = self.copy_animal_death
 
-    def test_food_growth_landscape(self):
-        """
-        Testing that food_growth method is called a correct number of times for
-        the landscape class.
-        """
-        food_growth_mocker = plmock.FixedValueMethodMocker()
-        Landscape.food_growth = food_growth_mocker.get_method()
-
-        island = Island(self.map)
-        island.food_growth_in_all_cells()
-        num_landscape = 17
-
-        nt.assert_equal(num_landscape, food_growth_mocker.num_calls(),
-                        "Food_growth method is called an incorrect number of "
-                        "times for landscape")
-
-    def test_food_growth_jungle(self):
+    def test_food_growth(self):
         """
-        Testing that food_growth method is called a correct number of times for
-        the jungle class.
+        Testing that fodder grows in all cells in one update of the fodder
+        array of the island, which is shared with the cells.
         """
-        food_growth_mocker = plmock.FixedValueMethodMocker()
-        Jungle.food_growth = food_growth_mocker.get_method()
-
-        island = Island(self.map)
+        island = self.island_with_all_cells()
+        island.island_map[1][1].available_food = 100
+        island.island_map[1][2].available_food = 100
         island.food_growth_in_all_cells()
-        num_jung = 2
 
-        nt.assert_equal(num_jung, food_growth_mocker.num_calls(),
-                        "Food_growth is called an incorrect number of times for"
-                        "jungle")
-
-    def test_food_growth_savannah(self):
-        """
-        Testing that food_growth method is called a correct number of times for
-        the savannah class
-        """
-        food_growth_mocker = plmock.FixedValueMethodMocker()
-        Savannah.food_growth = food_growth_mocker.get_method()
-
-        island = Island(self.map)
-        island.food_growth_in_all_cells()
-        num_sav = 1
-
-        nt.assert_equal(num_sav, food_growth_mocker.num_calls(),
-                        "Food_growth is called an incorrect number of times for"
-                        "savannah")
+        nt.assert_equal(Jungle.params['fmax'], island.fodder[1, 1],
+                        "Fodder in jungle does not grow to fmax")
+        nt.assert_equal(100 + Savannah.params['alpha'] *
+                        (Savannah.params['fmax'] - 100), island.fodder[1, 2])
+        nt.assert_equal(island.fodder[1, 2],
+                        island.island_map[1][2].available_food)
+        nt.assert_equal(0, island.island_map[2][1].available_food,
+                        "Fodder grows in the desert")
 
     def test_all_animals_aging(self):
         """
@@ -194,7 +215,7 @@ class TestAnnualProcesses(object):
         aging_mocker = plmock.FixedValueMethodMocker()
         Landscape.animal_aging = aging_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.all_animals_aging()
 
         nt.assert_equal(self.num_calls, aging_mocker.num_calls(),
@@ -210,7 +231,7 @@ class TestAnnualProcesses(object):
         weight_mocker = plmock.FixedValueMethodMocker()
         Landscape.animal_weight_change = weight_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.all_animals_lose_weight()
 
         nt.assert_equal(self.num_calls, weight_mocker.num_calls(),
@@ -225,7 +246,7 @@ class TestAnnualProcesses(object):
         herb_eat_mocker = plmock.FixedValueMethodMocker()
         Landscape.herb_eating = herb_eat_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.all_herb_eating()
 
         nt.assert_equal(self.num_calls, herb_eat_mocker.num_calls(),
@@ -240,7 +261,7 @@ class TestAnnualProcesses(object):
         carn_eat_mocker = plmock.FixedValueMethodMocker()
         Landscape.carn_eating = carn_eat_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.all_carn_eating()
 
         nt.assert_equal(self.num_calls, carn_eat_mocker.num_calls(),
@@ -255,7 +276,7 @@ class TestAnnualProcesses(object):
         animal_birth_mocker = plmock.FixedValueMethodMocker()
         Landscape.animal_birth = animal_birth_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.animals_give_birth()
 
         nt.assert_equal(self.num_calls, animal_birth_mocker.num_calls(),
@@ -274,16 +295,22 @@ class TestAnnualProcesses(object):
         immigrants_mocker = plmock.FixedValueMethodMocker()
         Landscape.add_immigrants_to_pop = immigrants_mocker.get_method()
 
-        isl = Island(self.map)
+        isl = self.island_with_all_cells()
+        isl.place_animals([{'loc': loc,
+                            'pop': [{'species': 'Herbivore', 'age': 5,
+                                     'weight': 20},
+                                    {'species': 'Carnivore', 'age': 5,
+                                     'weight': 20}]}
+                           for loc in ((2, 2), (2, 3), (3, 2), (3, 3))])
         isl.animals_migrate()
 
-        nt.assert_equal(6, herb_migrate_mocker.num_calls(),
+        nt.assert_equal(4, herb_migrate_mocker.num_calls(),
                         "Herb_migration method is called an incorrect number "
                         "of times")
-        nt.assert_equal(6, carn_migrate_mocker.num_calls(),
+        nt.assert_equal(4, carn_migrate_mocker.num_calls(),
                         "Carn_migration method is called an incorrect number "
                         "of times")
-        nt.assert_equal(12, immigrants_mocker.num_calls(),
+        nt.assert_equal(8, immigrants_mocker.num_calls(),
                         "Add_immigrants_to_pop method is called an incorrect "
                         "number of times")
 
@@ -295,7 +322,7 @@ class TestAnnualProcesses(object):
         animal_death_mocker = plmock.FixedValueMethodMocker()
         Landscape.animal_death = animal_death_mocker.get_method()
 
-        island = Island(self.map)
+        island = self.island_with_all_cells()
         island.animals_die()
 
         nt.assert_equal(self.num_calls, animal_death_mocker.num_calls(),
@@ -305,8 +332,8 @@ class TestAnnualProcesses(object):
 
 def test_randomize_cell_structure():
     """
-    Testing that cells at the edge of the map is not included in the returned
-    list of randomized cells.
+    Testing that only habitable cells which are created are included in the
+    returned list of randomized cells.
     """
     map_one = """OOOOO
                  OJSMO
@@ -314,7 +341,17 @@ def test_randomize_cell_structure():
                  OOOOO"""
 
     island_one = Island(map_one)
-    nt.assert_equal(6, len(island_one.randomize_cell_structure()),
+    nt.assert_equal(0, len(island_one.randomize_cell_structure()),
+                    "Cells are created before they are used")
+    island_one.place_animals([{'loc': (2, 2),
+                               'pop': [{'species': 'Herbivore', 'age': 5,
+                                        'weight': 20}]}])
+    nt.assert_list_equal([island_one.island_map[1][1]],
+                         island_one.randomize_cell_structure(),
+                         "Wrong list returned")
+    for row in island_one.island_map:
+        list(row)
+    nt.assert_equal(4, len(island_one.randomize_cell_structure()),
                     "Wrong length of returned list")
     map_two = """OO
                  OO"""
@@ -326,6 +363,27 @@ def test_randomize_cell_structure():
                          "Wrong list returned")
 
 
+def test_migration_creates_only_cells_moved_into():
+    """
+    Testing that migration only creates the cells animals move into, so
+    cells without animals do not create their neighbours.
+    """
+    island_map = '\n'.join(['O' * 60] + ['O' + 'J' * 58 + 'O'] * 58 +
+                           ['O' * 60])
+    random.seed(5)
+    island = Island(island_map)
+    island.place_animals([{'loc': (30, 30),
+                           'pop': [{'species': 'Herbivore', 'age': 5,
+                                    'weight': 20}]}])
+    visited = set()
+    for _ in range(10):
+        island.annual_cycle()
+        visited.update(cell.loc for cell in island.habitable_cells()
+                       if cell.herb)
+    nt.assert_less_equal(len(island.habitable_cells()), len(visited) + 1)
+    nt.assert_less(len(island.habitable_cells()), 20)
+
+
 def test_get_neighbours():
     """Testing that list of correct neighbour classes is returned. """
     island_map = """OOOOO
@@ -347,8 +405,8 @@ class TestPopulation(object):
     # noinspection PyAttributeOutsideInit
     def setup(self):
         """ Executed before each test in class to prepare for test. """
-        self.copy_params_herb = Herbivore.params
-        self.copy_params_carn = Carnivore.params
+        self.copy_params_herb = Herbivore.params.copy()
+        self.copy_params_carn = Carnivore.params.copy()
         self.copy_prob_carn_kill = Carnivore.prob_kill
         self.map_one = """OOOOO
                           OJSMO
@@ -461,3 +519,42 @@ class TestPopulation(object):
         nt.assert_true((carnivores == isl.num_carn_in_cells()).all(),
                        "Returns wrong array of number of carnivores in each "
                        "cell")
+
+    def test_animal_properties(self):
+        """
+        Testing that age, weight and fitness are collected for all animals of
+        the given species.
+        """
+        isl = Island(self.map_one)
+        isl.place_animals(self.pop)
+        props = isl.animal_properties('herbivores')
+
+        nt.assert_list_equal([5, 7, 8, 9, 9], sorted(props['age']),
+                             "Wrong ages collected")
+        nt.assert_list_equal([13, 13, 18, 20, 22], sorted(props['weight']),
+                             "Wrong weights collected")
+        nt.assert_equal(5, len(props['fitness']),
+                        "Wrong number of fitness values collected")
+        nt.assert_raises(ValueError, isl.animal_properties, 'fish')
+
+    def test_cell_statistics(self):
+        """
+        Testing that number, mean age, weight and fitness of the animals are
+        computed for each cell.
+        """
+        isl = Island(self.map_one)
+        isl.place_animals(self.pop)
+        herbivores = isl.cell_statistics()['herbivores']
+
+        nt.assert_true((isl.num_herb_in_cells() == herbivores.count).all(),
+                       "Wrong number of herbivores in each cell")
+        nt.assert_almost_equal(25 / 3., herbivores.age[1, 2])
+        nt.assert_almost_equal(16.5, herbivores.weight[2, 2])
+        fitness = np.mean([herb.fitness for herb in isl.get_cell(1, 2).herb])
+        nt.assert_almost_equal(fitness, herbivores.fitness[1, 2])
+        nt.assert_true(np.isnan(herbivores.weight[1, 1]),
+                       "Mean of a cell without herbivores is not NaN")
+
+        carnivores = isl.cell_statistics()['carnivores']
+        nt.assert_equal(3, carnivores.count[1, 1])
+        nt.assert_equal(4, carnivores.count.sum())
@@ -137,6 +137,7 @@ def test_animal_aging():
 def test_weight_change():
     """ Testing that all animals loose weight using mock tests. """
 
+    orig_weight_change = Animal.weight_change
     weight_mocker = plmock.FixedValueMethodMocker()
     Animal.weight_change = weight_mocker.get_method()
 
@@ -145,7 +146,10 @@ def test_weight_change():
                         {'species': 'Herbivore', 'weight': 54, 'age': 0},
                         {'species': 'Carnivore', 'weight': 20, 'age': 13}])
     num_w = 3
-    sav.animal_weight_change()
+    try:
+        sav.animal_weight_change()
+    finally:
+        Animal.weight_change = orig_weight_change
 
     nt.assert_equal(num_w, weight_mocker.num_calls(),
                     "Weight_change method called a wrong number of times")
@@ -212,6 +216,7 @@ def test_newborns_call():
     """
     Testing that all animals get the chance to procreate using mock tests.
     """
+    orig_birth = Animal.birth
     newborn_mock = plmock.FixedValueMethodMocker()
     Animal.birth = newborn_mock.get_method()
 
@@ -220,8 +225,11 @@ def test_newborns_call():
                         {'species': 'Herbivore', 'weight': 54, 'age': 0},
                         {'species': 'Carnivore', 'weight': 20, 'age': 13}])
 
-    jung.newborns(jung.herb)
-    jung.newborns(jung.carn)
+    try:
+        jung.newborns(jung.herb)
+        jung.newborns(jung.carn)
+    finally:
+        Animal.birth = orig_birth
 
     nt.assert_equal(3, newborn_mock.num_calls(),
                     "Birth method called wrong number of times")
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for functions in map_generator file.
+"""
+
+import nose.tools as nt
+from ..map_generator import generate_map, generate_population
+from ..island_nature import Island
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+def test_map_is_valid_island():
+    """Testing that generated maps are accepted by Island. """
+    for rows, cols in ((3, 3), (20, 45), (60, 30)):
+        geogr = generate_map(rows, cols, roughness=1.5, seed=4)
+        isl = Island(geogr)
+        nt.assert_equal((rows, cols), isl.terrain.shape,
+                        "Map has wrong size")
+
+
+def test_map_is_reproducible():
+    """Testing that the same seed gives the same map. """
+    nt.assert_equal(generate_map(40, 40, seed=2),
+                    generate_map(40, 40, seed=2),
+                    "Same seed gives different maps")
+    nt.assert_not_equal(generate_map(40, 40, seed=2),
+                        generate_map(40, 40, seed=3),
+                        "Different seeds give the same map")
+
+
+def test_land_fraction_and_proportions():
+    """Testing that land and landscape types have the given shares. """
+    geogr = generate_map(100, 100, proportions={'J': 3, 'D': 1},
+                         land_fraction=0.5, num_ridges=0, seed=1)
+    inner = ''.join(row[1:-1] for row in geogr.split()[1:-1])
+    land = len(inner) - inner.count('O')
+
+    nt.assert_almost_equal(0.5, land / float(len(inner)), delta=0.02,
+                           msg="Wrong share of land")
+    nt.assert_almost_equal(0.75, inner.count('J') / float(land), delta=0.02,
+                           msg="Wrong share of jungle")
+    nt.assert_equal(0, inner.count('S'), "Savannah without proportion")
+    nt.assert_equal(0, inner.count('M'), "Mountains without ridges")
+
+
+def test_ridges_make_mountains():
+    """Testing that ridges place mountains on the land. """
+    geogr = generate_map(100, 100, num_ridges=3, ridge_width=3,
+                         land_fraction=1, seed=1)
+    nt.assert_greater(geogr.count('M'), 0, "No mountains on ridges")
+
+
+def test_invalid_arguments():
+    """Testing that ValueError is raised for invalid arguments. """
+    nt.assert_raises(ValueError, generate_map, 2, 10)
+    nt.assert_raises(ValueError, generate_map, 10, 10, land_fraction=1.5)
+    nt.assert_raises(ValueError, generate_map, 10, 10, proportions={'M': 1})
+    nt.assert_raises(ValueError, generate_map, 10, 10, proportions={'J': 0})
+
+
+def test_generate_population():
+    """Testing that all animals are placed in habitable cells. """
+    geogr = generate_map(30, 30, seed=1)
+    population = generate_population(geogr, 200, 20, seed=1)
+    isl = Island(geogr)
+    isl.place_animals(population)
+    nt.assert_tuple_equal((200, 20), isl.number_of_animals(),
+                          "Wrong number of animals placed")
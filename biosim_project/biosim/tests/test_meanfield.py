@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the mean-field island in meanfield file.
+"""
+
+import nose.tools as nt
+import numpy as np
+from ..meanfield import MeanFieldIsland, compare_with_individual
+from ..animals import Herbivore, Carnivore
+from ..simulation import BioSim
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestMeanFieldIsland(object):
+    """
+    Tests for the phases of the annual cycle on a mean-field island.
+    """
+
+    def setup(self):
+        """ Creates an island with one jungle cell next to a savannah. """
+        self.island = MeanFieldIsland("OOOO\nOJSO\nOOOO")
+        self.herbs = [{'loc': (2, 2),
+                       'pop': [{'species': 'Herbivore', 'age': 5,
+                                'weight': 20.0} for _ in range(10)]}]
+        self.carns = [{'loc': (2, 2),
+                       'pop': [{'species': 'Carnivore', 'age': 5,
+                                'weight': 40.0} for _ in range(2)]}]
+        self.copy_params_herb = Herbivore.params.copy()
+        self.copy_params_carn = Carnivore.params.copy()
+
+    def teardown(self):
+        """ Restores the parameters of the animals. """
+        Herbivore.params = self.copy_params_herb
+        Carnivore.params = self.copy_params_carn
+
+    def mean_weight(self, species):
+        """ Returns the mean weight of a species on the island. """
+        counts = self.island.distribution(species)
+        return counts.sum(axis=0).dot(self.island.weights) / counts.sum()
+
+    def test_place_animals(self):
+        """Testing that animals are counted in their cell, age and weight. """
+        self.island.place_animals(self.herbs + self.carns)
+        nt.assert_almost_equal(10, self.island.number_of_animals()[0])
+        nt.assert_almost_equal(2, self.island.num_carn_in_cells()[1, 1])
+        nt.assert_almost_equal(10, self.island.distribution('herbivores')[5]
+                               .sum(), msg="Animals not placed in age bin")
+        nt.assert_almost_equal(20, self.mean_weight('herbivores'),
+                               msg="Mean weight is changed by the bins")
+        nt.assert_raises(ValueError, self.island.place_animals,
+                         [{'loc': (1, 1), 'pop': self.herbs[0]['pop']}])
+
+    def test_cell_statistics(self):
+        """Testing that means in each cell are weighted by the bins. """
+        self.island.place_animals(self.herbs + self.carns)
+        herbivores = self.island.cell_statistics()['herbivores']
+        nt.assert_almost_equal(10, herbivores.count[1, 1])
+        nt.assert_almost_equal(5, herbivores.age[1, 1])
+        nt.assert_almost_equal(self.mean_weight('herbivores'),
+                               herbivores.weight[1, 1])
+        nt.assert_true(np.isnan(herbivores.fitness[1, 2]))
+        nt.assert_almost_equal(
+            2, self.island.cell_statistics()['carnivores'].count.sum())
+
+    def test_no_cells(self):
+        """
+        Testing that the mean-field island has no cell objects, and that the
+        methods of the island using them raise ValueError.
+        """
+        nt.assert_raises(ValueError, self.island.get_cell, 1, 1)
+        nt.assert_raises(ValueError, self.island.habitable_cells)
+        nt.assert_raises(ValueError, self.island.enable_events)
+        nt.assert_raises(ValueError, self.island.animal_columns)
+        nt.assert_is_none(self.island.disable_events())
+        nt.assert_raises(ValueError, lambda: self.island.island_map[1][1])
+
+    def test_herb_eating(self):
+        """Testing that herbivores eat F each while there is fodder. """
+        self.island.place_animals(self.herbs)
+        self.island.all_herb_eating()
+        nt.assert_almost_equal(800 - 10 * Herbivore.params['F'],
+                               self.island.fodder[0])
+        nt.assert_almost_equal(
+            20 + Herbivore.params['beta'] * Herbivore.params['F'],
+            self.mean_weight('herbivores'), msg="Wrong weight gain")
+
+    def test_carn_eating(self):
+        """Testing that killed herbivores feed the carnivores. """
+        self.island.place_animals(self.herbs + self.carns)
+        herb_weight = 10 * self.mean_weight('herbivores')
+        self.island.all_carn_eating()
+        num_herb, num_carn = self.island.number_of_animals()
+
+        nt.assert_less(num_herb, 10, "No herbivores are killed")
+        nt.assert_almost_equal(2, num_carn)
+        eaten = herb_weight - num_herb * self.mean_weight('herbivores')
+        nt.assert_almost_equal(
+            40 + Carnivore.params['beta'] * eaten / 2,
+            self.mean_weight('carnivores'), places=6,
+            msg="Carnivores do not gain the weight eaten")
+
+    def test_birth(self):
+        """Testing that newborns are added to the youngest age bin. """
+        Herbivore.set_parameters({'gamma': 0.2, 'zeta': 3.5, 'w_birth': 8.0,
+                                  'sigma_birth': 1.5, 'xi': 1.2})
+        self.island.place_animals([{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': 5, 'weight': 50.0}] * 10}])
+        self.island.animals_give_birth()
+        newborns = self.island.distribution('herbivores')[0].sum()
+        nt.assert_greater(newborns, 0, "No animals are born")
+        nt.assert_almost_equal(10 + newborns,
+                               self.island.number_of_animals()[0])
+
+        light = MeanFieldIsland("OOO\nOJO\nOOO")
+        light.place_animals(self.herbs)
+        light.animals_give_birth()
+        nt.assert_equal(0, light.distribution('herbivores')[0].sum(),
+                        "Too light animals give birth")
+
+    def test_migration(self):
+        """Testing that migration moves animals without losing any. """
+        self.island.place_animals(self.herbs + self.carns)
+        self.island.animals_migrate()
+        nt.assert_greater(self.island.num_herb_in_cells()[1, 2], 0,
+                          "No herbivores migrate")
+        nt.assert_almost_equal(10, self.island.number_of_animals()[0])
+        nt.assert_almost_equal(2, self.island.number_of_animals()[1])
+
+    def test_aging_weight_loss_and_death(self):
+        """Testing aging, weight loss and death of the bins. """
+        self.island.place_animals(self.herbs)
+        self.island.all_animals_aging()
+        nt.assert_almost_equal(10, self.island.distribution('herbivores')[6]
+                               .sum(), msg="Animals do not age")
+
+        self.island.all_animals_lose_weight()
+        nt.assert_almost_equal(20 * (1 - Herbivore.params['eta']),
+                               self.mean_weight('herbivores'))
+
+        fitness = self.island.property_summary('herbivores')['fitness']
+        self.island.animals_die()
+        nt.assert_almost_equal(
+            10 * (1 - Herbivore.params['omega'] * (1 - fitness['mean'])),
+            self.island.number_of_animals()[0])
+
+    def test_extinction(self):
+        """Testing that species with too few animals die out. """
+        island = MeanFieldIsland("OOO\nOJO\nOOO", extinction_count=3)
+        island.place_animals(self.herbs + self.carns)
+        island.animals_die()
+        nt.assert_greater(island.number_of_animals()[0], 3)
+        nt.assert_equal(0, island.number_of_animals()[1],
+                        "Carnivores do not die out")
+
+
+def test_compare_with_individual():
+    """
+    Testing that the mean-field numbers are within the spread of the mean of
+    the individual-based runs in the first years, with few animals in each
+    cell, where births depend on the number of other animals.
+    """
+    ini_pop = [{'loc': (row, col),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40}
+                        for _ in range(4)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 40}
+                        for _ in range(2)]}
+               for row in (2, 3) for col in (2, 3, 4, 5)]
+    result = compare_with_individual("OOOOOO\nOJJJJO\nOJJJJO\nOOOOOO",
+                                     ini_pop, 3, num_replicates=40)
+    nt.assert_equal((40, 4), result['individual_herb'].shape)
+    for species in ('herb', 'carn'):
+        individual = result['individual_' + species][:, 1:]
+        error = individual.std(axis=0) / np.sqrt(len(individual))
+        z = (result['meanfield_' + species][1:] -
+             individual.mean(axis=0)) / error
+        nt.assert_true((abs(z) < 4).all(),
+                       "Engines differ for {}: z = {}".format(species, z))
+
+
+def test_biosim_engine():
+    """Testing that BioSim simulates and summarizes with the engine. """
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(10)]}]
+    sim = BioSim("OOOO\nOJSO\nOOOO", ini_pop, 1, engine='meanfield',
+                 engine_options={'weight_step': 5.0})
+    snapshots = list(sim.iter_years(3, summary=True))
+    nt.assert_equal(3, len(snapshots))
+    weight = snapshots[-1].summary['herbivores']['weight']
+    nt.assert_true(weight['min'] <= weight['mean'] <= weight['max'],
+                   "Mean is not between min and max")
+    nt.assert_is_none(snapshots[-1].summary['carnivores']['age'])
+
+    nt.assert_raises(ValueError, sim.enable_events)
+    nt.assert_raises(ValueError, BioSim, "OOO\nOJO\nOOO", ini_pop, 1,
+                     engine='quantum')
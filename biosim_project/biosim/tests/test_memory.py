@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the memory measurements and the memory budget in memory file.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import nose.tools as nt
+import numpy as np
+from .. import memory
+from ..memory import (MemoryGuard, MemoryRecord, MemoryBudgetExceeded,
+                      current_rss, phase_memory, dump_state)
+from ..island_nature import Island
+from ..meanfield import MeanFieldIsland
+from ..population import load_population
+from ..simulation import BioSim
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+ISLAND_MAP = """OOOOOOO
+                OJJSJJO
+                OJDJSJO
+                OOOOOOO"""
+POPULATION = [{'loc': (2, 2),
+               'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                       for _ in range(50)] +
+                      [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                       for _ in range(10)]}]
+
+
+def test_current_rss():
+    """Testing that the resident set size is a plausible number. """
+    rss = current_rss()
+    nt.assert_true(2 ** 20 < rss < 2 ** 40)
+
+
+def test_phase_memory():
+    """
+    Testing that measuring the phases simulates the same year as the annual
+    cycle.
+    """
+    random.seed(3)
+    island = Island(ISLAND_MAP)
+    island.place_animals(POPULATION)
+    phases = phase_memory(island)
+    nt.assert_equal(set(Island.annual_phases), set(phases))
+    for phase in phases.values():
+        nt.assert_true(phase.peak >= max(phase.allocated, 0))
+
+    random.seed(3)
+    reference = Island(ISLAND_MAP)
+    reference.place_animals(POPULATION)
+    reference.annual_cycle()
+    nt.assert_equal(reference.year, island.year)
+    nt.assert_equal(reference.number_of_animals(), island.number_of_animals())
+
+
+def test_phase_memory_instrumentation():
+    """Testing that the measured year is recorded by instrumentation. """
+    island = Island(ISLAND_MAP)
+    island.place_animals(POPULATION)
+    stats = island.enable_instrumentation()
+    phase_memory(island)
+    nt.assert_equal([1], [record.year for record in stats.records])
+    nt.assert_equal(set(Island.annual_phases),
+                    set(stats.records[0].phase_times))
+
+
+class TestMemoryGuard(object):
+    """
+    Tests for the projection of the memory and stopping a simulation.
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_invalid(self):
+        """Testing that the budget and the window are checked. """
+        nt.assert_raises(ValueError, MemoryGuard, 0)
+        nt.assert_raises(ValueError, MemoryGuard, 2 ** 30, window=1)
+
+    def test_growth(self):
+        """Testing that the growth per year is fitted over the window. """
+        guard = MemoryGuard(2 ** 40, window=3)
+        sizes = iter([100, 110, 125, 130, 120])
+        original = memory.current_rss
+        memory.current_rss = lambda: next(sizes)
+        try:
+            records = [guard.check(year, 10) for year in range(1, 6)]
+        finally:
+            memory.current_rss = original
+        nt.assert_equal(0, records[0].growth)
+        nt.assert_almost_equal(10, records[1].growth)
+        nt.assert_almost_equal(12.5, records[2].growth)
+        nt.assert_almost_equal(10, records[3].growth)
+        nt.assert_equal(0, records[4].growth)
+        nt.assert_almost_equal(140, records[3].projected)
+        nt.assert_equal(120, guard.projected(3))
+        nt.assert_equal(None, guard.years_left())
+
+    def test_years_left(self):
+        """Testing the years until the budget is reached. """
+        guard = MemoryGuard(1000)
+        nt.assert_equal(None, guard.projected(1))
+        guard.records.append(MemoryRecord(1, 500, 10, 100.0, 600.0))
+        nt.assert_equal(5, guard.years_left())
+        nt.assert_equal(800, guard.projected(3))
+
+    def test_no_budget_exceeded(self):
+        """Testing that a large budget does not change the simulation. """
+        sim = BioSim(ISLAND_MAP, POPULATION, seed=4)
+        guard = sim.set_memory_budget(2 ** 40)
+        sim.simulate(5, vis_steps=None)
+        reference = BioSim(ISLAND_MAP, POPULATION, seed=4)
+        reference.simulate(5, vis_steps=None)
+        nt.assert_equal([1, 2, 3, 4, 5],
+                        [record.year for record in guard.records])
+        nt.assert_equal(reference.total_num_by_species(),
+                        sim.total_num_by_species())
+        nt.assert_equal(None, sim.set_memory_budget(None))
+
+    def test_budget_exceeded(self):
+        """
+        Testing that the simulation stops after the first year with the
+        state saved, and continues from the saved state.
+        """
+        dump_file = os.path.join(self.directory, 'state.npz')
+        sim = BioSim(ISLAND_MAP, POPULATION, seed=4)
+        sim.set_memory_budget(2 ** 20, dump_file)
+        with nt.assert_raises(MemoryBudgetExceeded) as context:
+            sim.simulate(5, vis_steps=None)
+        nt.assert_equal(1, sim.num_years())
+        nt.assert_equal(1, context.exception.record.year)
+        nt.assert_equal(dump_file, context.exception.dump_file)
+
+        population = load_population(dump_file)
+        with np.load(dump_file) as state:
+            nt.assert_equal(1, state['year'])
+            nt.assert_equal(context.exception.record.rss,
+                            state['memory_rss'])
+        species = sim.total_num_by_species()
+        nt.assert_equal(species['herbivores'],
+                        (population['species'] == 0).sum())
+        nt.assert_equal(species['carnivores'],
+                        (population['species'] == 1).sum())
+
+        island = Island(ISLAND_MAP)
+        island.place_animal_columns(**population)
+        nt.assert_equal(sim.num_animals_per_cell()['herbivores'].tolist(),
+                        island.num_herb_in_cells().tolist())
+
+    def test_dump_meanfield(self):
+        """Testing that the mean-field island saves its histograms. """
+        island = MeanFieldIsland(ISLAND_MAP)
+        island.place_animals(POPULATION)
+        dump_file = os.path.join(self.directory, 'state.npz')
+        dump_state(dump_file, island)
+        with np.load(dump_file) as state:
+            nt.assert_almost_equal(50, state['herb_counts'].sum())
+            nt.assert_almost_equal(10, state['num_carn'].sum())
+            nt.assert_false('loc' in state)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for MovieWriter class in movie file.
+
+A small python script replaces ffmpeg, so the tests do not depend on ffmpeg
+being installed. The script stores the number of bytes it receives in the
+output file.
+"""
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from ..movie import MovieWriter, encode_segments
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+_FAKE_FFMPEG = """#!{python}
+import sys
+num_bytes = len(sys.stdin.buffer.read())
+with open(sys.argv[-1], 'w') as f:
+    f.write(str(num_bytes))
+sys.exit({status})
+"""
+
+_FAKE_FFMPEG_LOG = """#!{python}
+import sys
+with open({log!r}, 'a') as f:
+    f.write(' '.join(sys.argv[1:]) + '\\n')
+open(sys.argv[-1], 'w').close()
+"""
+
+
+class TestMovieWriter(object):
+    """Collects tests that use a fake ffmpeg program. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.movie = os.path.join(self.tmp_dir, 'movie.mp4')
+        self.frame = np.zeros((6, 8, 4), dtype=np.uint8)
+
+    def teardown(self):
+        """ Executed after each test in class to clean up."""
+        shutil.rmtree(self.tmp_dir)
+
+    def fake_ffmpeg(self, status=0):
+        """
+        Creates fake ffmpeg program.
+
+        :param status: exit status of the program
+        :return: path to the program
+        """
+        path = os.path.join(self.tmp_dir, 'ffmpeg')
+        with open(path, 'w') as f:
+            f.write(_FAKE_FFMPEG.format(python=sys.executable, status=status))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_frames_are_piped(self):
+        """Testing that all pixels of all frames are sent to ffmpeg. """
+        writer = MovieWriter(self.movie, ffmpeg_binary=self.fake_ffmpeg())
+        for _ in range(3):
+            writer.write_frame(self.frame)
+        writer.close()
+
+        with open(self.movie) as f:
+            nt.assert_equal(3 * self.frame.size, int(f.read()),
+                            "Wrong number of bytes sent to ffmpeg")
+        nt.assert_equal(3, writer.num_frames, "Wrong number of frames")
+
+    def test_frame_size_must_be_constant(self):
+        """Testing that ValueError is raised when frame size changes. """
+        writer = MovieWriter(self.movie, ffmpeg_binary=self.fake_ffmpeg())
+        writer.write_frame(self.frame)
+        nt.assert_raises(ValueError, writer.write_frame,
+                         np.zeros((4, 8, 4), dtype=np.uint8))
+        writer.close()
+
+    def test_frame_must_be_rgba(self):
+        """Testing that ValueError is raised for frames without alpha. """
+        writer = MovieWriter(self.movie, ffmpeg_binary=self.fake_ffmpeg())
+        nt.assert_raises(ValueError, writer.write_frame,
+                         np.zeros((6, 8, 3), dtype=np.uint8))
+
+    def test_ffmpeg_failure(self):
+        """Testing that RuntimeError is raised when ffmpeg fails. """
+        writer = MovieWriter(self.movie,
+                             ffmpeg_binary=self.fake_ffmpeg(status=1))
+        writer.write_frame(self.frame)
+        nt.assert_raises(RuntimeError, writer.close)
+
+    def test_close_without_frames(self):
+        """Testing that closing a writer without frames does nothing. """
+        writer = MovieWriter(self.movie, ffmpeg_binary=self.fake_ffmpeg())
+        writer.close()
+        nt.assert_false(os.path.exists(self.movie), "Movie file is created")
+
+
+def test_encode_segments():
+    """
+    Testing that images are split into consecutive segments which are joined
+    to one movie.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        log = os.path.join(tmp_dir, 'log.txt')
+        ffmpeg = os.path.join(tmp_dir, 'ffmpeg')
+        with open(ffmpeg, 'w') as f:
+            f.write(_FAKE_FFMPEG_LOG.format(python=sys.executable, log=log))
+        os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IEXEC)
+
+        movie = os.path.join(tmp_dir, 'dv.mp4')
+        encode_segments(os.path.join(tmp_dir, 'dv_%05d.png'), 10, movie, 3,
+                        ffmpeg_binary=ffmpeg)
+
+        with open(log) as f:
+            calls = f.read().splitlines()
+        encodings = sorted(call.split()[3] + ' ' + call.split()[7]
+                           for call in calls if '-start_number' in call)
+        nt.assert_list_equal(['0 3', '3 3', '6 4'], encodings,
+                             "Images are split into wrong segments")
+        nt.assert_true(any('concat' in call for call in calls),
+                       "Segments are not joined")
+        nt.assert_true(os.path.exists(movie), "Movie is not made")
+        nt.assert_list_equal(['dv.mp4', 'ffmpeg', 'log.txt'],
+                             sorted(os.listdir(tmp_dir)),
+                             "Segments are not removed")
+    finally:
+        shutil.rmtree(tmp_dir)
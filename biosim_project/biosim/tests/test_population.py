@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for functions in population file and placement of populations in
+columns on the island.
+"""
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from ..population import species_codes, load_population, save_population
+from ..island_nature import Island
+from ..animals import Herbivore, Carnivore
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+def test_species_codes():
+    """Testing that names and codes are converted to codes. """
+    nt.assert_list_equal([0, 1, 0], list(species_codes(
+        ['Herbivore', 'carnivore', 'herbivore'])),
+        "Names are converted to wrong codes")
+    nt.assert_list_equal([1, 0], list(species_codes([1, 0])),
+                         "Codes are changed")
+    nt.assert_raises(ValueError, species_codes, ['Rabbit'])
+    nt.assert_raises(ValueError, species_codes, [2])
+    nt.assert_equal(np.int64, species_codes([]).dtype,
+                    "Empty species are not codes")
+
+
+class TestPlaceColumns(object):
+    """Collects tests that place animals on the same island. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.isl = Island("""OOOOO
+                             OJSMO
+                             ODJJO
+                             OOOOO""")
+        self.loc = np.array([[2, 2], [3, 3], [2, 2], [3, 3]])
+        self.species = np.array([0, 0, 1, 0])
+        self.age = np.array([5, 8, 3, 1])
+        self.weight = np.array([20., 13., 30., 7.])
+
+    def teardown(self):
+        """ Executed after each test in class to clean up."""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_place_animal_columns(self):
+        """Testing that animals are created in correct cells. """
+        self.isl.place_animal_columns(self.loc, self.species, self.age,
+                                      self.weight)
+
+        cell = self.isl.island_map[2][2]
+        nt.assert_list_equal([(8, 13.), (1, 7.)],
+                             [(herb.age, herb.weight) for herb in cell.herb],
+                             "Herbivores are not added in the given order")
+        carn = self.isl.island_map[1][1].carn
+        nt.assert_equal(1, len(carn), "Carnivore is not placed")
+        nt.assert_is_instance(carn[0], Carnivore, "Wrong species")
+        nt.assert_is_instance(cell.herb[0], Herbivore, "Wrong species")
+        nt.assert_equal((3, 1), self.isl.number_of_animals(),
+                        "Wrong number of animals")
+
+    def test_place_empty_lists(self):
+        """Testing that an empty population given as lists is placed. """
+        self.isl.place_animal_columns([], [], [], [])
+        nt.assert_equal((0, 0), self.isl.number_of_animals(),
+                        "Animals are placed")
+        nt.assert_equal([], self.isl.habitable_cells(), "Cells are created")
+
+    def test_same_result_as_dictionaries(self):
+        """
+        Testing that columns place the same animals as population
+        dictionaries.
+        """
+        isl = Island("""OOOOO
+                        OJSMO
+                        ODJJO
+                        OOOOO""")
+        isl.place_animals([{'loc': tuple(loc), 'pop': [
+            {'species': ('Herbivore', 'Carnivore')[species], 'age': age,
+             'weight': weight}]} for loc, species, age, weight in
+            zip(self.loc.tolist(), self.species, self.age, self.weight)])
+        self.isl.place_animal_columns(self.loc, self.species, self.age,
+                                      self.weight)
+
+        nt.assert_true((isl.num_herb_in_cells() ==
+                        self.isl.num_herb_in_cells()).all(),
+                       "Herbivores are placed differently")
+        nt.assert_almost_equal(
+            isl.animal_properties('herbivores')['fitness'].sum(),
+            self.isl.animal_properties('herbivores')['fitness'].sum(),
+            msg="Animals have different fitness")
+
+    def test_invalid_columns(self):
+        """
+        Testing that ValueError is raised, and no animals are placed, for
+        invalid columns.
+        """
+        def place(**changes):
+            columns = {'loc': self.loc, 'species': self.species,
+                       'age': self.age, 'weight': self.weight}
+            columns.update(changes)
+            self.isl.place_animal_columns(**columns)
+
+        nt.assert_raises(ValueError, place, loc=[[2, 2], [2, 4], [2, 2],
+                                                 [3, 3]])
+        nt.assert_raises(ValueError, place, loc=[[2, 2], [9, 2], [2, 2],
+                                                 [3, 3]])
+        nt.assert_raises(ValueError, place, loc=[[2, 2], [0, 2], [2, 2],
+                                                 [3, 3]])
+        nt.assert_raises(ValueError, place, weight=[20., 0., 30., 7.])
+        nt.assert_raises(ValueError, place, age=[5, 8.5, 3, 1])
+        nt.assert_raises(ValueError, place, age=[5, -1, 3, 1])
+        nt.assert_raises(ValueError, place, species=[0, 0, 1])
+        nt.assert_raises(ValueError, place, loc=[[2, 2], [2.5, 2], [2, 2],
+                                                 [3, 3]])
+        nt.assert_raises(ValueError, place, loc=[[2, 2], [np.nan, 2],
+                                                 [2, 2], [3, 3]])
+        nt.assert_raises(ValueError, place, age=[5, np.inf, 3, 1])
+        nt.assert_raises(ValueError, place, weight=[20., np.inf, 30., 7.])
+        nt.assert_raises(ValueError, place, weight=[20., np.nan, 30., 7.])
+        nt.assert_equal((0, 0), self.isl.number_of_animals(),
+                        "Animals are placed although columns are invalid")
+
+    def test_files(self):
+        """Testing that populations are loaded from NPZ and CSV files. """
+        for name in ('pop.npz', 'pop.csv'):
+            filename = os.path.join(self.tmp_dir, name)
+            save_population(filename, self.loc, self.species, self.age,
+                            self.weight)
+            columns = load_population(filename)
+            nt.assert_list_equal(self.loc.tolist(),
+                                 columns['loc'].tolist(),
+                                 "Locations are not loaded")
+            nt.assert_list_equal([0, 0, 1, 0],
+                                 list(species_codes(columns['species'])),
+                                 "Species are not loaded")
+
+        self.isl.place_animals_from_file(filename)
+        nt.assert_equal((3, 1), self.isl.number_of_animals(),
+                        "Animals from file are not placed")
+
+    def test_unknown_file_format(self):
+        """Testing that ValueError is raised for unknown file formats. """
+        nt.assert_raises(ValueError, load_population,
+                         os.path.join(self.tmp_dir, 'pop.txt'))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for SamplingProfiler class in profiling file.
+"""
+
+import nose.tools as nt
+import os
+import shutil
+import tempfile
+from ..profiling import SamplingProfiler, profile_simulation
+from ..island_nature import Island
+from ..simulation import BioSim
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestSamplingProfiler(object):
+    """Collects tests that profile the same simulation. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.tmp_dir = tempfile.mkdtemp()
+        geogr = """OOOOOOO
+                   OJJSJJO
+                   OJDJSJO
+                   OOOOOOO"""
+        ini_pop = [{'loc': (2, 2),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(300)] +
+                           [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                            for _ in range(30)]}]
+        self.profiler = profile_simulation(BioSim(geogr, ini_pop, 1), 10,
+                                           interval=0.0005)
+
+    def teardown(self):
+        """ Executed after each test in class to clean up."""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_samples_attributed_to_phases(self):
+        """Testing that samples are attributed to phases and cells. """
+        nt.assert_greater(self.profiler.num_samples, 0, "No samples taken")
+        nt.assert_true(set(self.profiler.phase_samples) <=
+                       set(Island.annual_phases), "Unknown phase")
+        nt.assert_greater(sum(self.profiler.phase_samples.values()), 0,
+                          "No samples attributed to phases")
+        nt.assert_true(any(label.startswith('[cell ')
+                           for stack in self.profiler.stacks
+                           for label in stack),
+                       "No samples attributed to cells")
+
+    def test_top_functions_sorted(self):
+        """Testing that functions are sorted by self samples. """
+        top = self.profiler.top_functions(5)
+        self_counts = [self_count for _, self_count, _ in top]
+        nt.assert_list_equal(sorted(self_counts, reverse=True), self_counts,
+                             "Functions are not sorted")
+        for _, self_count, total_count in top:
+            nt.assert_less_equal(self_count, total_count,
+                                 "Self samples exceed total samples")
+
+    def test_write_collapsed(self):
+        """Testing that each line is a stack followed by its count. """
+        filename = os.path.join(self.tmp_dir, 'sim.folded')
+        self.profiler.write_collapsed(filename)
+
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        nt.assert_equal(self.profiler.num_samples,
+                        sum(int(line.rsplit(' ', 1)[1]) for line in lines),
+                        "Samples are lost")
+
+    def test_write_summary(self):
+        """Testing that summary lists every phase. """
+        filename = os.path.join(self.tmp_dir, 'sim.txt')
+        self.profiler.write_summary(filename)
+
+        with open(filename) as f:
+            summary = f.read()
+        for phase in Island.annual_phases:
+            nt.assert_in(phase, summary, "Phase missing in summary")
+
+
+def test_profiler_cannot_start_twice():
+    """Testing that RuntimeError is raised when started twice. """
+    with SamplingProfiler() as profiler:
+        nt.assert_raises(RuntimeError, profiler.start)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for functions in render file.
+"""
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from ..trajectory import Trajectory
+from ..render import render_year, render_images, main
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestRender(object):
+    """Collects tests that draw the same trajectory. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.trajectory = Trajectory("""OOOO
+                                        OJSO
+                                        OOOO""")
+        for year in range(5):
+            self.trajectory.record(np.full((3, 4), year), np.ones((3, 4)))
+
+    def teardown(self):
+        """ Executed after each test in class to clean up."""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_render_year(self):
+        """Testing that the figure for one year is saved. """
+        filename = os.path.join(self.tmp_dir, 'year.png')
+        render_year(self.trajectory, 2, filename, color_max_herb=10)
+        nt.assert_true(os.path.exists(filename), "Figure is not saved")
+
+    def test_render_year_indexes_year(self):
+        """
+        Testing that one year is drawn without copying every recorded year.
+        """
+        def copy_all():
+            raise AssertionError("Every year is copied")
+
+        self.trajectory.num_herb_cells = copy_all
+        self.trajectory.num_carn_cells = copy_all
+        filename = os.path.join(self.tmp_dir, 'year.png')
+        render_year(self.trajectory, 4, filename)
+        nt.assert_true(os.path.exists(filename), "Figure is not saved")
+
+    def test_render_year_out_of_range(self):
+        """Testing that ValueError is raised for years not recorded. """
+        nt.assert_raises(ValueError, render_year, self.trajectory, 5,
+                         os.path.join(self.tmp_dir, 'year.png'))
+
+    def test_render_images(self):
+        """Testing that numbered images are saved for every img_steps. """
+        num_images = render_images(self.trajectory,
+                                   os.path.join(self.tmp_dir, 'dv'),
+                                   img_steps=2, processes=1)
+        nt.assert_equal(3, num_images, "Wrong number of images")
+        nt.assert_list_equal(['dv_00000.png', 'dv_00001.png',
+                              'dv_00002.png'],
+                             sorted(os.listdir(self.tmp_dir)),
+                             "Wrong images saved")
+
+    def test_main_image(self):
+        """Testing that the command line draws the last year by default. """
+        trajectory_file = os.path.join(self.tmp_dir, 'trajectory.npz')
+        image = os.path.join(self.tmp_dir, 'last.png')
+        self.trajectory.save(trajectory_file)
+
+        main([trajectory_file, '--image', image, '--ymax', '50'])
+        nt.assert_true(os.path.exists(image), "Figure is not saved")
@@ -5,11 +5,34 @@ Test for methods in BioSim class in simulation file.
 """
 import nose.tools as nt
 import numpy as np
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+from .. import simulation
 from ..simulation import BioSim
 
 __authors__ = 'Elisabeth Flatner and Marie Klever'
 __emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
 
+# replaces ffmpeg, storing the frames piped to it, or the joined files
+_FAKE_FFMPEG = """#!{python}
+import sys
+args = sys.argv[1:]
+if 'concat' in args:
+    if {fail_concat}:
+        sys.exit(1)
+    with open(args[args.index('-i') + 1]) as f:
+        names = [line.split("'")[1] for line in f]
+    data = b''.join(open(name, 'rb').read() for name in names)
+else:
+    data = sys.stdin.buffer.read()
+with open(args[-1], 'wb') as f:
+    f.write(data)
+"""
+
 
 class TestSimulation(object):
     """Collects tests that have the same input values. """
@@ -99,3 +122,177 @@ class TestSimulation(object):
                        "Returns wrong array of number of herbivores")
         nt.assert_true((carnivores == res['carnivores']).all(),
                        "Returns wrong array of number of carnivores")
+
+    def test_simulate_with_blit(self):
+        """Testing that simulation runs with blitted graphics. """
+        sim = BioSim(self.map_one, self.ini_pop, 123456, blit=True)
+        sim.simulate(num_steps=5, vis_steps=1, img_steps=2000)
+        nt.assert_equal(5, sim.num_years(), "Returns wrong number of years")
+
+    def test_simulate_with_img_workers(self):
+        """Testing that images are saved by worker processes. """
+        img_dir = tempfile.mkdtemp()
+        try:
+            sim = BioSim(self.map_one, self.ini_pop, 123456, img_dir=img_dir,
+                         img_name='dv', img_workers=2)
+            sim.simulate(num_steps=4, vis_steps=100, img_steps=2)
+            nt.assert_list_equal(['dv_00000.png', 'dv_00001.png'],
+                                 sorted(os.listdir(img_dir)),
+                                 "Wrong images saved")
+        finally:
+            shutil.rmtree(img_dir)
+
+    def stream_movie(self, img_dir, fail_concat=False):
+        """
+        Streams two calls to simulate to a movie with a fake ffmpeg.
+
+        :return: simulation
+        """
+        ffmpeg = os.path.join(img_dir, 'ffmpeg')
+        with open(ffmpeg, 'w') as f:
+            f.write(_FAKE_FFMPEG.format(python=sys.executable,
+                                        fail_concat=fail_concat))
+        os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IEXEC)
+        os.mkdir(os.path.join(img_dir, 'movie'))
+
+        original = simulation._FFMPEG_BINARY
+        simulation._FFMPEG_BINARY = ffmpeg
+        try:
+            sim = BioSim(self.map_one, self.ini_pop, 123456,
+                         img_dir=os.path.join(img_dir, 'movie'),
+                         img_name='dv', stream_movie=True, movie_fmt='mp4')
+            sim.simulate(num_steps=2, vis_steps=1, img_steps=1)
+            sim.simulate(num_steps=3, vis_steps=1, img_steps=1)
+        finally:
+            simulation._FFMPEG_BINARY = original
+        return sim
+
+    def test_stream_movie_removes_segments(self):
+        """
+        Testing that the segments of each call to simulate are joined and
+        removed, and that the movie holds the frames of both calls.
+        """
+        img_dir = tempfile.mkdtemp()
+        try:
+            self.stream_movie(img_dir)
+            nt.assert_list_equal(['dv.mp4'],
+                                 os.listdir(os.path.join(img_dir, 'movie')),
+                                 "Segments are not removed")
+            frame_size = 800 * 1200 * 4
+            nt.assert_equal(5 * frame_size, os.path.getsize(
+                os.path.join(img_dir, 'movie', 'dv.mp4')),
+                "Movie does not have the frames of both calls")
+        finally:
+            shutil.rmtree(img_dir)
+
+    def test_stream_movie_keeps_segments_on_failure(self):
+        """Testing that segments are kept if they can not be joined. """
+        img_dir = tempfile.mkdtemp()
+        try:
+            nt.assert_raises(subprocess.CalledProcessError,
+                             self.stream_movie, img_dir, True)
+            nt.assert_list_equal(['dv_part000.mp4'],
+                                 os.listdir(os.path.join(img_dir, 'movie')),
+                                 "Segment is removed")
+        finally:
+            shutil.rmtree(img_dir)
+
+    def test_record_without_graphics(self):
+        """
+        Testing that a simulation without graphics records the number of
+        animals in each cell for year 0 and every simulated year.
+        """
+        sim = BioSim(self.map_one, self.ini_pop, 123456, record=True)
+        sim.simulate(num_steps=3, vis_steps=None)
+
+        nt.assert_is_none(sim._vis, "Graphics are created")
+        nt.assert_equal(3, sim.trajectory.num_years(),
+                        "Wrong number of years recorded")
+        nt.assert_equal(sim.total_num_by_species()['herbivores'],
+                        sim.trajectory.num_herb_cells()[-1].sum(),
+                        "Last year is not recorded")
+
+    def test_count_once_per_year(self):
+        """
+        Testing that the animals are counted once for each simulated year,
+        also when the memory is checked.
+        """
+        for iterate in (False, True):
+            sim = BioSim(self.map_one, self.ini_pop, 123456)
+            sim.set_memory_budget(2 ** 40)
+            count = sim._island.number_of_animals
+            calls = []
+
+            def counted():
+                calls.append(1)
+                return count()
+
+            sim._island.number_of_animals = counted
+            if iterate:
+                list(sim.iter_years(4))
+            else:
+                sim.simulate(num_steps=4, vis_steps=None)
+            nt.assert_equal(4, sim.num_years(), "Simulation stopped early")
+            nt.assert_equal(1 + 4, len(calls),
+                            "Animals are counted more than once per year")
+
+    def test_iter_years(self):
+        """
+        Testing that iter_years yields one snapshot for each simulated year,
+        with totals matching the count grids.
+        """
+        sim = BioSim(self.map_one, self.ini_pop, 123456)
+        years = []
+        for snapshot in sim.iter_years(4):
+            years.append(snapshot.year)
+            nt.assert_equal(snapshot.num_herb,
+                            snapshot.num_herb_cells.sum(),
+                            "Total number of herbivores does not match grid")
+            nt.assert_equal(snapshot.num_carn,
+                            snapshot.num_carn_cells.sum(),
+                            "Total number of carnivores does not match grid")
+            nt.assert_is_none(snapshot.summary, "Summary is not requested")
+
+        nt.assert_list_equal([1, 2, 3, 4], years, "Wrong years yielded")
+        nt.assert_equal(4, sim.num_years(), "Returns wrong number of years")
+
+    def test_iter_years_early_stop(self):
+        """
+        Testing that breaking out of iter_years leaves the simulation at the
+        last year yielded.
+        """
+        sim = BioSim(self.map_one, self.ini_pop, 123456)
+        for snapshot in sim.iter_years(10):
+            if snapshot.year == 2:
+                break
+
+        nt.assert_equal(2, sim.num_years(), "Simulation did not stop")
+        nt.assert_dict_equal({'herbivores': snapshot.num_herb,
+                              'carnivores': snapshot.num_carn},
+                             sim.total_num_by_species(),
+                             "Snapshot does not show the current state")
+
+    def test_iter_years_summary(self):
+        """Testing that summary has statistics for each species. """
+        sim = BioSim(self.map_one, self.ini_pop, 123456)
+        snapshot = next(sim.iter_years(1, summary=True))
+
+        for species in ('herbivores', 'carnivores'):
+            for name in ('age', 'weight', 'fitness'):
+                stats = snapshot.summary[species][name]
+                nt.assert_true(stats['min'] <= stats['mean'] <= stats['max'],
+                               "Mean is not between min and max")
+
+    def test_instrument(self):
+        """Testing that BioSim exposes a record of each simulated year. """
+        sim = BioSim(self.map_one, self.ini_pop, 123456, instrument=True)
+        for _ in sim.iter_years(3):
+            pass
+        nt.assert_list_equal([1, 2, 3],
+                             [record.year for record in sim.year_stats],
+                             "Years are not recorded")
+
+        sim = BioSim(self.map_one, self.ini_pop, 123456)
+        for _ in sim.iter_years(2):
+            pass
+        nt.assert_list_equal([], sim.year_stats, "Years recorded by default")
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for stopping criteria in stopping file.
+"""
+
+import nose.tools as nt
+import numpy as np
+from ..stopping import Extinction, Convergence, Periodicity
+from ..simulation import BioSim
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+def test_extinction():
+    """Testing that extinction is detected for the given species. """
+    nt.assert_equal('carnivores extinct',
+                    Extinction('carnivores').check([5, 3], [2, 0]),
+                    "Extinct carnivores are not detected")
+    nt.assert_is_none(Extinction('herbivores').check([5, 3], [2, 0]),
+                      "Herbivores are not extinct")
+    nt.assert_is_not_none(Extinction('any').check([5, 3], [2, 0]),
+                          "Extinct species is not detected")
+    nt.assert_is_none(Extinction('all').check([5, 3], [2, 0]),
+                      "Not all species are extinct")
+    nt.assert_raises(ValueError, Extinction, 'rabbits')
+
+
+def test_convergence():
+    """Testing that converged counts are detected after two windows. """
+    criterion = Convergence(window=10, rtol=0.05)
+    rng = np.random.RandomState(1)
+    herb = list(1000 + rng.normal(0, 5, 30))
+    carn = list(100 + rng.normal(0, 1, 30))
+
+    nt.assert_is_none(criterion.check(herb[:15], carn[:15]),
+                      "Converged before two windows")
+    nt.assert_is_not_none(criterion.check(herb, carn),
+                          "Converged counts are not detected")
+
+    growing = list(np.linspace(100, 1000, 30))
+    nt.assert_is_none(criterion.check(growing, carn),
+                      "Growing counts are not converged")
+
+
+def test_periodicity():
+    """Testing that the period of oscillating counts is found. """
+    years = np.arange(120)
+    herb = 1000 + 300 * np.sin(2 * np.pi * years / 12.0)
+    criterion = Periodicity(window=100)
+
+    nt.assert_equal(12, criterion.period(herb[-100:]), "Wrong period")
+    nt.assert_equal('counts periodic with period 12 years',
+                    criterion.check(list(herb), list(herb)),
+                    "Periodic counts are not detected")
+
+    noise = np.random.RandomState(2).normal(1000, 50, 120)
+    nt.assert_is_none(criterion.check(list(noise), list(noise)),
+                      "Noise is detected as periodic")
+    nt.assert_raises(ValueError, Periodicity, window=10, max_period=10)
+
+
+def test_simulation_stops():
+    """Testing that BioSim stops and reports when a criterion is met. """
+    island_map = """OOOOO
+                    OJSMO
+                    ODJJO
+                    OOOOO"""
+    ini_pop = [{'loc': (3, 3),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)]}]
+
+    sim = BioSim(island_map, ini_pop, 1)
+    sim.simulate(10, vis_steps=None, stop=Extinction('carnivores'))
+    nt.assert_equal(1, sim.num_years(), "Simulation did not stop")
+    nt.assert_tuple_equal((1, 'carnivores extinct'),
+                          tuple(sim.stop_report), "Wrong stop report")
+
+    snapshots = list(sim.iter_years(5))
+    nt.assert_equal(5, len(snapshots), "Stopped without criteria")
+    nt.assert_is_none(sim.stop_report, "Old stop report is kept")
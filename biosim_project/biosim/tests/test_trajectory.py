@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for Trajectory class in trajectory file.
+"""
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from ..trajectory import Trajectory
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestTrajectory(object):
+    """Collects tests that use the same recorded trajectory. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.map_one = """OOOO
+                          OJSO
+                          OOOO"""
+        self.trajectory = Trajectory(self.map_one)
+        self.herb = [np.array([[0, 0, 0, 0], [0, 3, 2, 0], [0, 0, 0, 0]]),
+                     np.array([[0, 0, 0, 0], [0, 4, 6, 0], [0, 0, 0, 0]])]
+        self.carn = [np.array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0]]),
+                     np.array([[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])]
+        for herb, carn in zip(self.herb, self.carn):
+            self.trajectory.record(herb, carn)
+
+    def test_num_years(self):
+        """Testing that year 0 is not counted as a simulated year. """
+        nt.assert_equal(1, self.trajectory.num_years(),
+                        "Returns wrong number of years")
+
+    def test_total_num_by_species(self):
+        """Testing that totals are summed over all cells. """
+        totals = self.trajectory.total_num_by_species()
+        nt.assert_list_equal([5, 10], list(totals['herbivores']),
+                             "Wrong total number of herbivores")
+        nt.assert_list_equal([1, 0], list(totals['carnivores']),
+                             "Wrong total number of carnivores")
+
+    def test_num_animals_in_year(self):
+        """
+        Testing that one year is returned, and the totals up to a year.
+        """
+        herb, carn = self.trajectory.num_animals_in_year(1)
+        nt.assert_list_equal(self.herb[1].tolist(), herb.tolist(),
+                             "Wrong herbivores in year")
+        nt.assert_list_equal(self.carn[1].tolist(), carn.tolist(),
+                             "Wrong carnivores in year")
+        totals = self.trajectory.total_num_by_species(0)
+        nt.assert_list_equal([5], list(totals['herbivores']),
+                             "Years after the last year are summed")
+
+    def test_save_and_load(self):
+        """Testing that a saved trajectory is loaded unchanged. """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, 'trajectory.npz')
+            self.trajectory.save(filename)
+            loaded = Trajectory.load(filename)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        nt.assert_equal(self.trajectory.island_map, loaded.island_map,
+                        "Island map is changed")
+        nt.assert_true((np.array(self.herb) ==
+                        loaded.num_herb_cells()).all(),
+                       "Herbivores in cells are changed")
+        nt.assert_true((np.array(self.carn) ==
+                        loaded.num_carn_cells()).all(),
+                       "Carnivores in cells are changed")
+
+    def test_unequal_years(self):
+        """
+        Testing that ValueError is raised when herbivores and carnivores are
+        given for different numbers of years.
+        """
+        nt.assert_raises(ValueError, Trajectory, self.map_one, self.herb,
+                         self.carn[:1])
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for checks of engines in verification file.
+"""
+
+import nose.tools as nt
+import numpy as np
+from ..verification import (ENGINES, MAPS, state_digest, check_exact,
+                            check_statistical, ks_two_sample, parameters,
+                            verify, format_results)
+from ..engines import ArrayEngine
+from ..island_nature import Island
+from ..animals import Herbivore, Carnivore
+from ..landscape import Jungle
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class _NoBirthEngine(ArrayEngine):
+    """ Engine with a wrong model, where no animals are born. """
+
+    def animal_birth(self, cell):
+        pass
+
+
+class TestVerification(object):
+    """
+    Tests for exact and statistical checks of engines.
+    """
+
+    def setup(self):
+        """ Adds an engine where no animals are born. """
+        self.copy_params_herb = Herbivore.params.copy()
+        self.copy_params_carn = Carnivore.params.copy()
+        self.copy_params_jungle = Jungle.params.copy()
+        Herbivore.set_parameters({'gamma': 0.2, 'omega': 0.4, 'zeta': 3.5,
+                                  'w_birth': 8.0, 'sigma_birth': 1.5})
+        Jungle.set_parameters({'fmax': 800})
+        ENGINES['no_birth'] = lambda island_map: Island(
+            island_map, cell_engine=_NoBirthEngine())
+        self.ini_pop = [{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5,
+                                  'weight': 30} for _ in range(30)]}]
+
+    def teardown(self):
+        """ Restores the parameters and engines. """
+        Herbivore.params = self.copy_params_herb
+        Carnivore.params = self.copy_params_carn
+        Jungle.params = self.copy_params_jungle
+        del ENGINES['no_birth']
+
+    def test_state_digest(self):
+        """Testing that the digest changes with the animals. """
+        island = Island(MAPS['jungle'])
+        island.place_animals(self.ini_pop)
+        digest = state_digest(island)
+        nt.assert_equal(digest, state_digest(island))
+        island.place_animals([{'loc': (2, 3), 'pop': [
+            {'species': 'Carnivore', 'age': 1, 'weight': 5}]}])
+        nt.assert_not_equal(digest, state_digest(island))
+
+    def test_state_digest_locations(self):
+        """
+        Testing that the digest changes when animals only change cells,
+        with the same number of animals in each cell.
+        """
+        young = {'species': 'Herbivore', 'age': 1, 'weight': 10}
+        old = {'species': 'Herbivore', 'age': 5, 'weight': 30}
+        island = Island(MAPS['jungle'])
+        island.place_animals([{'loc': (2, 2), 'pop': [young]},
+                              {'loc': (2, 3), 'pop': [old]}])
+        swapped = Island(MAPS['jungle'])
+        swapped.place_animals([{'loc': (2, 2), 'pop': [old]},
+                               {'loc': (2, 3), 'pop': [young]}])
+        nt.assert_not_equal(state_digest(island), state_digest(swapped))
+
+    def test_check_exact(self):
+        """Testing that a wrong engine differs after the first year. """
+        nt.assert_is_none(check_exact('array', MAPS['jungle'], self.ini_pop,
+                                      5))
+        nt.assert_equal(1, check_exact('no_birth', MAPS['jungle'],
+                                       self.ini_pop, 5))
+
+    def test_check_statistical(self):
+        """Testing that a wrong engine gives other numbers of animals. """
+        tests = check_statistical('no_birth', MAPS['jungle'], self.ini_pop,
+                                  4, num_replicates=10)
+        nt.assert_less(tests['herbivores'][1], 0.001,
+                       "Wrong engine is not detected")
+
+    def test_verify(self):
+        """Testing that each map, parameter set and engine is checked. """
+        exact, statistical = verify(
+            ['array', 'no_birth'], {'jungle': MAPS['jungle']},
+            {'default': {}, 'fertile': {'Herbivore': {'gamma': 0.4}}},
+            mode='exact', num_years=3)
+        nt.assert_equal(4, len(exact))
+        nt.assert_equal([], statistical)
+        text, passed = format_results(exact, statistical)
+        nt.assert_false(passed, "Wrong engine passes")
+        nt.assert_in('DIFFERS from year 1', text)
+        nt.assert_raises(ValueError, verify, ['gpu'])
+
+
+def test_ks_two_sample():
+    """Testing that only samples from different distributions differ. """
+    rng = np.random.RandomState(3)
+    first = rng.normal(0, 1, 200)
+    nt.assert_greater(ks_two_sample(first, rng.normal(0, 1, 300))[1], 0.01)
+    statistic, p_value = ks_two_sample(first, rng.normal(1, 1, 300))
+    nt.assert_greater(statistic, 0.2)
+    nt.assert_less(p_value, 1e-6)
+
+
+def test_parameters():
+    """Testing that parameters are restored after the check. """
+    gamma = Herbivore.params['gamma']
+    params = Herbivore.params
+    with parameters({'Herbivore': {'gamma': 0.5}}):
+        nt.assert_equal(0.5, Herbivore.params['gamma'])
+    nt.assert_equal(gamma, Herbivore.params['gamma'])
+    nt.assert_is(params, Herbivore.params,
+                 "Parameters are not restored in place")
+
+    with nt.assert_raises(ValueError):
+        with parameters({'Dragon': {'gamma': 0.5}}):
+            pass
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for Visualization class in visualization file.
+"""
+
+import nose.tools as nt
+import numpy as np
+import matplotlib.pyplot as plt
+from ..visualization import Visualization
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class TestVisualization(object):
+    """Collects tests that use the same island map. """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self):
+        """ Executed before each test in class to prepare for test. """
+        self.map_one = """OOOOO
+                          OJSMO
+                          ODJJO
+                          OOOOO"""
+        self.cells = np.zeros((4, 5))
+
+    @staticmethod
+    def teardown():
+        """ Executed after each test in class to clean up."""
+        plt.close('all')
+
+    def test_setup_extends_lines(self):
+        """
+        Testing that the line graph is extended when setup is called again.
+        """
+        vis = Visualization(self.map_one)
+        vis.setup(10)
+        vis.update_num_animals(3, 20, 5)
+        vis.setup(25)
+
+        ydata = vis._herb_line.get_ydata()
+        nt.assert_equal(25, len(ydata), "Line graph is not extended")
+        nt.assert_equal(20, ydata[3], "Stored number of animals is lost")
+
+    def test_ylim_follows_running_max(self):
+        """
+        Testing that ordinate grows with the largest number of animals seen.
+        """
+        vis = Visualization(self.map_one)
+        vis.setup(10)
+        vis.update_num_animals(0, 500, 20)
+        vis.update_num_animals(1, 100, 30)
+        vis.update(2, self.cells, self.cells)
+
+        nt.assert_equal(500, vis._max_num_animals,
+                        "Running maximum is not updated")
+        nt.assert_almost_equal(600, vis._pop_ax.get_ylim()[1],
+                               msg="Ordinate does not follow running maximum")
+
+    def test_given_ymax(self):
+        """Testing that a given ymax is used as limit for the ordinate. """
+        vis = Visualization(self.map_one)
+        vis.setup(10, ymax=50)
+        vis.update_num_animals(0, 500, 20)
+        vis.update(1, self.cells, self.cells)
+
+        nt.assert_equal(50, vis._pop_ax.get_ylim()[1],
+                        "Given ymax is not used")
+
+    def test_blit_stores_background(self):
+        """
+        Testing that blitting stores a background which is kept until the
+        ordinate has to change.
+        """
+        vis = Visualization(self.map_one, blit=True)
+        vis.setup(10)
+        vis.update(1, self.cells, self.cells)
+        background = vis._background
+        nt.assert_is_not_none(background, "Background is not stored")
+
+        vis.update(2, self.cells, self.cells)
+        nt.assert_is(background, vis._background,
+                     "Background is redrawn without changes in the axes")
+
+        vis.update_num_animals(2, 1000, 20)
+        vis.update(3, self.cells, self.cells)
+        nt.assert_is_not(background, vis._background,
+                         "Background is not redrawn when ordinate changes")
+
+    def test_blit_redraws_once(self):
+        """
+        Testing that the figure is drawn once when the ordinate changes.
+        """
+        vis = Visualization(self.map_one, blit=True)
+        vis.setup(10)
+        canvas = vis.figure.canvas
+        full_draw = canvas.draw
+        calls = []
+
+        def counted(*args, **kwargs):
+            calls.append(1)
+            return full_draw(*args, **kwargs)
+
+        canvas.draw = counted
+        vis.update(1, self.cells, self.cells)
+        nt.assert_equal(1, len(calls), "First figure is drawn more than once")
+
+        vis.update(2, self.cells, self.cells)
+        nt.assert_equal(1, len(calls), "Figure is drawn without changes")
+
+        vis.update_num_animals(2, 1000, 20)
+        vis.update(3, self.cells, self.cells)
+        nt.assert_equal(2, len(calls),
+                        "Figure is not drawn once when ordinate changes")
+
+    def test_only_changing_artists_animated(self):
+        """
+        Testing that only the changing artists are animated when blitting.
+        """
+        vis = Visualization(self.map_one, blit=True)
+        vis.setup(10)
+
+        for artist in vis._animated_artists():
+            nt.assert_true(artist.get_animated(), "Artist is not animated")
+        nt.assert_false(vis._pop_ax.get_legend().get_animated(),
+                        "Legend should be part of the background")
+
+    def test_frame_rgba(self):
+        """
+        Testing that the frame buffer has the size of the figure and is only
+        rendered when the data has changed.
+        """
+        vis = Visualization(self.map_one, blit=True)
+        vis.setup(10)
+        frame = vis.frame_rgba()
+
+        width, height = vis.figure.canvas.get_width_height(physical=True)
+        nt.assert_equal((height, width, 4), frame.shape,
+                        "Frame has wrong shape")
+        nt.assert_true(vis._drawn, "Figure is not rendered")
+
+        vis.update_num_animals(0, 10, 5)
+        nt.assert_false(vis._drawn, "Changed data is not marked for drawing")
+
+    def test_set_num_animals(self):
+        """
+        Testing that given totals replace the line graph, and that the
+        ordinate only depends on the given years.
+        """
+        vis = Visualization(self.map_one)
+        vis.setup(10)
+        vis.update_num_animals(8, 5000, 20)
+        vis.set_num_animals([300, 400], [10, 20])
+
+        herb, carn = vis.num_animals(3)
+        nt.assert_list_equal([300, 400], list(herb[:2]),
+                             "Herbivores are not stored")
+        nt.assert_true(np.isnan(vis.num_animals(10)[0][2:]).all(),
+                       "Later years are not cleared")
+        nt.assert_equal(400, vis._max_num_animals,
+                        "Running maximum is not reset")
+
+    def test_extend_num_animals(self):
+        """
+        Testing that totals added in parts give the same line graph and
+        ordinate as the totals given at once.
+        """
+        vis = Visualization(self.map_one)
+        vis.setup(10)
+        vis.set_num_animals([300, 400], [10, 20])
+        vis.extend_num_animals(2, [100, 500], [30, 40])
+        vis.update(4, np.zeros((4, 5)), np.zeros((4, 5)), draw=False)
+
+        other = Visualization(self.map_one)
+        other.setup(10)
+        other.set_num_animals([300, 400, 100, 500], [10, 20, 30, 40])
+        other.update(4, np.zeros((4, 5)), np.zeros((4, 5)), draw=False)
+
+        nt.assert_list_equal([300, 400, 100, 500],
+                             list(vis.num_animals(4)[0]))
+        nt.assert_list_equal([10, 20, 30, 40], list(vis.num_animals(4)[1]))
+        nt.assert_equal(other._pop_ax.get_ylim(), vis._pop_ax.get_ylim(),
+                        "Ordinate differs from the totals given at once")
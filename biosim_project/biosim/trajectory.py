@@ -0,0 +1,111 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a class implementing a recorded simulation for the biosim
+project.
+
+A trajectory holds the island map and the number of herbivores and
+carnivores in each cell for every year of a simulation. It is all that is
+needed to draw the graphics of the simulation again, so expensive simulations
+can run without graphics once and be visualized later.
+"""
+
+import numpy as np
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class Trajectory(object):
+    """
+    This class represents the number of animals in each cell, year by year.
+
+    Year 0 is the state before the first simulated year.
+    """
+
+    def __init__(self, island_map, num_herb_cells=None, num_carn_cells=None):
+        """
+        :param island_map: specification about the island's geography
+        :type island_map: multiline str
+        :param num_herb_cells: number of herbivores in each cell for each
+                               year, shape (years, rows, columns)
+        :param num_carn_cells: number of carnivores in each cell for each
+                               year, shape (years, rows, columns)
+        """
+        self.island_map = '\n'.join(island_map.split())
+        self._herb = [] if num_herb_cells is None else list(num_herb_cells)
+        self._carn = [] if num_carn_cells is None else list(num_carn_cells)
+
+        if len(self._herb) != len(self._carn):
+            raise ValueError("Herbivores and carnivores must be given for "
+                             "the same years")
+
+    def record(self, num_herb_cell, num_carn_cell):
+        """
+        Records number of animals in each cell for the next year.
+
+        :param num_herb_cell: number of herbivores in each cell
+        :param num_carn_cell: number of carnivores in each cell
+        """
+        self._herb.append(np.asarray(num_herb_cell, dtype=np.uint32))
+        self._carn.append(np.asarray(num_carn_cell, dtype=np.uint32))
+
+    def num_years(self):
+        """ Returns number of years simulated after year 0. """
+        return len(self._herb) - 1
+
+    def num_herb_cells(self):
+        """ Returns number of herbivores in each cell for each year. """
+        return np.array(self._herb, dtype=np.uint32)
+
+    def num_carn_cells(self):
+        """ Returns number of carnivores in each cell for each year. """
+        return np.array(self._carn, dtype=np.uint32)
+
+    def num_animals_in_year(self, year):
+        """
+        Returns number of herbivores and carnivores in each cell for one
+        year, without copying the other years.
+
+        :param year: year recorded, 0 is the state before the first year
+        :return: tuple of arrays with number of herbivores and carnivores
+        """
+        return self._herb[year], self._carn[year]
+
+    def total_num_by_species(self, last_year=None):
+        """
+        Returns total number of herbivores and carnivores for each year.
+
+        :param last_year: last year summed, all years are summed if None
+        :return: dictionary with arrays of totals
+        """
+        stop = None if last_year is None else last_year + 1
+        return {'herbivores': np.array([herb.sum()
+                                        for herb in self._herb[:stop]]),
+                'carnivores': np.array([carn.sum()
+                                        for carn in self._carn[:stop]])}
+
+    def save(self, filename):
+        """
+        Saves trajectory to a compressed numpy file.
+
+        :param filename: name of the file, '.npz' is added if missing
+        """
+        totals = self.total_num_by_species()
+        np.savez_compressed(filename, island_map=np.array(self.island_map),
+                            num_herb_cells=self.num_herb_cells(),
+                            num_carn_cells=self.num_carn_cells(),
+                            num_herb=totals['herbivores'],
+                            num_carn=totals['carnivores'])
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads trajectory saved with :meth:`save`.
+
+        :param filename: name of the file
+        :return: class instance of the trajectory
+        """
+        with np.load(filename) as data:
+            return cls(str(data['island_map']), data['num_herb_cells'],
+                       data['num_carn_cells'])
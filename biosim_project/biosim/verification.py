@@ -0,0 +1,392 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides checks that optimized engines implement the same model
+as the object engine, the reference, for the biosim project.
+
+In exact mode, the state of the island is reduced to a digest after each
+year: the location, species, age and weight of each animal, sorted. A
+candidate must give the same digest as the reference every
+year when both start from the same random seed.
+
+In statistical mode, each engine is run with different seeds, and the
+distributions of the number of animals and of the fitness at the last year
+are compared with two-sample Kolmogorov-Smirnov tests. A difference is
+reported when the p-value is below alpha divided by the number of tests.
+
+Both modes run over a matrix of maps and parameter sets, e.g.::
+
+    python -m biosim.verification --mode both --engines array auto
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import sys
+import textwrap
+from collections import namedtuple
+from contextlib import contextmanager
+import numpy as np
+from .island_nature import Island
+from .animals import Herbivore, Carnivore
+from .landscape import Jungle, Savannah
+from .map_generator import generate_map, generate_population
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+REFERENCE = 'object'
+
+# candidates create an island from a map; the mean-field engine simulates
+# expected numbers and can not be checked against single runs
+ENGINES = {
+    'object': lambda island_map: Island(island_map, cell_engine='object'),
+    'array': lambda island_map: Island(island_map, cell_engine='array'),
+    'auto': lambda island_map: Island(island_map, cell_engine='auto'),
+}
+
+MAPS = {
+    'jungle': textwrap.dedent("""\
+        OOOOO
+        OJJJO
+        OJJJO
+        OOOOO"""),
+    'mixed': textwrap.dedent("""\
+        OOOOOOOO
+        OJJSSDMO
+        OJJJSDDO
+        OSSJJMJO
+        OOOOOOOO"""),
+    'generated': generate_map(12, 16, seed=3),
+}
+
+PARAMETER_SETS = {
+    'default': {},
+    'fertile': {'Herbivore': {'gamma': 0.4, 'zeta': 2.0},
+                'Carnivore': {'gamma': 0.9}},
+    'hunters': {'Carnivore': {'F': 70.0, 'DeltaPhiMax': 4.0, 'mu': 0.6},
+                'Savannah': {'fmax': 500.0}},
+}
+
+# classes with parameters that can be set by name
+PARAMETER_CLASSES = {'Herbivore': Herbivore, 'Carnivore': Carnivore,
+                     'Jungle': Jungle, 'Savannah': Savannah}
+
+ExactResult = namedtuple('ExactResult', ['map', 'params', 'engine',
+                                         'first_difference'])
+ExactResult.__doc__ = """
+Result of an exact check. first_difference is the first year with a
+different digest, None if all years are the same.
+"""
+
+StatisticalResult = namedtuple('StatisticalResult',
+                               ['map', 'params', 'engine', 'quantity',
+                                'statistic', 'p_value'])
+StatisticalResult.__doc__ = """
+Result of a two-sample test of one quantity, e.g. 'herbivores' for the
+number of herbivores at the last year.
+"""
+
+
+@contextmanager
+def parameters(params):
+    """
+    Sets parameters of animals and landscapes, and restores the earlier
+    parameters at exit.
+
+    :param params: dictionary with class names, e.g. 'Herbivore', as keys
+                   and dictionaries of parameters as values
+    """
+    for name in params:
+        if name not in PARAMETER_CLASSES:
+            raise ValueError("Unknown class for parameters: {}".format(name))
+
+    saved = {name: cls.params.copy()
+             for name, cls in PARAMETER_CLASSES.items()}
+    try:
+        for name, new_params in params.items():
+            PARAMETER_CLASSES[name].set_parameters(new_params)
+        yield
+    finally:
+        # in place, so references to the dictionaries see the parameters
+        for name, cls in PARAMETER_CLASSES.items():
+            cls.params.clear()
+            cls.params.update(saved[name])
+
+
+def state_digest(island):
+    """
+    Reduces the state of an island to a digest.
+
+    The animals are sorted by cell, species, age and weight, so the digest
+    does not depend on the order of the animals in a cell.
+
+    :param island: class instance of the island
+    :return: hexadecimal string
+    """
+    loc, species, age, weight = island.animal_columns()
+    order = np.lexsort((weight, age, species, loc[:, 1], loc[:, 0]))
+    digest = hashlib.sha256()
+    for column in (loc, species, age):
+        digest.update(column[order].astype(np.int64).tobytes())
+    digest.update(weight[order].astype(float).tobytes())
+    return digest.hexdigest()
+
+
+def run_digests(engine, island_map, ini_pop, num_years, seed):
+    """
+    Simulates an island and returns the digest after each year.
+
+    :param engine: name of the engine in :data:`ENGINES`
+    :param island_map: multiline string with the island's geography
+    :param ini_pop: initial population, as taken by place_animals
+    :param num_years: number of years simulated
+    :param seed: random generator seed
+    :return: list of digests, the first for year 0
+    """
+    random.seed(seed)
+    island = ENGINES[engine](island_map)
+    island.place_animals(ini_pop)
+    digests = [state_digest(island)]
+    for _ in range(num_years):
+        island.annual_cycle()
+        digests.append(state_digest(island))
+    return digests
+
+
+def check_exact(engine, island_map, ini_pop, num_years, seed=1,
+                reference=REFERENCE):
+    """
+    Compares the digests of an engine with the reference for each year.
+
+    :return: first year with different digests, None if all are the same
+    """
+    expected = run_digests(reference, island_map, ini_pop, num_years, seed)
+    found = run_digests(engine, island_map, ini_pop, num_years, seed)
+    for year, (digest, reference_digest) in enumerate(zip(found, expected)):
+        if digest != reference_digest:
+            return year
+    return None
+
+
+def run_ensemble(engine, island_map, ini_pop, num_years, seeds):
+    """
+    Simulates an island once for each seed.
+
+    :return: dictionary with arrays of the number of herbivores and
+             carnivores at the last year for each seed, and the fitness of
+             all herbivores and carnivores at the last year of all seeds
+    """
+    result = {'herbivores': [], 'carnivores': [],
+              'herbivore fitness': [], 'carnivore fitness': []}
+    for seed in seeds:
+        random.seed(seed)
+        island = ENGINES[engine](island_map)
+        island.place_animals(ini_pop)
+        for _ in range(num_years):
+            island.annual_cycle()
+        num_herb, num_carn = island.number_of_animals()
+        result['herbivores'].append(num_herb)
+        result['carnivores'].append(num_carn)
+        result['herbivore fitness'].extend(
+            island.animal_properties('herbivores')['fitness'])
+        result['carnivore fitness'].extend(
+            island.animal_properties('carnivores')['fitness'])
+    return {name: np.asarray(values, dtype=float)
+            for name, values in result.items()}
+
+
+def ks_two_sample(first, second):
+    """
+    Two-sample Kolmogorov-Smirnov test.
+
+    The p-value uses the asymptotic distribution of the statistic, with the
+    correction of Stephens (1970) for small samples.
+
+    :param first: array of values
+    :param second: array of values
+    :return: largest distance between the empirical distribution functions,
+             and the p-value of the samples coming from the same
+             distribution
+    """
+    first = np.sort(first)
+    second = np.sort(second)
+    if len(first) == 0 or len(second) == 0:
+        return 0., 1.
+
+    values = np.concatenate((first, second))
+    cdf_first = np.searchsorted(first, values, side='right') / \
+        float(len(first))
+    cdf_second = np.searchsorted(second, values, side='right') / \
+        float(len(second))
+    statistic = float(np.abs(cdf_first - cdf_second).max())
+
+    size = math.sqrt(len(first) * len(second) /
+                     float(len(first) + len(second)))
+    x = (size + 0.12 + 0.11 / size) * statistic
+    if x < 0.2:
+        return statistic, 1.
+    p_value = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * x * x)
+                      for k in range(1, 101))
+    return statistic, min(max(p_value, 0.), 1.)
+
+
+def check_statistical(engine, island_map, ini_pop, num_years,
+                      num_replicates=20, seed=1, reference=REFERENCE):
+    """
+    Compares ensembles of an engine and the reference with different seeds.
+
+    :return: dictionary with (statistic, p-value) for each quantity
+    """
+    expected = run_ensemble(reference, island_map, ini_pop, num_years,
+                            range(seed, seed + num_replicates))
+    found = run_ensemble(engine, island_map, ini_pop, num_years,
+                         range(seed + num_replicates,
+                               seed + 2 * num_replicates))
+    return {name: ks_two_sample(found[name], expected[name])
+            for name in expected}
+
+
+def verify(engines, maps=None, parameter_sets=None, mode='both',
+           num_years=10, num_replicates=20, seed=1, num_herbivores=60,
+           num_carnivores=10):
+    """
+    Checks engines on each combination of map and parameter set.
+
+    :param engines: names of the engines checked
+    :param maps: dictionary with maps, default is :data:`MAPS`
+    :param parameter_sets: dictionary with parameter sets, default is
+                           :data:`PARAMETER_SETS`
+    :param mode: 'exact', 'statistical' or 'both'
+    :param num_years: number of years simulated
+    :param num_replicates: seeds in each ensemble of the statistical mode
+    :param seed: first seed
+    :param num_herbivores: number of herbivores placed on each map
+    :param num_carnivores: number of carnivores placed on each map
+    :return: lists of :class:`ExactResult` and :class:`StatisticalResult`
+    """
+    if mode not in ('exact', 'statistical', 'both'):
+        raise ValueError("Unknown mode: {}".format(mode))
+    for engine in engines:
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine: {}".format(engine))
+    if maps is None:
+        maps = MAPS
+    if parameter_sets is None:
+        parameter_sets = PARAMETER_SETS
+
+    exact = []
+    statistical = []
+    for map_name, island_map in sorted(maps.items()):
+        ini_pop = generate_population(island_map, num_herbivores,
+                                      num_carnivores, seed=seed)
+        for params_name, params in sorted(parameter_sets.items()):
+            with parameters(params):
+                for engine in engines:
+                    if mode in ('exact', 'both'):
+                        exact.append(ExactResult(
+                            map_name, params_name, engine,
+                            check_exact(engine, island_map, ini_pop,
+                                        num_years, seed)))
+                    if mode in ('statistical', 'both'):
+                        tests = check_statistical(
+                            engine, island_map, ini_pop, num_years,
+                            num_replicates, seed)
+                        for quantity, (statistic, p_value) in sorted(
+                                tests.items()):
+                            statistical.append(StatisticalResult(
+                                map_name, params_name, engine, quantity,
+                                statistic, p_value))
+    return exact, statistical
+
+
+def format_results(exact, statistical, alpha=0.01):
+    """
+    Describes the results of :func:`verify` in a table.
+
+    :param exact: list of :class:`ExactResult`
+    :param statistical: list of :class:`StatisticalResult`
+    :param alpha: significance level for all statistical tests together
+    :return: multiline string, and True if all checks passed
+    """
+    passed = True
+    lines = []
+    if exact:
+        lines.append('Exact mode: digests compared with the {} engine'
+                     .format(REFERENCE))
+        lines.append('{:<12} {:<12} {:<8} {}'.format('map', 'params',
+                                                     'engine', 'result'))
+        for result in exact:
+            if result.first_difference is None:
+                outcome = 'same'
+            else:
+                outcome = 'DIFFERS from year {}'.format(
+                    result.first_difference)
+                passed = False
+            lines.append('{:<12} {:<12} {:<8} {}'.format(
+                result.map, result.params, result.engine, outcome))
+
+    if statistical:
+        level = alpha / len(statistical)
+        if lines:
+            lines.append('')
+        lines.append('Statistical mode: Kolmogorov-Smirnov tests, '
+                     'difference if p < {:.2g}'.format(level))
+        lines.append('{:<12} {:<12} {:<8} {:<18} {:>6} {:>8}'.format(
+            'map', 'params', 'engine', 'quantity', 'D', 'p'))
+        for result in statistical:
+            outcome = ''
+            if result.p_value < level:
+                outcome = '  DIFFERS'
+                passed = False
+            lines.append('{:<12} {:<12} {:<8} {:<18} {:>6.3f} {:>8.3g}{}'
+                         .format(result.map, result.params, result.engine,
+                                 result.quantity, result.statistic,
+                                 result.p_value, outcome))
+    return '\n'.join(lines), passed
+
+
+def main(argv=None):
+    """
+    Verifies engines from the command line, exiting with status 1 if a check
+    fails.
+
+    :param argv: list of command line arguments, default is sys.argv
+    """
+    candidates = sorted(name for name in ENGINES if name != REFERENCE)
+    parser = argparse.ArgumentParser(
+        description='Check that engines implement the same model as the '
+                    'object engine.')
+    parser.add_argument('--mode', choices=('exact', 'statistical', 'both'),
+                        default='exact')
+    parser.add_argument('--engines', nargs='+', choices=candidates,
+                        default=candidates)
+    parser.add_argument('--maps', nargs='+', choices=sorted(MAPS),
+                        default=sorted(MAPS))
+    parser.add_argument('--params', nargs='+', choices=sorted(PARAMETER_SETS),
+                        default=sorted(PARAMETER_SETS))
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--replicates', type=int, default=20,
+                        help='seeds in each ensemble of the statistical mode')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--herbivores', type=int, default=60)
+    parser.add_argument('--carnivores', type=int, default=10)
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='significance level for all statistical tests '
+                             'together')
+    args = parser.parse_args(argv)
+
+    exact, statistical = verify(
+        args.engines, {name: MAPS[name] for name in args.maps},
+        {name: PARAMETER_SETS[name] for name in args.params}, args.mode,
+        args.years, args.replicates, args.seed, args.herbivores,
+        args.carnivores)
+    text, passed = format_results(exact, statistical, args.alpha)
+    print(text)
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+# -*-coding: utf-8 -*-
+
+"""
+This module provides a class implementing the graphics for the biosim project.
+
+The figure is based on the graphics in the RandVis project example given in
+lecture 15, INF200, 13.01.16 by Hans Ekkehard Plesser at NMBU.
+"""
+
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+
+__authors__ = 'Elisabeth Flatner and Marie Klever'
+__emails__ = 'elisabeth.flatner@nmbu.no, marie.klever@nmbu.no'
+
+
+class Visualization(object):
+    """
+    This class represents the figure showing the state of the island.
+
+    The figure has four panels: a map with the geography of the island, a line
+    graph with the number of animals, and the distribution of herbivores and
+    carnivores on the island.
+
+    Everything that does not change between updates (island map, legend,
+    colorbars, axes) is created once. With blitting, an update only redraws
+    the artists that change on top of a stored background.
+    """
+
+    rgb_value = {'O': (0.0, 0.0, 1.0),  # blue
+                 'M': (0.5, 0.5, 0.5),  # grey
+                 'J': (0.0, 0.6, 0.0),  # dark green
+                 'S': (0.5, 1.0, 0.5),  # light green
+                 'D': (1.0, 1.0, 0.5)}  # light yellow
+
+    def __init__(self, island_map, blit=False, offscreen=False):
+        """
+        :param island_map: specification about the island's geography
+        :type island_map: multiline str
+        :param blit: if True, only changed artists are redrawn at each update
+        :type blit: bool
+        :param offscreen: if True, the figure is only rendered to memory and
+                          files, and never shown in a window
+        :type offscreen: bool
+        """
+        self._island_map = island_map
+        self._map_shape = (len(island_map.split()),
+                           len(island_map.split()[0]))
+        self._blit = blit
+        self._offscreen = offscreen
+
+        # the following will be initialized by setup
+        self._fig = None
+        self._map_ax = None
+        self._img_axis = None
+        self._pop_ax = None
+        self._herb_line = None
+        self._carn_line = None
+        self._herb_map_ax = None
+        self._carn_map_ax = None
+        self._herb_img_axis = None
+        self._carn_img_axis = None
+        self._count_year = None
+        self._template = 'Year: {:5}'
+        self._txt = None
+
+        # stored background for blitting, None if a full redraw is needed
+        self._background = None
+
+        # True if the canvas buffer shows the latest data
+        self._drawn = False
+
+        # True when the figure window has been shown for blitting
+        self._shown = False
+
+        # maximum and default limit for ordinate in line graph
+        self._ymax = None
+        self._ylim = 200
+        self._max_num_animals = 0
+
+    @property
+    def figure(self):
+        """ Returns the matplotlib figure, None before setup is called. """
+        return self._fig
+
+    def setup(self, final_step, color_min_herb=0, color_max_herb=180,
+              color_min_carn=0, color_max_carn=180, ymax=None):
+        """
+        Creates subplots, or extends them if the figure already exists.
+
+        :param final_step: last step the line graph has to show
+        :param color_min_herb: color code minimum for herbivore
+        :param color_max_herb: color code maximum for herbivore
+        :param color_min_carn: color code minimum for carnivore
+        :param color_max_carn: color code maximum for carnivore
+        :param ymax: maxvalue for ylimit, adjusted automatically if None
+        """
+        self._ymax = ymax
+
+        # create new figure window, or a figure outside pyplot if offscreen
+        if self._fig is None:
+            if self._offscreen:
+                self._fig = Figure(figsize=(12, 8))
+                FigureCanvasAgg(self._fig)
+            else:
+                self._fig = plt.figure(figsize=(12, 8))
+
+        # Add upper left subplot showing a map with the geography of the island.
+        if self._map_ax is None:
+            kart_rgb = [[self.rgb_value[column] for column in row]
+                        for row in self._island_map.split()]
+
+            self._map_ax = self._fig.add_axes([0.05, 0.525, 0.35, 0.45],
+                                              title='Island map')
+            self._map_ax.imshow(kart_rgb, interpolation='nearest')
+            self._img_axis = self._fig.add_axes([0.41, 0.59, 0.1, 0.35])
+            self._img_axis.axis('off')
+
+            for ix, name in enumerate(('Ocean', 'Mountain', 'Jungle',
+                                       'Savannah', 'Desert')):
+                self._img_axis.add_patch(plt.Rectangle
+                                         ((0., ix * 0.2), 0.3, 0.1,
+                                          edgecolor='none',
+                                          facecolor=self.rgb_value[name[0]]))
+                self._img_axis.text(0.35, ix * 0.2, name,
+                                    transform=self._img_axis.transAxes)
+
+        # Add upper right subplot for line graph of number of animals on the
+        # island.
+        if self._pop_ax is None:
+            self._pop_ax = self._fig.add_axes([0.6, 0.58, 0.35, 0.35],
+                                              title='Number of animals on the '
+                                                    'island',
+                                              xlabel='year',
+                                              ylabel='number of animals')
+
+        # needs updating on subsequent calls to simulate()
+        self._pop_ax.set_xlim(0, final_step + 1)
+
+        if self._herb_line is None:
+            self._herb_line = self._pop_ax.plot(
+                np.arange(0, final_step), np.nan * np.ones(final_step),
+                'b-', animated=self._blit)[0]
+            self._carn_line = self._pop_ax.plot(
+                np.arange(0, final_step), np.nan * np.ones(final_step),
+                'r-', animated=self._blit)[0]
+            self._pop_ax.legend((self._herb_line, self._carn_line),
+                                ('Herbivores', 'Carnivores'),
+                                loc='upper left', fontsize='small')
+        else:
+            xdata, ydata_herb = self._herb_line.get_data()
+            ydata_carn = self._carn_line.get_ydata()
+            xnew = np.arange(xdata[-1] + 1, final_step)
+
+            if len(xnew) > 0:
+                ynew = np.nan * np.ones_like(xnew)
+                self._herb_line.set_data(np.hstack((xdata, xnew)),
+                                         np.hstack((ydata_herb, ynew)))
+                self._carn_line.set_data(np.hstack((xdata, xnew)),
+                                         np.hstack((ydata_carn, ynew)))
+        self._set_ylim()
+
+        # Add lower left subplot for map illustrating the distribution of
+        # herbivores on the island.
+        if self._herb_map_ax is None:
+            self._herb_map_ax = self._fig.add_axes([0.05, 0.025, 0.4, 0.45],
+                                                   title='Distribution of '
+                                                         'herbivores')
+            self._herb_img_axis = self._herb_map_ax.imshow(
+                np.zeros(self._map_shape), interpolation='nearest',
+                animated=self._blit)
+            self._fig.colorbar(self._herb_img_axis, ax=self._herb_map_ax,
+                               orientation='horizontal')
+
+        # Add lower right subplot for map illustrating the distribution of
+        # carnivores on the island.
+        if self._carn_map_ax is None:
+            self._carn_map_ax = self._fig.add_axes([0.57, 0.025, 0.4, 0.45],
+                                                   title='Distribution of '
+                                                         'carnivores')
+            self._carn_img_axis = self._carn_map_ax.imshow(
+                np.zeros(self._map_shape), interpolation='nearest',
+                animated=self._blit)
+            self._fig.colorbar(self._carn_img_axis, ax=self._carn_map_ax,
+                               orientation='horizontal')
+
+        self._herb_img_axis.set_clim(color_min_herb, color_max_herb)
+        self._carn_img_axis.set_clim(color_min_carn, color_max_carn)
+
+        # Add lower center subplot for counter of number of years that are
+        # simulated
+        if self._count_year is None:
+            self._count_year = self._fig.add_axes([0.36, 0.35, 0.2, 0.2])
+            self._count_year.axis('off')
+            self._txt = self._count_year.text(0.5, 0.5, self._template.
+                                              format(0),
+                                              horizontalalignment='left',
+                                              verticalalignment='bottom',
+                                              transform=self._count_year.
+                                              transAxes, fontsize='large',
+                                              weight='bold',
+                                              animated=self._blit)
+
+        # limits and axes may have changed, so the background is outdated
+        self._background = None
+        self._drawn = False
+
+    def update_num_animals(self, step, num_herb, num_carn):
+        """
+        Stores total number of animals for a year in the line graph.
+
+        Years after the end of the line graph are ignored.
+
+        :param step: index of the year in the line graph
+        :param num_herb: total number of herbivores on the island
+        :param num_carn: total number of carnivores on the island
+        """
+        ydata_herb = self._herb_line.get_ydata()
+        if step >= len(ydata_herb):
+            return
+
+        ydata_herb[step] = num_herb
+        self._carn_line.get_ydata()[step] = num_carn
+
+        # running maximum, so the whole history is never searched
+        self._max_num_animals = max(self._max_num_animals, num_herb, num_carn)
+        self._drawn = False
+
+    def num_animals(self, num_years):
+        """
+        Returns total number of animals stored in the line graph.
+
+        :param num_years: number of years to return, from the first year
+        :return: arrays with number of herbivores and carnivores
+        """
+        return (self._herb_line.get_ydata()[:num_years],
+                self._carn_line.get_ydata()[:num_years])
+
+    def set_num_animals(self, num_herb, num_carn):
+        """
+        Replaces the totals in the line graph with the given years.
+
+        Years after the given ones are cleared, and the ordinate is adjusted
+        as if the figure had only seen the given years.
+
+        :param num_herb: total number of herbivores for each year
+        :type num_herb: sequence
+        :param num_carn: total number of carnivores for each year
+        :type num_carn: sequence
+        """
+        num_years = len(num_herb)
+        ydata_herb = self._herb_line.get_ydata()
+        ydata_carn = self._carn_line.get_ydata()
+        ydata_herb[:num_years] = num_herb
+        ydata_carn[:num_years] = num_carn
+        ydata_herb[num_years:] = np.nan
+        ydata_carn[num_years:] = np.nan
+
+        self._ylim = 200
+        self._max_num_animals = 0
+        if num_years > 0:
+            self._max_num_animals = max(np.max(num_herb), np.max(num_carn))
+        self._drawn = False
+
+    def extend_num_animals(self, first_year, num_herb, num_carn):
+        """
+        Adds totals after the years given to set_num_animals, or to earlier
+        calls of this method, as if all the years were given at once.
+
+        Only the new years are copied, and the later years must be empty.
+
+        :param first_year: index of the first year given, the number of
+                           years given before
+        :param num_herb: total number of herbivores for each new year
+        :type num_herb: sequence
+        :param num_carn: total number of carnivores for each new year
+        :type num_carn: sequence
+        """
+        end = first_year + len(num_herb)
+        self._herb_line.get_ydata()[first_year:end] = num_herb
+        self._carn_line.get_ydata()[first_year:end] = num_carn
+
+        self._ylim = 200
+        if first_year == 0:
+            self._max_num_animals = 0
+        if len(num_herb) > 0:
+            self._max_num_animals = max(self._max_num_animals,
+                                        np.max(num_herb), np.max(num_carn))
+        self._drawn = False
+
+    def update(self, step, num_herb_cell, num_carn_cell, draw=True):
+        """
+        Updates graphics with current data.
+
+        :param step: number of years simulated
+        :param num_herb_cell: total number of herbivores in each cell
+        :param num_carn_cell: total number of carnivores in each cell
+        :param draw: if False, the data is updated without drawing
+        """
+        self._herb_img_axis.set_data(num_herb_cell)
+        self._carn_img_axis.set_data(num_carn_cell)
+
+        # the line data is updated in place, so the lines must be recached
+        self._herb_line.set_ydata(self._herb_line.get_ydata())
+        self._carn_line.set_ydata(self._carn_line.get_ydata())
+        self._set_ylim()
+
+        self._txt.set_text(self._template.format(step))
+        self._drawn = False
+
+        if draw:
+            self.draw()
+
+    def _set_ylim(self):
+        """
+        Updates ordinate of line graph.
+
+        If ymax is not given, the ordinate grows with the largest number of
+        animals seen so far. Changing the ordinate requires a full redraw.
+        """
+        if self._ymax is not None:
+            ylim = self._ymax
+        else:
+            if self._max_num_animals > self._ylim:
+                self._ylim = 1.2 * self._max_num_animals
+            ylim = self._ylim
+
+        if self._pop_ax.get_ylim() != (0, ylim):
+            self._pop_ax.set_ylim(0, ylim)
+            self._background = None
+
+    def _animated_artists(self):
+        """ Returns the artists that change between updates. """
+        return (self._herb_img_axis, self._carn_img_axis, self._herb_line,
+                self._carn_line, self._txt)
+
+    def draw(self):
+        """
+        Draws the figure on screen.
+
+        Without blitting the whole figure is redrawn. With blitting, the
+        background is restored and only the animated artists are drawn. If
+        the background is outdated, it is redrawn once by :meth:`_render`.
+        An offscreen figure is only rendered to memory.
+        """
+        if self._offscreen:
+            self._render()
+            return
+
+        if not self._blitting():
+            plt.pause(1e-6)
+            return
+
+        if not self._shown:
+            plt.show(block=False)
+            self._shown = True
+        self._render()
+        self._fig.canvas.blit(self._fig.bbox)
+        self._fig.canvas.flush_events()
+
+    def _blitting(self):
+        """ Returns True if blitting is requested and supported. """
+        return self._blit and self._fig.canvas.supports_blit
+
+    def _render(self):
+        """
+        Renders the figure into the canvas buffer without showing it.
+
+        When blitting, only the animated artists are rendered on top of the
+        stored background.
+        """
+        canvas = self._fig.canvas
+
+        if not self._blitting():
+            canvas.draw()
+        else:
+            if self._background is None:
+                canvas.draw()
+                self._background = canvas.copy_from_bbox(self._fig.bbox)
+            else:
+                canvas.restore_region(self._background)
+
+            for artist in self._animated_artists():
+                artist.axes.draw_artist(artist)
+        self._drawn = True
+
+    def frame_rgba(self):
+        """
+        Returns the current figure as an RGBA pixel buffer.
+
+        The buffer is only rendered if the data has changed since the figure
+        was last drawn. The returned array shares memory with the canvas and
+        is overwritten at the next draw.
+
+        :return: array with shape (height, width, 4)
+        """
+        if not self._drawn:
+            self._render()
+        return np.asarray(self._fig.canvas.buffer_rgba())
+
+    def save(self, filename):
+        """
+        Saves figure to file.
+
+        :param filename: name of the image file
+        """
+        self._fig.savefig(filename)
@@ -33,12 +33,12 @@ if __name__ == '__main__':
                   'pop': [{'species': 'Herbivore',
                            'age': 5,
                            'weight': 20}
-                          for _ in xrange(230)]}]
+                          for _ in range(230)]}]
     ini_carns = [{'loc': (10, 10),
                   'pop': [{'species': 'Carnivore',
                            'age': 5,
                            'weight': 20}
-                          for _ in xrange(15)]}]
+                          for _ in range(15)]}]
 
     isl = Island(geogr)
     isl.place_animals(ini_carns+ini_herbs)